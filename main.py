@@ -1,14 +1,13 @@
-import schedule
-import time
 import os
-from rpa.rpa_with_state_machine import RPAWithStateMachine
+from rpa.rpa_with_state_machine import RPAWithStateMachine, reload_reference_assets
 from rpa.simple_logger import rpa_logger
+from rpa.supervisor import Supervisor
 import logging
 
 # Configurar logging
 logging.basicConfig(filename='logs.log', level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
 
-def run_rpa_task():
+def run_rpa_task(supervisor=None):
     """Ejecuta el proceso RPA con máquina de estados para automatizar SAP"""
     logging.info('Iniciando proceso RPA con máquina de estados')
     print('Iniciando proceso RPA con máquina de estados...')
@@ -17,6 +16,8 @@ def run_rpa_task():
 
     try:
         rpa = RPAWithStateMachine()
+        # Entre órdenes el supervisor aplica recargas y detiene el ciclo si se pidió drenaje
+        rpa.supervisor = supervisor
         
         # El método run() maneja internamente toda la lógica de reintentos
         # usando la máquina de estados
@@ -40,28 +41,36 @@ def run_rpa_task():
     print('Sistema RPA en espera - monitoreando nuevos archivos JSON...')
     rpa_logger.log_action("=== FIN DE CICLO RPA ===", "Sistema en espera para próximo ciclo")
 
-print("=== SISTEMA RPA TAMAPRINT ===")
-print("Iniciando sistema de automatización RPA para SAP...")
 
-# Ejecutar una vez al inicio
-run_rpa_task()
+def flush_pending_work():
+    """Vacía el trabajo en segundo plano antes de salir (volcados de depuración, journal, watchdog)"""
+    from rpa.vision.frame_buffer import debug_frames
+    from rpa.checkpoint_store import checkpoint_store
+    from rpa.watchdog import state_watchdog
+    
+    debug_frames.wait()
+    checkpoint_store.close()
+    state_watchdog.stop()
+
 
-# Programar ejecución cada 10 minutos
-schedule.every(10).minutes.do(run_rpa_task)
+# Sin ejecutar al importar: los procesos de la validación previa (spawn en Windows)
+# vuelven a importar este módulo
+if __name__ == '__main__':
+    print("=== SISTEMA RPA TAMAPRINT ===")
+    print("Iniciando sistema de automatización RPA para SAP...")
 
-print("Sistema RPA activo. Presiona Ctrl+C para detener.")
+    # Ciclo al inicio y luego cada system.schedule_interval minutos
+    supervisor = Supervisor(run_rpa_task)
+    supervisor.add_reload_hook(reload_reference_assets)
+    supervisor.add_shutdown_hook(flush_pending_work)
+    supervisor.install_signal_handlers()
+
+    print("Sistema RPA activo. Ctrl+C termina la orden en curso y sale (dos veces: detención inmediata).")
 
-# Loop principal del sistema
-while True:
     try:
-        schedule.run_pending()
-        time.sleep(10)  # Verificar cada 10 segundos
-        print('.', end='', flush=True)  # Indicador de actividad
+        supervisor.run_forever()
+        print("\nSistema RPA detenido ordenadamente.")
+        logging.info("Sistema RPA detenido ordenadamente")
     except KeyboardInterrupt:
         print("\nSistema RPA detenido por el usuario.")
         logging.info("Sistema RPA detenido por el usuario")
-        break
-    except Exception as e:
-        print(f"\nError en el sistema RPA: {e}")
-        logging.error(f"Error en el sistema RPA: {e}")
-        time.sleep(30)  # Esperar 30 segundos antes de continuar en caso de error
@@ -0,0 +1,368 @@
+"""
+Ingreso masivo de órdenes desde planillas CSV/XLSX
+Las planillas con cientos de órdenes se leen fila por fila (memoria acotada a
+la orden en curso más un índice de una entrada por orden), las filas se
+agrupan por orden_compra, cada orden se valida y las válidas se guardan en un
+spool JSONL por planilla. La cola de JSON se alimenta desde el spool por lotes,
+así nunca hay cientos de archivos intermedios en data/outputs_json
+"""
+
+import os
+import re
+import csv
+import json
+import time
+import shutil
+from dataclasses import dataclass, field
+from datetime import datetime, date
+from typing import Any, Dict, Iterator, List, Optional
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+from rpa.catalog_index import sniff_delimiter, catalog_index
+from rpa.order_validation import compile_schema, validate_order
+
+# Columna de la planilla para cada campo de la orden (encabezados sin distinguir mayúsculas)
+DEFAULT_COLUMNS = {
+    'nit': 'nit',
+    'orden_compra': 'orden_compra',
+    'fecha_entrega': 'fecha_entrega',
+    'fecha_documento': 'fecha_documento',
+    'codigo': 'codigo',
+    'cantidad': 'cantidad',
+    'descripcion': 'descripcion',
+}
+
+
+def _normalize_header(name: Any) -> str:
+    return str(name if name is not None else '').strip().lower()
+
+
+def cell_text(value: Any) -> str:
+    """Texto de una celda: fechas en DD/MM/YYYY y números enteros sin decimales"""
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%d/%m/%Y')
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _quantity(text: str) -> Any:
+    """Cantidad como número cuando se puede (la validación reporta el resto)"""
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return int(number) if number.is_integer() else number
+
+
+def iter_csv_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Filas de un CSV como diccionarios por encabezado (separador detectado)"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.readline()
+        f.seek(0)
+        reader = csv.reader(f, delimiter=sniff_delimiter(sample))
+        header = [_normalize_header(name) for name in next(reader, [])]
+        for row in reader:
+            if any(cell.strip() for cell in row):
+                yield dict(zip(header, row))
+
+
+def iter_xlsx_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Filas de la primera hoja de un XLSX en modo de solo lectura (streaming)
+
+    Raises:
+        ImportError: Si openpyxl no está instalado
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ImportError("Se requiere openpyxl para leer planillas .xlsx (pip install openpyxl)") from e
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_normalize_header(name) for name in next(rows, ())]
+        for row in rows:
+            if any(value not in (None, '') for value in row):
+                yield dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Filas de una planilla según su extensión"""
+    if path.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(path)
+    return iter_csv_rows(path)
+
+
+def group_orders(rows: Iterator[Dict[str, Any]], columns: Dict[str, str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Agrupa filas consecutivas con la misma orden_compra en órdenes con el formato JSON
+
+    Solo se mantiene en memoria la orden en curso. Una orden cuyas filas no son
+    consecutivas sale en varios grupos, que el spool une al liberarla.
+    """
+    columns = {**DEFAULT_COLUMNS, **(columns or {})}
+    columns = {key: _normalize_header(name) for key, name in columns.items()}
+    current = None
+    for row in rows:
+        values = {key: cell_text(row.get(name)) for key, name in columns.items()}
+        if current is None or values['orden_compra'] != current['orden_compra']:
+            if current is not None:
+                yield current
+            current = {
+                'comprador': {'nit': values['nit']},
+                'orden_compra': values['orden_compra'],
+                'fecha_entrega': values['fecha_entrega'],
+                'items': [],
+            }
+            if values['fecha_documento']:
+                current['fecha_documento'] = values['fecha_documento']
+
+        item = {'codigo': values['codigo'], 'cantidad': _quantity(values['cantidad'])}
+        if values['descripcion']:
+            item['descripcion'] = values['descripcion']
+        if values['fecha_entrega']:
+            item['fecha_entrega'] = values['fecha_entrega']
+        current['items'].append(item)
+    if current is not None:
+        yield current
+
+
+@dataclass
+class IntakeReport:
+    """Resultado del ingreso de una planilla"""
+    source: str
+    rows: int = 0
+    orders: int = 0
+    rejected: Dict[str, List[str]] = field(default_factory=dict)
+    duration: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.duration if self.duration > 0 else 0.0
+
+
+class BulkIntake:
+    """
+    Adaptador de planillas: spool JSONL por planilla y liberación por lotes
+
+    Por cada planilla se escriben <nombre>.orders.jsonl (un grupo de filas por
+    línea) y <nombre>.index.json (orden_compra -> posiciones en el spool, y
+    cuántas órdenes ya se liberaron a la cola). release() escribe el JSON de
+    las siguientes órdenes solo cuando la cola tiene lugar.
+    """
+
+    def __init__(self, spool_dir: str = None, archive_dir: str = None, quarantine_dir: str = None,
+                 release_batch: int = None, columns: Dict[str, str] = None):
+        self.spool_dir = spool_dir or config.get('paths.bulk_spool', './data/outputs_json/Lotes')
+        self.archive_dir = archive_dir or config.get('paths.bulk_archive', './data/outputs_json/Planillas')
+        self.quarantine_dir = quarantine_dir or config.get('paths.quarantine_json', './data/outputs_json/Cuarentena')
+        self.release_batch = release_batch or config.get('bulk_intake.release_batch', 20)
+        self.columns = columns if columns is not None else config.get('bulk_intake.columns', {}) or {}
+        self.extensions = tuple(config.get('bulk_intake.extensions', ['.csv', '.xlsx']))
+
+    def scan(self, directory: str) -> List[IntakeReport]:
+        """Ingresa todas las planillas del directorio"""
+        reports = []
+        for file_name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, file_name)
+            if os.path.isfile(path) and file_name.lower().endswith(self.extensions) and not file_name.startswith('.'):
+                report = self.ingest(path)
+                if report is not None:
+                    reports.append(report)
+        return reports
+
+    def ingest(self, path: str) -> Optional[IntakeReport]:
+        """
+        Lee una planilla, valida sus órdenes y las deja en el spool
+
+        Args:
+            path: Planilla CSV o XLSX
+
+        Returns:
+            IntakeReport, o None si la planilla no se pudo leer (queda en su lugar)
+        """
+        start_time = time.time()
+        source = os.path.basename(path)
+        stem = os.path.splitext(source)[0]
+        if os.path.exists(self._index_path(stem)):
+            # Otra planilla con el mismo nombre todavía tiene órdenes en el spool
+            stem = f"{stem}_{int(time.time())}"
+        report = IntakeReport(source)
+        schema = compile_schema()
+        check_catalog = config.get('catalog.enabled', True)
+        if check_catalog:
+            catalog_index.refresh()
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        spool_path = os.path.join(self.spool_dir, f'{stem}.orders.jsonl')
+        offsets: Dict[str, List[int]] = {}
+        nits: Dict[str, str] = {}
+
+        try:
+            with open(spool_path, 'wb') as spool:
+                for order in group_orders(self._counted(iter_rows(path), report), self.columns):
+                    key = order['orden_compra']
+                    errors = validate_order(order, schema)
+                    if not errors and key in nits and nits[key] != order['comprador']['nit']:
+                        errors = [f"NIT distinto entre filas de la misma orden: {nits[key]} y {order['comprador']['nit']}"]
+                    if not errors and check_catalog:
+                        errors = catalog_index.check_order(order['comprador']['nit'],
+                                                           [item['codigo'] for item in order['items']])
+                    if errors:
+                        report.rejected.setdefault(key or '(sin orden de compra)', []).extend(errors)
+                        continue
+                    nits.setdefault(key, order['comprador']['nit'])
+                    offsets.setdefault(key, []).append(spool.tell())
+                    spool.write(json.dumps(order, ensure_ascii=False).encode('utf-8') + b'\n')
+        except ImportError as e:
+            # Falta openpyxl: la planilla queda en su lugar hasta instalarlo
+            rpa_logger.log_error(str(e), f"Archivo: {source}")
+            self._remove(spool_path)
+            return None
+        except (OSError, UnicodeDecodeError, csv.Error, ValueError) as e:
+            rpa_logger.log_error(f"No se pudo leer la planilla: {str(e)}", f"Archivo: {source}")
+            self._remove(spool_path)
+            self._write_rejected(stem, {source: [f"Planilla ilegible: {str(e)}"]})
+            self._archive(path, self.quarantine_dir)
+            return None
+
+        # Una orden con algún grupo de filas inválido se rechaza completa
+        for key in report.rejected:
+            offsets.pop(key, None)
+        report.orders = len(offsets)
+        self._write_index(stem, {'source': source, 'orders': list(offsets.items()), 'released': 0})
+        self._write_rejected(stem, report.rejected)
+        self._archive(path)
+
+        report.duration = time.time() - start_time
+        rpa_logger.log_performance(f"Ingreso de planilla {source}", report.duration)
+        rpa_logger.log_action(
+            "Planilla ingresada",
+            f"Archivo: {source}, Filas: {report.rows}, Órdenes: {report.orders}, "
+            f"Rechazadas: {len(report.rejected)}, Velocidad: {report.rows_per_second:,.0f} filas/s"
+        )
+        return report
+
+    def pending(self) -> int:
+        """Órdenes en el spool que todavía no pasaron a la cola"""
+        total = 0
+        for stem in self._stems():
+            index = self._read_index(stem)
+            total += len(index['orders']) - index['released']
+        return total
+
+    def release(self, directory: str, queued: int = 0) -> List[str]:
+        """
+        Escribe en la cola el JSON de las siguientes órdenes del spool
+
+        Args:
+            directory: Directorio de la cola (data/outputs_json)
+            queued: Archivos JSON que ya esperan en la cola
+
+        Returns:
+            Nombres de los archivos escritos
+        """
+        available = self.release_batch - queued
+        written = []
+        for stem in self._stems():
+            if available <= 0:
+                break
+            index = self._read_index(stem)
+            spool_path = os.path.join(self.spool_dir, f'{stem}.orders.jsonl')
+            with open(spool_path, 'rb') as spool:
+                while available > 0 and index['released'] < len(index['orders']):
+                    key, positions = index['orders'][index['released']]
+                    order = None
+                    for position in positions:
+                        spool.seek(position)
+                        part = json.loads(spool.readline())
+                        if order is None:
+                            order = part
+                        else:
+                            order['items'].extend(part['items'])
+                    file_name = f"{stem}_{re.sub(r'[^A-Za-z0-9._-]', '_', key)}.json"
+                    self._write_json(os.path.join(directory, file_name), order)
+                    written.append(file_name)
+                    index['released'] += 1
+                    available -= 1
+            if index['released'] >= len(index['orders']):
+                self._remove(spool_path)
+                self._remove(self._index_path(stem))
+            else:
+                self._write_index(stem, index)
+
+        if written:
+            rpa_logger.log_action("Órdenes liberadas desde planillas",
+                                  f"Escritas: {len(written)}, Pendientes en spool: {self.pending()}")
+        return written
+
+    @staticmethod
+    def _counted(rows: Iterator[Dict[str, Any]], report: IntakeReport) -> Iterator[Dict[str, Any]]:
+        for row in rows:
+            report.rows += 1
+            yield row
+
+    def _stems(self) -> List[str]:
+        if not os.path.isdir(self.spool_dir):
+            return []
+        suffix = '.index.json'
+        return sorted(name[:-len(suffix)] for name in os.listdir(self.spool_dir) if name.endswith(suffix))
+
+    def _index_path(self, stem: str) -> str:
+        return os.path.join(self.spool_dir, f'{stem}.index.json')
+
+    def _read_index(self, stem: str) -> Dict[str, Any]:
+        with open(self._index_path(stem), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_index(self, stem: str, index: Dict[str, Any]):
+        self._write_json(self._index_path(stem), index)
+
+    @staticmethod
+    def _write_json(path: str, data: Any):
+        """Escritura atómica (archivo temporal + rename)"""
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, path)
+
+    def _write_rejected(self, stem: str, rejected: Dict[str, List[str]]):
+        """Motivos de las órdenes rechazadas, en un solo archivo por planilla"""
+        if not rejected:
+            return
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        path = os.path.join(self.quarantine_dir, f'{stem}.reason.json')
+        self._write_json(path, {
+            'file': stem,
+            'quarantined_at': datetime.now().isoformat(timespec='seconds'),
+            'orders': rejected,
+        })
+        for key, errors in rejected.items():
+            rpa_logger.log_error(f"Orden de planilla rechazada: {'; '.join(errors)}",
+                                 f"Planilla: {stem}, Orden: {key}")
+
+    def _archive(self, path: str, directory: str = None):
+        directory = directory or self.archive_dir
+        os.makedirs(directory, exist_ok=True)
+        destination = os.path.join(directory, os.path.basename(path))
+        if os.path.exists(destination):
+            base, extension = os.path.splitext(os.path.basename(path))
+            destination = os.path.join(directory, f"{base}_{int(time.time())}{extension}")
+        shutil.move(path, destination)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Instancia global del ingreso masivo
+bulk_intake = BulkIntake()
@@ -0,0 +1,180 @@
+"""
+Índice local del catálogo de SAP (códigos de item y NIT de clientes)
+Se construye desde las exportaciones periódicas de SAP como arreglos ordenados
+y deduplicados; las consultas son búsquedas binarias O(log n), así la
+validación previa detecta códigos y clientes inexistentes antes de teclearlos
+"""
+
+import os
+import csv
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+
+EXPORT_DELIMITERS = ',;\t|'
+
+
+def normalize_code(value) -> str:
+    """Clave de búsqueda: sin espacios y en mayúsculas"""
+    return str(value).strip().upper()
+
+
+def sniff_delimiter(sample: str) -> str:
+    """Separador de una exportación a partir de su primera línea (coma por defecto)"""
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=EXPORT_DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+
+def read_export_column(path: str, column: str) -> List[str]:
+    """
+    Lee una columna de una exportación CSV de SAP
+
+    El separador se detecta en la primera línea (coma, punto y coma, tabulador
+    o barra). Si el encabezado no tiene la columna pedida se usa la primera.
+
+    Args:
+        path: Archivo exportado
+        column: Nombre de la columna (sin distinguir mayúsculas)
+
+    Returns:
+        Valores normalizados en el orden del archivo
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.readline()
+        f.seek(0)
+        reader = csv.reader(f, delimiter=sniff_delimiter(sample))
+        header = [name.strip().lower() for name in next(reader, [])]
+        index = header.index(column.lower()) if column.lower() in header else 0
+        return [normalize_code(row[index]) for row in reader if len(row) > index and row[index].strip()]
+
+
+class SortedIndex:
+    """Conjunto inmutable de claves en un arreglo ordenado (búsqueda binaria)"""
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._keys = sorted(set(keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        key = normalize_code(key)
+        position = bisect_left(self._keys, key)
+        return position < len(self._keys) and self._keys[position] == key
+
+
+class CatalogIndex:
+    """
+    Índice de códigos de item y NIT válidos
+
+    Cada exportación se vuelve a leer solo cuando cambian su tamaño o su fecha
+    de modificación. Si una exportación no existe, ese tipo de validación queda
+    desactivado (available() retorna False) y las órdenes no se rechazan por él.
+    Una exportación que cambia mientras se lee (SAP aún la está escribiendo) o
+    que trae muchas menos claves que la anterior se descarta y se conserva el
+    índice previo.
+    """
+
+    def __init__(self, items_file: str = None, customers_file: str = None,
+                 item_column: str = None, nit_column: str = None, max_shrink: float = None):
+        self.items_file = items_file if items_file is not None else config.get('catalog.items_file', './data/catalog/items.csv')
+        self.customers_file = (customers_file if customers_file is not None
+                               else config.get('catalog.customers_file', './data/catalog/customers.csv'))
+        self.item_column = item_column or config.get('catalog.item_column', 'codigo')
+        self.nit_column = nit_column or config.get('catalog.nit_column', 'nit')
+        self.max_shrink = max_shrink if max_shrink is not None else config.get('catalog.max_shrink', 0.5)
+
+        self.items = SortedIndex()
+        self.customers = SortedIndex()
+        self._signatures: Dict[str, Optional[Tuple[int, float]]] = {'items': None, 'customers': None}
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, float]]:
+        """Tamaño y fecha de modificación de una exportación (None si no existe)"""
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime) if stat else None
+
+    def refresh(self) -> bool:
+        """
+        Recarga las exportaciones que cambiaron desde la última lectura
+
+        La exportación se compara antes y después de leerla: si cambió de tamaño
+        o de fecha entretanto, todavía se está escribiendo y se reintenta en el
+        siguiente refresco. Un índice nuevo con más de max_shrink menos claves
+        que el actual se rechaza.
+
+        Returns:
+            True si se reconstruyó algún índice
+        """
+        changed = False
+        for name, path, column in (('items', self.items_file, self.item_column),
+                                   ('customers', self.customers_file, self.nit_column)):
+            signature = self._signature(path)
+            if signature == self._signatures[name]:
+                continue
+
+            if signature is None:
+                setattr(self, name, SortedIndex())
+                self._signatures[name] = None
+                changed = True
+                continue
+
+            start_time = time.time()
+            try:
+                index = SortedIndex(read_export_column(path, column))
+            except (OSError, UnicodeDecodeError, csv.Error) as e:
+                rpa_logger.warning(f"No se pudo leer la exportación del catálogo: {e} ({path})")
+                continue
+            if self._signature(path) != signature:
+                rpa_logger.warning(f"La exportación del catálogo cambió durante la lectura, se reintentará: {path}")
+                continue
+
+            self._signatures[name] = signature
+            previous = len(getattr(self, name))
+            if previous and len(index) < previous * (1 - self.max_shrink):
+                rpa_logger.warning(
+                    f"Exportación del catálogo rechazada ({name}): {len(index)} claves frente a "
+                    f"{previous} del índice actual ({path})"
+                )
+                continue
+
+            setattr(self, name, index)
+            rpa_logger.log_performance(f"Índice de catálogo ({name}) construido", time.time() - start_time)
+            rpa_logger.log_action("Catálogo actualizado", f"{name}: {len(index)} claves desde {path}")
+            changed = True
+        return changed
+
+    def available(self, name: str) -> bool:
+        """Indica si el índice 'items' o 'customers' tiene datos cargados"""
+        return len(getattr(self, name)) > 0
+
+    def check_order(self, nit: str, codes: Iterable[str]) -> List[str]:
+        """
+        Verifica el NIT y los códigos de una orden contra el catálogo
+
+        Args:
+            nit: NIT del comprador
+            codes: Códigos de los items en el orden de la orden
+
+        Returns:
+            Lista de errores (vacía si todo existe o el catálogo no está disponible)
+        """
+        errors = []
+        if nit and self.available('customers') and nit not in self.customers:
+            errors.append(f"NIT no existe en el catálogo de clientes: {nit}")
+        if self.available('items'):
+            for index, code in enumerate(codes, 1):
+                if code not in self.items:
+                    errors.append(f"Item {index}: código no existe en el catálogo: {code}")
+        return errors
+
+
+# Instancia global del catálogo (se refresca en cada validación previa)
+catalog_index = CatalogIndex()
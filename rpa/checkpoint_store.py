@@ -0,0 +1,288 @@
+"""
+Almacén de checkpoints en un journal append-only
+Un archivo JSONL por robot donde cada línea lleva su CRC32; un índice en memoria
+da el último checkpoint por archivo en O(1) y la compactación reescribe solo
+las entradas vigentes con un rename atómico
+"""
+
+import os
+import glob
+import json
+import time
+import zlib
+import threading
+from typing import Optional, Dict, Any, Tuple
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    """Línea del journal: '<crc32 hex> <json>\\n'"""
+    payload = json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return b'%08x ' % zlib.crc32(payload) + payload + b'\n'
+
+
+def journal_path(base_path: str, worker_id: Optional[str] = None) -> str:
+    """Journal propio de un robot: journal.jsonl -> journal.<worker_id>.jsonl"""
+    if not worker_id:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{worker_id}{ext}"
+
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    """Registro de una línea completa, o None si está corrupta"""
+    if len(line) < 10 or line[8:9] != b' ':
+        return None
+    payload = line[9:]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload.decode('utf-8'))
+    except ValueError:
+        return None
+
+
+class CheckpointStore:
+    """
+    Journal de checkpoints por archivo
+
+    - put/delete agregan una línea (delete escribe una lápida)
+    - fsync por lotes: cada `fsync_every` escrituras o, como máximo, `fsync_interval`
+      segundos después de la primera escritura pendiente (temporizador en segundo plano)
+    - al abrir, una cola truncada o corrupta (caída a mitad de escritura) se descarta
+    - las entradas más viejas que `max_age` no se cargan y se eliminan al compactar
+    - con varios robots (workers.enabled) cada uno escribe su propio journal; get()
+      también lee los de los demás para retomar una orden de un robot caído
+    """
+
+    def __init__(self,
+                 path: str = None,
+                 fsync_every: int = None,
+                 fsync_interval: float = None,
+                 max_age: float = None,
+                 compact_min_records: int = None,
+                 worker_id: str = None):
+        if path is None and worker_id is None and config.get('workers.enabled', False):
+            worker_id = config.get('workers.worker_id') or rpa_logger.worker_id
+        self.base_path = path or config.get('checkpoints.path', './checkpoints/journal.jsonl')
+        self.path = journal_path(self.base_path, worker_id)
+        self.fsync_every = fsync_every or config.get('checkpoints.fsync_every', 8)
+        self.fsync_interval = fsync_interval if fsync_interval is not None else config.get('checkpoints.fsync_interval', 1.0)
+        self.max_age = max_age or config.get('checkpoints.max_age', 3600)
+        self.compact_min_records = compact_min_records or config.get('checkpoints.compact_min_records', 200)
+
+        self._index: Dict[str, Dict[str, Any]] = {}
+        # Momento de la última lápida por archivo (descarta checkpoints ajenos anteriores)
+        self._deleted: Dict[str, float] = {}
+        self._records = 0
+        self._pending = 0
+        self._last_sync = time.time()
+        self._sync_timer: Optional[threading.Timer] = None
+        self._file = None
+        self._lock = threading.RLock()
+
+    def _open(self):
+        """Carga el journal (perezosamente, en el primer uso)"""
+        if self._file is not None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._index, self._deleted, self._records, valid_size = self._read(self.path)
+        self._file = open(self.path, 'ab')
+        if self._file.tell() != valid_size:
+            # Cola incompleta o corrupta: se descarta para que las nuevas líneas queden legibles
+            rpa_logger.log_action("Journal de checkpoints reparado",
+                                  f"Bytes descartados: {self._file.tell() - valid_size}")
+            self._file.truncate(valid_size)
+            self._file.seek(valid_size)
+
+    def _read(self, path: str) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float], int, int]:
+        """Reconstruye el índice de un journal y retorna (índice, lápidas, registros, bytes válidos)"""
+        index: Dict[str, Dict[str, Any]] = {}
+        deleted: Dict[str, float] = {}
+        records = 0
+        valid_size = 0
+        if not os.path.exists(path):
+            return index, deleted, records, valid_size
+
+        cutoff = time.time() - self.max_age
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                record = _decode(line[:-1])
+                if record is None:
+                    break
+                valid_size += len(line)
+                records += 1
+                key = record.get('key')
+                if record.get('data') is None:
+                    index.pop(key, None)
+                    deleted[key] = record.get('ts', 0)
+                elif record.get('ts', 0) < cutoff:
+                    index.pop(key, None)
+                else:
+                    index[key] = record
+        return index, deleted, records, valid_size
+
+    def _latest(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Checkpoint vigente de un archivo considerando también los journals de otros robots
+
+        Gana el evento más reciente entre todos los journals: si algún robot
+        terminó la orden después (lápida), los checkpoints anteriores ya no valen.
+        """
+        root, ext = os.path.splitext(self.base_path)
+        candidates = [self.base_path] + glob.glob(glob.escape(root) + '.*' + ext)
+        newest = self._index.get(key)
+        deleted_at = self._deleted.get(key, 0)
+        for path in candidates:
+            if os.path.abspath(path) == os.path.abspath(self.path):
+                continue
+            try:
+                index, deleted, _, _ = self._read(path)
+            except OSError:
+                continue
+            deleted_at = max(deleted_at, deleted.get(key, 0))
+            record = index.get(key)
+            if record is not None and (newest is None or record['ts'] > newest['ts']):
+                newest = record
+        if newest is None or newest['ts'] <= deleted_at:
+            return None
+        return newest
+
+    def _append(self, record: Dict[str, Any]):
+        self._file.write(_encode(record))
+        self._records += 1
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.time() - self._last_sync >= self.fsync_interval:
+            self.sync()
+        else:
+            self._file.flush()
+            self._schedule_sync()
+
+    def _schedule_sync(self):
+        """Garantiza el fsync de lo pendiente a más tardar fsync_interval después (aunque no haya más escrituras)"""
+        if self._sync_timer is not None:
+            return
+        delay = max(self.fsync_interval - (time.time() - self._last_sync), 0)
+        self._sync_timer = threading.Timer(delay, self._timed_sync)
+        self._sync_timer.daemon = True
+        self._sync_timer.start()
+
+    def _timed_sync(self):
+        with self._lock:
+            self._sync_timer = None
+            if self._pending:
+                self.sync()
+
+    def _cancel_sync_timer(self):
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+
+    def sync(self):
+        """Fuerza a disco las escrituras pendientes"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+            self._last_sync = time.time()
+            self._cancel_sync_timer()
+
+    def put(self, key: str, data: Dict[str, Any]):
+        """Registra el último checkpoint de un archivo"""
+        with self._lock:
+            self._open()
+            record = {'key': key, 'ts': time.time(), 'data': data}
+            self._append(record)
+            self._index[key] = record
+            self._maybe_compact()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Último checkpoint vigente de un archivo, o None"""
+        with self._lock:
+            self._open()
+            record = self._latest(key)
+            if record is None:
+                return None
+            if time.time() - record['ts'] > self.max_age:
+                return None
+            return record['data']
+
+    def delete(self, key: str):
+        """Elimina el checkpoint de un archivo (lápida en el journal)"""
+        with self._lock:
+            self._open()
+            if key not in self._index and self._latest(key) is None:
+                return
+            record = {'key': key, 'ts': time.time(), 'data': None}
+            self._append(record)
+            self._index.pop(key, None)
+            self._deleted[key] = record['ts']
+            self.sync()
+            self._maybe_compact()
+
+    def keys(self):
+        with self._lock:
+            self._open()
+            return list(self._index)
+
+    def _maybe_compact(self):
+        # Compacta cuando las líneas obsoletas superan ampliamente a las vigentes
+        if self._records >= self.compact_min_records and self._records > 4 * max(1, len(self._index) + len(self._deleted)):
+            self.compact()
+
+    def compact(self):
+        """Reescribe el journal con las entradas vigentes (temporal + fsync + rename atómico)"""
+        with self._lock:
+            self._open()
+            cutoff = time.time() - self.max_age
+            live = {key: record for key, record in self._index.items() if record['ts'] >= cutoff}
+            # Las lápidas recientes se conservan: anulan checkpoints de la misma orden en journals ajenos
+            deleted = {key: ts for key, ts in self._deleted.items() if ts >= cutoff and key not in live}
+
+            temp_path = self.path + '.compact'
+            with open(temp_path, 'wb') as f:
+                for key, ts in deleted.items():
+                    f.write(_encode({'key': key, 'ts': ts, 'data': None}))
+                for record in live.values():
+                    f.write(_encode(record))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._file.close()
+            os.replace(temp_path, self.path)
+            self._fsync_directory()
+            self._file = open(self.path, 'ab')
+            self._index = live
+            self._deleted = deleted
+            self._records = len(live) + len(deleted)
+            self._pending = 0
+            self._cancel_sync_timer()
+
+    def _fsync_directory(self):
+        """Persiste el rename (no disponible en Windows)"""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Sincroniza y cierra el journal"""
+        with self._lock:
+            if self._file is not None:
+                self.sync()
+                self._file.close()
+                self._file = None
+            self._cancel_sync_timer()
+
+
+# Instancia global del almacén de checkpoints
+checkpoint_store = CheckpointStore()
@@ -3,6 +3,9 @@ Constantes globales para el sistema RPA
 Centraliza configuraciones y elimina números mágicos del código
 """
 
+from rpa.config_manager import get_confidence
+from rpa.vision.thresholds import get_threshold
+
 # Configuración de ventanas
 REMOTE_DESKTOP_WINDOW = "20.96.6.64 - Conexión a Escritorio remoto"
 
@@ -43,12 +46,18 @@ class Paths:
     SAP_ORDER_TEMPLATE = './rpa/vision/reference_images/sap_orden_de_ventas_template.png'
 
 # Configuración de template matching
+# (template_matching.*_confidence en config.yaml; la tabla calibrada tiene prioridad)
 class TemplateMatching:
-    DEFAULT_CONFIDENCE = 0.8
-    LOW_CONFIDENCE = 0.5
-    HIGH_CONFIDENCE = 0.9
-    SAP_ICON_CONFIDENCE = 0.7
-    SCROLLBAR_CONFIDENCE = 0.8
+    DEFAULT_CONFIDENCE = get_confidence('default')
+    LOW_CONFIDENCE = get_confidence('low')
+    HIGH_CONFIDENCE = get_confidence('high')
+    SAP_ICON_CONFIDENCE = get_confidence('sap_icon')
+    SCROLLBAR_CONFIDENCE = get_confidence('scrollbar')
+
+    @staticmethod
+    def threshold(name: str, confidence_type: str = 'default') -> float:
+        """Umbral calibrado de un template, o el de config.yaml si no está calibrado"""
+        return get_threshold(name, get_confidence(confidence_type))
     
 # Configuración de reintentos
 class Retries:
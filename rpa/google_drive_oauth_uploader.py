@@ -11,6 +11,7 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from rpa.simple_logger import rpa_logger
+from rpa.processed_archive import processed_archive
 
 class GoogleDriveOAuthUploader:
     """
@@ -124,7 +125,7 @@ class GoogleDriveOAuthUploader:
         
         # Buscar archivos originales
         search_locations = [
-            './data/outputs_json/Procesados/',
+            *processed_archive.search_dirs(),
             './data/outputs_json/',
             './data/',
             './'
@@ -0,0 +1,171 @@
+"""
+Órdenes grandes: división en documentos vinculados y verificación por bloques
+Una orden con más líneas que las que se cargan de forma confiable en la grilla
+de SAP se divide en partes (archivos JSON independientes en la cola, con la
+referencia a la orden original); las órdenes grandes que no se dividen se
+cargan por bloques, verificando la ventana visible de la grilla al final de
+cada bloque
+"""
+
+import os
+import json
+import copy
+import shutil
+from contextlib import nullcontext
+from typing import Dict, List, Any, Optional
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+from rpa.order_model import item_code
+
+
+def is_large_order(items_count: int, threshold: int = None) -> bool:
+    """Indica si la orden se carga en modo de órdenes grandes"""
+    threshold = threshold if threshold is not None else config.get('large_orders.threshold', 40)
+    return bool(threshold) and items_count >= threshold
+
+
+def split_order(data: Dict[str, Any], max_lines: int, reference_format: str = None) -> List[Dict[str, Any]]:
+    """
+    Divide una orden en partes de a lo sumo max_lines items
+
+    Cada parte conserva el encabezado, lleva la orden de compra con el sufijo de
+    la parte y una sección 'documento_vinculado' con la referencia a la original.
+
+    Args:
+        data: Orden completa
+        max_lines: Máximo de items por documento
+        reference_format: Formato de la orden de compra de cada parte
+            ({orden_compra}, {part}, {total})
+
+    Returns:
+        Lista de partes (la orden original sin cambios si no supera max_lines)
+    """
+    items = data.get('items') or []
+    if max_lines <= 0 or len(items) <= max_lines:
+        return [data]
+
+    reference_format = reference_format or config.get('large_orders.split_reference_format', '{orden_compra}-{part}')
+    total = (len(items) + max_lines - 1) // max_lines
+    parts = []
+    for part in range(1, total + 1):
+        part_data = copy.deepcopy({key: value for key, value in data.items() if key != 'items'})
+        part_data['items'] = copy.deepcopy(items[(part - 1) * max_lines:part * max_lines])
+        part_data['orden_compra'] = reference_format.format(
+            orden_compra=data.get('orden_compra', ''), part=part, total=total)
+        part_data['documento_vinculado'] = {
+            'orden_compra_original': data.get('orden_compra'),
+            'parte': part,
+            'total_partes': total,
+            'items_original': len(items),
+        }
+        parts.append(part_data)
+    return parts
+
+
+def split_large_order_files(directory: str, files: List[str], max_lines: int = None,
+                            archive_dir: str = None, leases=None) -> List[str]:
+    """
+    Reemplaza en la cola los archivos con más de max_lines items por sus partes
+
+    Las partes se escriben como <archivo>.parteNdeM.json (temporal + rename) y el
+    archivo original se mueve a archive_dir para conservarlo.
+
+    Args:
+        directory: Directorio de órdenes pendientes
+        files: Nombres de archivo a procesar
+        max_lines: Líneas por documento (0 desactiva la división)
+        archive_dir: Destino de los archivos originales divididos
+        leases: LeaseManager con varios robots; una orden se divide solo con su lease
+            tomado (si otro robot ya la está cargando se deja como está)
+
+    Returns:
+        Lista de nombres de archivo a procesar, con las partes en lugar de los originales
+    """
+    max_lines = max_lines if max_lines is not None else config.get('large_orders.split_above', 0)
+    if not max_lines:
+        return list(files)
+    archive_dir = archive_dir or config.get('paths.split_json', './data/outputs_json/Divididos')
+
+    result = []
+    for file_name in files:
+        path = os.path.join(directory, file_name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # El error se reporta al procesar el archivo
+            result.append(file_name)
+            continue
+
+        parts = split_order(data, max_lines)
+        if len(parts) == 1:
+            result.append(file_name)
+            continue
+
+        with (leases.claimed(file_name) if leases is not None else nullcontext(True)) as owned:
+            if not owned or not os.path.exists(path):
+                # Otro robot la está cargando (o ya la terminó): no se divide
+                rpa_logger.log_action("Orden grande en proceso por otro robot, no se divide",
+                                      f"Archivo: {file_name}")
+                continue
+            part_names = _write_parts(directory, file_name, parts, archive_dir)
+        if part_names is None:
+            result.append(file_name)
+            continue
+
+        rpa_logger.log_action(
+            "Orden grande dividida en documentos vinculados",
+            f"Archivo: {file_name}, Items: {len(data['items'])}, Partes: {len(parts)} de hasta {max_lines} líneas"
+        )
+        result.extend(part_names)
+    return result
+
+
+def _write_parts(directory: str, file_name: str, parts: List[Dict[str, Any]],
+                 archive_dir: str) -> Optional[List[str]]:
+    """Escribe las partes en la cola y archiva el original; None si falló (la cola queda como estaba)"""
+    base, extension = os.path.splitext(file_name)
+    part_names = []
+    try:
+        for number, part_data in enumerate(parts, 1):
+            part_name = f"{base}.parte{number}de{len(parts)}{extension}"
+            part_data['documento_vinculado']['archivo_original'] = file_name
+            temp_file = os.path.join(directory, part_name + '.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(part_data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, os.path.join(directory, part_name))
+            part_names.append(part_name)
+        os.makedirs(archive_dir, exist_ok=True)
+        shutil.move(os.path.join(directory, file_name), os.path.join(archive_dir, file_name))
+    except OSError as e:
+        rpa_logger.log_error(f"No se pudo dividir la orden: {str(e)}", f"Archivo: {file_name}")
+        for part_name in part_names:
+            try:
+                os.remove(os.path.join(directory, part_name))
+            except OSError:
+                pass
+        return None
+    return part_names
+
+
+def grid_window_matches(items: List[Dict[str, Any]], loaded: int, visible_codes: Optional[List[str]]) -> bool:
+    """
+    Verifica que la ventana visible de la grilla termine en el último item cargado
+
+    Args:
+        items: Items de la orden
+        loaded: Cantidad de items cargados hasta ahora
+        visible_codes: Códigos leídos de la grilla (de arriba hacia abajo)
+
+    Returns:
+        True si los códigos visibles son exactamente los items anteriores a 'loaded'
+    """
+    if not visible_codes or len(visible_codes) > loaded:
+        return False
+    expected = items[loaded - len(visible_codes):loaded]
+    return all(str(code).strip().upper() == item_code(item) for code, item in zip(visible_codes, expected))
+
+
+def items_per_minute(items_count: int, seconds: float) -> float:
+    """Velocidad de carga de items"""
+    return items_count * 60.0 / seconds if seconds > 0 else 0.0
@@ -0,0 +1,136 @@
+"""
+Grafo de navegación ponderado por latencia
+Las pantallas son nodos y las acciones aristas con un costo estimado en
+segundos que se ajusta con la duración medida de cada paso (EWMA)
+"""
+
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional
+
+
+@dataclass
+class NavigationEdge:
+    """Acción que lleva de una pantalla a otra"""
+    source: Hashable
+    target: Hashable
+    name: str
+    steps: List[str]
+    cost: float
+    samples: int = 0
+    failures: int = 0
+
+    @property
+    def key(self) -> str:
+        """Identificador estable para persistir el costo aprendido"""
+        source = getattr(self.source, 'value', self.source)
+        target = getattr(self.target, 'value', self.target)
+        return f"{source}->{target}:{self.name}"
+
+
+@dataclass
+class NavigationReport:
+    """Resumen de una navegación: costo planificado vs real"""
+    target: Hashable
+    success: bool = False
+    planned_cost: Optional[float] = None
+    actual_cost: float = 0.0
+    steps: List[str] = field(default_factory=list)
+    replans: int = 0
+
+
+class NavigationGraph:
+    """Grafo dirigido de pantallas con búsqueda de ruta de menor costo (Dijkstra)"""
+
+    def __init__(self, smoothing: float = 0.3, failure_penalty: float = 30.0):
+        """
+        Args:
+            smoothing: Peso de la última medición en el promedio exponencial
+            failure_penalty: Segundos que se suman a la medición si el paso falla
+        """
+        self.smoothing = smoothing
+        self.failure_penalty = failure_penalty
+        self.edges: Dict[Hashable, List[NavigationEdge]] = {}
+
+    def add_edge(self, source: Hashable, target: Hashable, name: str,
+                 steps: List[str], cost: float) -> NavigationEdge:
+        """Agrega una acción con su costo inicial estimado"""
+        edge = NavigationEdge(source, target, name, list(steps), float(cost))
+        self.edges.setdefault(source, []).append(edge)
+        return edge
+
+    def edges_from(self, node: Hashable) -> List[NavigationEdge]:
+        return self.edges.get(node, [])
+
+    def all_edges(self) -> List[NavigationEdge]:
+        return [edge for edges in self.edges.values() for edge in edges]
+
+    def shortest_path(self, source: Hashable, target: Hashable) -> Optional[List[NavigationEdge]]:
+        """
+        Ruta de menor costo total entre dos pantallas
+
+        Returns:
+            Lista de aristas (vacía si source == target) o None si no hay ruta
+        """
+        if source == target:
+            return []
+
+        # El contador desempata nodos con igual costo (no necesitan ser comparables)
+        counter = itertools.count()
+        queue = [(0.0, next(counter), source)]
+        best: Dict[Hashable, float] = {source: 0.0}
+        previous: Dict[Hashable, NavigationEdge] = {}
+
+        while queue:
+            cost, _, node = heapq.heappop(queue)
+            if node == target:
+                break
+            if cost > best.get(node, float('inf')):
+                continue
+            for edge in self.edges_from(node):
+                new_cost = cost + edge.cost
+                if new_cost < best.get(edge.target, float('inf')):
+                    best[edge.target] = new_cost
+                    previous[edge.target] = edge
+                    heapq.heappush(queue, (new_cost, next(counter), edge.target))
+
+        if target not in previous:
+            return None
+
+        path = []
+        node = target
+        while node != source:
+            edge = previous[node]
+            path.append(edge)
+            node = edge.source
+        path.reverse()
+        return path
+
+    @staticmethod
+    def path_cost(path: List[NavigationEdge]) -> float:
+        return sum(edge.cost for edge in path)
+
+    def record(self, edge: NavigationEdge, duration: float, success: bool):
+        """Actualiza el costo de una arista con la duración medida"""
+        measured = duration if success else duration + self.failure_penalty
+        edge.cost = self.smoothing * measured + (1 - self.smoothing) * edge.cost
+        edge.samples += 1
+        if not success:
+            edge.failures += 1
+
+    def export_costs(self) -> Dict[str, Dict[str, Any]]:
+        """Costos aprendidos por arista (para persistir entre ejecuciones)"""
+        return {
+            edge.key: {'cost': round(edge.cost, 3), 'samples': edge.samples, 'failures': edge.failures}
+            for edge in self.all_edges()
+        }
+
+    def load_costs(self, costs: Dict[str, Dict[str, Any]]):
+        """Restaura costos aprendidos; las aristas desconocidas se ignoran"""
+        for edge in self.all_edges():
+            saved = costs.get(edge.key)
+            if saved:
+                edge.cost = float(saved.get('cost', edge.cost))
+                edge.samples = int(saved.get('samples', 0))
+                edge.failures = int(saved.get('failures', 0))
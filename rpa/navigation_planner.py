@@ -3,67 +3,85 @@ Sistema de Navegación Automática - RPA TAMAPRINT
 Fase 2: Navegación inteligente entre pantallas
 """
 
+import os
+import json
 import pyautogui
 import time
 import logging
 from typing import List, Optional, Tuple
-from dataclasses import dataclass
-from rpa.screen_detector import ScreenState, screen_detector
+from rpa.screen_detector import ScreenState, DetectionResult, screen_detector
 from rpa.simple_logger import rpa_logger
 from rpa.smart_waits import smart_sleep, adaptive_wait
-from rpa.config_manager import get_delay
+from rpa.config_manager import config, get_delay
+from rpa.navigation_graph import NavigationEdge, NavigationGraph, NavigationReport
+from rpa.vision.template_matcher import template_matcher
 
 
-@dataclass
-class NavigationStep:
-    """Paso de navegación"""
-    action: str
-    target: str
-    expected_state: ScreenState
-    timeout: int = 10
-    retries: int = 3
+class NavigationPlanner:
+    """
+    Planificador de navegación automática
 
+    Las pantallas y acciones forman un grafo con costos en segundos que se
+    aprenden de la duración real de cada paso. En cada paso se detecta la
+    pantalla actual, se calcula la ruta más barata al objetivo y se ejecuta
+    solo su primera acción, de modo que un desvío se corrige re-planificando.
+    """
 
-class NavigationPlanner:
-    """Planificador de navegación automática"""
-    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.current_state = ScreenState.UNKNOWN
-        
+        self.last_navigation: Optional[NavigationReport] = None
+
         # Configurar PyAutoGUI para ser más seguro
         pyautogui.FAILSAFE = True
         pyautogui.PAUSE = 0.5
-        
-        # Definir rutas de navegación
-        self.navigation_routes = {
-            # Desde cualquier estado a Remote Desktop
-            ScreenState.UNKNOWN: [
-                NavigationStep("maximize_remote_desktop", "Remote Desktop", ScreenState.REMOTE_DESKTOP),
-                NavigationStep("connect_remote_desktop", "Remote Desktop", ScreenState.REMOTE_DESKTOP)
-            ],
-            
-            # Desde Remote Desktop a SAP Desktop
-            ScreenState.REMOTE_DESKTOP: [
-                NavigationStep("open_sap", "SAP Desktop", ScreenState.SAP_DESKTOP),
-                NavigationStep("wait_sap_load", "SAP Desktop", ScreenState.SAP_DESKTOP)
-            ],
-            
-            # Desde SAP Desktop a Sales Order Form
-            ScreenState.SAP_DESKTOP: [
-                NavigationStep("navigate_to_sales_order", "Sales Order Form", ScreenState.SALES_ORDER_FORM),
-                NavigationStep("wait_form_load", "Sales Order Form", ScreenState.SALES_ORDER_FORM)
-            ]
+
+        self.max_steps = config.get('navigation.max_steps', 8)
+        self.costs_file = config.get('navigation.costs_file', './logs/navigation_costs.json')
+        self.graph = NavigationGraph(
+            smoothing=config.get('navigation.cost_smoothing', 0.3),
+            failure_penalty=config.get('navigation.failure_penalty', 30.0)
+        )
+
+        # Acciones disponibles (nombre -> método)
+        self.actions = {
+            "activate_remote_desktop": self._navigate_to_remote_desktop,
+            "maximize_remote_desktop": self._maximize_remote_desktop,
+            "connect_remote_desktop": self._connect_remote_desktop,
+            "open_sap": self._open_sap,
+            "wait_sap_load": self._wait_sap_load,
+            "navigate_to_sales_order": self._navigate_to_sales_order,
+            "wait_form_load": self._wait_form_load,
+            "recover_from_error": self._recover_from_error,
         }
-    
+
+        # Grafo de navegación (costo inicial estimado en segundos)
+        # Desde estado desconocido hay varias alternativas a Remote Desktop
+        self.graph.add_edge(ScreenState.UNKNOWN, ScreenState.REMOTE_DESKTOP,
+                            "activate", ["activate_remote_desktop"], 2.0)
+        self.graph.add_edge(ScreenState.UNKNOWN, ScreenState.REMOTE_DESKTOP,
+                            "maximize", ["maximize_remote_desktop"], 3.0)
+        self.graph.add_edge(ScreenState.UNKNOWN, ScreenState.REMOTE_DESKTOP,
+                            "connect", ["connect_remote_desktop"], 8.0)
+        self.graph.add_edge(ScreenState.ERROR, ScreenState.REMOTE_DESKTOP,
+                            "recover", ["recover_from_error"], 5.0)
+        # Desde Remote Desktop a SAP Desktop
+        self.graph.add_edge(ScreenState.REMOTE_DESKTOP, ScreenState.SAP_DESKTOP,
+                            "open_sap", ["open_sap", "wait_sap_load"], 30.0)
+        # Desde SAP Desktop a Sales Order Form
+        self.graph.add_edge(ScreenState.SAP_DESKTOP, ScreenState.SALES_ORDER_FORM,
+                            "sales_order", ["navigate_to_sales_order", "wait_form_load"], 8.0)
+
+        self._load_costs()
+
     def navigate_to_target_state(self, target_state: ScreenState, max_attempts: int = 3) -> bool:
         """
         Navega automáticamente al estado objetivo
-        
+
         Args:
             target_state: Estado al que queremos llegar
-            max_attempts: Número máximo de intentos
-            
+            max_attempts: Número máximo de pasos fallidos antes de abandonar
+
         Returns:
             True si se logró llegar al estado objetivo
         """
@@ -71,140 +89,118 @@ class NavigationPlanner:
             "INICIANDO NAVEGACIÓN",
             f"Objetivo: {target_state.value}, Máximo intentos: {max_attempts}"
         )
-        
-        for attempt in range(max_attempts):
-            self.logger.info(f"Intento {attempt + 1}/{max_attempts} para llegar a {target_state.value}")
-            
-            # Detectar estado actual
-            detection_result = screen_detector.detect_current_screen()
-            self.current_state = detection_result.state
-            
-            self.logger.info(f"Estado actual detectado: {self.current_state.value} (confianza: {detection_result.confidence:.3f})")
-            
-            # Si ya estamos en el estado objetivo
+
+        report = NavigationReport(target=target_state)
+        start_time = time.time()
+        failures = 0
+        expected_state = None
+        detection = screen_detector.detect_current_screen()
+
+        # Cada paso re-planifica desde la pantalla detectada; max_steps evita ciclos
+        for step_number in range(self.max_steps):
+            self.current_state = detection.state
+            self.logger.info(f"Estado actual detectado: {self.current_state.value} (confianza: {detection.confidence:.3f})")
+
             if self.current_state == target_state:
-                self.logger.info(f"Ya estamos en el estado objetivo: {target_state.value}")
-                return True
-            
-            # Si hay error en la detección, intentar recuperar
-            if self.current_state == ScreenState.ERROR:
-                self.logger.warning("Error en detección, intentando recuperar...")
-                self._recover_from_error()
-                continue
-            
-            # Si estado desconocido, intentar navegar a Remote Desktop
-            if self.current_state == ScreenState.UNKNOWN:
-                self.logger.info("Estado desconocido, intentando navegar a Remote Desktop...")
-                if self._navigate_to_remote_desktop():
-                    continue
-                else:
-                    self.logger.error("No se pudo navegar a Remote Desktop")
-                    return False
-            
-            # Navegar al estado objetivo
-            if self._execute_navigation_plan(target_state):
-                # Verificar que llegamos al estado objetivo
-                if screen_detector.verify_screen_state(target_state, max_attempts=2):
-                    self.logger.info(f"✅ Navegación exitosa a {target_state.value}")
-                    return True
-                else:
-                    self.logger.warning(f"No se pudo confirmar llegada a {target_state.value}")
-            
-            # Esperar antes del siguiente intento
-            if attempt < max_attempts - 1:
-                smart_sleep(3)
-        
-        self.logger.error(f"❌ No se pudo llegar a {target_state.value} después de {max_attempts} intentos")
-        return False
-    
-    def _execute_navigation_plan(self, target_state: ScreenState) -> bool:
-        """Ejecuta el plan de navegación hacia el estado objetivo"""
-        
-        # Obtener ruta de navegación
-        route = self._get_navigation_route(target_state)
-        if not route:
-            self.logger.error(f"No se encontró ruta de navegación para {target_state.value}")
-            return False
-        
-        self.logger.info(f"Ejecutando ruta de navegación con {len(route)} pasos")
-        
-        # Ejecutar cada paso
-        for step in route:
-            if not self._execute_navigation_step(step):
-                self.logger.error(f"Fallo en paso: {step.action}")
-                return False
-        
-        return True
-    
-    def _get_navigation_route(self, target_state: ScreenState) -> List[NavigationStep]:
-        """Obtiene la ruta de navegación hacia el estado objetivo"""
-        
-        # Si estamos en estado desconocido, ir a Remote Desktop primero
-        if self.current_state == ScreenState.UNKNOWN:
-            return self.navigation_routes[ScreenState.UNKNOWN]
-        
-        # Construir ruta paso a paso
-        route = []
-        current = self.current_state
-        
-        while current != target_state:
-            if current in self.navigation_routes:
-                route.extend(self.navigation_routes[current])
-                # El siguiente estado sería el objetivo del último paso
-                if route:
-                    current = route[-1].expected_state
-                else:
-                    break
-            else:
-                self.logger.error(f"No hay ruta definida desde {current.value}")
+                report.success = True
                 break
-        
-        return route
-    
-    def _execute_navigation_step(self, step: NavigationStep) -> bool:
-        """Ejecuta un paso de navegación específico"""
-        
-        self.logger.info(f"Ejecutando: {step.action} -> {step.target}")
-        rpa_logger.log_action("NAVEGACIÓN", f"{step.action} -> {step.target}")
-        
-        for retry in range(step.retries):
-            try:
-                # Ejecutar acción específica
-                if step.action == "maximize_remote_desktop":
-                    success = self._maximize_remote_desktop()
-                elif step.action == "connect_remote_desktop":
-                    success = self._connect_remote_desktop()
-                elif step.action == "open_sap":
-                    success = self._open_sap()
-                elif step.action == "wait_sap_load":
-                    success = self._wait_sap_load()
-                elif step.action == "navigate_to_sales_order":
-                    success = self._navigate_to_sales_order()
-                elif step.action == "wait_form_load":
-                    success = self._wait_form_load()
-                else:
-                    self.logger.error(f"Acción no reconocida: {step.action}")
-                    return False
-                
-                if success:
-                    # Verificar que llegamos al estado esperado
-                    if screen_detector.verify_screen_state(step.expected_state, max_attempts=1):
-                        self.current_state = step.expected_state
-                        return True
-                    else:
-                        self.logger.warning(f"Acción exitosa pero no se confirmó estado {step.expected_state.value}")
-                
+
+            if expected_state is not None and self.current_state != expected_state:
+                report.replans += 1
+                self.logger.info(f"Pantalla inesperada (se esperaba {expected_state.value}), re-planificando")
+
+            route = self._get_navigation_route(target_state)
+            if route is None:
+                self.logger.error(f"No hay ruta de navegación desde {self.current_state.value} a {target_state.value}")
+                break
+            if report.planned_cost is None:
+                report.planned_cost = self.graph.path_cost(route)
+
+            edge = route[0]
+            self.logger.info(
+                f"Paso {step_number + 1}: {edge.name} -> {edge.target.value} "
+                f"(ruta: {' -> '.join(e.name for e in route)}, costo estimado {self.graph.path_cost(route):.1f}s)"
+            )
+            success, duration, detection = self._execute_navigation_step(edge)
+            self.graph.record(edge, duration, success)
+            report.steps.append(edge.name)
+            expected_state = edge.target
+
+            if not success:
+                failures += 1
+                if failures >= max_attempts:
+                    self.logger.error(f"Se alcanzó el máximo de {max_attempts} pasos fallidos")
+                    break
                 # Esperar antes del siguiente intento
-                if retry < step.retries - 1:
-                    smart_sleep(2)
-                    
+                smart_sleep(2)
+                detection = screen_detector.detect_current_screen()
+
+        report.actual_cost = time.time() - start_time
+        self.last_navigation = report
+        self._save_costs()
+
+        planned = f"{report.planned_cost:.1f}s" if report.planned_cost is not None else "n/a"
+        rpa_logger.log_performance(f"Navegación a {target_state.value} (estimado {planned})", report.actual_cost)
+
+        if report.success:
+            self.logger.info(f"✅ Navegación exitosa a {target_state.value}")
+        else:
+            self.logger.error(f"❌ No se pudo llegar a {target_state.value} ({len(report.steps)} pasos)")
+        return report.success
+
+    def _get_navigation_route(self, target_state: ScreenState) -> Optional[List[NavigationEdge]]:
+        """Ruta de menor costo estimado desde el estado actual hacia el objetivo"""
+        return self.graph.shortest_path(self.current_state, target_state)
+
+    def _execute_navigation_step(self, edge: NavigationEdge) -> Tuple[bool, float, DetectionResult]:
+        """
+        Ejecuta las acciones de una arista y detecta la pantalla resultante
+
+        Returns:
+            Tupla (llegó a la pantalla esperada, duración en segundos, detección final)
+        """
+        self.logger.info(f"Ejecutando: {edge.name} -> {edge.target.value}")
+        rpa_logger.log_action("NAVEGACIÓN", f"{edge.name} -> {edge.target.value}")
+
+        start_time = time.time()
+        for action in edge.steps:
+            try:
+                if not self.actions[action]():
+                    self.logger.warning(f"Fallo en acción: {action}")
+                    break
             except Exception as e:
-                self.logger.error(f"Error en paso {step.action}: {e}")
-                if retry < step.retries - 1:
-                    smart_sleep(2)
-        
-        return False
-    
+                self.logger.error(f"Error en paso {action}: {e}")
+                break
+
+        detection = screen_detector.detect_current_screen()
+        duration = time.time() - start_time
+        success = detection.state == edge.target
+        if not success:
+            self.logger.warning(f"No se confirmó estado {edge.target.value} (detectado: {detection.state.value})")
+        return success, duration, detection
+
+    def _load_costs(self):
+        """Carga los costos aprendidos en ejecuciones anteriores"""
+        if not self.costs_file or not os.path.exists(self.costs_file):
+            return
+        try:
+            with open(self.costs_file, 'r', encoding='utf-8') as f:
+                self.graph.load_costs(json.load(f))
+        except Exception as e:
+            self.logger.warning(f"No se pudieron cargar costos de navegación: {e}")
+
+    def _save_costs(self):
+        """Persiste los costos aprendidos"""
+        if not self.costs_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.costs_file)), exist_ok=True)
+            with open(self.costs_file + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.graph.export_costs(), f, indent=2)
+            os.replace(self.costs_file + '.tmp', self.costs_file)
+        except Exception as e:
+            self.logger.warning(f"No se pudieron guardar costos de navegación: {e}")
+
     def _maximize_remote_desktop(self) -> bool:
         """Maximiza la ventana de Remote Desktop"""
         try:
@@ -269,12 +265,7 @@ class NavigationPlanner:
         """Espera a que SAP termine de cargar"""
         try:
             # Esperar hasta 30 segundos para que SAP cargue
-            for i in range(30):
-                if screen_detector.verify_screen_state(ScreenState.SAP_DESKTOP, max_attempts=1):
-                    return True
-                smart_sleep(1)
-            
-            return False
+            return self._wait_for_screen(ScreenState.SAP_DESKTOP, 30)
             
         except Exception as e:
             self.logger.error(f"Error esperando carga de SAP: {e}")
@@ -314,17 +305,30 @@ class NavigationPlanner:
         """Espera a que el formulario de órdenes cargue"""
         try:
             # Esperar hasta 15 segundos para que el formulario cargue
-            for i in range(15):
-                if screen_detector.verify_screen_state(ScreenState.SALES_ORDER_FORM, max_attempts=1):
-                    return True
-                smart_sleep(1)
-            
-            return False
+            return self._wait_for_screen(ScreenState.SALES_ORDER_FORM, 15)
             
         except Exception as e:
             self.logger.error(f"Error esperando carga del formulario: {e}")
             return False
     
+    def _wait_for_screen(self, state: ScreenState, timeout: float) -> bool:
+        """
+        Espera a que se detecte una pantalla, re-evaluando solo cuando la pantalla cambia
+        
+        Args:
+            state: Estado de pantalla esperado
+            timeout: Tiempo máximo de espera en segundos
+        """
+        deadline = time.time() + timeout
+        while True:
+            if screen_detector.verify_screen_state(state, max_attempts=1):
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            # Retorna en cuanto cambian los píxeles, sin esperar el segundo completo
+            template_matcher.wait_for_change(timeout=min(remaining, 1.0))
+    
     def _navigate_to_remote_desktop(self) -> bool:
         """Navega a Remote Desktop desde cualquier estado"""
         try:
@@ -0,0 +1,131 @@
+"""
+Modelo tipado de una orden de venta
+La orden se interpreta una sola vez al tomarla de la cola: NIT y códigos
+normalizados, cantidades ya formateadas para teclear y fechas parseadas con
+su texto en el formato de SAP; los manejadores de estado usan estos campos
+directamente en vez de volver a recorrer el diccionario del JSON
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from rpa.config_manager import config
+
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d")
+
+
+def parse_date(value: Any) -> Optional[datetime]:
+    """Fecha DD/MM/YYYY (o YYYY-MM-DD), o None si no se reconoce"""
+    if not value:
+        return None
+    text = str(value).strip()
+    if len(text) == 10 and text[2] == '/' and text[5] == '/' and text[:2].isdigit():
+        # Formato habitual de los JSON: sin pasar por strptime
+        try:
+            return datetime(int(text[6:]), int(text[3:5]), int(text[:2]))
+        except ValueError:
+            return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def format_quantity(value: Any) -> str:
+    """Cantidad como se teclea en SAP (7000.0 -> '7000')"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def item_code(item: Any) -> str:
+    """Código de un item para comparar (OrderItem o diccionario del JSON)"""
+    if isinstance(item, OrderItem):
+        return item.codigo.upper()
+    return str(item['codigo']).strip().upper()
+
+
+class OrderItem:
+    """Línea de la orden con los valores listos para teclear"""
+    __slots__ = ('codigo', 'cantidad', 'cantidad_text', 'descripcion', 'fecha_entrega')
+
+    def __init__(self, codigo: str, cantidad: Any, descripcion: str = '', fecha_entrega: Optional[datetime] = None):
+        self.codigo = str(codigo).strip()
+        self.cantidad = cantidad
+        self.cantidad_text = format_quantity(cantidad)
+        self.descripcion = descripcion
+        self.fecha_entrega = fecha_entrega
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'OrderItem':
+        if 'codigo' not in data or 'cantidad' not in data:
+            raise ValueError(f"Item sin código o cantidad: {data}")
+        return cls(data['codigo'], data['cantidad'], data.get('descripcion', ''), parse_date(data.get('fecha_entrega')))
+
+    def __repr__(self) -> str:
+        return f"OrderItem({self.codigo!r}, {self.cantidad_text!r})"
+
+
+class Order:
+    """
+    Orden de venta interpretada una sola vez
+
+    fecha_entrega es la fecha más tardía entre la del encabezado y las de los
+    items (la que se carga en SAP); fecha_documento usa fecha_documento,
+    luego fecha_orden y por último la fecha de entrega. Los campos *_sap tienen
+    el texto que se teclea en el formulario.
+    """
+    __slots__ = ('nit', 'orden_compra', 'items', 'fecha_entrega', 'fecha_entrega_sap',
+                 'fecha_documento', 'fecha_documento_sap')
+
+    def __init__(self, nit: Optional[str], orden_compra: Optional[str], items: Optional[List[OrderItem]],
+                 fecha_entrega: Optional[datetime], fecha_documento: Optional[datetime] = None,
+                 fecha_documento_text: Optional[str] = None, date_format: str = None):
+        date_format = date_format or config.get('files.sap_date_format', '%d/%m/%Y')
+        self.nit = nit
+        self.orden_compra = orden_compra
+        self.items = items
+        self.fecha_entrega = fecha_entrega
+        self.fecha_entrega_sap = fecha_entrega.strftime(date_format) if fecha_entrega else None
+        self.fecha_documento = fecha_documento
+        if fecha_documento:
+            self.fecha_documento_sap = fecha_documento.strftime(date_format)
+        else:
+            # Un texto no reconocido se teclea tal cual; sin fecha de documento se usa la de entrega
+            self.fecha_documento_sap = fecha_documento_text or self.fecha_entrega_sap
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], date_format: str = None) -> 'Order':
+        """
+        Interpreta el diccionario del JSON de la orden
+
+        Los campos ausentes quedan en None; cada manejador de estado reporta el
+        que necesita.
+
+        Raises:
+            ValueError: Si la orden no es un objeto o un item no tiene código o cantidad
+        """
+        if not isinstance(data, dict):
+            raise ValueError("La orden debe ser un objeto JSON")
+        comprador = data.get('comprador')
+        nit = comprador.get('nit') if isinstance(comprador, dict) else None
+        orden_compra = data.get('orden_compra')
+        items = ([OrderItem.from_dict(item) for item in data['items']]
+                 if isinstance(data.get('items'), list) else None)
+
+        dates = [parse_date(data.get('fecha_entrega'))] + [item.fecha_entrega for item in items or []]
+        dates = [date for date in dates if date is not None]
+        fecha_documento_text = data.get('fecha_documento') or data.get('fecha_orden')
+        return cls(
+            nit=str(nit).strip() if nit else None,
+            orden_compra=str(orden_compra).strip() if orden_compra else None,
+            items=items,
+            fecha_entrega=max(dates) if dates else None,
+            fecha_documento=parse_date(fecha_documento_text),
+            fecha_documento_text=str(fecha_documento_text).strip() if fecha_documento_text else None,
+            date_format=date_format,
+        )
+
+    def __repr__(self) -> str:
+        return f"Order({self.nit!r}, {self.orden_compra!r}, {len(self.items or [])} items)"
@@ -0,0 +1,296 @@
+"""
+Planificador de órdenes por fecha de entrega (earliest deadline first)
+Mantiene un heap incremental de las órdenes pendientes ordenado por
+fecha_entrega, con prioridad por cliente y envejecimiento para que ninguna
+orden espere indefinidamente, y proyecta la hora de terminación de cada orden
+con la velocidad de carga medida
+"""
+
+import os
+import json
+import time
+import heapq
+import itertools
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d")
+
+
+def parse_fecha(value: Any) -> Optional[float]:
+    """Fecha DD/MM/YYYY (o YYYY-MM-DD) como timestamp, o None si no se reconoce"""
+    if not value:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).timestamp()
+        except ValueError:
+            pass
+    return None
+
+
+@dataclass
+class ScheduledOrder:
+    """Orden pendiente en la cola"""
+    file_name: str
+    path: str
+    due: Optional[float]
+    nit: str
+    items_count: int
+    enqueued_at: float
+    priority_key: float = 0.0
+
+
+class OrderScheduler:
+    """
+    Cola EDF de órdenes pendientes
+
+    La clave de prioridad es la fecha de entrega efectiva:
+
+        due - prioridad_cliente - aging_rate * (ahora - encolado)
+
+    El término `aging_rate * ahora` es igual para todas las órdenes, así que
+    la clave guardada (due - prioridad_cliente + aging_rate * encolado) no
+    cambia con el tiempo y el heap se mantiene con push/pop, sin reordenar en
+    cada ciclo. Las órdenes que desaparecen del directorio se descartan de
+    forma perezosa al salir del heap.
+
+    Con group_by_customer, después de una orden se siguen tomando las del
+    mismo NIT (heap por cliente) mientras SAP tiene el cliente en caché,
+    hasta max_group_size y siempre que la orden más urgente de la cola no
+    quede proyectada después de su fecha de entrega.
+    """
+
+    def __init__(self,
+                 aging_rate: float = None,
+                 customer_priority_days: Dict[str, float] = None,
+                 undated_days: float = None,
+                 state_file: str = None,
+                 group_by_customer: bool = None,
+                 max_group_size: int = None):
+        self.aging_rate = aging_rate if aging_rate is not None else config.get('scheduler.aging_rate', 0.5)
+        self.customer_priority_days = (customer_priority_days if customer_priority_days is not None
+                                       else config.get('scheduler.customer_priority_days', {}) or {})
+        self.undated_days = undated_days if undated_days is not None else config.get('scheduler.undated_days', 30)
+        self.state_file = state_file if state_file is not None else config.get('scheduler.state_file', './logs/scheduler_state.json')
+        self.smoothing = config.get('scheduler.rate_smoothing', 0.3)
+        self.group_by_customer = (group_by_customer if group_by_customer is not None
+                                  else config.get('scheduler.group_by_customer', True))
+        self.max_group_size = max_group_size or config.get('scheduler.max_group_size', 20)
+
+        # Velocidad medida (EWMA); valores iniciales hasta la primera orden completada
+        self.seconds_per_item = config.get('scheduler.initial_seconds_per_item', 20.0)
+        self.order_overhead = config.get('scheduler.initial_order_overhead', 90.0)
+        self.completed_orders = 0
+
+        self._heap: List[list] = []
+        self._by_nit: Dict[str, List[list]] = {}
+        self._entries: Dict[str, tuple] = {}
+        self._last_nit: Optional[str] = None
+        self._group_count = 0
+        self._enqueued_at: Dict[str, float] = {}
+        self._counter = itertools.count()
+        self._load_state()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _priority_key(self, due: Optional[float], nit: str, enqueued_at: float) -> float:
+        if due is None:
+            # Sin fecha válida: se trata como vencimiento lejano, el envejecimiento la saca
+            due = enqueued_at + self.undated_days * 86400
+        bonus = float(self.customer_priority_days.get(nit, 0.0)) * 86400
+        return due - bonus + self.aging_rate * enqueued_at
+
+    def _read_order(self, path: str, enqueued_at: float) -> ScheduledOrder:
+        due, nit, items_count = None, '', 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            nit = str((data.get('comprador') or {}).get('nit', '')).strip()
+            items = data.get('items') or []
+            items_count = len(items)
+            due = parse_fecha(data.get('fecha_entrega'))
+            if due is None:
+                item_dates = [parse_fecha(item.get('fecha_entrega')) for item in items if isinstance(item, dict)]
+                item_dates = [d for d in item_dates if d is not None]
+                due = min(item_dates) if item_dates else None
+        except (OSError, ValueError, AttributeError) as e:
+            rpa_logger.warning(f"No se pudo leer la orden para planificar: {e} ({path})")
+        return ScheduledOrder(os.path.basename(path), path, due, nit, items_count, enqueued_at)
+
+    def push(self, path: str, enqueued_at: float = None) -> ScheduledOrder:
+        """Agrega (o reemplaza) una orden en la cola"""
+        file_name = os.path.basename(path)
+        enqueued_at = self._enqueued_at.setdefault(file_name, enqueued_at or time.time())
+        order = self._read_order(path, enqueued_at)
+        order.priority_key = self._priority_key(order.due, order.nit, enqueued_at)
+        sequence = next(self._counter)
+        self._entries[file_name] = (sequence, order)
+        entry = [order.priority_key, sequence, file_name]
+        heapq.heappush(self._heap, entry)
+        if order.nit:
+            heapq.heappush(self._by_nit.setdefault(order.nit, []), list(entry))
+        return order
+
+    def sync(self, paths: List[str]) -> int:
+        """
+        Sincroniza la cola con los archivos pendientes del ciclo
+
+        Solo lee los archivos nuevos; los que ya no están se descartan del índice
+        (y salen del heap al llegar al tope).
+
+        Returns:
+            Cantidad de órdenes nuevas
+        """
+        names = {os.path.basename(path): path for path in paths}
+        for file_name in list(self._entries):
+            if file_name not in names:
+                del self._entries[file_name]
+        for file_name in list(self._enqueued_at):
+            if file_name not in names:
+                del self._enqueued_at[file_name]
+
+        added = 0
+        for file_name, path in names.items():
+            if file_name not in self._entries:
+                self.push(path)
+                added += 1
+        if added:
+            self._save_state()
+        return added
+
+    def _peek(self, heap: Optional[List[list]]) -> Optional[ScheduledOrder]:
+        """Tope vigente de un heap (descarta las entradas obsoletas)"""
+        while heap:
+            _, sequence, file_name = heap[0]
+            entry = self._entries.get(file_name)
+            if entry is not None and entry[0] == sequence:
+                return entry[1]
+            heapq.heappop(heap)
+        return None
+
+    def _continue_group(self, now: float) -> Optional[ScheduledOrder]:
+        """Siguiente orden del mismo cliente, si agruparla no atrasa a la más urgente"""
+        if not self.group_by_customer or not self._last_nit or self._group_count >= self.max_group_size:
+            return None
+        candidate = self._peek(self._by_nit.get(self._last_nit))
+        head = self._peek(self._heap)
+        if candidate is None or head is None or candidate is head:
+            return candidate
+        if head.due is not None:
+            finish = now + self.estimate_duration(candidate) + self.estimate_duration(head)
+            if finish > head.due + 86400:
+                return None
+        return candidate
+
+    def pop(self, now: float = None) -> Optional[ScheduledOrder]:
+        """Retira la siguiente orden a procesar, o None si la cola está vacía"""
+        now = now if now is not None else time.time()
+        order = self._continue_group(now) or self._peek(self._heap)
+        if order is None:
+            return None
+        del self._entries[order.file_name]
+
+        if order.nit and order.nit == self._last_nit:
+            self._group_count += 1
+        else:
+            self._last_nit, self._group_count = order.nit, 1
+        return order
+
+    def ordered(self, now: float = None) -> List[ScheduledOrder]:
+        """Órdenes en el orden en que se van a procesar (sin retirarlas)"""
+        plan = object.__new__(OrderScheduler)
+        plan.__dict__.update(self.__dict__)
+        plan._heap = list(self._heap)
+        plan._by_nit = {nit: list(heap) for nit, heap in self._by_nit.items()}
+        plan._entries = dict(self._entries)
+
+        clock = now if now is not None else time.time()
+        result = []
+        while True:
+            order = plan.pop(now=clock)
+            if order is None:
+                return result
+            clock += self.estimate_duration(order)
+            result.append(order)
+
+    def estimate_duration(self, order: ScheduledOrder) -> float:
+        """Duración estimada de una orden con la velocidad medida"""
+        return self.order_overhead + self.seconds_per_item * order.items_count
+
+    def projections(self, now: float = None) -> List[Dict[str, Any]]:
+        """
+        Hora proyectada de terminación de cada orden en cola
+
+        Returns:
+            Lista en orden de procesamiento con file, due, projected_finish y late
+        """
+        finish = now if now is not None else time.time()
+        result = []
+        for order in self.ordered(now=finish):
+            finish += self.estimate_duration(order)
+            result.append({
+                'file': order.file_name,
+                'due': order.due,
+                'projected_finish': finish,
+                # La entrega vence al final del día de fecha_entrega
+                'late': order.due is not None and finish > order.due + 86400,
+            })
+        return result
+
+    def record_completion(self, processing_stats: Dict[str, Any]):
+        """Actualiza la velocidad medida con las estadísticas de una orden completada"""
+        items_count = processing_stats.get('items_count') or 0
+        items_time = processing_stats.get('items_load_time')
+        total_time = processing_stats.get('total_processing_time')
+        if items_count and items_time:
+            self.seconds_per_item = self._smooth(self.seconds_per_item, items_time / items_count)
+        if total_time and items_time is not None and total_time > items_time:
+            self.order_overhead = self._smooth(self.order_overhead, total_time - items_time)
+        self.completed_orders += 1
+        self._save_state()
+
+    def _smooth(self, current: float, sample: float) -> float:
+        if self.completed_orders == 0:
+            return sample
+        return (1 - self.smoothing) * current + self.smoothing * sample
+
+    def _load_state(self):
+        """Restaura velocidad medida y horas de encolado (para el envejecimiento)"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.seconds_per_item = float(state.get('seconds_per_item', self.seconds_per_item))
+            self.order_overhead = float(state.get('order_overhead', self.order_overhead))
+            self.completed_orders = int(state.get('completed_orders', 0))
+            self._enqueued_at.update(state.get('enqueued_at', {}))
+        except (OSError, ValueError) as e:
+            rpa_logger.warning(f"No se pudo cargar el estado del planificador: {e}")
+
+    def _save_state(self):
+        """Guarda el estado de forma atómica (archivo temporal + rename)"""
+        if not self.state_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+            temp_file = self.state_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'seconds_per_item': round(self.seconds_per_item, 3),
+                    'order_overhead': round(self.order_overhead, 3),
+                    'completed_orders': self.completed_orders,
+                    'enqueued_at': self._enqueued_at,
+                }, f)
+            os.replace(temp_file, self.state_file)
+        except OSError as e:
+            rpa_logger.warning(f"No se pudo guardar el estado del planificador: {e}")
+
+
+# Instancia global del planificador (se conserva entre ciclos de main.py)
+order_scheduler = OrderScheduler()
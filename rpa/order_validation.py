@@ -0,0 +1,259 @@
+"""
+Validación previa de órdenes JSON
+Valida todos los archivos pendientes en paralelo antes de conectar al escritorio
+remoto; los archivos con errores se mueven a cuarentena junto con un archivo de
+motivos para que no consuman tiempo del robot. Si hay exportaciones del
+catálogo de SAP, también se verifica que el NIT y los códigos existan
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+from rpa.catalog_index import CatalogIndex, catalog_index
+
+
+@dataclass
+class OrderSchema:
+    """Reglas de validación de una orden, con los patrones ya compilados"""
+    nit_pattern: re.Pattern
+    date_pattern: re.Pattern
+    min_year: int
+    max_year: int
+    orden_compra_length: tuple
+    codigo_length: tuple
+    max_cantidad: float
+
+
+def compile_schema() -> OrderSchema:
+    """Compila las reglas de validación desde config.yaml (sección validation)"""
+    return OrderSchema(
+        # Los NIT de SAP llevan prefijo de país (p. ej. CN890900608)
+        nit_pattern=re.compile(config.get('validation.nit_pattern', r'^[A-Z]{0,3}\d{8,12}$')),
+        date_pattern=re.compile(r'^(\d{2})/(\d{2})/(\d{4})$'),
+        min_year=config.get('validation.min_year', 2020),
+        max_year=config.get('validation.max_year', 2035),
+        orden_compra_length=(3, 50),
+        codigo_length=(2, 30),
+        max_cantidad=config.get('validation.max_cantidad', 1000000),
+    )
+
+
+def _validate_fecha(schema: OrderSchema, fecha: Any, label: str) -> Optional[str]:
+    if not fecha:
+        return f"{label} vacía"
+    match = schema.date_pattern.match(str(fecha).strip())
+    if not match:
+        return f"{label} debe tener formato DD/MM/YYYY: {fecha}"
+    day, month, year = (int(part) for part in match.groups())
+    if not schema.min_year <= year <= schema.max_year:
+        return f"{label} con año fuera de rango ({schema.min_year}-{schema.max_year}): {fecha}"
+    try:
+        datetime(year, month, day)
+    except ValueError:
+        return f"{label} no es una fecha del calendario: {fecha}"
+    return None
+
+
+def validate_order(data: Any, schema: OrderSchema) -> List[str]:
+    """
+    Valida la estructura y los campos de una orden
+
+    Args:
+        data: Contenido del JSON
+        schema: Reglas compiladas
+
+    Returns:
+        Lista de errores (vacía si la orden es válida)
+    """
+    if not isinstance(data, dict):
+        return ["La orden debe ser un objeto JSON"]
+
+    errors = []
+    for key in ('comprador', 'orden_compra', 'fecha_entrega', 'items'):
+        if key not in data:
+            errors.append(f"Clave requerida faltante: {key}")
+    if errors:
+        return errors
+
+    comprador = data['comprador']
+    nit = comprador.get('nit') if isinstance(comprador, dict) else None
+    nit_str = str(nit).strip() if nit else ''
+    if not nit_str:
+        errors.append("NIT faltante en comprador")
+    elif not schema.nit_pattern.match(nit_str):
+        errors.append(f"NIT con formato inválido: {nit_str}")
+
+    orden = str(data['orden_compra'] or '').strip()
+    min_length, max_length = schema.orden_compra_length
+    if not min_length <= len(orden) <= max_length:
+        errors.append(f"Orden de compra debe tener entre {min_length} y {max_length} caracteres: '{orden}'")
+
+    error = _validate_fecha(schema, data['fecha_entrega'], "Fecha de entrega")
+    if error:
+        errors.append(error)
+    if data.get('fecha_documento'):
+        error = _validate_fecha(schema, data['fecha_documento'], "Fecha de documento")
+        if error:
+            errors.append(error)
+
+    items = data['items']
+    if not isinstance(items, list):
+        return errors + ["Items debe ser una lista"]
+    if not items:
+        errors.append("La orden no tiene items")
+
+    min_length, max_length = schema.codigo_length
+    for index, item in enumerate(items, 1):
+        if not isinstance(item, dict) or 'codigo' not in item or 'cantidad' not in item:
+            errors.append(f"Item {index} faltante codigo o cantidad")
+            continue
+        codigo = str(item['codigo'] or '').strip()
+        if not min_length <= len(codigo) <= max_length:
+            errors.append(f"Item {index}: código inválido '{codigo}'")
+        try:
+            cantidad = float(item['cantidad'])
+        except (TypeError, ValueError):
+            errors.append(f"Item {index}: cantidad debe ser un número ({item['cantidad']})")
+            continue
+        if not 0 < cantidad <= schema.max_cantidad:
+            errors.append(f"Item {index}: cantidad fuera de rango ({item['cantidad']})")
+    return errors
+
+
+# Reglas compiladas una vez por proceso (también en los procesos del pool)
+_schema: Optional[OrderSchema] = None
+
+
+def validate_file(path: str) -> Dict[str, Any]:
+    """Lee y valida un archivo; retorna {'path', 'errors', 'nit', 'codes'}"""
+    global _schema
+    if _schema is None:
+        _schema = compile_schema()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        return {'path': path, 'errors': [f"JSON ilegible: {str(e)}"]}
+    errors = validate_order(data, _schema)
+    if errors:
+        return {'path': path, 'errors': errors}
+    # NIT y códigos para verificar contra el catálogo en el proceso principal
+    return {'path': path, 'errors': errors, 'nit': str(data['comprador']['nit']).strip(),
+            'codes': [str(item['codigo']).strip() for item in data['items']]}
+
+
+@dataclass
+class PrevalidationReport:
+    """Resultado de la validación previa de un lote de archivos"""
+    valid_files: List[str] = field(default_factory=list)
+    quarantined: Dict[str, List[str]] = field(default_factory=dict)
+    duration: float = 0.0
+    workers: int = 1
+
+    @property
+    def files_per_second(self) -> float:
+        total = len(self.valid_files) + len(self.quarantined)
+        return total / self.duration if self.duration > 0 else 0.0
+
+
+class OrderPrevalidator:
+    """Valida los archivos pendientes en un pool de procesos y aparta los inválidos"""
+
+    def __init__(self, quarantine_dir: str = None, workers: int = None, min_parallel_files: int = None,
+                 catalog: Optional[CatalogIndex] = None):
+        self.quarantine_dir = quarantine_dir or config.get('paths.quarantine_json', './data/outputs_json/Cuarentena')
+        self.workers = workers or config.get('validation.workers', 0) or min(4, os.cpu_count() or 1)
+        # Con pocos archivos el arranque del pool cuesta más que validar en serie
+        self.min_parallel_files = (min_parallel_files if min_parallel_files is not None
+                                   else config.get('validation.min_parallel_files', 16))
+        self.catalog = catalog if catalog is not None else catalog_index
+        self.check_catalog = config.get('catalog.enabled', True)
+
+    def validate(self, paths: List[str], leases=None) -> PrevalidationReport:
+        """
+        Valida los archivos y mueve a cuarentena los inválidos
+
+        Args:
+            paths: Rutas de los archivos JSON pendientes
+            leases: LeaseManager con varios robots; un archivo va a cuarentena solo con
+                su lease tomado (si otro robot lo está procesando se deja en la cola)
+
+        Returns:
+            PrevalidationReport con los archivos válidos (en el orden recibido)
+        """
+        start_time = time.time()
+        if self.workers > 1 and len(paths) >= self.min_parallel_files:
+            workers = self.workers
+            chunksize = max(1, len(paths) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(validate_file, paths, chunksize=chunksize))
+        else:
+            workers = 1
+            results = [validate_file(path) for path in paths]
+
+        # El catálogo vive en este proceso: una búsqueda binaria por código
+        if self.check_catalog:
+            self.catalog.refresh()
+            for result in results:
+                if not result['errors']:
+                    result['errors'] = self.catalog.check_order(result['nit'], result['codes'])
+
+        report = PrevalidationReport(workers=workers)
+        for result in results:
+            if result['errors']:
+                file_name = os.path.basename(result['path'])
+                with (leases.claimed(file_name) if leases is not None else nullcontext(True)) as owned:
+                    if not owned or not os.path.exists(result['path']):
+                        # En proceso por otro robot: ni se aparta ni se vuelve a encolar
+                        continue
+                    self.quarantine(result['path'], result['errors'])
+                report.quarantined[file_name] = result['errors']
+            else:
+                report.valid_files.append(result['path'])
+        report.duration = time.time() - start_time
+
+        rpa_logger.log_performance("Validación previa de órdenes", report.duration)
+        rpa_logger.log_action(
+            "Validación previa completada",
+            f"Válidos: {len(report.valid_files)}, En cuarentena: {len(report.quarantined)}, "
+            f"Procesos: {workers}, Throughput: {report.files_per_second:.1f} archivos/s"
+        )
+        return report
+
+    def quarantine(self, path: str, errors: List[str]) -> Optional[str]:
+        """Mueve el archivo a cuarentena y escribe <archivo>.reason.json con los errores"""
+        try:
+            os.makedirs(self.quarantine_dir, exist_ok=True)
+            file_name = os.path.basename(path)
+            destination = os.path.join(self.quarantine_dir, file_name)
+            if os.path.exists(destination):
+                base, extension = os.path.splitext(file_name)
+                destination = os.path.join(self.quarantine_dir, f"{base}_{int(time.time())}{extension}")
+            shutil.move(path, destination)
+
+            reason = {
+                'file': file_name,
+                'quarantined_at': datetime.now().isoformat(timespec='seconds'),
+                'errors': errors,
+            }
+            with open(destination + '.reason.json', 'w', encoding='utf-8') as f:
+                json.dump(reason, f, ensure_ascii=False, indent=2)
+
+            rpa_logger.log_error(f"Orden enviada a cuarentena: {'; '.join(errors)}", f"Archivo: {file_name}")
+            return destination
+        except OSError as e:
+            rpa_logger.log_error(f"No se pudo mover a cuarentena: {str(e)}", f"Archivo: {path}")
+            return None
+
+
+# Instancia global del validador previo
+order_prevalidator = OrderPrevalidator()
@@ -0,0 +1,203 @@
+"""
+Archivo de órdenes procesadas particionado por fecha
+Los artefactos de cada orden terminada (JSON y capturas) se guardan en
+Procesados/YYYY/MM/DD y un índice pequeño (Procesados/index.json) lleva el
+contador de órdenes por día, así el conteo diario del launcher es una sola
+lectura en vez de un stat por cada archivo histórico. Los archivos que quedaron
+en la carpeta plana anterior se siguen encontrando con locate()
+"""
+
+import os
+import json
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+
+INDEX_FILE = 'index.json'
+# Varios robots pueden terminar órdenes a la vez: el índice se actualiza bajo un candado
+LOCK_ATTEMPTS = 50
+LOCK_STALE_SECONDS = 30
+
+
+class ProcessedArchive:
+    """
+    Carpeta de procesados con subcarpetas por día e índice de contadores
+
+    Args:
+        root: Carpeta raíz de procesados (paths.processed_json)
+        lookup_days: Días hacia atrás que locate() revisa antes de recorrer todas las carpetas
+    """
+
+    def __init__(self, root: str = None, lookup_days: int = None):
+        self.root = root or config.get('paths.processed_json', './data/outputs_json/Procesados')
+        self.lookup_days = lookup_days if lookup_days is not None else config.get('processed_archive.lookup_days', 7)
+        self.index_file = os.path.join(self.root, INDEX_FILE)
+
+    def shard_dir(self, day: date = None) -> str:
+        """Carpeta del día (Procesados/YYYY/MM/DD)"""
+        day = day or datetime.now().date()
+        return os.path.join(self.root, f"{day.year:04d}", f"{day.month:02d}", f"{day.day:02d}")
+
+    def path_for(self, filename: str, day: date = None) -> str:
+        """
+        Ruta donde se guarda un artefacto procesado (crea la carpeta del día)
+
+        Args:
+            filename: Nombre del archivo (JSON o captura)
+            day: Día de la partición (hoy por defecto)
+
+        Returns:
+            Ruta completa dentro de la carpeta del día
+        """
+        directory = self.shard_dir(day)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    def search_dirs(self) -> List[str]:
+        """Carpetas donde puede estar un artefacto: días recientes (hoy primero) y la carpeta plana anterior"""
+        today = datetime.now().date()
+        directories = []
+        for offset in range(max(self.lookup_days, 0) + 1):
+            directory = self.shard_dir(today - timedelta(days=offset))
+            if os.path.isdir(directory):
+                directories.append(directory)
+        directories.append(self.root)
+        return directories
+
+    def locate(self, filename: str) -> Optional[str]:
+        """
+        Busca un artefacto procesado por nombre
+
+        Primero se revisan los días recientes y la carpeta plana; si no está ahí
+        se recorren todas las carpetas de días (más reciente primero).
+
+        Returns:
+            Ruta del archivo, o None si no está en ninguna carpeta de procesados
+        """
+        searched = set()
+        for directory in self.search_dirs():
+            searched.add(directory)
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                return path
+        for directory in self.all_shards():
+            if directory in searched:
+                continue
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def all_shards(self) -> List[str]:
+        """Todas las carpetas de días existentes (YYYY/MM/DD), de la más reciente a la más antigua"""
+        shards = []
+        for year in self._subdirs(self.root, 4):
+            for month in self._subdirs(year, 2):
+                shards.extend(self._subdirs(month, 2))
+        return sorted(shards, reverse=True)
+
+    @staticmethod
+    def _subdirs(parent: str, width: int) -> List[str]:
+        try:
+            with os.scandir(parent) as entries:
+                return [entry.path for entry in entries
+                        if len(entry.name) == width and entry.name.isdigit() and entry.is_dir()]
+        except OSError:
+            return []
+
+    def _read_index(self) -> Dict[str, int]:
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        counters = data.get('dias') if isinstance(data, dict) else None
+        return counters if isinstance(counters, dict) else {}
+
+    def record_completion(self, filename: str, day: date = None) -> int:
+        """
+        Suma una orden terminada al contador del día (escritura atómica del índice)
+
+        Args:
+            filename: Archivo de la orden (para el log)
+            day: Día de la partición (hoy por defecto)
+
+        Returns:
+            Órdenes procesadas ese día
+        """
+        day = day or datetime.now().date()
+        os.makedirs(self.root, exist_ok=True)
+        locked = self._lock()
+        try:
+            return self._increment(filename, day)
+        finally:
+            if locked:
+                self._unlock()
+
+    def _lock(self) -> bool:
+        lock_path = self.index_file + '.lock'
+        for _ in range(LOCK_ATTEMPTS):
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if os.path.getmtime(lock_path) + LOCK_STALE_SECONDS < time.time():
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.05)
+        # Sin candado se actualiza igual: a lo sumo se pierde un incremento
+        rpa_logger.warning(f"Índice de procesados bloqueado, se actualiza sin candado ({lock_path})")
+        return False
+
+    def _unlock(self):
+        try:
+            os.remove(self.index_file + '.lock')
+        except OSError:
+            pass
+
+    def _increment(self, filename: str, day: date) -> int:
+        key = day.isoformat()
+        counters = self._read_index()
+        if key not in counters:
+            # Índice ausente o de otro día: se parte de lo que ya hay en la carpeta del día
+            # (menos la orden actual, que ya fue movida)
+            counters[key] = max(self._count_shard(day) - 1, 0)
+        counters[key] = int(counters[key]) + 1
+
+        try:
+            temp_file = self.index_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'dias': counters}, f, indent=2, sort_keys=True)
+            os.replace(temp_file, self.index_file)
+        except OSError as e:
+            rpa_logger.warning(f"No se pudo actualizar el índice de procesados: {e} ({filename})")
+        return counters[key]
+
+    def _count_shard(self, day: date) -> int:
+        try:
+            with os.scandir(self.shard_dir(day)) as entries:
+                return sum(1 for entry in entries if entry.name.endswith('.json') and entry.is_file())
+        except OSError:
+            return 0
+
+    def processed_on(self, day: date = None) -> int:
+        """
+        Órdenes procesadas en un día
+
+        Se lee del índice; si el día no está registrado se cuentan los JSON de su
+        carpeta (nunca la historia completa).
+        """
+        day = day or datetime.now().date()
+        counters = self._read_index()
+        if day.isoformat() in counters:
+            return int(counters[day.isoformat()])
+        return self._count_shard(day)
+
+
+# Instancia global del archivo de procesados
+processed_archive = ProcessedArchive()
@@ -1,11 +1,65 @@
-from typing import Optional
-from datetime import datetime
+from typing import Optional, List, Dict
 from .state_machine import RPAEvent, StateContext, RPAState
 from .simple_logger import rpa_logger
+from .large_orders import items_per_minute
+from .order_model import Order, item_code
+from .processed_archive import processed_archive
+from .watchdog import watchdog_sleep
 import time
 import os
 
 
+def resolve_resume_index(items: List[Dict], last_confirmed_item: int,
+                         grid_codes: Optional[List[str]], form_reopened: bool = False) -> int:
+    """
+    Determina desde qué item continuar la carga
+    
+    Args:
+        items: Items de la orden
+        last_confirmed_item: Último item confirmado según el checkpoint (base 0, -1 si ninguno)
+        grid_codes: Códigos visibles de la grilla de SAP (desplazada al final), o None si no se pudo leer
+        form_reopened: True si el reintento abrió un formulario nuevo (la grilla empezó vacía)
+        
+    Returns:
+        Índice (base 0) del siguiente item a cargar
+    """
+    checkpoint_next = min(last_confirmed_item + 1, len(items))
+    if grid_codes is None:
+        # Sin lectura de la grilla se confía en el checkpoint
+        return checkpoint_next
+    if not grid_codes:
+        # Grilla vacía: solo es un formulario nuevo si de verdad se reabrió; si no, el OCR
+        # no leyó nada y se confía en el checkpoint
+        return 0 if form_reopened else checkpoint_next
+    
+    def same(code, item):
+        return str(code).strip().upper() == item_code(item)
+    
+    # Filas de la grilla que coinciden en orden con los items de la orden; una fila
+    # escrita pero no confirmada (caída justo después) también cuenta, para no duplicarla
+    loaded = 0
+    for code, item in zip(grid_codes, items):
+        if not same(code, item):
+            break
+        loaded += 1
+    window = len(grid_codes)
+    if 0 < loaded < window:
+        # La grilla difiere de la orden a partir de esa fila
+        return loaded
+    
+    # Ventana visible completa: puede ser el inicio de la orden o, en órdenes grandes,
+    # las últimas filas; se toma la ubicación que termina más cerca del checkpoint
+    ends = [offset + window for offset in range(len(items) - window + 1)
+            if all(same(code, item) for code, item in zip(grid_codes, items[offset:offset + window]))]
+    if not ends:
+        return 0
+    end = min(ends, key=lambda end: abs(end - checkpoint_next))
+    if form_reopened:
+        return end
+    # Las filas confirmadas pueden no estar a la vista: nunca se retrocede del checkpoint
+    return max(end, checkpoint_next)
+
+
 class RPAStateHandlers:
     """Manejadores específicos para cada estado del proceso RPA"""
     
@@ -18,6 +72,29 @@ class RPAStateHandlers:
         """
         self.rpa = rpa_instance
 
+    def _order(self, context: StateContext) -> Order:
+        """Orden interpretada del contexto (se construye una sola vez por archivo)"""
+        if context.order is None:
+            if not context.current_data:
+                raise ValueError("No se encontraron datos")
+            context.order = Order.from_dict(context.current_data)
+        return context.order
+
+    def _header_already_loaded(self, context: StateContext) -> bool:
+        """
+        Indica si el encabezado ya quedó cargado en el formulario que sigue abierto
+
+        En un reintento con items confirmados y sin formulario nuevo, el foco está
+        en la grilla: volver a teclear NIT, orden o fechas escribiría en los items.
+        """
+        if context.last_confirmed_item >= 0 and not context.form_reopened:
+            rpa_logger.log_action(
+                "Encabezado ya cargado en el formulario abierto, se continúa con los items",
+                f"Items confirmados: {context.last_confirmed_item + 1}, Archivo: {context.current_file}"
+            )
+            return True
+        return False
+
     def handle_idle_state(self, context: StateContext, **kwargs) -> Optional[RPAEvent]:
         """Maneja el estado IDLE - no hay procesamiento activo"""
         rpa_logger.log_action("Sistema en estado IDLE", "Esperando archivos para procesar")
@@ -144,6 +221,7 @@ class RPAStateHandlers:
                     "Ya estamos en el formulario de órdenes de ventas",
                     "Saltando directamente a carga de datos"
                 )
+                context.form_reopened = False
                 duration = time.time() - start_time
                 context.processing_stats['already_in_form_time'] = duration
                 return RPAEvent.SALES_ORDER_OPENED
@@ -158,6 +236,8 @@ class RPAStateHandlers:
             success = self.rpa.open_sap_orden_de_ventas()
             
             if success:
+                # Formulario nuevo: la grilla de items empieza vacía
+                context.form_reopened = True
                 duration = time.time() - start_time
                 rpa_logger.log_performance("Navegación a orden de ventas", duration)
                 context.processing_stats['navigation_time'] = duration
@@ -175,21 +255,25 @@ class RPAStateHandlers:
         start_time = time.time()
         
         try:
-            if not context.current_data or 'comprador' not in context.current_data:
+            if self._header_already_loaded(context):
+                return RPAEvent.NIT_LOADED
+
+            nit = self._order(context).nit
+            if not nit:
                 raise ValueError("No se encontraron datos del comprador")
-                
-            nit = context.current_data['comprador']['nit']
+
             rpa_logger.log_action(
                 f"ESTADO: Cargando NIT",
                 f"NIT: {nit}, Archivo: {context.current_file}"
             )
             
-            # Cargar el NIT
-            self.rpa.load_nit(nit)
+            # Cargar el NIT (True si el cliente es el mismo de la orden anterior)
+            warm = self.rpa.load_nit(nit)
             
             duration = time.time() - start_time
             rpa_logger.log_performance("Carga de NIT", duration)
             context.processing_stats['nit_load_time'] = duration
+            context.processing_stats['nit_warm'] = warm is True
             return RPAEvent.NIT_LOADED
             
         except Exception as e:
@@ -201,10 +285,13 @@ class RPAStateHandlers:
         start_time = time.time()
         
         try:
-            if not context.current_data or 'orden_compra' not in context.current_data:
+            if self._header_already_loaded(context):
+                return RPAEvent.ORDER_LOADED
+
+            orden_compra = self._order(context).orden_compra
+            if not orden_compra:
                 raise ValueError("No se encontraron datos de orden de compra")
-                
-            orden_compra = context.current_data['orden_compra']
+
             rpa_logger.log_action(
                 f"ESTADO: Cargando orden de compra",
                 f"Orden: {orden_compra}, Archivo: {context.current_file}"
@@ -227,49 +314,22 @@ class RPAStateHandlers:
         start_time = time.time()
 
         try:
-            if not context.current_data:
-                raise ValueError("No se encontraron datos")
+            if self._header_already_loaded(context):
+                return RPAEvent.DATE_LOADED
 
-            data = context.current_data
-
-            def _try_parse_date(date_str: str):
-                if not date_str:
-                    return None
-                for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
-                    try:
-                        return datetime.strptime(date_str, fmt)
-                    except Exception:
-                        pass
-                return None
-
-            candidates = []
-            if data.get('fecha_entrega'):
-                parsed = _try_parse_date(data['fecha_entrega'])
-                if parsed:
-                    candidates.append((data['fecha_entrega'], parsed))
-
-            for item in data.get('items', []):
-                fe = item.get('fecha_entrega')
-                if fe:
-                    parsed = _try_parse_date(fe)
-                    if parsed:
-                        candidates.append((fe, parsed))
-
-            if not candidates:
+            # Fecha más tardía entre encabezado e items, ya en el formato de SAP
+            order = self._order(context)
+            if not order.fecha_entrega_sap:
                 raise ValueError("No se encontraron fechas de entrega válidas")
-
-            selected_original, selected_dt = max(candidates, key=lambda t: t[1])
-
-            # Obtener fecha_documento del JSON, buscar también fecha_orden como alternativa
-            fecha_documento = data.get('fecha_documento') or data.get('fecha_orden', selected_original)
+            fecha_entrega, fecha_documento = order.fecha_entrega_sap, order.fecha_documento_sap
 
             rpa_logger.log_action(
                 "ESTADO: Cargando fechas",
-                f"Entrega: {selected_original}, Documento: {fecha_documento}, Archivo: {context.current_file}"
+                f"Entrega: {fecha_entrega}, Documento: {fecha_documento}, Archivo: {context.current_file}"
             )
 
             # Cargar las fechas (entrega y documento)
-            self.rpa.load_fecha_entrega(selected_original, fecha_documento)
+            self.rpa.load_fecha_entrega(fecha_entrega, fecha_documento)
 
             duration = time.time() - start_time
             rpa_logger.log_performance("Carga de fechas", duration)
@@ -281,30 +341,53 @@ class RPAStateHandlers:
             return RPAEvent.DATE_FAILED
 
     def handle_loading_items(self, context: StateContext, **kwargs) -> RPAEvent:
-        """Maneja la carga de todos los items"""
+        """Maneja la carga de todos los items (reanudando desde el último confirmado)"""
         start_time = time.time()
         
         try:
-            if not context.current_data or 'items' not in context.current_data:
+            items = self._order(context).items
+            if items is None:
                 raise ValueError("No se encontraron datos de items")
-                
-            items = context.current_data['items']
+
             rpa_logger.log_action(
                 f"ESTADO: Cargando items",
                 f"Total items: {len(items)}, Archivo: {context.current_file}"
             )
             
-            # Cargar todos los items
-            self.rpa.load_items(items)
+            # Si ya se confirmaron items (reintento o reanudación), la grilla de SAP decide
+            start_index = 0
+            if context.last_confirmed_item >= 0:
+                # Se lee con la grilla al final: en órdenes grandes solo se ven las últimas filas
+                grid_codes = self.rpa.read_items_grid(to_end=True)
+                start_index = resolve_resume_index(items, context.last_confirmed_item, grid_codes,
+                                                   form_reopened=context.form_reopened)
+                rpa_logger.log_action(
+                    "Reanudando carga de items",
+                    f"Checkpoint: {context.last_confirmed_item + 1} confirmados, "
+                    f"Grilla: {len(grid_codes) if grid_codes is not None else 'no legible'}, "
+                    f"Continuando desde item {start_index + 1}/{len(items)}"
+                )
+                context.processing_stats['items_resumed_from'] = start_index
+                if 0 < start_index < len(items):
+                    self.rpa.focus_item_row(start_index)
+            
+            # Cargar los items pendientes, confirmando cada uno en el checkpoint
+            if start_index < len(items):
+                self.rpa.load_items(items, start_index=start_index,
+                                    on_item_loaded=self.rpa.state_machine.confirm_item)
             
             # Esperar 2 segundos después de cargar items
             rpa_logger.log_action("Esperando 2 segundos después de cargar items", "Preparando para captura")
-            time.sleep(2)
+            watchdog_sleep(2)
             
             duration = time.time() - start_time
+            rate = items_per_minute(len(items) - start_index, duration)
             rpa_logger.log_performance("Carga de items", duration)
+            rpa_logger.log_action("Velocidad de carga de items",
+                                  f"{rate:.1f} items/min ({len(items) - start_index} items en {duration:.1f}s)")
             context.processing_stats['items_load_time'] = duration
             context.processing_stats['items_count'] = len(items)
+            context.processing_stats['items_per_minute'] = rate
             return RPAEvent.ITEMS_LOADED
             
         except Exception as e:
@@ -427,7 +510,7 @@ class RPAStateHandlers:
             
             # Buscar archivos en orden específico
             search_locations = [
-                './data/outputs_json/Procesados/',
+                *processed_archive.search_dirs(),
                 './data/outputs_json/',
                 './data/',
                 './'
@@ -2,25 +2,56 @@ import pyautogui
 import time
 import os
 import json
+from contextlib import nullcontext
 from rpa.vision.main import Vision
+from rpa.vision.screen_source import annotate_screen_source
+from rpa.vision.frame_buffer import debug_frames
+from rpa.vision.template_matcher import template_matcher
+from rpa.vision.asset_bundle import asset_bundle
 from rpa.simple_logger import rpa_logger
 from rpa.smart_waits import smart_waits, adaptive_wait, smart_sleep
-from rpa.config_manager import get_delay, get_navigation_tabs, get_retry_attempts
+from rpa.watchdog import state_watchdog, watchdog_sleep
+from rpa.config_manager import config, get_delay, get_navigation_tabs, get_retry_attempts
 from rpa.error_handler import (
     error_handler, with_error_handling, ErrorType, ErrorSeverity,
     handle_template_error, handle_window_error, handle_sap_error
 )
 from rpa.state_machine import StateMachine, RPAState, RPAEvent
 from rpa.rpa_state_handlers import RPAStateHandlers
+from rpa.order_validation import order_prevalidator
+from rpa.order_scheduler import order_scheduler
+from rpa.large_orders import is_large_order, split_large_order_files, grid_window_matches
+from rpa.order_model import Order
+from rpa.bulk_intake import bulk_intake
+from rpa.processed_archive import processed_archive
+from rpa.work_leases import work_leases, INTAKE_LEASE
 
 vision = Vision()
 
 
+def reload_reference_assets():
+    """Recarga en caliente: paquete de templates, caché e imágenes de referencia"""
+    asset_bundle.reload()
+    template_matcher.clear_cache()
+    vision.load_templates()
+    rpa_logger.log_action("Imágenes de referencia recargadas", f"Paquete: {asset_bundle.version or 'sin paquete'}")
+
+
 class RPAWithStateMachine:
     """Versión del RPA que utiliza máquina de estados para control de flujo"""
     
     def __init__(self):
         self.remote_desktop_window = "20.96.6.64 - Conexión a Escritorio remoto"
+        # Último NIT cargado en SAP (cliente en caché para la siguiente orden del grupo)
+        self.last_loaded_nit = None
+        # Tiempo de encabezado (NIT + orden + fechas) por orden: cliente repetido o nuevo
+        self.header_times = {'warm': [], 'cold': []}
+        # Velocidad de carga de items (items/min) de las órdenes completadas
+        self.item_rates = []
+        # Lease de la orden en proceso (solo con varios robots: workers.enabled)
+        self.current_lease = None
+        # Supervisor de main.py: drenaje y recarga en caliente entre órdenes
+        self.supervisor = None
         
         # Inicializar máquina de estados
         self.state_machine = StateMachine()
@@ -31,6 +62,9 @@ class RPAWithStateMachine:
         
         # Registrar callbacks de entrada y salida si es necesario
         self._register_callbacks()
+        
+        # Tabla incompleta o estados sin manejador: fallar al iniciar, no a mitad de un archivo
+        self.state_machine.validate_transitions(require_handlers=True)
 
     def _register_state_handlers(self):
         """Registra todos los manejadores de estado"""
@@ -88,6 +122,14 @@ class RPAWithStateMachine:
                 "ENTRANDO A ESTADO DE ERROR",
                 f"Archivo: {context.current_file}, Intento: {context.retry_count}"
             )
+            # Contexto visual del fallo: últimas capturas del buffer en memoria
+            dump_dir = debug_frames.dump_async(
+                context.current_file or "sin_archivo",
+                {'error': context.error_message, 'retry_count': context.retry_count,
+                 'worker': rpa_logger.worker_id}
+            )
+            if dump_dir:
+                rpa_logger.log_action("Capturas de depuración en proceso de guardado", f"Directorio: {dump_dir}")
         
         self.state_machine.register_entry_callback(RPAState.ERROR, on_error_entry)
         
@@ -120,14 +162,68 @@ class RPAWithStateMachine:
         # Reiniciar la máquina de estados para este archivo
         self.state_machine.reset()
         
-        # Iniciar el procesamiento
-        success = self.state_machine.start_processing(file_name, data)
-        if not success:
-            rpa_logger.log_error(f"No se pudo iniciar el procesamiento", f"Archivo: {file_name}")
+        if self._resume_from_checkpoint(file_name, data):
+            rpa_logger.log_action(
+                "Procesamiento reanudado desde checkpoint",
+                f"Estado: {self.state_machine.get_current_state().value}, Archivo: {file_name}"
+            )
+        else:
+            # Iniciar el procesamiento
+            success = self.state_machine.start_processing(file_name, data)
+            if not success:
+                rpa_logger.log_error(f"No se pudo iniciar el procesamiento", f"Archivo: {file_name}")
+                return False
+        
+        # La orden se interpreta una sola vez; los manejadores usan el modelo
+        try:
+            self.state_machine.get_context().order = Order.from_dict(data)
+        except ValueError as e:
+            rpa_logger.log_error(f"Orden inválida: {str(e)}", f"Archivo: {file_name}")
             return False
         
         # Ejecutar el bucle de la máquina de estados
         max_iterations = 100  # Prevenir bucles infinitos
+        items_count = len(data.get('items', []) or [])
+        if is_large_order(items_count):
+            # Cada reintento reanuda desde el último item confirmado: una orden larga
+            # puede permitirse más intentos sin repetir trabajo
+            context = self.state_machine.get_context()
+            context.max_retries = max(context.max_retries, config.get('large_orders.max_retries', 6))
+            max_iterations = max(max_iterations, 20 * context.max_retries)
+        # Plazo por estado y heartbeat: un estado colgado cuesta un tiempo acotado
+        state_watchdog.start()
+        
+        try:
+            return self._run_state_loop(file_name, items_count, max_iterations)
+        finally:
+            state_watchdog.clear()
+
+    def _resume_from_checkpoint(self, file_name: str, data: dict) -> bool:
+        """
+        Reanuda un archivo interrumpido si su checkpoint es de un estado del
+        formulario y el formulario de órdenes de venta sigue abierto en pantalla
+        """
+        if not self.state_machine.try_resume_from_checkpoint(file_name):
+            return False
+        
+        resumable_states = [
+            RPAState.LOADING_NIT, RPAState.LOADING_ORDER, RPAState.LOADING_DATE,
+            RPAState.LOADING_ITEMS, RPAState.MOVING_JSON, RPAState.POSITIONING_MOUSE,
+        ]
+        state = self.state_machine.get_current_state()
+        if state not in resumable_states or not vision.is_sales_order_form_visible():
+            rpa_logger.log_action("Checkpoint descartado, se inicia el proceso completo",
+                                  f"Estado guardado: {state.value}, Archivo: {file_name}")
+            self.state_machine.reset()
+            return False
+        
+        context = self.state_machine.get_context()
+        context.current_data = data
+        context.start_time = time.time()
+        return True
+
+    def _run_state_loop(self, file_name: str, items_count: int, max_iterations: int) -> bool:
+        """Bucle principal de la máquina de estados para un archivo"""
         iteration = 0
         
         while (self.state_machine.get_current_state() not in [RPAState.COMPLETED, RPAState.IDLE] 
@@ -136,15 +232,38 @@ class RPAWithStateMachine:
             iteration += 1
             current_state = self.state_machine.get_current_state()
             
+            if self.current_lease is not None and self.current_lease.lost:
+                # Otro robot reclamó la orden: se abandona sin reintentar para no grabarla dos veces
+                rpa_logger.log_error("Lease perdido: se abandona la orden",
+                                     f"Estado: {current_state.value}, Archivo: {file_name}")
+                return False
+            # Si se está grabando la sesión, las capturas quedan etiquetadas con el estado
+            annotate_screen_source(rpa_state=current_state.value, file=file_name, worker=rpa_logger.worker_id)
+            debug_frames.set_state(current_state.value)
+            
             rpa_logger.log_action(
                 f"Ejecutando estado: {current_state.value}",
                 f"Iteración: {iteration}, Archivo: {file_name}"
             )
             
+            extra_time = 0.0
+            if current_state == RPAState.LOADING_ITEMS:
+                extra_time = items_count * config.get('watchdog.per_item_timeout', 20)
+            state_watchdog.enter_state(current_state.value, file_name, extra_time)
+            
             try:
                 # Ejecutar el estado actual
                 next_event = self.state_machine.execute_current_state()
                 
+                # El manejador terminó después del plazo (p. ej. una llamada bloqueante
+                # que no pasó por un punto de interrupción): se trata como timeout
+                if (next_event not in (None, RPAEvent.STATE_TIMEOUT)
+                        and state_watchdog.expired
+                        and self.state_machine.can_transition_to(RPAEvent.STATE_TIMEOUT)):
+                    next_event = self.state_machine.record_timeout(
+                        f"Timeout en estado {current_state.value} después de {state_watchdog.timeout:.0f}s"
+                    )
+                
                 if next_event is None:
                     # El estado no generó un evento, posiblemente es un estado final
                     if current_state == RPAState.COMPLETED:
@@ -170,7 +289,7 @@ class RPAWithStateMachine:
                     break
                 
                 # Manejo especial para errores
-                if next_event == RPAEvent.ERROR_OCCURRED:
+                if next_event in (RPAEvent.ERROR_OCCURRED, RPAEvent.STATE_TIMEOUT):
                     context = self.state_machine.get_context()
                     self.state_machine.handle_error(context.error_message or "Error desconocido")
                 
@@ -207,83 +326,120 @@ class RPAWithStateMachine:
         rpa_logger.log_action("Iniciando RPA con máquina de estados", "Buscando archivos JSON")
         
         directory = './data/outputs_json'
+        # Varios robots sobre la misma cola: cada orden se toma con un lease
+        leases = work_leases if config.get('workers.enabled', False) else None
         
         try:
-            # Filtrar solo archivos JSON válidos
-            files = [f for f in os.listdir(directory) 
-                    if os.path.isfile(os.path.join(directory, f))
-                    and f.endswith('.json')
-                    and not f.startswith('.')
-                    and not f.endswith('.tmp')]
-            
-            if len(files) == 0:
-                rpa_logger.log_action(
-                    "No hay archivos JSON disponibles para procesar",
-                    f"Directorio: {directory}"
-                )
-                return
+            if leases is None or self._claim(leases, INTAKE_LEASE):
+                # El lease de la etapa de entrada se renueva mientras dura (planillas grandes)
+                with (leases.hold(INTAKE_LEASE) if leases is not None else nullcontext()):
+                    files = self._prepare_queue(directory, leases)
+            else:
+                # Otro robot está en la etapa de entrada: se toman las órdenes ya en la cola
+                rpa_logger.log_action("Etapa de entrada a cargo de otro robot", f"Robot: {leases.worker_id}")
+                files = self._list_json_files(directory)
             
-            rpa_logger.log_action(
-                f"Archivos encontrados para procesar",
-                f"Total: {len(files)} archivos"
-            )
+            if not files:
+                return
             
             successful_files = 0
             failed_files = 0
+            skipped_files = 0
+            
+            # Orden de procesamiento: fecha de entrega más próxima primero (EDF con envejecimiento)
+            order_scheduler.sync([os.path.join(directory, f) for f in files])
+            self._log_schedule()
             
-            for i, file in enumerate(files, 1):
-                file_path = os.path.join(directory, file)
+            i = 0
+            while True:
+                if self.supervisor is not None and not self.supervisor.between_orders():
+                    rpa_logger.log_action("Drenaje en curso: no se toman más órdenes",
+                                          f"Pendientes en la cola: {len(order_scheduler)}")
+                    break
+                order = order_scheduler.pop()
+                if order is None:
+                    break
+                i += 1
+                file = order.file_name
+                file_path = order.path
+                
+                if leases is not None:
+                    if not self._claim(leases, file):
+                        skipped_files += 1
+                        rpa_logger.log_action("Orden tomada por otro robot", f"Archivo: {file}")
+                        continue
+                    if not os.path.exists(file_path):
+                        # Otro robot la terminó entre el listado y el lease
+                        leases.release(file)
+                        skipped_files += 1
+                        continue
+                
                 rpa_logger.log_action(
                     f"Procesando archivo {i}/{len(files)}",
                     f"Archivo: {file}"
                 )
                 
-                try:
-                    # Cargar datos del archivo JSON
-                    with open(file_path) as f:
-                        data = json.load(f)
-                    
-                    rpa_logger.log_action("Archivo JSON cargado", f"Archivo: {file}")
-                    
-                    # Procesar el archivo usando la máquina de estados
-                    success = self.process_single_file(file_path, data)
-                    
-                    if success:
-                        successful_files += 1
-                        rpa_logger.log_action(
-                            f"Archivo procesado exitosamente",
+                with (leases.hold(file) if leases is not None else nullcontext()) as lease:
+                    try:
+                        # Cargar datos del archivo JSON
+                        with open(file_path) as f:
+                            data = json.load(f)
+                        
+                        rpa_logger.log_action("Archivo JSON cargado", f"Archivo: {file}")
+                        
+                        # Procesar el archivo usando la máquina de estados
+                        self.current_lease = lease
+                        success = self.process_single_file(file_path, data)
+                        
+                        if success:
+                            successful_files += 1
+                            stats = self.state_machine.get_context().processing_stats
+                            order_scheduler.record_completion(stats)
+                            self.record_header_time(stats)
+                            if stats.get('items_per_minute'):
+                                self.item_rates.append(stats['items_per_minute'])
+                            rpa_logger.log_action(
+                                f"Archivo procesado exitosamente",
+                                f"Archivo: {file}"
+                            )
+                        else:
+                            failed_files += 1
+                            rpa_logger.log_error(
+                                f"Falló el procesamiento del archivo",
+                                f"Archivo: {file}"
+                            )
+                        
+                    except json.JSONDecodeError as e:
+                        failed_files += 1
+                        rpa_logger.log_error(
+                            f"Error decodificando archivo JSON: {str(e)}",
                             f"Archivo: {file}"
                         )
-                    else:
+                        continue
+                        
+                    except Exception as e:
                         failed_files += 1
                         rpa_logger.log_error(
-                            f"Falló el procesamiento del archivo",
+                            f"Error inesperado procesando archivo: {str(e)}",
                             f"Archivo: {file}"
                         )
-                    
-                except json.JSONDecodeError as e:
-                    failed_files += 1
-                    rpa_logger.log_error(
-                        f"Error decodificando archivo JSON: {str(e)}",
-                        f"Archivo: {file}"
-                    )
-                    continue
-                    
-                except Exception as e:
-                    failed_files += 1
-                    rpa_logger.log_error(
-                        f"Error inesperado procesando archivo: {str(e)}",
-                        f"Archivo: {file}"
-                    )
-                    continue
+                        continue
+                    finally:
+                        self.current_lease = None
             
             # Estadísticas finales
             total_duration = time.time() - start_time
             rpa_logger.log_performance("Procesamiento RPA completado", total_duration)
             rpa_logger.log_action(
                 "Resumen de procesamiento",
-                f"Exitosos: {successful_files}, Fallidos: {failed_files}, Total: {len(files)}"
+                f"Exitosos: {successful_files}, Fallidos: {failed_files}, "
+                f"Tomados por otros robots: {skipped_files}, Total: {len(files)}"
             )
+            rpa_logger.log_action("Tiempo de encabezado por orden", self.header_time_summary())
+            if self.item_rates:
+                rpa_logger.log_action("Velocidad de carga de items",
+                                      f"Promedio: {sum(self.item_rates) / len(self.item_rates):.1f} items/min, "
+                                      f"Mínima: {min(self.item_rates):.1f} items/min")
             
         except Exception as e:
             rpa_logger.log_error(
@@ -292,6 +448,97 @@ class RPAWithStateMachine:
             )
             return
 
+    def _prepare_queue(self, directory, leases=None):
+        """
+        Etapa de entrada: planillas, validación previa y división de órdenes grandes
+        
+        Con varios robots cada archivo se mueve (cuarentena o división) solo con su
+        lease tomado: otro robot puede haber tomado ya una orden de la cola.
+        
+        Returns:
+            Archivos listos para procesar (lista vacía si no hay órdenes)
+        """
+        # Filtrar solo archivos JSON válidos
+        files = self._list_json_files(directory)
+        
+        # Planillas CSV/XLSX: sus órdenes pasan del spool a la cola por lotes
+        if config.get('bulk_intake.enabled', True):
+            bulk_intake.scan(directory)
+            if bulk_intake.release(directory, queued=len(files)):
+                files = self._list_json_files(directory)
+        
+        if len(files) == 0:
+            rpa_logger.log_action(
+                "No hay archivos JSON disponibles para procesar",
+                f"Directorio: {directory}"
+            )
+            return []
+        
+        rpa_logger.log_action(
+            f"Archivos encontrados para procesar",
+            f"Total: {len(files)} archivos"
+        )
+        
+        # Validación previa: las órdenes inválidas van a cuarentena antes de usar el robot
+        if config.get('validation.enabled', True):
+            report = order_prevalidator.validate([os.path.join(directory, f) for f in files], leases=leases)
+            files = [os.path.basename(path) for path in report.valid_files]
+            if not files:
+                rpa_logger.log_action("No quedan órdenes válidas para procesar",
+                                      f"En cuarentena: {len(report.quarantined)}")
+                return []
+        
+        # Órdenes con demasiadas líneas para un solo documento: se dividen en partes vinculadas
+        return split_large_order_files(directory, files, leases=leases)
+
+    def check_lease(self):
+        """Lanza LeaseLost si otro robot reclamó la orden en proceso (no se debe seguir escribiendo en SAP)"""
+        if self.current_lease is not None:
+            self.current_lease.check()
+
+    def _claim(self, leases, name):
+        """Toma un lease; un error de disco en el directorio compartido cuenta como no tomado"""
+        try:
+            return leases.claim(name)
+        except OSError as e:
+            rpa_logger.log_error(f"No se pudo tomar el lease: {str(e)}", f"Orden: {name}")
+            return False
+
+    def _list_json_files(self, directory):
+        """Archivos JSON pendientes en la cola (sin ocultos ni temporales)"""
+        return [f for f in os.listdir(directory)
+                if os.path.isfile(os.path.join(directory, f))
+                and f.endswith('.json')
+                and not f.startswith('.')
+                and not f.endswith('.tmp')]
+
+    def record_header_time(self, stats: dict):
+        """Acumula el tiempo de encabezado de una orden completada"""
+        parts = [stats.get(key) for key in ('nit_load_time', 'order_load_time', 'date_load_time')]
+        if all(isinstance(part, (int, float)) for part in parts):
+            self.header_times['warm' if stats.get('nit_warm') else 'cold'].append(sum(parts))
+
+    def header_time_summary(self) -> str:
+        """Promedio del tiempo de encabezado con cliente repetido y con cliente nuevo"""
+        def average(values):
+            return f"{sum(values) / len(values):.1f}s ({len(values)} órdenes)" if values else "N/A"
+        return (f"Cliente repetido: {average(self.header_times['warm'])}, "
+                f"Cliente nuevo: {average(self.header_times['cold'])}")
+
+    def _log_schedule(self):
+        """Registra el orden planificado con la hora proyectada de terminación"""
+        projections = order_scheduler.projections()
+        late = [p['file'] for p in projections if p['late']]
+        for position, projection in enumerate(projections, 1):
+            due = time.strftime('%d/%m/%Y', time.localtime(projection['due'])) if projection['due'] else 'sin fecha'
+            finish = time.strftime('%d/%m/%Y %H:%M', time.localtime(projection['projected_finish']))
+            rpa_logger.log_action(
+                f"Cola {position}/{len(projections)}: {projection['file']}",
+                f"Entrega: {due}, Terminación proyectada: {finish}{' (ATRASADA)' if projection['late'] else ''}"
+            )
+        if late:
+            rpa_logger.warning(f"Órdenes proyectadas después de su fecha de entrega: {', '.join(late)}")
+
     def get_state_info(self) -> dict:
         """Retorna información del estado actual de la máquina de estados"""
         return self.state_machine.get_state_info()
@@ -311,17 +558,27 @@ class RPAWithStateMachine:
 
     @with_error_handling(ErrorType.DATA_PROCESSING, ErrorSeverity.MEDIUM, operation="load_nit")
     def load_nit(self, nit):
+        """
+        Carga el NIT del comprador en el formulario
+        
+        Returns:
+            True si el NIT es el mismo de la orden anterior (cliente en caché de
+            SAP: se usa la espera corta after_nit_warm)
+        """
         start_time = time.time()
         rpa_logger.log_action("Iniciando carga de NIT", f"NIT: {nit}")
         
         if not nit or not str(nit).strip():
             raise ValueError(f"NIT inválido: {nit}")
         
+        warm = str(nit).strip() == self.last_loaded_nit
         try:
             smart_sleep('short')
             
-            pyautogui.screenshot("./rpa/vision/reference_images/template.png")
-            vision.save_template()
+            # La captura del formulario queda en memoria; solo se escribe en modo depuración
+            vision.set_form_frame()
+            if config.get('development.enable_debug_screenshots', False):
+                vision.save_template()
             
             pyautogui.hotkey('ctrl', 'a')
             smart_sleep('very_short')
@@ -329,7 +586,7 @@ class RPAWithStateMachine:
             nit_str = str(nit).strip()
             pyautogui.typewrite(nit_str, interval=0.2)
             smart_sleep('after_input')
-            smart_sleep('after_nit')
+            smart_sleep('after_nit_warm' if warm else 'after_nit')
             
             pyautogui.hotkey('enter')
             smart_sleep('after_input')
@@ -341,10 +598,13 @@ class RPAWithStateMachine:
                 smart_sleep('after_tab')
             
             duration = time.time() - start_time
+            self.last_loaded_nit = nit_str
             rpa_logger.log_performance("Carga de NIT", duration)
-            rpa_logger.log_action("NIT cargado exitosamente", f"NIT: {nit}")
+            rpa_logger.log_action("NIT cargado exitosamente", f"NIT: {nit}, Cliente repetido: {'sí' if warm else 'no'}")
+            return warm
             
         except Exception as e:
+            self.last_loaded_nit = None
             rpa_logger.log_error(f"Error al cargar NIT: {str(e)}", f"NIT: {nit}")
             raise
 
@@ -407,53 +667,72 @@ class RPAWithStateMachine:
             rpa_logger.log_error(f"Error al cargar fechas: {str(e)}", f"Entrega: {fecha_entrega}, Documento: {fecha_doc}")
             raise
 
-    def load_items(self, items):
+    def load_items(self, items, start_index=0, on_item_loaded=None):
+        """
+        Carga los items en la grilla de la orden de venta
+        
+        Args:
+            items: Items de la orden (OrderItem)
+            start_index: Índice (base 0) del primer item a cargar; el cursor debe
+                estar en la celda de código de esa fila
+            on_item_loaded: Callback con el índice (base 0) de cada item confirmado
+        """
         start_time = time.time()
-        rpa_logger.log_action("Iniciando carga de items", f"Total items: {len(items)}")
+        rpa_logger.log_action("Iniciando carga de items", f"Total items: {len(items)}, Desde item: {start_index + 1}")
         
         try:
             rpa_logger.log_action("Iniciando navegación por teclado", "Sin movimientos de mouse")
             
-            for i, item in enumerate(items, 1):
+            # Orden grande: cada chunk_size items se verifica la grilla desplazada al final
+            chunk_size = config.get('large_orders.chunk_size', 25) if is_large_order(len(items)) else 0
+            
+            for i, item in enumerate(items[start_index:], start_index + 1):
                 item_start_time = time.time()
-                rpa_logger.log_action(f"Procesando item {i}/{len(items)}", f"Código: {item['codigo']}")
+                rpa_logger.log_action(f"Procesando item {i}/{len(items)}", f"Código: {item.codigo}")
                 
                 try:
-                    pyautogui.typewrite(item['codigo'], interval=0.2)
-                    time.sleep(3)
-                    time.sleep(1)
+                    pyautogui.typewrite(item.codigo, interval=0.2)
+                    watchdog_sleep(3)
+                    watchdog_sleep(1)
                     pyautogui.hotkey('tab')
-                    time.sleep(2)
+                    watchdog_sleep(2)
                     pyautogui.hotkey('tab')
-                    time.sleep(2)
-                    pyautogui.typewrite(str(item['cantidad']), interval=0.2)
-                    time.sleep(2)
+                    watchdog_sleep(2)
+                    pyautogui.typewrite(item.cantidad_text, interval=0.2)
+                    watchdog_sleep(2)
                     
                     if i < len(items):
                         pyautogui.hotkey('tab')
-                        time.sleep(2)
+                        watchdog_sleep(2)
                         pyautogui.hotkey('tab')
-                        time.sleep(2)
+                        watchdog_sleep(2)
                         pyautogui.hotkey('tab')
-                        time.sleep(2)
-                        rpa_logger.log_action(f"Item {i} - Navegando al siguiente artículo", f"Código: {item['codigo']}")
+                        watchdog_sleep(2)
+                        rpa_logger.log_action(f"Item {i} - Navegando al siguiente artículo", f"Código: {item.codigo}")
                     else:
                         # Para el último item, presionar TAB para actualizar el total antes de la foto
                         pyautogui.hotkey('tab')
-                        time.sleep(2)
-                        rpa_logger.log_action(f"Item {i} - Último artículo completado, presionando TAB para actualizar total", f"Código: {item['codigo']}")
+                        watchdog_sleep(2)
+                        rpa_logger.log_action(f"Item {i} - Último artículo completado, presionando TAB para actualizar total", f"Código: {item.codigo}")
                         # Esperar un poco más para que SAP procese y actualice el total
-                        time.sleep(3)
-                        rpa_logger.log_action(f"Item {i} - Total actualizado, listo para captura de pantalla", f"Código: {item['codigo']}")
+                        watchdog_sleep(3)
+                        rpa_logger.log_action(f"Item {i} - Total actualizado, listo para captura de pantalla", f"Código: {item.codigo}")
                     
                     item_duration = time.time() - item_start_time
                     rpa_logger.log_performance(f"Item {i} procesado", item_duration)
                     rpa_logger.log_action(f"Item {i} cargado exitosamente", 
-                                        f"Código: {item['codigo']}, Cantidad: {item['cantidad']}")
+                                        f"Código: {item.codigo}, Cantidad: {item.cantidad_text}")
+                    if on_item_loaded:
+                        on_item_loaded(i - 1)
+                    # Punto de control por item: si otro robot tomó la orden no se cargan más
+                    self.check_lease()
+                    
+                    if chunk_size and i % chunk_size == 0 and i < len(items):
+                        self.verify_items_chunk(items, i)
                     
                 except Exception as e:
                     rpa_logger.log_error(f"Error al procesar item {i}: {str(e)}", 
-                                       f"Código: {item['codigo']}")
+                                       f"Código: {item.codigo}")
                     raise
             
             total_duration = time.time() - start_time
@@ -464,6 +743,67 @@ class RPAWithStateMachine:
             rpa_logger.log_error(f"Error en carga de items: {str(e)}", f"Total items: {len(items)}")
             raise
 
+    def read_items_grid(self, to_end=False):
+        """
+        Lee los códigos de artículo ya cargados en la grilla de la orden
+        
+        Args:
+            to_end: Desplazar antes la grilla al final (las últimas filas cargadas quedan a la vista)
+        
+        Returns:
+            Lista de códigos visibles en orden de fila, o None si la grilla no se pudo leer
+        """
+        try:
+            if to_end:
+                self.scroll_items_grid(to_end=True)
+            codes = vision.read_item_codes()
+            rpa_logger.log_action("Grilla de items leída", f"Filas con código: {len(codes) if codes is not None else 'N/A'}")
+            return codes
+        except Exception as e:
+            rpa_logger.log_error(f"Error leyendo la grilla de items: {str(e)}")
+            return None
+
+    def verify_items_chunk(self, items, loaded):
+        """
+        Punto de control de una orden grande: desplaza la grilla al final y
+        verifica que las filas visibles sean los últimos items cargados
+        
+        Args:
+            items: Items de la orden
+            loaded: Cantidad de items cargados hasta ahora
+            
+        Raises:
+            RuntimeError: Si la grilla no coincide (el reintento reanuda desde la grilla)
+        """
+        start_time = time.time()
+        visible_codes = self.read_items_grid(to_end=True)
+        if visible_codes is None:
+            rpa_logger.warning(f"Grilla no legible en el punto de control del item {loaded}, se continúa")
+            return
+        if not grid_window_matches(items, loaded, visible_codes):
+            raise RuntimeError(f"La grilla no coincide con los items cargados en el punto de control "
+                               f"del item {loaded}: visibles {visible_codes[-3:]}")
+        rpa_logger.log_performance(f"Punto de control de grilla ({loaded}/{len(items)} items)", time.time() - start_time)
+
+    def scroll_items_grid(self, to_end=True):
+        """Desplaza la grilla de items al final (o al inicio) con la rueda del mouse, sin cambiar el foco"""
+        coordinates, _ = vision.get_primer_articulo_coordinates()
+        clicks = config.get('large_orders.scroll_clicks', 50)
+        pyautogui.scroll(-clicks if to_end else clicks, x=coordinates[0], y=coordinates[1])
+        watchdog_sleep(1)
+
+    def focus_item_row(self, index):
+        """Ubica el cursor en la celda de código de la fila indicada (base 0)"""
+        # La grilla puede haber quedado desplazada en un punto de control
+        self.scroll_items_grid(to_end=False)
+        coordinates, _ = vision.get_primer_articulo_coordinates()
+        pyautogui.click(coordinates)
+        watchdog_sleep(1)
+        if index > 0:
+            pyautogui.press('down', presses=index, interval=0.3)
+            watchdog_sleep(1)
+        rpa_logger.log_action("Cursor ubicado en la grilla de items", f"Fila: {index + 1}")
+
     def scroll_to_bottom(self):
         start_time = time.time()
         rpa_logger.log_action("Iniciando scroll hacia abajo", "Buscando barra de desplazamiento vertical")
@@ -485,7 +825,7 @@ class RPAWithStateMachine:
             
             rpa_logger.log_action("Haciendo clic en barra de desplazamiento", f"Posición: {coordinates}")
             pyautogui.click(scrollbar_x, scrollbar_y)
-            time.sleep(1)
+            watchdog_sleep(1)
             
             screen_width, screen_height = pyautogui.size()
             scroll_distance = screen_height - 100
@@ -493,7 +833,7 @@ class RPAWithStateMachine:
             rpa_logger.log_action("Arrastrando scroll hacia abajo", f"Distancia: {scroll_distance} píxeles")
             pyautogui.drag(0, scroll_distance, duration=2)
             
-            time.sleep(2)
+            watchdog_sleep(2)
             
             duration = time.time() - start_time
             rpa_logger.log_performance("Scroll hacia abajo completado", duration)
@@ -510,19 +850,13 @@ class RPAWithStateMachine:
         rpa_logger.log_action("Iniciando captura de pantalla para validación", f"Archivo: {filename}")
         
         try:
-            processed_dir = './data/outputs_json/Procesados'
-            
-            if not os.path.exists(processed_dir):
-                os.makedirs(processed_dir)
-                rpa_logger.log_action("Directorio de procesados creado", f"Ruta: {processed_dir}")
-            
             base_name = filename.replace('.json', '')
             validation_filename = f'{base_name}.png'
-            saved_filepath = os.path.join(processed_dir, validation_filename)
+            saved_filepath = processed_archive.path_for(validation_filename)
             
             # Esperar un poco más para asegurar que el total esté completamente actualizado
             rpa_logger.log_action("Esperando a que el total se actualice completamente", "Preparando captura de pantalla")
-            time.sleep(2)
+            watchdog_sleep(2)
             screenshot = pyautogui.screenshot()
             screenshot.save(saved_filepath)
             
@@ -545,22 +879,24 @@ class RPAWithStateMachine:
             import shutil
             
             source_path = f'./data/outputs_json/{filename}'
-            processed_dir = './data/outputs_json/Procesados'
-            destination_path = os.path.join(processed_dir, filename)
-            
-            if not os.path.exists(processed_dir):
-                os.makedirs(processed_dir)
-                rpa_logger.log_action("Directorio de procesados creado", f"Ruta: {processed_dir}")
+            destination_path = processed_archive.path_for(filename)
             
             if not os.path.exists(source_path):
                 rpa_logger.log_error(f"Archivo fuente no encontrado: {source_path}", f"Archivo: {filename}")
                 return False
             
+            if self.current_lease is not None and self.current_lease.lost:
+                # Otro robot reclamó la orden: la orden no se graba ni se mueve desde este robot
+                rpa_logger.log_error("Lease perdido antes de mover la orden", f"Archivo: {filename}")
+                return False
+            
             rpa_logger.log_action("Moviendo archivo JSON a procesados", f"De: {source_path} a: {destination_path}")
             shutil.move(source_path, destination_path)
+            processed_today = processed_archive.record_completion(filename)
+            rpa_logger.log_action("Orden registrada en el índice de procesados", f"Procesadas hoy: {processed_today}")
             
             screenshot_name = filename.replace('.json', '.png')
-            screenshot_path = os.path.join(processed_dir, screenshot_name)
+            screenshot_path = processed_archive.locate(screenshot_name) or processed_archive.path_for(screenshot_name)
             
             # NUEVO: Subir archivos originales PNG y PDF a Google Drive
             drive_upload_result = None
@@ -600,11 +936,9 @@ class RPAWithStateMachine:
             return False
 
     def validate_files_for_makecom(self, filename):
-        processed_dir = './data/outputs_json/Procesados'
-        
-        json_path = os.path.join(processed_dir, filename)
+        json_path = processed_archive.locate(filename) or processed_archive.path_for(filename)
         screenshot_name = filename.replace('.json', '.png')
-        screenshot_path = os.path.join(processed_dir, screenshot_name)
+        screenshot_path = processed_archive.locate(screenshot_name) or processed_archive.path_for(screenshot_name)
         
         validation_result = {
             'json_exists': os.path.exists(json_path),
@@ -691,15 +1025,15 @@ class RPAWithStateMachine:
         rpa_logger.log_action("Iniciando posicionamiento optimizado del mouse", "Buscando botón 'Agregar y' en esquina inferior izquierda")
         
         try:
-            # Cargar la imagen del botón "Agregar y"
-            import cv2
+            # Cargar la imagen del botón "Agregar y" (caché del matcher, invalidada por mtime)
+            from rpa.vision.template_matcher import template_matcher
             template_path = os.path.join(os.path.dirname(__file__), 'vision', 'reference_images', 'agregar_y_button.png')
             
             if not os.path.exists(template_path):
                 rpa_logger.log_error(f"Imagen de referencia no encontrada: {template_path}", "Archivo faltante")
                 return False
             
-            agregar_button_image = cv2.imread(template_path, cv2.IMREAD_COLOR)
+            agregar_button_image = template_matcher.load_template_image(template_path)
             if agregar_button_image is None:
                 rpa_logger.log_error("No se pudo cargar la imagen de referencia", "Error de lectura de imagen")
                 return False
@@ -734,7 +1068,7 @@ class RPAWithStateMachine:
             agregar_docum_image = None
             
             if os.path.exists(docum_template_path):
-                agregar_docum_image = cv2.imread(docum_template_path, cv2.IMREAD_COLOR)
+                agregar_docum_image = template_matcher.load_template_image(docum_template_path)
                 if agregar_docum_image is not None:
                     rpa_logger.log_action("Imagen anti-error cargada", "Template 'Agregar docum' disponible para validación")
                 else:
@@ -744,14 +1078,25 @@ class RPAWithStateMachine:
             
             # Buscar el botón usando template matching con confianza aumentada en la región específica
             rpa_logger.log_action("Buscando botón 'Agregar y' en región optimizada", "Usando template matching con confianza 0.85 en esquina inferior izquierda")
-            from rpa.vision.template_matcher import template_matcher
             
-            # Primera búsqueda: región específica con confianza alta
-            coordinates = template_matcher.find_template(
-                agregar_button_image, 
-                confidence=primary_confidence,
-                search_region=search_region
+            search_margin = 50  # Píxeles de margen para buscar botón incorrecto
+            
+            # Primera búsqueda: ambos botones en paralelo sobre la misma captura y región
+            batch_templates = {'agregar_y': agregar_button_image}
+            if agregar_docum_image is not None:
+                batch_templates['agregar_docum'] = agregar_docum_image
+            
+            batch = template_matcher.match_batch(
+                batch_templates,
+                regions={name: search_region for name in batch_templates},
+                thresholds={'agregar_y': primary_confidence, 'agregar_docum': anti_error_confidence}
+            )
+            rpa_logger.log_action(
+                "Búsqueda en lote completada",
+                f"Tiempos: {', '.join(f'{k}: {v * 1000:.0f}ms' for k, v in batch.timings.items())}"
             )
+            coordinates = batch.results['agregar_y'].coordinates
+            docum_match = batch.results.get('agregar_docum')
             
             # Si no se encuentra en la región específica, intentar búsqueda completa con confianza más baja
             if not coordinates:
@@ -760,6 +1105,7 @@ class RPAWithStateMachine:
                     agregar_button_image, 
                     confidence=fallback_confidence
                 )
+                docum_match = None
             
             if not coordinates:
                 rpa_logger.log_error("No se pudo encontrar el botón 'Agregar y' en ninguna región", "Template matching falló completamente")
@@ -776,21 +1122,27 @@ class RPAWithStateMachine:
             if agregar_docum_image is not None:
                 rpa_logger.log_action("Ejecutando validación anti-error", "Verificando que no sea 'Agregar docum'")
                 
-                # Crear región de búsqueda alrededor de las coordenadas encontradas
-                search_margin = 50  # Píxeles de margen para buscar botón incorrecto
-                search_region = (
-                    max(0, button_x - search_margin),
-                    max(0, button_y - search_margin),
-                    search_margin * 2,
-                    search_margin * 2
-                )
-                
-                # Buscar botón incorrecto en la región
-                wrong_button_coords = template_matcher.find_template(
-                    agregar_docum_image, 
-                    confidence=anti_error_confidence,
-                    search_region=search_region
-                )
+                if docum_match is not None:
+                    # Resultado ya calculado en el lote: basta comparar distancias
+                    wrong_button_coords = docum_match.coordinates
+                    if wrong_button_coords and (abs(wrong_button_coords[0] - button_x) > search_margin
+                                                or abs(wrong_button_coords[1] - button_y) > search_margin):
+                        wrong_button_coords = None
+                else:
+                    # Crear región de búsqueda alrededor de las coordenadas encontradas
+                    search_region = (
+                        max(0, button_x - search_margin),
+                        max(0, button_y - search_margin),
+                        search_margin * 2,
+                        search_margin * 2
+                    )
+                    
+                    # Buscar botón incorrecto en la región
+                    wrong_button_coords = template_matcher.find_template(
+                        agregar_docum_image, 
+                        confidence=anti_error_confidence,
+                        search_region=search_region
+                    )
                 
                 if wrong_button_coords:
                     rpa_logger.log_error(
@@ -824,14 +1176,15 @@ class RPAWithStateMachine:
             pyautogui.moveTo(corner_x, corner_y, duration=1.0)
             rpa_logger.log_action("Mouse posicionado en botón 'Agregar y'", f"Posición: ({corner_x}, {corner_y})")
             
-            # Hacer clic en el botón "Agregar y"
+            # Hacer clic en el botón "Agregar y" (crea la orden): solo si el lease sigue siendo nuestro
             smart_sleep('short')
+            self.check_lease()
             pyautogui.click()
             rpa_logger.log_action("Clic ejecutado en botón 'Agregar y'", "Esperando apertura de minipantalla")
             
             # Esperar a que se abra la minipantalla
             smart_sleep('medium')  # Espera adicional para la minipantalla
-            time.sleep(2)  # Espera extra para asegurar que la minipantalla esté completamente cargada
+            watchdog_sleep(2)  # Espera extra para asegurar que la minipantalla esté completamente cargada
             
             # Buscar el botón específico "Agregar y cerrar" en la minipantalla
             popup_template_path = os.path.join(os.path.dirname(__file__), 'vision', 'reference_images', 'sap_popup_agregar_y_cerrar.png')
@@ -840,7 +1193,7 @@ class RPAWithStateMachine:
                 rpa_logger.log_error(f"Imagen de referencia del botón 'Agregar y cerrar' no encontrada: {popup_template_path}", "Archivo faltante")
                 return False
             
-            popup_image = cv2.imread(popup_template_path, cv2.IMREAD_COLOR)
+            popup_image = template_matcher.load_template_image(popup_template_path)
             if popup_image is None:
                 rpa_logger.log_error("No se pudo cargar la imagen del botón 'Agregar y cerrar'", "Error de lectura de imagen")
                 return False
@@ -876,17 +1229,13 @@ class RPAWithStateMachine:
             
             # Esperar 3 segundos para que se cargue el subtotal
             rpa_logger.log_action("Esperando 3 segundos para que se cargue el subtotal", "Preparando captura final")
-            time.sleep(3)
+            watchdog_sleep(3)
             
             # Tomar screenshot final ANTES de cerrar el pedido
             try:
-                processed_dir = './data/outputs_json/Procesados'
-                if not os.path.exists(processed_dir):
-                    os.makedirs(processed_dir)
-                
                 base_name = filename.replace('.json', '') if filename else 'unknown'
                 validation_filename = f'{base_name}.png'
-                saved_filepath = os.path.join(processed_dir, validation_filename)
+                saved_filepath = processed_archive.path_for(validation_filename)
                 
                 screenshot = pyautogui.screenshot()
                 screenshot.save(saved_filepath)
@@ -922,9 +1271,9 @@ class RPAWithStateMachine:
         self.get_remote_desktop()
         coordinates = vision.get_cancel_order_coordinates()
         pyautogui.moveTo(coordinates, duration=0.5)
-        time.sleep(1)
+        watchdog_sleep(1)
         pyautogui.click()
-        time.sleep(1)
+        watchdog_sleep(1)
         rpa_logger.info('Order cancelled.')
 
     @with_error_handling(ErrorType.SAP_NAVIGATION, ErrorSeverity.HIGH, operation="open_sap")
@@ -956,6 +1305,8 @@ class RPAWithStateMachine:
                 
                 pyautogui.hotkey('enter')
                 smart_sleep('sap_startup')
+                # SAP recién iniciado: no hay clientes en caché
+                self.last_loaded_nit = None
                 
                 screenshot = pyautogui.screenshot("./rpa/vision/reference_images/sap_desktop.png")
                 if screenshot:
@@ -981,18 +1332,18 @@ class RPAWithStateMachine:
             rpa_logger.info('SAP already closed. Waiting for next run')
             return
         pyautogui.moveTo(archivo_menu_coordinates, duration=0.5)
-        time.sleep(1)
+        watchdog_sleep(1)
         pyautogui.click()
-        time.sleep(2)
+        watchdog_sleep(2)
         pyautogui.screenshot("./rpa/vision/reference_images/sap_archivo_menu.png")
-        time.sleep(1)
+        watchdog_sleep(1)
         finalizar_button_coordinates = vision.get_finalizar_button_coordinates()
         pyautogui.moveTo(finalizar_button_coordinates, duration=0.5)
-        time.sleep(1)
+        watchdog_sleep(1)
         pyautogui.click()
-        time.sleep(1)
+        watchdog_sleep(1)
         pyautogui.hotkey('enter')
-        time.sleep(15)
+        watchdog_sleep(15)
         rpa_logger.info('SAP closed.')
 
     def open_sap_orden_de_ventas(self):
@@ -1000,30 +1351,27 @@ class RPAWithStateMachine:
         rpa_logger.log_action("Iniciando apertura de SAP orden de ventas", "Navegación usando atajos de teclado")
         
         try:
-            from rpa.vision.main import Vision
-            vision = Vision()
-            
             rpa_logger.log_action("PASO 4.0: Asegurando que la ventana esté activa", "Verificación de foco")
             windows = pyautogui.getWindowsWithTitle(self.remote_desktop_window)
             if windows:
                 window = windows[0]
                 if not window.isActive:
                     window.activate()
-                    time.sleep(2)
+                    watchdog_sleep(2)
                     rpa_logger.log_action("PASO 4.0 COMPLETADO: Ventana activada", "Esperando 2 segundos")
             
             rpa_logger.log_action("PASO 4.1: Abriendo menú módulos", "Atajo: Alt + M")
             pyautogui.keyDown('alt')
-            time.sleep(0.1)
+            watchdog_sleep(0.1)
             pyautogui.press('m')
-            time.sleep(0.1)
+            watchdog_sleep(0.1)
             pyautogui.keyUp('alt')
-            time.sleep(2)
+            watchdog_sleep(2)
             rpa_logger.log_action("PASO 4.1 COMPLETADO: Menú módulos abierto", "Esperando 2 segundos")
             
             rpa_logger.log_action("PASO 4.2: Seleccionando módulo Ventas", "Tecla: V")
             pyautogui.press('v')
-            time.sleep(2)
+            watchdog_sleep(2)
             rpa_logger.log_action("PASO 4.2 COMPLETADO: Módulo Ventas seleccionado", "Esperando 2 segundos")
             
             rpa_logger.log_action("PASO 4.3: Buscando botón de Orden de Ventas", "Usando imagen de referencia: sap_ventas_order_button.png")
@@ -1037,17 +1385,19 @@ class RPAWithStateMachine:
             
             rpa_logger.log_action("PASO 4.4: Moviendo cursor al botón de Orden de Ventas", f"Coordenadas: {orden_ventas_coordinates}")
             pyautogui.moveTo(orden_ventas_coordinates, duration=0.5)
-            time.sleep(1)
+            watchdog_sleep(1)
             
             rpa_logger.log_action("PASO 4.5: Haciendo clic en botón de Orden de Ventas", "Clic ejecutado")
             pyautogui.click()
-            time.sleep(3)
-            time.sleep(2)
+            watchdog_sleep(3)
+            watchdog_sleep(2)
             rpa_logger.log_action("PASO 4.5 COMPLETADO: Clic ejecutado exitosamente", "Esperando 5 segundos para carga (3+2)")
             
-            rpa_logger.log_action("PASO 4.6: Capturando pantalla de verificación", "Guardando: sap_orden_de_ventas_template.png")
-            pyautogui.screenshot("./rpa/vision/reference_images/sap_orden_de_ventas_template.png")
-            rpa_logger.log_action("PASO 4.6 COMPLETADO: Captura de pantalla guardada", "Verificación completada")
+            rpa_logger.log_action("PASO 4.6: Capturando pantalla de verificación", "Captura del formulario en memoria")
+            vision.set_form_frame()
+            if config.get('development.enable_debug_screenshots', False):
+                vision.save_template()
+            rpa_logger.log_action("PASO 4.6 COMPLETADO: Captura del formulario actualizada", "Verificación completada")
             
             duration = time.time() - start_time
             rpa_logger.log_performance("PASO 4 COMPLETADO: Apertura de SAP orden de ventas", duration)
@@ -1072,7 +1422,7 @@ class RPAWithStateMachine:
                     if attempt < max_retries - 1:
                         rpa_logger.warning(f'Ventana no encontrada (intento {attempt + 1}/{max_retries}), abriendo escritorio remoto')
                         self.open_remote_desktop()
-                        time.sleep(retry_delay)
+                        watchdog_sleep(retry_delay)
                         continue
                     else:
                         raise Exception('Ventana de escritorio remoto no encontrada después de varios intentos')
@@ -1105,18 +1455,18 @@ class RPAWithStateMachine:
                     raise Exception(f'Error crítico en conexión RDP después de {max_retries} intentos: {str(e)}')
                 else:
                     rpa_logger.warning(f'Error en conexión RDP (intento {attempt + 1}): {str(e)}. Reintentando...')
-                    time.sleep(retry_delay)
+                    watchdog_sleep(retry_delay)
         
         return None
 
     def open_remote_desktop(self):
         rpa_logger.log_action("Abriendo aplicación de escritorio remoto", "Búsqueda en menú de Windows")
         pyautogui.hotkey('win')
-        time.sleep(1)
+        watchdog_sleep(1)
         pyautogui.typewrite('remote', interval=0.2)
-        time.sleep(1)
+        watchdog_sleep(1)
         pyautogui.hotkey('enter', "enter", interval=1)
-        time.sleep(10)
+        watchdog_sleep(10)
         rpa_logger.log_action("Aplicación de escritorio remoto abierta", "Lista para conexión")
 
 
@@ -0,0 +1,655 @@
+"""
+Simulador del formulario de órdenes de venta de SAP Business One
+Permite ejecutar RPAWithStateMachine de punta a punta sin escritorio remoto ni
+SAP: un driver de entrada compatible con pyautogui, una fuente de pantalla que
+dibuja un formulario sintético con las imágenes de referencia existentes y un
+reloj virtual para medir órdenes por hora con latencias configurables
+"""
+
+import os
+import sys
+import time
+import types
+import logging
+import cv2
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, List, Dict, Callable
+from rpa.config_manager import config, get_navigation_tabs
+from rpa.vision.screen_source import ScreenSource, set_screen_source
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+REFERENCE_DIR = './rpa/vision/reference_images'
+SCREEN_SIZE = (1920, 1080)
+
+# Latencias por defecto de la aplicación simulada (segundos)
+DEFAULT_LATENCIES = {
+    'sap_startup': 20.0,     # doble clic en el icono hasta el escritorio de SAP
+    'menu': 0.5,             # apertura de menús
+    'form_open': 3.0,        # clic en Orden de Ventas hasta el formulario
+    'nit_lookup': 1.5,       # búsqueda del cliente después de Enter
+    'nit_lookup_warm': 0.3,  # búsqueda del mismo cliente de la orden anterior (en caché)
+    'item_lookup': 1.0,      # búsqueda del artículo al salir del código
+    'totals_update': 1.0,    # recálculo de totales al salir de la cantidad
+    'popup': 1.0,            # minipantalla de "Agregar y"
+    'save': 2.0,             # grabado de la orden
+}
+
+# Posición (x, y) de cada widget en las pantallas sintéticas
+LAYOUT = {
+    'remote_desktop': {
+        'sap_icon': (60, 60),
+    },
+    # El escritorio de SAP se detecta con sap_desktop.png a pantalla completa: no se dibuja encima
+    'sap_desktop': {},
+    'sales_order_form': {
+        'sap_modulos_menu_button': (10, 32),
+        'client_field': (60, 140),
+        'orden_compra': (1100, 140),
+        'fecha_entrega': (1100, 190),
+        'primer_articulo': (60, 300),
+        'scroll_to_bottom': (1880, 300),
+        'sap_totales_section': (1640, 840),
+        'agregar_y_button': (30, 1000),
+        'sap_agregar_docum_button': (300, 1000),
+        'cancel_order': (450, 996),
+    },
+}
+OVERLAYS = {
+    'modulos_menu': ('sap_modulos_menu', (10, 58)),
+    'ventas_menu': ('sap_ventas_order_menu', (312, 58)),
+    'popup': ('sap_popup_agregar_y', (30, 930)),
+}
+# Widgets dentro de los overlays (posición absoluta)
+OVERLAY_WIDGETS = {
+    'ventas_menu': {'sap_ventas_order_button': (330, 100)},
+    'popup': {'sap_popup_agregar_y_cerrar': (34, 970)},
+}
+
+FORM_BACKGROUND = (236, 236, 236)
+# El escritorio remoto se dibuja sintético: la captura real remote_desktop.png se
+# parece demasiado a sap_desktop.png y el RPA creería que SAP ya está abierto
+DESKTOP_BACKGROUND = (130, 90, 30)
+TASKBAR_COLOR = (40, 40, 40)
+TEXT_COLOR = (20, 20, 20)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class VirtualClock:
+    """
+    Reloj simulado: sleep() avanza el tiempo sin esperar
+
+    install() reemplaza time.time/time.sleep para que las esperas del RPA
+    (smart_sleep, watchdog_sleep, PAUSE de pyautogui) cuesten tiempo virtual.
+    """
+
+    def __init__(self, start: Optional[float] = None):
+        self._real_time = time.time
+        self._real_sleep = time.sleep
+        self.now = start if start is not None else self._real_time()
+        self.installed = False
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        if seconds and seconds > 0:
+            self.now += seconds
+
+    def install(self):
+        time.time = self.time
+        time.sleep = self.sleep
+        self.installed = True
+
+    def uninstall(self):
+        time.time = self._real_time
+        time.sleep = self._real_sleep
+        self.installed = False
+
+
+@dataclass
+class SimulatedOrder:
+    """Contenido del formulario al grabar una orden"""
+    nit: str = ''
+    orden_compra: str = ''
+    fecha_entrega: str = ''
+    fecha_documento: str = ''
+    items: List[Tuple[str, str]] = field(default_factory=list)
+
+
+class SimulatedSAP:
+    """
+    Modelo del escritorio remoto con SAP y el formulario de órdenes de venta
+
+    El foco del formulario sigue el mismo orden de tabulación que usa el RPA
+    (navigation.tabs_* en config.yaml). Las teclas que llegan mientras la
+    aplicación está ocupada se aplican igual, pero se cuentan en
+    stats['keys_while_busy'] como indicio de esperas demasiado cortas.
+    """
+
+    def __init__(self, clock: VirtualClock, latencies: Optional[Dict[str, float]] = None,
+                 start_screen: str = 'remote_desktop', output_dir: str = './simulation'):
+        self.clock = clock
+        self.latencies = dict(DEFAULT_LATENCIES)
+        self.latencies.update(config.get('simulator.latencies', {}) or {})
+        self.latencies.update(latencies or {})
+        self.output_dir = output_dir
+
+        self.screen = start_screen
+        self.overlays: List[str] = []
+        self.mouse = (SCREEN_SIZE[0] // 2, SCREEN_SIZE[1] // 2)
+        self.keys_down = set()
+        self.busy_until = 0.0
+        self.version = 0
+        self.saved_orders: List[SimulatedOrder] = []
+        self.stats = {'keystrokes': 0, 'clicks': 0, 'keys_while_busy': 0, 'orders_saved': 0}
+        self._pending: List[Tuple[float, Callable[[], None]]] = []
+        self.cached_customer: Optional[str] = None
+        self.layout: Dict[str, Dict[str, Tuple[int, int]]] = {}
+
+        # Orden de tabulación del formulario derivado de la configuración del RPA
+        self.fields = {0: 'nit'}
+        self.fields[get_navigation_tabs('after_nit')] = 'orden_compra'
+        fecha_index = get_navigation_tabs('after_nit') + get_navigation_tabs('after_order')
+        self.fields[fecha_index] = 'fecha_entrega'
+        self.fields[fecha_index + 1] = 'fecha_documento'
+        self.grid_start = fecha_index + get_navigation_tabs('after_date')
+        self.quantity_column = get_navigation_tabs('before_quantity')
+        self.row_width = self.quantity_column + get_navigation_tabs('after_quantity_next_item')
+
+        self.widgets = {name: load_widget(name) for name in self._widget_names()}
+        self.backgrounds = {'sap_desktop': load_widget('sap_desktop')}
+        self.regions = self._layout_regions()
+        self._reset_form()
+
+    # --- estado -----------------------------------------------------------
+
+    def _widget_names(self):
+        names = {name for layout in LAYOUT.values() for name in layout}
+        names.update(name for name, _ in OVERLAYS.values())
+        names.update(name for widgets in OVERLAY_WIDGETS.values() for name in widgets)
+        return names
+
+    def _locate(self, background: np.ndarray, name: str) -> Optional[Tuple[int, int]]:
+        """Posición del widget si ya aparece en la imagen de fondo (para no duplicarlo)"""
+        widget = self.widgets[name]
+        if widget.shape[0] > background.shape[0] or widget.shape[1] > background.shape[1]:
+            return None
+        result = cv2.matchTemplate(background, widget, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_loc if max_val >= 0.9 else None
+
+    def _layout_regions(self) -> Dict[str, Dict[str, Tuple[int, int, int, int]]]:
+        """
+        Regiones clicables por pantalla y overlay; un widget que ya está en la
+        imagen de fondo usa esa posición y no se vuelve a dibujar
+        """
+        self.layout = {screen: dict(layout) for screen, layout in LAYOUT.items()}
+        self.layout.update({overlay: dict(widgets) for overlay, widgets in OVERLAY_WIDGETS.items()})
+        regions = {}
+        for screen, layout in self.layout.items():
+            if screen in OVERLAYS:
+                image_name, (origin_x, origin_y) = OVERLAYS[screen]
+                background = self.widgets[image_name]
+            else:
+                background, origin_x, origin_y = self.backgrounds.get(screen), 0, 0
+            regions[screen] = {}
+            for name, (x, y) in list(layout.items()):
+                found = self._locate(background, name) if background is not None else None
+                if found is not None:
+                    x, y = origin_x + found[0], origin_y + found[1]
+                    del layout[name]
+                h, w = self.widgets[name].shape[:2]
+                regions[screen][name] = (x, y, w, h)
+        return regions
+
+    def _reset_form(self):
+        self.values: Dict[str, str] = {name: '' for name in self.fields.values()}
+        self.cliente = ''
+        self.grid: Dict[int, Dict[int, str]] = {}
+        self.total = 0.0
+        self.focus = 0
+        self.select_all = False
+        self.add_mode: Optional[str] = None
+
+    def _changed(self):
+        self.version += 1
+
+    def _busy(self, latency_name: str):
+        self.busy_until = max(self.busy_until, self.clock.time()) + self.latencies[latency_name]
+
+    def _after(self, latency_name: str, action: Callable[[], None]):
+        """Programa un cambio de pantalla después de la latencia indicada"""
+        self._pending.append((self.clock.time() + self.latencies[latency_name], action))
+        self._pending.sort(key=lambda entry: entry[0])
+
+    def advance(self):
+        """Aplica los cambios programados que ya vencieron en el reloj virtual"""
+        now = self.clock.time()
+        while self._pending and self._pending[0][0] <= now:
+            _, action = self._pending.pop(0)
+            action()
+            self._changed()
+
+    def _input(self):
+        self.advance()
+        if self.clock.time() < self.busy_until:
+            self.stats['keys_while_busy'] += 1
+
+    # --- formulario -------------------------------------------------------
+
+    def _grid_cell(self, index: int) -> Optional[Tuple[int, int]]:
+        if index < self.grid_start:
+            return None
+        offset = index - self.grid_start
+        return offset // self.row_width, offset % self.row_width
+
+    def _commit_field(self):
+        """Sale del campo con foco (Tab): búsquedas y recálculos de SAP"""
+        cell = self._grid_cell(self.focus)
+        if cell is None:
+            return
+        row, column = cell
+        values = self.grid.get(row, {})
+        if column == 0 and values.get(0):
+            values[1] = f"Artículo {values[0]}"
+            self._busy('item_lookup')
+        elif column == self.quantity_column:
+            self._busy('totals_update')
+            self.total = sum(_to_number(r.get(self.quantity_column, '')) for r in self.grid.values())
+
+    def type_text(self, text: str):
+        self._input()
+        if self.screen != 'sales_order_form' or self.overlays:
+            return
+        cell = self._grid_cell(self.focus)
+        if cell is None:
+            name = self.fields.get(self.focus)
+            if name is None:
+                return
+            self.values[name] = text if self.select_all else self.values[name] + text
+        else:
+            row, column = cell
+            current = self.grid.setdefault(row, {}).get(column, '')
+            self.grid[row][column] = text if self.select_all else current + text
+        self.select_all = False
+        self.stats['keystrokes'] += len(text)
+        self._changed()
+
+    def press(self, key: str):
+        self._input()
+        key = key.lower()
+        self.stats['keystrokes'] += 1
+
+        if 'alt' in self.keys_down and key == 'm' and self.screen in ('sap_desktop', 'sales_order_form'):
+            self._after('menu', lambda: self._set_overlays(['modulos_menu']))
+            return
+        if key == 'v' and self.overlays == ['modulos_menu']:
+            self._after('menu', lambda: self._set_overlays(['modulos_menu', 'ventas_menu']))
+            return
+        if key == 'escape':
+            self._set_overlays([])
+            return
+        if self.screen != 'sales_order_form' or self.overlays:
+            return
+
+        if key == 'tab':
+            self._commit_field()
+            self.focus += 1
+        elif key == 'enter' and self.fields.get(self.focus) == 'nit' and self.values['nit']:
+            self.cliente = f"Cliente {self.values['nit']}"
+            self._busy('nit_lookup_warm' if self.values['nit'] == self.cached_customer else 'nit_lookup')
+            self.cached_customer = self.values['nit']
+        elif key == 'down':
+            cell = self._grid_cell(self.focus)
+            if cell is not None:
+                self.focus += self.row_width
+        elif key == 'a' and 'ctrl' in self.keys_down:
+            self.select_all = True
+        self._changed()
+
+    def click(self, x: int, y: int, clicks: int = 1):
+        self._input()
+        self.mouse = (x, y)
+        self.stats['clicks'] += 1
+        widget = self.widget_at(x, y)
+
+        if self.screen == 'remote_desktop' and widget == 'sap_icon' and clicks >= 2:
+            self._after('sap_startup', self._sap_started)
+        elif widget == 'sap_ventas_order_button':
+            self._set_overlays([])
+            self._after('form_open', self._open_form)
+        elif self.screen == 'sales_order_form':
+            self._click_form(widget)
+        self._changed()
+
+    def _click_form(self, widget: Optional[str]):
+        focus_by_widget = {
+            'client_field': 0,
+            'orden_compra': [i for i, name in self.fields.items() if name == 'orden_compra'][0],
+            'fecha_entrega': [i for i, name in self.fields.items() if name == 'fecha_entrega'][0],
+            'primer_articulo': self.grid_start,
+        }
+        if widget in focus_by_widget and not self.overlays:
+            self.focus = focus_by_widget[widget]
+        elif widget == 'agregar_y_button' and not self.overlays:
+            if self.add_mode == 'cerrar':
+                self._busy('save')
+                self._after('save', self._save_order)
+            else:
+                self._after('popup', lambda: self._set_overlays(['popup']))
+        elif widget == 'sap_popup_agregar_y_cerrar':
+            self.add_mode = 'cerrar'
+            self._set_overlays([])
+        elif widget == 'cancel_order' and not self.overlays:
+            self._reset_form()
+            self.screen = 'sap_desktop'
+
+    def _set_overlays(self, overlays: List[str]):
+        self.overlays = overlays
+        self._changed()
+
+    def _sap_started(self):
+        self.cached_customer = None
+        self.screen = 'sap_desktop'
+
+    def _open_form(self):
+        self._reset_form()
+        self.screen = 'sales_order_form'
+
+    def _save_order(self):
+        items = []
+        for row in sorted(self.grid):
+            values = self.grid[row]
+            if values.get(0):
+                items.append((values[0], values.get(self.quantity_column, '')))
+        self.saved_orders.append(SimulatedOrder(
+            nit=self.values['nit'],
+            orden_compra=self.values['orden_compra'],
+            fecha_entrega=self.values['fecha_entrega'],
+            fecha_documento=self.values['fecha_documento'],
+            items=items,
+        ))
+        self.stats['orders_saved'] += 1
+        self._reset_form()
+        self.screen = 'sap_desktop'
+
+    def widget_at(self, x: int, y: int) -> Optional[str]:
+        """Widget visible bajo el punto (los overlays tienen prioridad)"""
+        layers = [overlay for overlay in reversed(self.overlays) if overlay in self.regions]
+        for layer in layers + [self.screen]:
+            for name, (wx, wy, w, h) in self.regions.get(layer, {}).items():
+                if wx <= x < wx + w and wy <= y < wy + h:
+                    return name
+        return None
+
+    # --- dibujo -----------------------------------------------------------
+
+    def render(self) -> np.ndarray:
+        """Dibuja la pantalla actual en BGR"""
+        self.advance()
+        width, height = SCREEN_SIZE
+        frame = np.full((height, width, 3), FORM_BACKGROUND, dtype=np.uint8)
+
+        image = self.backgrounds.get(self.screen)
+        if image is not None:
+            frame[:image.shape[0], :image.shape[1]] = image[:height, :width]
+        elif self.screen == 'remote_desktop':
+            frame[:] = DESKTOP_BACKGROUND
+            cv2.rectangle(frame, (0, height - 40), (width, height), TASKBAR_COLOR, -1)
+        else:
+            cv2.rectangle(frame, (0, 0), (width, 28), (120, 80, 40), -1)
+            cv2.putText(frame, "Orden de venta", (12, 20), FONT, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+
+        for name, (x, y) in self.layout.get(self.screen, {}).items():
+            paste(frame, self.widgets[name], x, y)
+
+        if self.screen == 'sales_order_form':
+            self._render_form(frame)
+
+        for overlay in self.overlays:
+            name, (x, y) = OVERLAYS[overlay]
+            paste(frame, self.widgets[name], x, y)
+            for widget, (wx, wy) in self.layout.get(overlay, {}).items():
+                paste(frame, self.widgets[widget], wx, wy)
+        return frame
+
+    def _render_form(self, frame: np.ndarray):
+        def put(text, x, y):
+            cv2.putText(frame, str(text), (x, y), FONT, 0.45, TEXT_COLOR, 1, cv2.LINE_AA)
+
+        for name, widget in (('nit', 'client_field'), ('orden_compra', 'orden_compra'),
+                             ('fecha_entrega', 'fecha_entrega')):
+            x, y, w, h = self.regions['sales_order_form'][widget]
+            put(self.values[name], x + w + 10, y + h)
+        x, y, w, h = self.regions['sales_order_form']['client_field']
+        put(self.cliente, x + w + 200, y + h)
+        x, y, w, h = self.regions['sales_order_form']['fecha_entrega']
+        put(self.values['fecha_documento'], x + w + 10, y + h + 30)
+
+        # Grilla: las filas se dibujan debajo del template para no alterar su detección
+        x, y, w, h = self.regions['sales_order_form']['primer_articulo']
+        row_height = max(h // 2, 18)
+        for row, values in sorted(self.grid.items()):
+            row_y = y + h + row * row_height + row_height - 5
+            put(values.get(0, ''), x + 4, row_y)
+            put(values.get(1, ''), x + w + 10, row_y)
+            put(values.get(self.quantity_column, ''), x + w + 400, row_y)
+
+        x, y, w, h = self.regions['sales_order_form']['sap_totales_section']
+        put(f"{self.total:,.2f}", x + 10, y + h + 20)
+
+
+def load_widget(name: str) -> np.ndarray:
+    """Imagen de referencia en BGR (el canal alfa se compone sobre el fondo del formulario)"""
+    image = cv2.imread(os.path.join(REFERENCE_DIR, f'{name}.png'), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise FileNotFoundError(f"Imagen de referencia no encontrada: {name}.png")
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[2] == 4:
+        alpha = image[:, :, 3:4].astype(np.float32) / 255.0
+        background = np.full(image.shape[:2] + (3,), FORM_BACKGROUND, dtype=np.float32)
+        return (image[:, :, :3] * alpha + background * (1 - alpha)).astype(np.uint8)
+    return image
+
+
+def paste(frame: np.ndarray, image: np.ndarray, x: int, y: int):
+    h = min(image.shape[0], frame.shape[0] - y)
+    w = min(image.shape[1], frame.shape[1] - x)
+    if h > 0 and w > 0:
+        frame[y:y + h, x:x + w] = image[:h, :w]
+
+
+def _to_number(value: str) -> float:
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        return 0.0
+
+
+class SimulatedScreenSource(ScreenSource):
+    """Fuente de pantalla que dibuja el estado del simulador"""
+
+    name = 'simulated'
+
+    def __init__(self, sap: SimulatedSAP):
+        self.sap = sap
+        self._frame: Optional[np.ndarray] = None
+        self._version = -1
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None) -> Optional[np.ndarray]:
+        self.sap.advance()
+        if self._frame is None or self._version != self.sap.version:
+            self._frame = self.sap.render()
+            self._version = self.sap.version
+        if region:
+            x, y, w, h = region
+            return self._frame[y:y + h, x:x + w].copy()
+        return self._frame.copy()
+
+
+class SimulatedScreenshot:
+    """Resultado de screenshot(): se guarda en el directorio del simulador"""
+
+    def __init__(self, frame: np.ndarray, output_dir: str):
+        self.frame = frame
+        self.output_dir = output_dir
+
+    def __bool__(self):
+        return True
+
+    def __array__(self, dtype=None):
+        rgb = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
+        return rgb.astype(dtype) if dtype else rgb
+
+    def save(self, path: str):
+        # Nunca se escriben las imágenes de referencia ni carpetas de producción
+        os.makedirs(self.output_dir, exist_ok=True)
+        cv2.imwrite(os.path.join(self.output_dir, os.path.basename(path)), self.frame)
+
+
+class SimulatedWindow:
+    """Ventana del escritorio remoto (siempre disponible)"""
+
+    def __init__(self, title: str):
+        self.title = title
+        self.isActive = True
+
+    def activate(self):
+        self.isActive = True
+
+
+class SimulatedInputDriver:
+    """Subconjunto de la API de pyautogui usado por el RPA, dirigido al simulador"""
+
+    FAILSAFE = False
+    PAUSE = 0.5
+
+    def __init__(self, sap: SimulatedSAP, screen: SimulatedScreenSource):
+        self.sap = sap
+        self.screen = screen
+
+    def _pause(self):
+        time.sleep(self.PAUSE)
+
+    def _point(self, x=None, y=None) -> Tuple[int, int]:
+        if isinstance(x, (tuple, list)):
+            return int(x[0]), int(x[1])
+        if x is None or y is None:
+            return self.sap.mouse
+        return int(x), int(y)
+
+    def size(self):
+        return SCREEN_SIZE
+
+    def position(self):
+        return self.sap.mouse
+
+    def moveTo(self, x=None, y=None, duration=0.0, **kwargs):
+        self.sap.mouse = self._point(x, y)
+        time.sleep(duration)
+        self._pause()
+
+    def click(self, x=None, y=None, clicks=1, interval=0.0, **kwargs):
+        point = self._point(x, y)
+        self.sap.click(point[0], point[1], clicks)
+        self._pause()
+
+    def doubleClick(self, x=None, y=None, **kwargs):
+        point = self._point(x, y)
+        self.sap.click(point[0], point[1], clicks=2)
+        self._pause()
+
+    def drag(self, x_offset=0, y_offset=0, duration=0.0, **kwargs):
+        self.sap.mouse = (self.sap.mouse[0] + x_offset, self.sap.mouse[1] + y_offset)
+        time.sleep(duration)
+        self._pause()
+
+    def scroll(self, clicks, x=None, y=None, **kwargs):
+        # La grilla simulada muestra todas las filas: desplazarla no cambia la imagen
+        self.sap.mouse = self._point(x, y)
+        self._pause()
+
+    def keyDown(self, key):
+        self.sap.keys_down.add(key.lower())
+        self._pause()
+
+    def keyUp(self, key):
+        self.sap.keys_down.discard(key.lower())
+        self._pause()
+
+    def press(self, keys, presses=1, interval=0.0, **kwargs):
+        keys = [keys] if isinstance(keys, str) else keys
+        for _ in range(presses):
+            for key in keys:
+                self.sap.press(key)
+                time.sleep(interval)
+        self._pause()
+
+    def hotkey(self, *keys, interval=0.0, **kwargs):
+        modifiers = [key for key in keys if key.lower() in ('ctrl', 'alt', 'shift', 'win')]
+        for modifier in modifiers:
+            self.sap.keys_down.add(modifier.lower())
+        for key in keys:
+            if key.lower() not in modifiers:
+                self.sap.press(key)
+                time.sleep(interval)
+        for modifier in modifiers:
+            self.sap.keys_down.discard(modifier.lower())
+        self._pause()
+
+    def typewrite(self, message, interval=0.0, **kwargs):
+        if isinstance(message, (list, tuple)):
+            for key in message:
+                self.sap.press(key)
+        else:
+            self.sap.type_text(str(message))
+            time.sleep(interval * len(str(message)))
+        self._pause()
+
+    write = typewrite
+
+    def screenshot(self, image_filename=None, region=None):
+        shot = SimulatedScreenshot(self.screen.grab(region), self.sap.output_dir)
+        if image_filename:
+            shot.save(image_filename)
+        return shot
+
+    def getWindowsWithTitle(self, title):
+        return [SimulatedWindow(title)]
+
+    def as_module(self) -> types.ModuleType:
+        """Módulo con la misma forma que pyautogui"""
+        module = types.ModuleType('pyautogui')
+        for name in dir(self):
+            if not name.startswith('_') and name not in ('sap', 'screen', 'as_module'):
+                setattr(module, name, getattr(self, name))
+        return module
+
+
+def install_simulator(sap: SimulatedSAP) -> SimulatedInputDriver:
+    """
+    Dirige el RPA al simulador: pyautogui, fuente de pantalla y reloj virtual
+
+    Debe llamarse antes de importar los módulos del RPA; los módulos ya
+    importados que referencian pyautogui también se redirigen.
+    """
+    screen = SimulatedScreenSource(sap)
+    driver = SimulatedInputDriver(sap, screen)
+    module = driver.as_module()
+    sys.modules['pyautogui'] = module
+    for loaded in list(sys.modules.values()):
+        if loaded is not None and getattr(loaded, 'pyautogui', None) is not None and loaded is not module:
+            setattr(loaded, 'pyautogui', module)
+    set_screen_source(screen)
+    if not sap.clock.installed:
+        sap.clock.install()
+
+    # El watchdog mide plazos con esperas reales; no aplica con reloj virtual
+    from rpa.watchdog import state_watchdog
+    state_watchdog.enabled = False
+    logger.info(f"Simulador de SAP instalado (pantalla inicial: {sap.screen})")
+    return driver
@@ -3,15 +3,17 @@ Sistema de Detección de Estado de Pantalla - RPA TAMAPRINT
 Fase 1: Detección básica de las 3 pantallas principales
 """
 
-import cv2
 import numpy as np
-import pyautogui
 import logging
 import time
 from enum import Enum
-from typing import Tuple, Optional, Dict, Any
+from typing import Optional, Dict, Any
 from dataclasses import dataclass
-from rpa.vision.template_matcher import template_matcher
+from rpa.vision.template_matcher import template_matcher, load_template
+from rpa.vision.change_detector import change_detector
+from rpa.vision.screen_source import grab_screen
+from rpa.vision.frame_buffer import debug_frames
+from rpa.vision.thresholds import get_threshold
 from rpa.simple_logger import rpa_logger
 
 
@@ -38,15 +40,16 @@ class ScreenDetector:
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self.last_debug_dump: Optional[str] = None
         
         # Cargar imágenes de referencia para detección
         self._load_reference_images()
         
-        # Configurar umbrales de confianza
+        # Configurar umbrales de confianza (calibrados en thresholds.json si existen)
         self.confidence_thresholds = {
-            ScreenState.REMOTE_DESKTOP: 0.85,
-            ScreenState.SAP_DESKTOP: 0.80,
-            ScreenState.SALES_ORDER_FORM: 0.85,
+            ScreenState.REMOTE_DESKTOP: get_threshold('remote_desktop', 0.85, 'screen_states'),
+            ScreenState.SAP_DESKTOP: get_threshold('sap_desktop', 0.80, 'screen_states'),
+            ScreenState.SALES_ORDER_FORM: get_threshold('sales_order_form', 0.85, 'screen_states'),
         }
         
         # Elementos clave para cada pantalla
@@ -69,50 +72,47 @@ class ScreenDetector:
         }
     
     def _load_reference_images(self):
-        """Carga las imágenes de referencia para detección"""
+        """
+        Carga las imágenes de referencia para detección
+        
+        load_template normaliza a BGR y registra la máscara alfa de los PNG
+        con transparencia, por lo que el matching no convierte canales por llamada.
+        """
         try:
             # Remote Desktop
-            self.remote_desktop_image = cv2.imread(
-                './rpa/vision/reference_images/remote_desktop.png', 
-                cv2.IMREAD_UNCHANGED
-            )
+            self.remote_desktop_image = load_template('./rpa/vision/reference_images/remote_desktop.png')
             
             # SAP Desktop
-            self.sap_desktop_image = cv2.imread(
-                './rpa/vision/reference_images/sap_desktop.png', 
-                cv2.IMREAD_UNCHANGED
-            )
-            self.sap_icon_image = cv2.imread(
-                './rpa/vision/reference_images/sap_icon.png', 
-                cv2.IMREAD_COLOR
-            )
-            self.sap_modulos_menu_button = cv2.imread(
-                './rpa/vision/reference_images/sap_modulos_menu_button.png', 
-                cv2.IMREAD_COLOR
-            )
+            self.sap_desktop_image = load_template('./rpa/vision/reference_images/sap_desktop.png')
+            self.sap_icon_image = load_template('./rpa/vision/reference_images/sap_icon.png')
+            self.sap_modulos_menu_button = load_template('./rpa/vision/reference_images/sap_modulos_menu_button.png')
             # Nueva imagen de referencia para la interfaz principal de SAP
-            self.sap_main_interface_image = cv2.imread(
-                './rpa/vision/reference_images/sap_main_interface.png', 
-                cv2.IMREAD_COLOR
-            )
+            self.sap_main_interface_image = load_template('./rpa/vision/reference_images/sap_main_interface.png')
             
             # Sales Order Form
-            self.sales_order_template = cv2.imread(
-                './rpa/vision/reference_images/sap_orden_de_ventas_template.png', 
-                cv2.IMREAD_UNCHANGED
-            )
-            self.client_field_image = cv2.imread(
-                './rpa/vision/reference_images/client_field.png', 
-                cv2.IMREAD_COLOR
-            )
-            self.orden_compra_image = cv2.imread(
-                './rpa/vision/reference_images/orden_compra.png', 
-                cv2.IMREAD_COLOR
-            )
-            self.fecha_entrega_image = cv2.imread(
-                './rpa/vision/reference_images/fecha_entrega.png', 
-                cv2.IMREAD_COLOR
-            )
+            self.sales_order_template = load_template('./rpa/vision/reference_images/sap_orden_de_ventas_template.png')
+            self.client_field_image = load_template('./rpa/vision/reference_images/client_field.png')
+            self.orden_compra_image = load_template('./rpa/vision/reference_images/orden_compra.png')
+            self.fecha_entrega_image = load_template('./rpa/vision/reference_images/fecha_entrega.png')
+            
+            # Templates que identifican cada pantalla (se buscan en lote)
+            self.state_templates = {
+                ScreenState.REMOTE_DESKTOP: {
+                    'remote_desktop': self.remote_desktop_image,
+                },
+                ScreenState.SAP_DESKTOP: {
+                    'sap_icon': self.sap_icon_image,
+                    'sap_modulos_menu_button': self.sap_modulos_menu_button,
+                    'sap_main_interface': self.sap_main_interface_image,
+                    'sap_desktop': self.sap_desktop_image,
+                },
+                ScreenState.SALES_ORDER_FORM: {
+                    'sap_orden_de_ventas_template': self.sales_order_template,
+                    'client_field': self.client_field_image,
+                    'orden_compra': self.orden_compra_image,
+                    'fecha_entrega': self.fecha_entrega_image,
+                },
+            }
             
             self.logger.info("Imágenes de referencia cargadas correctamente")
             
@@ -140,26 +140,18 @@ class ScreenDetector:
                     details={"error": "No se pudo tomar screenshot"}
                 )
             
-            # Detectar cada estado
-            results = {}
-            
-            # Remote Desktop
-            remote_desktop_conf = self._detect_remote_desktop(screenshot)
-            results[ScreenState.REMOTE_DESKTOP] = remote_desktop_conf
-            
-            # SAP Desktop
-            sap_desktop_conf = self._detect_sap_desktop(screenshot)
-            results[ScreenState.SAP_DESKTOP] = sap_desktop_conf
-            
-            # Sales Order Form
-            sales_order_conf = self._detect_sales_order_form(screenshot)
-            results[ScreenState.SALES_ORDER_FORM] = sales_order_conf
+            # Detectar cada estado (se reutiliza el resultado si la pantalla no cambió)
+            results = change_detector.cached_call(
+                'detect_current_screen',
+                screenshot,
+                lambda: self._compute_confidences(screenshot)
+            )
             
             # Determinar estado con mayor confianza
             best_state = max(results.items(), key=lambda x: x[1])
             
             # Verificar si la confianza es suficiente
-            if best_state[1] >= self.confidence_thresholds.get(best_state[0], 0.8):
+            if best_state[1] > self.confidence_thresholds.get(best_state[0], 0.8):
                 detected_state = best_state[0]
                 confidence = best_state[1]
             else:
@@ -174,7 +166,7 @@ class ScreenDetector:
                     "all_confidences": results,
                     "threshold_met": detected_state != ScreenState.UNKNOWN
                 },
-                screenshot_path=f"./debug_screenshots/detection_{detected_state.value}.png" if save_screenshot else None
+                screenshot_path=self.last_debug_dump if save_screenshot else None
             )
             
             self.logger.info(f"Estado detectado: {detected_state.value} (confianza: {confidence:.3f})")
@@ -193,16 +185,44 @@ class ScreenDetector:
                 details={"error": str(e)}
             )
     
+    def _compute_confidences(self, screenshot: np.ndarray) -> Dict[ScreenState, float]:
+        """
+        Calcula la confianza de cada pantalla conocida sobre una captura
+        
+        Todos los templates se buscan en un solo lote paralelo y la confianza de
+        cada pantalla es el promedio de sus templates.
+        """
+        templates = {
+            name: image
+            for state_templates in self.state_templates.values()
+            for name, image in state_templates.items()
+            if image is not None
+        }
+        scores = template_matcher.match_batch(
+            templates, screenshot, confidence=0.0
+        ).confidences()
+        
+        return {
+            state: self._average_confidence(state_templates, scores)
+            for state, state_templates in self.state_templates.items()
+        }
+    
+    def _average_confidence(self, state_templates: Dict[str, np.ndarray], scores: Dict[str, float]) -> float:
+        """Promedia la confianza de los templates cargados de una pantalla"""
+        matches = [scores[name] for name, image in state_templates.items()
+                   if image is not None and name in scores]
+        if matches:
+            return sum(matches) / len(matches)
+        return 0.0
+    
     def _take_screenshot(self, save: bool = False) -> Optional[np.ndarray]:
         """Toma un screenshot de la pantalla actual"""
         try:
-            screenshot = pyautogui.screenshot()
-            screenshot_np = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            screenshot_np = grab_screen()
             
             if save:
-                import os
-                os.makedirs("./debug_screenshots", exist_ok=True)
-                cv2.imwrite(f"./debug_screenshots/screenshot_{int(time.time())}.png", screenshot_np)
+                # Se vuelca el buffer de capturas recientes en segundo plano
+                self.last_debug_dump = debug_frames.dump_async("screen_detection")
             
             return screenshot_np
             
@@ -210,109 +230,28 @@ class ScreenDetector:
             self.logger.error(f"Error tomando screenshot: {e}")
             return None
     
-    def _detect_remote_desktop(self, screenshot: np.ndarray) -> float:
-        """Detecta si estamos en la pantalla de Remote Desktop"""
+    def _detect_state(self, state: ScreenState, screenshot: np.ndarray) -> float:
+        """Calcula la confianza de una sola pantalla"""
         try:
-            # Detectar elementos clave de Remote Desktop
-            matches = []
-            
-            # Buscar imagen de referencia de Remote Desktop
-            if self.remote_desktop_image is not None:
-                result = cv2.matchTemplate(screenshot, self.remote_desktop_image, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                matches.append(max_val)
-            
-            # Buscar elementos específicos de Remote Desktop
-            # (Aquí se pueden añadir más elementos específicos)
-            
-            # Calcular confianza promedio
-            if matches:
-                return sum(matches) / len(matches)
-            else:
-                return 0.0
-                
+            state_templates = self.state_templates[state]
+            templates = {name: image for name, image in state_templates.items() if image is not None}
+            scores = template_matcher.match_batch(templates, screenshot, confidence=0.0).confidences()
+            return self._average_confidence(state_templates, scores)
         except Exception as e:
-            self.logger.error(f"Error detectando Remote Desktop: {e}")
+            self.logger.error(f"Error detectando {state.value}: {e}")
             return 0.0
     
+    def _detect_remote_desktop(self, screenshot: np.ndarray) -> float:
+        """Detecta si estamos en la pantalla de Remote Desktop"""
+        return self._detect_state(ScreenState.REMOTE_DESKTOP, screenshot)
+    
     def _detect_sap_desktop(self, screenshot: np.ndarray) -> float:
         """Detecta si estamos en la pantalla de SAP Desktop"""
-        try:
-            matches = []
-            
-            # Buscar icono de SAP
-            if self.sap_icon_image is not None:
-                result = cv2.matchTemplate(screenshot, self.sap_icon_image, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                matches.append(max_val)
-            
-            # Buscar botón de módulos
-            if self.sap_modulos_menu_button is not None:
-                result = cv2.matchTemplate(screenshot, self.sap_modulos_menu_button, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                matches.append(max_val)
-            
-            # Buscar interfaz principal de SAP (nueva imagen de referencia)
-            if self.sap_main_interface_image is not None:
-                result = cv2.matchTemplate(screenshot, self.sap_main_interface_image, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                matches.append(max_val)
-                self.logger.debug(f"Confianza interfaz principal SAP: {max_val:.3f}")
-            
-            # Buscar layout de SAP Desktop
-            if self.sap_desktop_image is not None:
-                result = cv2.matchTemplate(screenshot, self.sap_desktop_image, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                matches.append(max_val)
-            
-            # Calcular confianza promedio
-            if matches:
-                return sum(matches) / len(matches)
-            else:
-                return 0.0
-                
-        except Exception as e:
-            self.logger.error(f"Error detectando SAP Desktop: {e}")
-            return 0.0
+        return self._detect_state(ScreenState.SAP_DESKTOP, screenshot)
     
     def _detect_sales_order_form(self, screenshot: np.ndarray) -> float:
         """Detecta si estamos en el formulario de órdenes de venta"""
-        try:
-            matches = []
-            
-            # Buscar template de formulario de órdenes
-            if self.sales_order_template is not None:
-                result = cv2.matchTemplate(screenshot, self.sales_order_template, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                matches.append(max_val)
-            
-            # Buscar campo de cliente
-            if self.client_field_image is not None:
-                result = cv2.matchTemplate(screenshot, self.client_field_image, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                matches.append(max_val)
-            
-            # Buscar campo de orden de compra
-            if self.orden_compra_image is not None:
-                result = cv2.matchTemplate(screenshot, self.orden_compra_image, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                matches.append(max_val)
-            
-            # Buscar campo de fecha de entrega
-            if self.fecha_entrega_image is not None:
-                result = cv2.matchTemplate(screenshot, self.fecha_entrega_image, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                matches.append(max_val)
-            
-            # Calcular confianza promedio
-            if matches:
-                return sum(matches) / len(matches)
-            else:
-                return 0.0
-                
-        except Exception as e:
-            self.logger.error(f"Error detectando formulario de órdenes: {e}")
-            return 0.0
+        return self._detect_state(ScreenState.SALES_ORDER_FORM, screenshot)
     
     def verify_screen_state(self, state: ScreenState, max_attempts: int = 3) -> bool:
         """
@@ -328,14 +267,13 @@ class ScreenDetector:
         for attempt in range(max_attempts):
             result = self.detect_current_screen()
             
-            if result.state == state and result.confidence >= self.confidence_thresholds.get(state, 0.8):
+            if result.state == state and result.confidence > self.confidence_thresholds.get(state, 0.8):
                 self.logger.info(f"Estado {state.value} confirmado en intento {attempt + 1}")
                 return True
             
             self.logger.warning(f"Intento {attempt + 1}: Estado esperado {state.value}, detectado {result.state.value}")
             
             if attempt < max_attempts - 1:
-                import time
                 time.sleep(1)  # Esperar antes del siguiente intento
         
         self.logger.error(f"No se pudo confirmar estado {state.value} después de {max_attempts} intentos")
@@ -5,18 +5,41 @@ Reemplaza el sistema complejo anterior con una versión ligera y eficiente
 
 import logging
 import os
+import socket
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
 
 
+class WorkerFilter(logging.Filter):
+    """Agrega el identificador del robot a cada registro (%(worker)s)"""
+    
+    def __init__(self, worker_id):
+        super().__init__()
+        self.worker_id = worker_id
+    
+    def filter(self, record):
+        record.worker = self.worker_id
+        return True
+
+
 class SimpleRPALogger:
     """Logger simplificado para RPA con funcionalidades esenciales"""
     
     def __init__(self, name="RPA", log_dir="logs"):
         self.name = name
         self.log_dir = log_dir
+        # Identificador del robot: varias instancias pueden drenar la misma cola
+        self.worker_filter = WorkerFilter(os.environ.get('RPA_WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}")
         self.setup_logger()
     
+    @property
+    def worker_id(self):
+        return self.worker_filter.worker_id
+    
+    def set_worker_id(self, worker_id):
+        """Cambia el identificador del robot que aparece en los logs"""
+        self.worker_filter.worker_id = worker_id
+    
     def setup_logger(self):
         """Configura el logger con handlers básicos pero eficientes"""
         # Crear directorio de logs si no existe
@@ -29,6 +52,8 @@ class SimpleRPALogger:
         
         # Evitar duplicación de handlers
         if self.logger.handlers:
+            for handler in self.logger.handlers:
+                handler.addFilter(self.worker_filter)
             return
         
         # Handler principal con rotación
@@ -55,7 +80,7 @@ class SimpleRPALogger:
         
         # Formateador simple y claro
         formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
+            '%(asctime)s - %(levelname)s - [%(worker)s] - %(funcName)s:%(lineno)d - %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         
@@ -65,6 +90,8 @@ class SimpleRPALogger:
         console_handler.setFormatter(formatter)
         
         # Agregar handlers
+        for handler in (main_handler, error_handler, console_handler):
+            handler.addFilter(self.worker_filter)
         self.logger.addHandler(main_handler)
         self.logger.addHandler(error_handler)
         self.logger.addHandler(console_handler)
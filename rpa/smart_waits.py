@@ -8,6 +8,7 @@ import pyautogui
 from typing import Callable, Optional, Any, Tuple
 from rpa.config_manager import get_delay
 from rpa.simple_logger import rpa_logger
+from rpa.watchdog import watchdog_sleep, watchdog_check
 
 
 class SmartWaits:
@@ -43,6 +44,7 @@ class SmartWaits:
         rpa_logger.info(f"Esperando {description} (timeout: {timeout}s)")
         
         while time.time() - start_time < timeout:
+            watchdog_check()
             try:
                 if check_function():
                     elapsed = time.time() - start_time
@@ -52,7 +54,7 @@ class SmartWaits:
                 rpa_logger.warning(f"Error verificando {description}: {str(e)}")
             
             checks_made += 1
-            time.sleep(check_interval)
+            watchdog_sleep(check_interval)
         
         rpa_logger.warning(f"Timeout esperando {description} después de {timeout}s ({checks_made} verificaciones)")
         return False
@@ -79,23 +81,51 @@ class SmartWaits:
         if timeout is None:
             timeout = get_delay('long') or 3.0
         
-        def check_template():
-            return template_matcher.find_template(template_image, confidence=confidence)
-        
         rpa_logger.info(f"Esperando template: {description}")
         
+        # El matcher solo repite el matching cuando la pantalla cambia
         start_time = time.time()
-        while time.time() - start_time < timeout:
-            coordinates = check_template()
-            if coordinates:
-                elapsed = time.time() - start_time
-                rpa_logger.info(f"Template {description} encontrado en {elapsed:.2f}s en {coordinates}")
-                return coordinates
-            time.sleep(0.1)
+        coordinates = template_matcher.find_template_with_timeout(
+            template_image,
+            timeout=timeout,
+            confidence=confidence
+        )
+        if coordinates:
+            elapsed = time.time() - start_time
+            rpa_logger.info(f"Template {description} encontrado en {elapsed:.2f}s en {coordinates}")
+            return coordinates
         
         rpa_logger.warning(f"Timeout esperando template {description} después de {timeout}s")
         return None
     
+    def wait_for_change(self,
+                        region: Optional[Tuple[int, int, int, int]] = None,
+                        timeout: float = None,
+                        description: str = "cambio en pantalla") -> bool:
+        """
+        Espera hasta que cambien los píxeles de una región de la pantalla
+        
+        Args:
+            region: Región a vigilar (x, y, width, height); None para toda la pantalla
+            timeout: Tiempo máximo de espera
+            description: Descripción para logging
+        
+        Returns:
+            True si la región cambió, False si timeout
+        """
+        from rpa.vision.template_matcher import template_matcher
+        
+        if timeout is None:
+            timeout = get_delay('long') or 3.0
+        
+        start_time = time.time()
+        changed = template_matcher.wait_for_change(region, timeout)
+        if changed:
+            rpa_logger.info(f"{description} detectado en {time.time() - start_time:.2f}s")
+        else:
+            rpa_logger.warning(f"Timeout esperando {description} después de {timeout}s")
+        return changed
+    
     def wait_for_window_active(self,
                               window_title: str,
                               timeout: float = None) -> bool:
@@ -155,32 +185,32 @@ class SmartWaits:
         adjusted_delay = max(0.1, min(adjusted_delay, 5.0))
         
         rpa_logger.debug(f"Espera adaptativa para {operation_type}: {adjusted_delay:.2f}s")
-        time.sleep(adjusted_delay)
+        watchdog_sleep(adjusted_delay)
         self.last_action_time = time.time()
     
     def wait_for_user_input_processed(self, delay_type: str = "after_input"):
         """Espera específica después de entrada de usuario"""
         delay = get_delay(delay_type) or 1.0
         rpa_logger.debug(f"Esperando procesamiento de entrada: {delay}s")
-        time.sleep(delay)
+        watchdog_sleep(delay)
     
     def wait_for_click_processed(self, delay_type: str = "after_click"):
         """Espera específica después de clic"""
         delay = get_delay(delay_type) or 1.0
         rpa_logger.debug(f"Esperando procesamiento de clic: {delay}s")
-        time.sleep(delay)
+        watchdog_sleep(delay)
     
     def wait_for_navigation(self, delay_type: str = "navigation_wait"):
         """Espera específica para navegación"""
         delay = get_delay(delay_type) or 2.0
         rpa_logger.debug(f"Esperando navegación: {delay}s")
-        time.sleep(delay)
+        watchdog_sleep(delay)
     
     def wait_for_system_startup(self, system_name: str = "SAP", delay_type: str = "sap_startup"):
         """Espera para startup de sistemas pesados"""
         delay = get_delay(delay_type) or 30.0
         rpa_logger.info(f"Esperando startup de {system_name}: {delay}s")
-        time.sleep(delay)
+        watchdog_sleep(delay)
     
     def smart_tab_wait(self, tabs_count: int, operation_context: str = ""):
         """
@@ -201,7 +231,7 @@ class SmartWaits:
             total_delay *= 1.1  # Items pueden requerir procesamiento adicional
         
         rpa_logger.debug(f"Espera inteligente después de {tabs_count} tabs ({operation_context}): {total_delay:.2f}s")
-        time.sleep(total_delay)
+        watchdog_sleep(total_delay)
     
     def conditional_wait(self,
                         condition_function: Callable[[], bool],
@@ -225,12 +255,12 @@ class SmartWaits:
         if self.wait_for_element(condition_function, timeout, 0.1, description):
             if success_delay > 0:
                 rpa_logger.debug(f"Condición cumplida, esperando {success_delay}s adicionales")
-                time.sleep(success_delay)
+                watchdog_sleep(success_delay)
             return True
         else:
             if failure_delay > 0:
                 rpa_logger.debug(f"Condición no cumplida, esperando {failure_delay}s para recuperación")
-                time.sleep(failure_delay)
+                watchdog_sleep(failure_delay)
             return False
 
 
@@ -246,6 +276,10 @@ def wait_for_template(template_image, confidence=0.8, timeout=None, description=
     """Función de conveniencia para esperar templates"""
     return smart_waits.wait_for_template(template_image, confidence, timeout, description)
 
+def wait_for_change(region=None, timeout=None, description="cambio en pantalla"):
+    """Función de conveniencia para esperar cambios en una región"""
+    return smart_waits.wait_for_change(region, timeout, description)
+
 def adaptive_wait(operation_type, base_delay=None):
     """Función de conveniencia para esperas adaptativas"""
     smart_waits.adaptive_wait(operation_type, base_delay)
@@ -253,4 +287,4 @@ def adaptive_wait(operation_type, base_delay=None):
 def smart_sleep(delay_type):
     """Reemplazo inteligente para time.sleep() con configuración"""
     delay = get_delay(delay_type) or 1.0
-    time.sleep(delay)
\ No newline at end of file
+    watchdog_sleep(delay)
\ No newline at end of file
@@ -1,10 +1,12 @@
 from enum import Enum
-from typing import Dict, Optional, Callable, Any
+from typing import Dict, Optional, Callable, Any, Tuple, List
+from collections import deque
 import time
-import json
 import os
 from dataclasses import dataclass
 from .simple_logger import rpa_logger
+from .watchdog import StateTimeoutError
+from .checkpoint_store import checkpoint_store
 
 
 class RPAState(Enum):
@@ -53,6 +55,7 @@ class RPAEvent(Enum):
     GOOGLE_DRIVE_FAILED = "google_drive_failed"
     PROCESS_COMPLETED = "process_completed"
     ERROR_OCCURRED = "error_occurred"
+    STATE_TIMEOUT = "state_timeout"
     RETRY = "retry"
     MAX_RETRIES_REACHED = "max_retries_reached"
     RESET = "reset"
@@ -71,12 +74,35 @@ class StateContext:
     processing_stats: Dict[str, Any] = None
     checkpoint_file: Optional[str] = None
     last_completed_state: Optional[RPAState] = None
+    last_confirmed_item: int = -1
+    form_reopened: bool = False  # El último paso por la navegación abrió un formulario nuevo
+    order: Optional[Any] = None  # Order interpretado una vez (rpa.order_model)
 
     def __post_init__(self):
         if self.processing_stats is None:
             self.processing_stats = {}
 
 
+class TransitionTableError(Exception):
+    """La tabla de transiciones tiene estados faltantes, inalcanzables o sin salida"""
+
+
+# Estados donde termina el procesamiento de un archivo
+TERMINAL_STATES = (RPAState.IDLE, RPAState.COMPLETED)
+
+
+@dataclass(frozen=True)
+class CompiledTransition:
+    """Transición resuelta al compilar la tabla: destino, callbacks y checkpoint"""
+    source: RPAState
+    event: RPAEvent
+    target: RPAState
+    on_exit: Optional[Callable] = None
+    on_enter: Optional[Callable] = None
+    checkpoint: Optional[str] = None        # 'save', 'cleanup' o None
+    records_progress: bool = False          # actualiza last_completed_state
+
+
 class StateMachine:
     """Máquina de estados para el proceso RPA"""
     
@@ -87,7 +113,11 @@ class StateMachine:
         self.transitions: Dict[RPAState, Dict[RPAEvent, RPAState]] = {}
         self.state_entry_callbacks: Dict[RPAState, Callable] = {}
         self.state_exit_callbacks: Dict[RPAState, Callable] = {}
+        self._table: Dict[Tuple[RPAState, RPAEvent], CompiledTransition] = {}
+        self._events_by_state: Dict[RPAState, List[RPAEvent]] = {}
         self._setup_transitions()
+        self.validate_transitions()
+        self.compile_transitions()
         
     def _setup_transitions(self):
         """Define las transiciones válidas entre estados"""
@@ -167,6 +197,121 @@ class StateMachine:
             },
         }
 
+        # Cualquier estado de trabajo puede vencer su plazo (watchdog)
+        for state, transitions in self.transitions.items():
+            if state not in (RPAState.IDLE, RPAState.ERROR, RPAState.RETRYING, RPAState.COMPLETED):
+                transitions[RPAEvent.STATE_TIMEOUT] = RPAState.ERROR
+
+    def validate_transitions(self, require_handlers: bool = False):
+        """
+        Verifica la tabla de transiciones antes de procesar archivos
+        
+        Falla si algún estado no tiene transiciones definidas, si un destino no
+        es un RPAState, si un estado no es alcanzable desde IDLE o si desde un
+        estado no se puede llegar a IDLE/COMPLETED.
+        
+        Args:
+            require_handlers: Exigir además un manejador registrado por estado
+            
+        Raises:
+            TransitionTableError: Con la lista de problemas encontrados
+        """
+        problems = []
+        for state in RPAState:
+            if not self.transitions.get(state):
+                problems.append(f"Sin transiciones definidas: {state.value}")
+            if require_handlers and state not in self.state_handlers:
+                problems.append(f"Sin manejador registrado: {state.value}")
+        for state, events in self.transitions.items():
+            for event, target in events.items():
+                if not isinstance(event, RPAEvent) or not isinstance(target, RPAState):
+                    problems.append(f"Transición inválida: {state.value} --{event}--> {target}")
+
+        reachable = self._reachable_from([RPAState.IDLE], reverse=False)
+        for state in RPAState:
+            if state not in reachable:
+                problems.append(f"Estado inalcanzable desde idle: {state.value}")
+        can_finish = self._reachable_from(list(TERMINAL_STATES), reverse=True)
+        for state in RPAState:
+            if state not in can_finish:
+                problems.append(f"Estado sin camino a idle/completed: {state.value}")
+
+        if problems:
+            raise TransitionTableError("Tabla de transiciones inválida: " + "; ".join(problems))
+
+    def _reachable_from(self, sources: List[RPAState], reverse: bool) -> set:
+        """Estados alcanzables desde `sources` (o que alcanzan a `sources` si reverse)"""
+        edges: Dict[RPAState, List[RPAState]] = {}
+        for state, events in self.transitions.items():
+            for target in events.values():
+                if not isinstance(target, RPAState):
+                    continue
+                source, destination = (target, state) if reverse else (state, target)
+                edges.setdefault(source, []).append(destination)
+
+        seen = set(sources)
+        queue = deque(sources)
+        while queue:
+            for neighbour in edges.get(queue.popleft(), []):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+        return seen
+
+    def compile_transitions(self):
+        """
+        Compila `transitions` y los callbacks en una tabla plana (estado, evento)
+        
+        Debe llamarse de nuevo si se modifica `transitions` directamente; los
+        register_*_callback recompilan solos.
+        """
+        table = {}
+        for state, events in self.transitions.items():
+            for event, target in events.items():
+                if target in (RPAState.ERROR, RPAState.IDLE):
+                    checkpoint = None
+                elif target == RPAState.COMPLETED:
+                    # Al completar el archivo ya no hay nada que reanudar
+                    checkpoint = 'cleanup'
+                else:
+                    checkpoint = 'save'
+                table[(state, event)] = CompiledTransition(
+                    source=state,
+                    event=event,
+                    target=target,
+                    on_exit=self.state_exit_callbacks.get(state),
+                    on_enter=self.state_entry_callbacks.get(target),
+                    checkpoint=checkpoint,
+                    records_progress=checkpoint is not None and target != RPAState.RETRYING,
+                )
+        self._table = table
+        self._events_by_state = {state: list(events) for state, events in self.transitions.items()}
+
+    def export_dot(self, path: Optional[str] = None) -> str:
+        """
+        Exporta la tabla de transiciones en formato Graphviz DOT
+        
+        Args:
+            path: Archivo opcional donde guardar el grafo
+            
+        Returns:
+            Texto DOT del grafo
+        """
+        lines = ['digraph rpa_state_machine {', '    rankdir=LR;']
+        for state in RPAState:
+            shape = 'doublecircle' if state in TERMINAL_STATES else 'box'
+            lines.append(f'    "{state.value}" [shape={shape}];')
+        for transition in self._table.values():
+            style = ' color=red' if transition.target == RPAState.ERROR else ''
+            lines.append(f'    "{transition.source.value}" -> "{transition.target.value}" '
+                         f'[label="{transition.event.value}"{style}];')
+        lines.append('}')
+        dot = '\n'.join(lines) + '\n'
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(dot)
+        return dot
+
     def register_state_handler(self, state: RPAState, handler: Callable):
         """Registra un manejador para un estado específico"""
         self.state_handlers[state] = handler
@@ -174,62 +319,61 @@ class StateMachine:
     def register_entry_callback(self, state: RPAState, callback: Callable):
         """Registra un callback que se ejecuta al entrar a un estado"""
         self.state_entry_callbacks[state] = callback
+        self.compile_transitions()
         
     def register_exit_callback(self, state: RPAState, callback: Callable):
         """Registra un callback que se ejecuta al salir de un estado"""
         self.state_exit_callbacks[state] = callback
+        self.compile_transitions()
 
     def trigger_event(self, event: RPAEvent, **kwargs) -> bool:
         """Dispara un evento y ejecuta la transición correspondiente"""
         try:
-            # Verificar si la transición es válida
-            if self.current_state not in self.transitions:
-                rpa_logger.log_error(
-                    f"No hay transiciones definidas para el estado: {self.current_state.value}",
-                    f"Evento: {event.value}"
-                )
+            transition = self._table.get((self.current_state, event))
+            if transition is None:
+                if self.current_state not in self._events_by_state:
+                    rpa_logger.log_error(
+                        f"No hay transiciones definidas para el estado: {self.current_state.value}",
+                        f"Evento: {event.value}"
+                    )
+                else:
+                    rpa_logger.log_error(
+                        f"Transición inválida: {event.value} desde estado {self.current_state.value}",
+                        "Transición no permitida"
+                    )
                 return False
-                
-            if event not in self.transitions[self.current_state]:
-                rpa_logger.log_error(
-                    f"Transición inválida: {event.value} desde estado {self.current_state.value}",
-                    "Transición no permitida"
-                )
-                return False
-
-            # Obtener el nuevo estado
-            new_state = self.transitions[self.current_state][event]
-            old_state = self.current_state
 
             # Ejecutar callback de salida del estado anterior
-            if old_state in self.state_exit_callbacks:
+            if transition.on_exit is not None:
                 try:
-                    self.state_exit_callbacks[old_state](self.context, **kwargs)
+                    transition.on_exit(self.context, **kwargs)
                 except Exception as e:
-                    rpa_logger.log_error(f"Error en callback de salida del estado {old_state.value}: {str(e)}")
+                    rpa_logger.log_error(f"Error en callback de salida del estado {transition.source.value}: {str(e)}")
 
             # Cambiar el estado
-            self.current_state = new_state
+            self.current_state = transition.target
             
             # Log de transición
             rpa_logger.log_action(
                 f"Transición de estado ejecutada",
-                f"De: {old_state.value} → A: {new_state.value} (Evento: {event.value})"
+                f"De: {transition.source.value} → A: {transition.target.value} (Evento: {event.value})"
             )
 
             # Ejecutar callback de entrada del nuevo estado
-            if new_state in self.state_entry_callbacks:
+            if transition.on_enter is not None:
                 try:
-                    self.state_entry_callbacks[new_state](self.context, **kwargs)
+                    transition.on_enter(self.context, **kwargs)
                 except Exception as e:
-                    rpa_logger.log_error(f"Error en callback de entrada del estado {new_state.value}: {str(e)}")
+                    rpa_logger.log_error(f"Error en callback de entrada del estado {transition.target.value}: {str(e)}")
 
             # Guardar checkpoint después de transiciones exitosas (excepto errores)
-            if new_state not in [RPAState.ERROR, RPAState.IDLE]:
+            if transition.checkpoint == 'save':
                 self.save_checkpoint()
-                # Actualizar último estado completado exitosamente
-                if new_state != RPAState.RETRYING:
-                    self.context.last_completed_state = new_state
+            elif transition.checkpoint == 'cleanup':
+                self.cleanup_checkpoint()
+            # Actualizar último estado completado exitosamente
+            if transition.records_progress:
+                self.context.last_completed_state = transition.target
 
             return True
             
@@ -239,9 +383,16 @@ class StateMachine:
 
     def execute_current_state(self, **kwargs) -> Optional[RPAEvent]:
         """Ejecuta la lógica del estado actual y retorna el próximo evento"""
-        if self.current_state in self.state_handlers:
+        handler = self.state_handlers.get(self.current_state)
+        if handler is not None:
             try:
-                return self.state_handlers[self.current_state](self.context, **kwargs)
+                return handler(self.context, **kwargs)
+            except StateTimeoutError as e:
+                rpa_logger.log_error(
+                    f"Estado {self.current_state.value} interrumpido por el watchdog: {str(e)}",
+                    f"Archivo: {self.context.current_file}"
+                )
+                return self.record_timeout(str(e))
             except Exception as e:
                 rpa_logger.log_error(
                     f"Error ejecutando estado {self.current_state.value}: {str(e)}",
@@ -256,6 +407,13 @@ class StateMachine:
             )
             return RPAEvent.ERROR_OCCURRED
 
+    def record_timeout(self, message: str) -> RPAEvent:
+        """Registra un timeout del estado actual y retorna el evento correspondiente"""
+        self.context.error_message = message
+        timeouts = self.context.processing_stats.setdefault('timeouts', [])
+        timeouts.append({'state': self.current_state.value, 'timestamp': time.time(), 'message': message})
+        return RPAEvent.STATE_TIMEOUT
+
     def get_current_state(self) -> RPAState:
         """Retorna el estado actual"""
         return self.current_state
@@ -272,14 +430,11 @@ class StateMachine:
 
     def can_transition_to(self, event: RPAEvent) -> bool:
         """Verifica si se puede ejecutar una transición desde el estado actual"""
-        return (self.current_state in self.transitions and 
-                event in self.transitions[self.current_state])
+        return (self.current_state, event) in self._table
 
     def get_available_events(self) -> list[RPAEvent]:
         """Retorna los eventos disponibles desde el estado actual"""
-        if self.current_state in self.transitions:
-            return list(self.transitions[self.current_state].keys())
-        return []
+        return list(self._events_by_state.get(self.current_state, []))
 
     def get_state_info(self) -> Dict[str, Any]:
         """Retorna información completa del estado actual"""
@@ -318,10 +473,13 @@ class StateMachine:
         """Inicia el procesamiento de un archivo"""
         self.context.current_file = file_name
         self.context.current_data = data
+        self.context.order = None
         self.context.retry_count = 0
         self.context.error_message = None
         self.context.start_time = time.time()
         self.context.processing_stats = {}
+        self.context.last_confirmed_item = -1
+        self.context.form_reopened = False
         
         rpa_logger.log_action(
             f"Iniciando procesamiento con máquina de estados",
@@ -342,7 +500,7 @@ class StateMachine:
         return self.trigger_event(RPAEvent.PROCESS_COMPLETED)
 
     def save_checkpoint(self):
-        """Guarda el estado actual en un archivo de checkpoint"""
+        """Guarda el estado actual en el journal de checkpoints"""
         if not self.context.current_file:
             return False
             
@@ -354,38 +512,34 @@ class StateMachine:
             'error_message': self.context.error_message,
             'last_successful_state': self.context.last_successful_state.value if self.context.last_successful_state else None,
             'timestamp': time.time(),
-            'processing_stats': self.context.processing_stats
+            'processing_stats': self.context.processing_stats,
+            'last_confirmed_item': self.context.last_confirmed_item
         }
         
         try:
-            checkpoint_file = f"checkpoint_{os.path.basename(self.context.current_file)}.json"
-            self.context.checkpoint_file = checkpoint_file
-            
-            with open(checkpoint_file, 'w') as f:
-                json.dump(checkpoint_data, f, indent=2)
-                
-            rpa_logger.log_action("Checkpoint guardado", f"Estado: {self.current_state.value}, Archivo: {checkpoint_file}")
+            checkpoint_key = os.path.basename(self.context.current_file)
+            self.context.checkpoint_file = checkpoint_key
+            checkpoint_store.put(checkpoint_key, checkpoint_data)
+            rpa_logger.log_action("Checkpoint guardado", f"Estado: {self.current_state.value}, Archivo: {checkpoint_key}")
             return True
             
         except Exception as e:
             rpa_logger.log_error(f"Error guardando checkpoint: {str(e)}")
             return False
 
+    def confirm_item(self, index: int):
+        """Registra el último item confirmado (índice base 0) y lo persiste en el checkpoint"""
+        self.context.last_confirmed_item = index
+        self.save_checkpoint()
+
     def try_resume_from_checkpoint(self, file_name: str) -> bool:
         """Intenta resumir procesamiento desde un checkpoint existente"""
-        checkpoint_file = f"checkpoint_{os.path.basename(file_name)}.json"
+        checkpoint_key = os.path.basename(file_name)
         
-        if not os.path.exists(checkpoint_file):
-            return False
-            
         try:
-            with open(checkpoint_file, 'r') as f:
-                checkpoint_data = json.load(f)
-            
-            # Validar que el checkpoint no sea muy viejo (más de 1 hora)
-            if time.time() - checkpoint_data['timestamp'] > 3600:
-                rpa_logger.log_action("Checkpoint expirado, iniciando proceso completo", f"Archivo: {checkpoint_file}")
-                os.remove(checkpoint_file)
+            # El journal descarta los checkpoints de más de checkpoints.max_age (1 hora)
+            checkpoint_data = checkpoint_store.get(checkpoint_key)
+            if checkpoint_data is None:
                 return False
             
             # Restaurar estado desde checkpoint
@@ -395,29 +549,31 @@ class StateMachine:
             self.context.max_retries = checkpoint_data['max_retries']
             self.context.error_message = checkpoint_data['error_message']
             self.context.processing_stats = checkpoint_data.get('processing_stats', {})
-            self.context.checkpoint_file = checkpoint_file
+            self.context.last_confirmed_item = checkpoint_data.get('last_confirmed_item', -1)
+            self.context.checkpoint_file = checkpoint_key
             
             if checkpoint_data.get('last_successful_state'):
                 self.context.last_successful_state = RPAState(checkpoint_data['last_successful_state'])
             
             rpa_logger.log_action(
                 "Checkpoint restaurado exitosamente", 
-                f"Estado: {self.current_state.value}, Archivo: {file_name}"
+                f"Estado: {self.current_state.value}, Archivo: {file_name}, "
+                f"Último item confirmado: {self.context.last_confirmed_item + 1}"
             )
             return True
             
         except Exception as e:
             rpa_logger.log_error(f"Error restaurando checkpoint: {str(e)}")
-            # Eliminar checkpoint corrupto
-            if os.path.exists(checkpoint_file):
-                os.remove(checkpoint_file)
+            # Eliminar checkpoint inválido
+            checkpoint_store.delete(checkpoint_key)
             return False
 
     def cleanup_checkpoint(self):
-        """Limpia el archivo de checkpoint después de completar el proceso"""
-        if self.context.checkpoint_file and os.path.exists(self.context.checkpoint_file):
+        """Elimina el checkpoint del archivo después de completar el proceso"""
+        if self.context.checkpoint_file:
             try:
-                os.remove(self.context.checkpoint_file)
+                checkpoint_store.delete(self.context.checkpoint_file)
                 rpa_logger.log_action("Checkpoint limpiado", f"Archivo: {self.context.checkpoint_file}")
+                self.context.checkpoint_file = None
             except Exception as e:
-                rpa_logger.log_error(f"Error limpiando checkpoint: {str(e)}")
\ No newline at end of file
+                rpa_logger.log_error(f"Error limpiando checkpoint: {str(e)}")
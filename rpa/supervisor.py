@@ -0,0 +1,232 @@
+"""
+Supervisor del ciclo del robot
+Reemplaza el bucle schedule/sleep de main.py: ejecuta el ciclo RPA cada
+intervalo y atiende dos pedidos entre órdenes, nunca a mitad de una:
+
+- Drenaje (Ctrl+C, SIGTERM o el archivo de control 'detener'): termina la
+  orden en curso, vacía volcados y logs y sale. Un segundo Ctrl+C detiene de
+  inmediato.
+- Recarga (SIGHUP, Ctrl+Break en Windows o el archivo 'recargar'): vuelve a
+  leer config.yaml y las imágenes de referencia sin cerrar la sesión de SAP.
+
+En Windows el launcher no puede enviar señales al proceso, así que los
+pedidos también se hacen creando los archivos de control
+"""
+
+import os
+import signal
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+
+DRAIN = 'drain'
+RELOAD = 'reload'
+
+# Holgura al comparar la fecha de un archivo de control con el arranque
+# (la resolución de fecha de FAT es de 2 segundos)
+CONTROL_FILE_SLACK = 2.0
+
+
+def control_file(action: str) -> str:
+    """Ruta del archivo de control de un pedido (drain o reload)"""
+    if action == DRAIN:
+        return config.get('system.stop_file', './data/control/detener')
+    return config.get('system.reload_file', './data/control/recargar')
+
+
+def request_control(action: str, path: str = None) -> str:
+    """
+    Pide un drenaje o una recarga al robot en ejecución (desde otro proceso)
+
+    Returns:
+        Ruta del archivo de control creado
+    """
+    path = path or control_file(action)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(time.strftime('%Y-%m-%d %H:%M:%S'))
+    return path
+
+
+def clear_controls():
+    """Elimina los archivos de control que hayan quedado de una ejecución anterior"""
+    for action in (DRAIN, RELOAD):
+        try:
+            os.remove(control_file(action))
+        except OSError:
+            pass
+
+
+class Supervisor:
+    """
+    Bucle principal con drenaje ordenado y recarga en caliente
+
+    Args:
+        task: Ciclo RPA (recibe el supervisor para consultarlo entre órdenes)
+        interval: Segundos entre ciclos (system.schedule_interval en minutos)
+        poll: Segundos entre revisiones de pedidos mientras espera
+        error_wait: Segundos de espera después de un ciclo con error
+        stop_file: Archivo de control de drenaje
+        reload_file: Archivo de control de recarga
+    """
+
+    def __init__(self, task: Callable[['Supervisor'], None], interval: float = None, poll: float = None,
+                 error_wait: float = None, stop_file: str = None, reload_file: str = None):
+        self.task = task
+        self.interval = interval if interval is not None else config.get('system.schedule_interval', 10) * 60
+        self.poll = poll if poll is not None else config.get('system.main_loop_interval', 10)
+        self.error_wait = error_wait if error_wait is not None else config.get('system.error_recovery_wait', 20)
+        self.control_files = {DRAIN: stop_file or control_file(DRAIN), RELOAD: reload_file or control_file(RELOAD)}
+        self.reload_hooks: List[Callable[[], None]] = []
+        self.shutdown_hooks: List[Callable[[], None]] = []
+        self.reloads = 0
+        self.started_at = time.time()
+        self._drain = threading.Event()
+        self._reload = threading.Event()
+        self._wake = threading.Event()
+
+    @property
+    def draining(self) -> bool:
+        return self._drain.is_set()
+
+    def add_reload_hook(self, hook: Callable[[], None]):
+        """Función que se ejecuta después de releer config.yaml (p. ej. recargar templates)"""
+        self.reload_hooks.append(hook)
+
+    def add_shutdown_hook(self, hook: Callable[[], None]):
+        """Función que vacía trabajo pendiente antes de salir (volcados, journal, etc.)"""
+        self.shutdown_hooks.append(hook)
+
+    def request_drain(self, reason: str = ''):
+        if not self.draining:
+            rpa_logger.log_action("Drenaje solicitado: se termina la orden en curso y se sale", reason)
+        self._drain.set()
+        self._wake.set()
+
+    def request_reload(self, reason: str = ''):
+        rpa_logger.log_action("Recarga de configuración solicitada", reason)
+        self._reload.set()
+        self._wake.set()
+
+    def install_signal_handlers(self):
+        """Ctrl+C/SIGTERM piden drenaje; SIGHUP (o Ctrl+Break en Windows) pide recarga"""
+        def on_stop(signum, frame):
+            if self.draining and signum == signal.SIGINT:
+                # Segundo Ctrl+C: detención inmediata
+                raise KeyboardInterrupt
+            self.request_drain(f"Señal {signal.Signals(signum).name}")
+
+        def on_reload(signum, frame):
+            self.request_reload(f"Señal {signal.Signals(signum).name}")
+
+        signal.signal(signal.SIGINT, on_stop)
+        signal.signal(signal.SIGTERM, on_stop)
+        reload_signal = getattr(signal, 'SIGHUP', None) or getattr(signal, 'SIGBREAK', None)
+        if reload_signal is not None:
+            signal.signal(reload_signal, on_reload)
+
+    def check_controls(self):
+        """
+        Convierte los archivos de control presentes en pedidos (y los consume)
+
+        Un archivo anterior al arranque del supervisor quedó de una ejecución
+        previa: se elimina sin atenderlo para que no drene el robot recién iniciado.
+        """
+        for action, request in ((DRAIN, self.request_drain), (RELOAD, self.request_reload)):
+            path = self.control_files[action]
+            try:
+                stale = os.path.getmtime(path) < self.started_at - CONTROL_FILE_SLACK
+            except OSError:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            if stale:
+                rpa_logger.warning(f"Archivo de control anterior al arranque descartado: {path}")
+                continue
+            request(f"Archivo de control: {path}")
+
+    def between_orders(self) -> bool:
+        """
+        Punto seguro entre órdenes: aplica una recarga pendiente
+
+        Returns:
+            False si se pidió drenaje (no se debe tomar otra orden)
+        """
+        self.check_controls()
+        if self._reload.is_set():
+            self.reload()
+        return not self.draining
+
+    def reload(self) -> bool:
+        """
+        Relee config.yaml y ejecuta los hooks de recarga
+
+        Si algo falla el robot sigue con lo que ya tenía cargado.
+
+        Returns:
+            True si la recarga terminó sin errores
+        """
+        self._reload.clear()
+        start_time = time.time()
+        try:
+            config.reload_config()
+            for hook in self.reload_hooks:
+                hook()
+        except Exception as e:
+            rpa_logger.log_error(f"Error en la recarga en caliente: {str(e)}", "Se mantiene la configuración anterior")
+            return False
+        self.reloads += 1
+        rpa_logger.log_performance("Recarga en caliente de configuración y referencias", time.time() - start_time)
+        return True
+
+    def _wait(self, seconds: float):
+        """Espera hasta seconds, despertando ante un pedido o para revisar los archivos de control"""
+        deadline = time.monotonic() + seconds
+        while not self.draining:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._wake.wait(min(self.poll, remaining))
+            self._wake.clear()
+            self.between_orders()
+
+    def run_forever(self, max_cycles: Optional[int] = None):
+        """
+        Ejecuta el ciclo al iniciar y luego cada intervalo hasta que se pida drenaje
+
+        Args:
+            max_cycles: Límite de ciclos (para pruebas); None = sin límite
+        """
+        cycles = 0
+        try:
+            while self.between_orders():
+                failed = False
+                try:
+                    self.task(self)
+                except Exception as e:
+                    rpa_logger.log_error(f"Error en el ciclo RPA: {str(e)}", "Supervisor")
+                    failed = True
+                cycles += 1
+                if max_cycles is not None and cycles >= max_cycles:
+                    break
+                # Después de un error se reintenta tras error_wait, sin esperar además el intervalo
+                self._wait(self.error_wait if failed else self.interval)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Vacía trabajo pendiente y logs antes de salir"""
+        rpa_logger.log_action("Supervisor detenido", f"Drenaje: {self.draining}, Recargas: {self.reloads}")
+        for hook in self.shutdown_hooks:
+            try:
+                hook()
+            except Exception as e:
+                rpa_logger.log_error(f"Error al vaciar trabajo pendiente: {str(e)}", "Apagado")
+        for handler in rpa_logger.logger.handlers:
+            handler.flush()
+        logging.shutdown()
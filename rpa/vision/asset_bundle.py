@@ -0,0 +1,225 @@
+"""
+Paquete de imágenes de referencia precalculadas
+Agrupa los templates activos en un solo archivo binario mapeado en memoria
+(BGR, escala de grises, máscara alfa y niveles de pirámide) con un manifest
+JSON, para evitar decodificar PNG al iniciar
+"""
+
+import os
+import json
+import time
+import glob
+import hashlib
+import logging
+import numpy as np
+from typing import Optional, Dict, Any, Tuple
+from rpa.config_manager import config
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+ALIGNMENT = 64
+DEFAULT_BUNDLE_PATH = './rpa/vision/bundle/reference_assets.json'
+
+# Imágenes que no se empaquetan: obsoletas o reescritas por el RPA en ejecución
+EXCLUDED_PREFIXES = ('old_',)
+RUNTIME_WRITTEN = {
+    'template.png',
+    'sap_orden_de_ventas_template.png',
+    'sap_desktop.png',
+    'remote_desktop.png',
+    'sap_archivo_menu.png',
+}
+
+
+def is_bundled_asset(file_name: str) -> bool:
+    """Indica si una imagen de referencia es estable y puede empaquetarse"""
+    return not file_name.startswith(EXCLUDED_PREFIXES) and file_name not in RUNTIME_WRITTEN
+
+
+def _variants(image: np.ndarray, mask: Optional[np.ndarray], levels: int) -> Dict[str, np.ndarray]:
+    """Variantes precalculadas de un template ya normalizado a BGR"""
+    import cv2
+    variants = {
+        'bgr': image,
+        'gray': cv2.cvtColor(image, cv2.COLOR_BGR2GRAY),
+    }
+    if mask is not None:
+        variants['mask'] = mask
+
+    level_image = image
+    for level in range(1, levels + 1):
+        if min(level_image.shape[:2]) < 8:
+            break
+        level_image = cv2.pyrDown(level_image)
+        variants[f'pyr{level}'] = level_image
+    return variants
+
+
+def build_bundle(reference_dir: str,
+                 manifest_path: str,
+                 thresholds: Optional[Dict[str, Any]] = None,
+                 metadata: Optional[Dict[str, Any]] = None,
+                 pyramid_levels: int = 2) -> Dict[str, Any]:
+    """
+    Construye el paquete binario y su manifest
+
+    Args:
+        reference_dir: Directorio con los PNG de referencia
+        manifest_path: Ruta del manifest JSON (el .bin se escribe al lado)
+        thresholds: Umbrales calibrados por template (sección 'templates')
+        metadata: Metadatos adicionales por template (offset, región esperada)
+        pyramid_levels: Niveles de pirámide reducida a precalcular
+
+    Returns:
+        El manifest escrito
+    """
+    import cv2
+    from rpa.vision.template_matcher import template_matcher
+
+    thresholds = thresholds or {}
+    metadata = metadata or {}
+    data_path = os.path.splitext(manifest_path)[0] + '.bin'
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+
+    entries = {}
+    digest = hashlib.sha1()
+    offset = 0
+
+    with open(data_path + '.tmp', 'wb') as data_file:
+        for path in sorted(glob.glob(os.path.join(reference_dir, '*.png'))):
+            file_name = os.path.basename(path)
+            if not is_bundled_asset(file_name):
+                continue
+
+            with open(path, 'rb') as f:
+                raw = f.read()
+            decoded = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+            if decoded is None:
+                logger.warning(f"No se pudo decodificar {file_name}, se omite del paquete")
+                continue
+            digest.update(raw)
+
+            image, mask = template_matcher.normalize_template(decoded)
+            arrays = {}
+            for variant, array in _variants(image, mask, pyramid_levels).items():
+                array = np.ascontiguousarray(array)
+                padding = (-offset) % ALIGNMENT
+                data_file.write(b'\0' * padding)
+                offset += padding
+                data_file.write(array.tobytes())
+                arrays[variant] = {'offset': offset, 'shape': list(array.shape), 'dtype': str(array.dtype)}
+                offset += array.nbytes
+
+            name = os.path.splitext(file_name)[0]
+            entries[name] = {
+                'file': file_name,
+                'mtime': os.path.getmtime(path),
+                'arrays': arrays,
+                'threshold': thresholds.get(name, {}).get('threshold'),
+                **metadata.get(name, {}),
+            }
+
+    manifest = {
+        'format': BUNDLE_FORMAT_VERSION,
+        'version': digest.hexdigest()[:12],
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'data_file': os.path.basename(data_path),
+        'size': offset,
+        'entries': entries,
+    }
+
+    os.replace(data_path + '.tmp', data_path)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+class AssetBundle:
+    """
+    Acceso de solo lectura a un paquete de templates mapeado en memoria
+
+    Un template se sirve desde el paquete solo si el PNG original no cambió
+    desde que se construyó; de lo contrario se debe leer el PNG.
+    """
+
+    def __init__(self, manifest_path: Optional[str] = None):
+        self.manifest_path = manifest_path or config.get('template_matching.asset_bundle', DEFAULT_BUNDLE_PATH)
+        self.manifest: Dict[str, Any] = {}
+        self._data: Optional[np.memmap] = None
+        self._by_file: Dict[str, str] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            logger.debug(f"Paquete de templates no encontrado: {self.manifest_path}")
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('format') != BUNDLE_FORMAT_VERSION:
+                logger.warning(f"Formato de paquete no soportado: {manifest.get('format')}")
+                return
+            data_path = os.path.join(os.path.dirname(self.manifest_path), manifest['data_file'])
+            if manifest['size']:
+                self._data = np.memmap(data_path, dtype=np.uint8, mode='r')
+            self.manifest = manifest
+            self._by_file = {entry['file']: name for name, entry in manifest['entries'].items()}
+            logger.info(f"Paquete de templates {manifest['version']} cargado: {len(self._by_file)} templates")
+        except Exception as e:
+            logger.error(f"Error cargando paquete de templates {self.manifest_path}: {e}")
+            self.manifest, self._data, self._by_file = {}, None, {}
+
+    def reload(self):
+        """Vuelve a abrir el paquete (ruta de config.yaml incluida) después de reconstruirlo"""
+        self.manifest_path = config.get('template_matching.asset_bundle', DEFAULT_BUNDLE_PATH)
+        self.manifest, self._data, self._by_file = {}, None, {}
+        self._load()
+
+    @property
+    def available(self) -> bool:
+        return self._data is not None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.manifest.get('version')
+
+    def entry(self, name: str) -> Optional[Dict[str, Any]]:
+        """Entrada del manifest (metadatos incluidos) de un template"""
+        return self.manifest.get('entries', {}).get(name)
+
+    def array(self, name: str, variant: str = 'bgr') -> Optional[np.ndarray]:
+        """Vista de solo lectura sobre una variante ('bgr', 'gray', 'mask', 'pyr1'...)"""
+        entry = self.entry(name)
+        if not self.available or entry is None or variant not in entry['arrays']:
+            return None
+        spec = entry['arrays'][variant]
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        return np.frombuffer(self._data, dtype=dtype, count=count, offset=spec['offset']).reshape(spec['shape'])
+
+    def lookup(self, image_path: str) -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """
+        Busca un PNG de referencia en el paquete
+
+        Returns:
+            Tupla (BGR, máscara o None), o None si no está empaquetado o el PNG cambió
+        """
+        if not self.available:
+            return None
+        name = self._by_file.get(os.path.basename(image_path))
+        if name is None:
+            return None
+        try:
+            if os.path.getmtime(image_path) != self.entry(name)['mtime']:
+                logger.debug(f"{image_path} cambió desde la construcción del paquete, se lee el PNG")
+                return None
+        except OSError:
+            pass
+        return self.array(name, 'bgr'), self.array(name, 'mask')
+
+
+# Instancia global del paquete (vacía si no se ha construido)
+asset_bundle = AssetBundle()
@@ -0,0 +1,168 @@
+"""
+Detector barato de cambios de pantalla
+Evita repetir template matching completo cuando la pantalla no ha cambiado
+"""
+
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+import logging
+from typing import Optional, Tuple, Any, Callable
+from rpa.config_manager import config
+from rpa.watchdog import watchdog_sleep
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+
+class FrameChangeDetector:
+    """
+    Compara capturas usando una huella reducida (escala de grises submuestreada)
+
+    Una diferencia máxima por bloque menor o igual a la tolerancia se considera
+    la misma pantalla, lo que absorbe el ruido de compresión del escritorio remoto.
+    """
+
+    def __init__(self, grid: Tuple[int, int] = None, tolerance: int = None, cache_size: int = None):
+        self.grid = tuple(grid or config.get('change_detection.grid', [64, 36]))
+        self.tolerance = tolerance if tolerance is not None else config.get('change_detection.tolerance', 2)
+        self.enabled = config.get('change_detection.enabled', True)
+        self.cache_size = cache_size if cache_size is not None else config.get('change_detection.cache_size', 64)
+        # Caché LRU de resultados por clave -> (huella, resultado)
+        self._result_cache: 'OrderedDict[Any, Tuple[np.ndarray, Any]]' = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def fingerprint(self,
+                    image: np.ndarray,
+                    region: Optional[Tuple[int, int, int, int]] = None,
+                    grid: Optional[Tuple[int, int]] = None) -> Optional[np.ndarray]:
+        """
+        Calcula la huella de una imagen o de una región de ella
+
+        Args:
+            image: Imagen BGR o escala de grises
+            region: Región opcional (x, y, width, height)
+            grid: Tamaño (ancho, alto) de la huella; por defecto self.grid
+
+        Returns:
+            Arreglo uint8 con la huella, o None si la imagen no es válida
+        """
+        if image is None:
+            return None
+
+        if region:
+            x, y, w, h = region
+            image = image[y:y+h, x:x+w]
+
+        if image.size == 0:
+            return None
+
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        grid_w, grid_h = grid or self.grid
+        grid_w = max(1, min(grid_w, image.shape[1]))
+        grid_h = max(1, min(grid_h, image.shape[0]))
+        # INTER_AREA promedia cada bloque: es un diff por bloques implícito
+        return cv2.resize(image, (grid_w, grid_h), interpolation=cv2.INTER_AREA)
+
+    def is_same(self, fp_a: Optional[np.ndarray], fp_b: Optional[np.ndarray]) -> bool:
+        """Indica si dos huellas corresponden a la misma pantalla"""
+        if fp_a is None or fp_b is None or fp_a.shape != fp_b.shape:
+            return False
+        diff = cv2.absdiff(fp_a, fp_b)
+        return int(diff.max()) <= self.tolerance
+
+    def cached_call(self,
+                    key: Any,
+                    image: np.ndarray,
+                    compute: Callable[[], Any],
+                    region: Optional[Tuple[int, int, int, int]] = None) -> Any:
+        """
+        Retorna el resultado anterior de `key` si la pantalla no cambió,
+        de lo contrario ejecuta `compute` y guarda su resultado
+
+        Args:
+            key: Identificador de la operación (p. ej. ruta del template + confianza)
+            image: Captura actual
+            compute: Función que calcula el resultado completo
+            region: Región relevante para la operación
+        """
+        if not self.enabled:
+            return compute()
+
+        fp = self.fingerprint(image, region)
+        cached = self._result_cache.get(key)
+        if cached is not None and self.is_same(cached[0], fp):
+            self.stats['hits'] += 1
+            self._result_cache.move_to_end(key)
+            return cached[1]
+
+        self.stats['misses'] += 1
+        result = compute()
+        if fp is not None:
+            self._result_cache[key] = (fp, result)
+            self._result_cache.move_to_end(key)
+            # Se descarta la clave usada hace más tiempo
+            while len(self._result_cache) > max(self.cache_size, 1):
+                self._result_cache.popitem(last=False)
+        return result
+
+    def wait_for_change(self,
+                        region: Optional[Tuple[int, int, int, int]] = None,
+                        timeout: float = 10.0,
+                        check_interval: float = 0.05,
+                        reference: Optional[np.ndarray] = None,
+                        grab: Optional[Callable[[], Optional[np.ndarray]]] = None) -> bool:
+        """
+        Espera hasta que cambien los píxeles de una región
+
+        Args:
+            region: Región a vigilar (x, y, width, height); None para toda la pantalla
+            timeout: Tiempo máximo de espera en segundos
+            check_interval: Intervalo entre capturas
+            reference: Captura base; si es None se toma una al iniciar
+            grab: Función de captura; por defecto la del template_matcher
+
+        Returns:
+            True si la región cambió, False si se agotó el timeout
+        """
+        if grab is None:
+            from rpa.vision.template_matcher import template_matcher
+            grab = template_matcher._get_current_screenshot
+
+        # Para regiones pequeñas se usa mayor resolución relativa
+        grid = self._region_grid(region)
+
+        base_fp = self.fingerprint(reference if reference is not None else grab(), region, grid)
+        start_time = time.time()
+
+        while time.time() - start_time < timeout:
+            watchdog_sleep(check_interval)
+            current_fp = self.fingerprint(grab(), region, grid)
+            if current_fp is not None and not self.is_same(base_fp, current_fp):
+                logger.debug(f"Cambio detectado en región {region} después de {time.time() - start_time:.2f}s")
+                return True
+
+        logger.debug(f"Sin cambios en región {region} después de {timeout}s")
+        return False
+
+    def _region_grid(self, region: Optional[Tuple[int, int, int, int]]) -> Tuple[int, int]:
+        """Calcula el tamaño de huella para una región (bloques de ~8 px)"""
+        if not region:
+            return self.grid
+        _, _, w, h = region
+        return (max(1, min(w // 8, 256)), max(1, min(h // 8, 256)))
+
+    def clear(self):
+        """Limpia los resultados memorizados"""
+        self._result_cache.clear()
+
+
+# Instancia global del detector
+change_detector = FrameChangeDetector()
+
+def wait_for_change(region=None, timeout=10.0, check_interval=0.05):
+    """Función de conveniencia para esperar cambios en una región"""
+    return change_detector.wait_for_change(region, timeout, check_interval)
@@ -0,0 +1,178 @@
+"""
+Buffer circular en memoria de las últimas capturas para depuración
+Guarda las capturas reducidas y comprimidas con su estado y marca de tiempo,
+y solo las escribe a disco (en segundo plano) cuando ocurre un error
+"""
+
+import os
+import re
+import json
+import time
+import threading
+import cv2
+import numpy as np
+import logging
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, List, Dict, Any
+from rpa.config_manager import config
+from rpa.vision.change_detector import change_detector
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BufferedFrame:
+    """Captura almacenada en el buffer"""
+    timestamp: float
+    state: Optional[str]
+    label: Optional[str]
+    shape: tuple
+    data: bytes
+
+
+class DebugFrameBuffer:
+    """
+    Mantiene las últimas N capturas en memoria (reducidas y en JPEG)
+
+    add() es barato y no toca disco; dump_async() copia el contenido actual
+    y lo escribe en un hilo aparte, para no frenar el manejo del error.
+    """
+
+    def __init__(self,
+                 capacity: int = None,
+                 scale: float = None,
+                 jpeg_quality: int = None,
+                 dump_path: str = None):
+        self.enabled = config.get('debug_frames.enabled', True)
+        self.capacity = capacity or config.get('debug_frames.capacity', 30)
+        self.scale = scale or config.get('debug_frames.scale', 0.5)
+        self.jpeg_quality = jpeg_quality or config.get('debug_frames.jpeg_quality', 70)
+        self.dump_path = dump_path or config.get('debug_frames.dump_path', './debug_screenshots/failures')
+        self.state: Optional[str] = None
+        self._frames: deque = deque(maxlen=self.capacity)
+        self._last_fp: Optional[np.ndarray] = None
+        self._last_state: Optional[str] = None
+        self._lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def set_state(self, state: Optional[str]):
+        """Estado del RPA con el que se etiquetan las capturas siguientes"""
+        self.state = state
+
+    def add(self, frame: Optional[np.ndarray], label: Optional[str] = None):
+        """
+        Agrega una captura al buffer (descarta la más antigua si está lleno)
+
+        Args:
+            frame: Captura BGR
+            label: Etiqueta opcional (p. ej. operación que la tomó)
+        """
+        if not self.enabled or frame is None or frame.size == 0:
+            return
+        try:
+            small = frame
+            if self.scale and self.scale < 1.0:
+                small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode('.jpg', small, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                return
+            entry = BufferedFrame(time.time(), self.state, label, frame.shape, encoded.tobytes())
+            with self._lock:
+                self._frames.append(entry)
+        except Exception as e:
+            logger.debug(f"No se pudo agregar captura al buffer de depuración: {e}")
+
+    def add_if_changed(self, frame: Optional[np.ndarray], label: Optional[str] = None) -> bool:
+        """
+        Agrega la captura solo si difiere de la última agregada por esta vía
+
+        Los sondeos repetidos de una pantalla que no cambia no se reducen ni se
+        comprimen de nuevo; un cambio de estado siempre deja una captura.
+
+        Returns:
+            True si la captura se agregó al buffer
+        """
+        if not self.enabled or frame is None or frame.size == 0:
+            return False
+        fingerprint = change_detector.fingerprint(frame)
+        if self.state == self._last_state and change_detector.is_same(self._last_fp, fingerprint):
+            return False
+        self._last_fp = fingerprint
+        self._last_state = self.state
+        self.add(frame, label)
+        return True
+
+    def snapshot(self) -> List[BufferedFrame]:
+        """Copia del contenido actual del buffer (de la más antigua a la más reciente)"""
+        with self._lock:
+            return list(self._frames)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+        self._last_fp = None
+
+    def dump_async(self, reason: str, details: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Escribe el contenido del buffer a disco en segundo plano
+
+        Args:
+            reason: Motivo del volcado (p. ej. archivo en proceso)
+            details: Información adicional para el índice (mensaje de error, etc.)
+
+        Returns:
+            Directorio donde quedarán las capturas, o None si el buffer está vacío
+        """
+        frames = self.snapshot()
+        if not frames:
+            return None
+
+        safe_reason = re.sub(r'[^\w.-]+', '_', reason or 'error')[:60]
+        target_dir = os.path.join(self.dump_path, f"{time.strftime('%Y%m%d_%H%M%S')}_{safe_reason}")
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-frames")
+        future = self._writer.submit(self._write, target_dir, frames, reason, details or {})
+        future.add_done_callback(self._log_result)
+        return target_dir
+
+    def _write(self, target_dir: str, frames: List[BufferedFrame], reason: str, details: Dict[str, Any]) -> str:
+        os.makedirs(target_dir, exist_ok=True)
+        index = []
+        for i, frame in enumerate(frames):
+            file_name = f"{i:03d}_{frame.state or 'sin_estado'}.jpg"
+            with open(os.path.join(target_dir, file_name), 'wb') as f:
+                f.write(frame.data)
+            index.append({
+                'file': file_name,
+                'timestamp': frame.timestamp,
+                'time': time.strftime('%H:%M:%S', time.localtime(frame.timestamp)),
+                'state': frame.state,
+                'label': frame.label,
+                'original_size': [frame.shape[1], frame.shape[0]],
+            })
+        with open(os.path.join(target_dir, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump({'reason': reason, 'details': details, 'frames': index}, f, indent=2, ensure_ascii=False)
+        return target_dir
+
+    @staticmethod
+    def _log_result(future: Future):
+        try:
+            logger.info(f"Capturas de depuración guardadas en {future.result()}")
+        except Exception as e:
+            logger.error(f"Error guardando capturas de depuración: {e}")
+
+    def wait(self):
+        """Espera a que terminen los volcados pendientes"""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+
+
+# Instancia global del buffer de depuración
+debug_frames = DebugFrameBuffer()
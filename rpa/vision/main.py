@@ -1,11 +1,14 @@
+import os
+import re
 import cv2
 import logging
 import pytesseract
 import easyocr
-import numpy as np
 from PIL import Image
-import pyautogui
 from rpa.vision.template_matcher import template_matcher, find_template, load_template
+from rpa.vision.screen_source import grab_screen
+from rpa.vision.thresholds import get_threshold
+from rpa.config_manager import config, get_confidence
 
 # Configurar la ruta de Tesseract para Windows
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -20,31 +23,53 @@ logger.addHandler(handler)
 
 class Vision:
     def __init__(self):
-        self.sap_orden_de_ventas_template_image = cv2.imread('./rpa/vision/reference_images/sap_orden_de_ventas_template.png', cv2.IMREAD_UNCHANGED)
-        self.client_field_image = cv2.imread('./rpa/vision/reference_images/client_field.png', cv2.IMREAD_COLOR)
-        self.orden_compra_image = cv2.imread('./rpa/vision/reference_images/orden_compra.png', cv2.IMREAD_COLOR)
-        self.fecha_entrega_image = cv2.imread('./rpa/vision/reference_images/fecha_entrega.png', cv2.IMREAD_COLOR)
-        self.primer_articulo_image = cv2.imread('./rpa/vision/reference_images/primer_articulo.png', cv2.IMREAD_COLOR)
-        self.cancel_order_image = cv2.imread('./rpa/vision/reference_images/cancel_order.png', cv2.IMREAD_COLOR)
-        self.sap_desktop_image = cv2.imread('./rpa/vision/reference_images/sap_desktop.png', cv2.IMREAD_UNCHANGED)
-        self.sap_icon_image = cv2.imread('./rpa/vision/reference_images/sap_icon.png', cv2.IMREAD_COLOR)
-        self.remote_desktop_image = cv2.imread('./rpa/vision/reference_images/remote_desktop.png', cv2.IMREAD_UNCHANGED)
-        self.sap_modulos_menu_button = cv2.imread('./rpa/vision/reference_images/sap_modulos_menu_button.png', cv2.IMREAD_COLOR)
-        self.sap_modulos_menu_image = cv2.imread('./rpa/vision/reference_images/sap_modulos_menu.png', cv2.IMREAD_UNCHANGED)
-        self.sap_ventas_menu_button_image = cv2.imread('./rpa/vision/reference_images/sap_ventas_menu_button.png', cv2.IMREAD_COLOR)
-        self.sap_ventas_order_menu_image = cv2.imread('./rpa/vision/reference_images/sap_ventas_order_menu.png', cv2.IMREAD_UNCHANGED)
-        self.sap_ventas_order_button_image = cv2.imread('./rpa/vision/reference_images/sap_ventas_order_button.png', cv2.IMREAD_COLOR)
-        self.sap_archivo_menu_button_image = cv2.imread('./rpa/vision/reference_images/sap_archivo_menu_button.png', cv2.IMREAD_COLOR)
-        self.sap_archivos_menu_image = cv2.imread('./rpa/vision/reference_images/sap_archivo_menu.png', cv2.IMREAD_UNCHANGED)
-        self.sap_finalizar_button_image = cv2.imread('./rpa/vision/reference_images/sap_finalizar_button.png', cv2.IMREAD_COLOR)
-        self.sap_totales_section_image = cv2.imread('./rpa/vision/reference_images/sap_totales_section.png', cv2.IMREAD_COLOR)
-        self.scroll_to_bottom_image = cv2.imread('./rpa/vision/reference_images/scroll_to_bottom.png', cv2.IMREAD_COLOR)
+        self.load_templates()
+        # Captura en memoria del formulario actual (ver set_form_frame)
+        self.form_frame = None
+
+    def load_templates(self):
+        """Carga (o vuelve a cargar, en la recarga en caliente) las imágenes de referencia"""
+        self.sap_orden_de_ventas_template_image = load_template('./rpa/vision/reference_images/sap_orden_de_ventas_template.png')
+        self.client_field_image = load_template('./rpa/vision/reference_images/client_field.png')
+        self.orden_compra_image = load_template('./rpa/vision/reference_images/orden_compra.png')
+        self.fecha_entrega_image = load_template('./rpa/vision/reference_images/fecha_entrega.png')
+        self.primer_articulo_image = load_template('./rpa/vision/reference_images/primer_articulo.png')
+        self.cancel_order_image = load_template('./rpa/vision/reference_images/cancel_order.png')
+        self.sap_desktop_image = load_template('./rpa/vision/reference_images/sap_desktop.png')
+        self.sap_icon_image = load_template('./rpa/vision/reference_images/sap_icon.png')
+        self.remote_desktop_image = load_template('./rpa/vision/reference_images/remote_desktop.png')
+        self.sap_modulos_menu_button = load_template('./rpa/vision/reference_images/sap_modulos_menu_button.png')
+        self.sap_modulos_menu_image = load_template('./rpa/vision/reference_images/sap_modulos_menu.png')
+        self.sap_ventas_menu_button_image = load_template('./rpa/vision/reference_images/sap_ventas_menu_button.png')
+        self.sap_ventas_order_menu_image = load_template('./rpa/vision/reference_images/sap_ventas_order_menu.png')
+        self.sap_ventas_order_button_image = load_template('./rpa/vision/reference_images/sap_ventas_order_button.png')
+        self.sap_archivo_menu_button_image = load_template('./rpa/vision/reference_images/sap_archivo_menu_button.png')
+        self.sap_archivos_menu_image = load_template('./rpa/vision/reference_images/sap_archivo_menu.png')
+        self.sap_finalizar_button_image = load_template('./rpa/vision/reference_images/sap_finalizar_button.png')
+        self.sap_totales_section_image = load_template('./rpa/vision/reference_images/sap_totales_section.png')
+        self.scroll_to_bottom_image = load_template('./rpa/vision/reference_images/scroll_to_bottom.png')
+
+    def set_form_frame(self, frame=None):
+        """
+        Guarda en memoria la captura actual del formulario de órdenes de venta
+        
+        Las búsquedas de coordenadas del formulario (cliente, orden, fecha,
+        primer artículo, cancelar) usan esta captura sin pasar por disco.
+        """
+        self.form_frame = frame if frame is not None else grab_screen()
+        return self.form_frame
+
+    def get_form_frame(self):
+        """Captura del formulario en memoria, o la imagen de referencia si aún no hay"""
+        if self.form_frame is not None:
+            return self.form_frame
+        return self.sap_orden_de_ventas_template_image
 
     def get_client_coordinates(self):
         offset = (-self.client_field_image.shape[1]//40, 0)  # Offset específico para cliente
         return template_matcher.find_template(
             self.client_field_image, 
-            self.sap_orden_de_ventas_template_image,
+            self.get_form_frame(),
             offset=offset
         )
     
@@ -52,7 +77,7 @@ class Vision:
         offset = (-self.orden_compra_image.shape[1]//30, 0)  # Offset específico para orden
         return template_matcher.find_template(
             self.orden_compra_image,
-            self.sap_orden_de_ventas_template_image,
+            self.get_form_frame(),
             offset=offset
         )
     
@@ -60,32 +85,62 @@ class Vision:
         offset = (-self.fecha_entrega_image.shape[1]//30, 0)  # Offset específico para fecha
         return template_matcher.find_template(
             self.fecha_entrega_image,
-            self.sap_orden_de_ventas_template_image,
+            self.get_form_frame(),
             offset=offset
         )
     
     def get_primer_articulo_coordinates(self):
-        result_primer = cv2.matchTemplate(self.sap_orden_de_ventas_template_image, self.primer_articulo_image ,cv2.TM_CCOEFF_NORMED)
-        min_val_primer, max_val_primer, min_loc_primer, max_loc_primer = cv2.minMaxLoc(result_primer)
+        max_val_primer, max_loc_primer = template_matcher.match_score(self.primer_articulo_image, self.get_form_frame())
         w_primer = self.primer_articulo_image.shape[1]
         h_primer = self.primer_articulo_image.shape[0]
         center_point_primer = (max_loc_primer[0] + w_primer//2, max_loc_primer[1] + h_primer//2 + h_primer//4)
         return center_point_primer, h_primer//2
     
+    def read_item_codes(self):
+        """
+        Lee por OCR la columna de códigos de la grilla de artículos
+        
+        Returns:
+            Lista de códigos por fila (de arriba hacia abajo), o None si no se
+            encontró la grilla en pantalla
+        """
+        screenshot_cv = grab_screen()
+        max_val, max_loc = template_matcher.match_score(self.primer_articulo_image, screenshot_cv)
+        if max_val <= get_threshold('primer_articulo', 0.7):
+            logger.warning(f"Grilla de artículos no encontrada (confianza: {max_val:.3f})")
+            return None
+        
+        # La primera fila está en la mitad inferior del template (ver get_primer_articulo_coordinates)
+        h, w = self.primer_articulo_image.shape[:2]
+        column = screenshot_cv[max_loc[1] + h // 2:, max_loc[0]:max_loc[0] + w]
+        gray = cv2.cvtColor(column, cv2.COLOR_BGR2GRAY)
+        text = pytesseract.image_to_string(gray, config=r'--oem 3 --psm 6')
+        
+        codes = []
+        for line in text.splitlines():
+            tokens = line.split()
+            if not tokens:
+                continue
+            code = tokens[0].strip('|[]()')
+            # Un texto que no parece código (fila vacía mal leída, totales) marca el final
+            if not re.match(r'^[A-Za-z0-9][A-Za-z0-9._-]{2,}$', code):
+                break
+            codes.append(code)
+        logger.info(f"Códigos leídos de la grilla: {codes}")
+        return codes
+
     def get_template_image(self):
-        return self.sap_orden_de_ventas_template_image
+        return self.get_form_frame()
 
     def get_cancel_order_coordinates(self):
-        result_cancel_order = cv2.matchTemplate(self.sap_orden_de_ventas_template_image, self.cancel_order_image ,cv2.TM_CCOEFF_NORMED)
-        min_val_cancel_order, max_val_cancel_order, min_loc_cancel_order, max_loc_cancel_order = cv2.minMaxLoc(result_cancel_order)
+        max_val_cancel_order, max_loc_cancel_order = template_matcher.match_score(self.cancel_order_image, self.get_form_frame())
         w_cancel_order = self.cancel_order_image.shape[1]
         h_cancel_order = self.cancel_order_image.shape[0]
         center_point_cancel_order = (max_loc_cancel_order[0] + w_cancel_order//2, max_loc_cancel_order[1] + h_cancel_order//2)
         return center_point_cancel_order
     
     def get_modulos_menu_coordinates(self):
-        result_modulos_menu = cv2.matchTemplate(self.sap_desktop_image, self.sap_modulos_menu_button ,cv2.TM_CCOEFF_NORMED)
-        min_val_modulos_menu, max_val_modulos_menu, min_loc_modulos_menu, max_loc_modulos_menu = cv2.minMaxLoc(result_modulos_menu)
+        max_val_modulos_menu, max_loc_modulos_menu = template_matcher.match_score(self.sap_modulos_menu_button, self.sap_desktop_image)
         w_modulos_menu = self.sap_modulos_menu_button.shape[1]
         h_modulos_menu = self.sap_modulos_menu_button.shape[0]
         center_point_modulos_menu = (max_loc_modulos_menu[0] + w_modulos_menu//2, max_loc_modulos_menu[1] + h_modulos_menu//2)
@@ -95,16 +150,13 @@ class Vision:
         """Busca el icono de SAP en la pantalla"""
         try:
             # Tomar screenshot actual
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+            screenshot_cv = grab_screen()
             
             # Buscar icono de SAP
-            result_sap_icon = cv2.matchTemplate(screenshot_cv, self.sap_icon_image, cv2.TM_CCOEFF_NORMED)
-            min_val_sap_icon, max_val_sap_icon, min_loc_sap_icon, max_loc_sap_icon = cv2.minMaxLoc(result_sap_icon)
+            max_val_sap_icon, max_loc_sap_icon = template_matcher.match_score(self.sap_icon_image, screenshot_cv)
             
             # Verificar confianza
-            if max_val_sap_icon > 0.7:  # Umbral de confianza
+            if max_val_sap_icon > get_threshold('sap_icon', 0.7):
                 w_sap_icon = self.sap_icon_image.shape[1]
                 h_sap_icon = self.sap_icon_image.shape[0]
                 center_point_sap_icon = (max_loc_sap_icon[0] + w_sap_icon//2, max_loc_sap_icon[1] + h_sap_icon//2)
@@ -121,16 +173,13 @@ class Vision:
         """Busca el menú de ventas"""
         try:
             # Tomar screenshot actual
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+            screenshot_cv = grab_screen()
             
             # Buscar botón de ventas
-            result_ventas = cv2.matchTemplate(screenshot_cv, self.sap_ventas_menu_button_image, cv2.TM_CCOEFF_NORMED)
-            min_val_ventas, max_val_ventas, min_loc_ventas, max_loc_ventas = cv2.minMaxLoc(result_ventas)
+            max_val_ventas, max_loc_ventas = template_matcher.match_score(self.sap_ventas_menu_button_image, screenshot_cv)
             
             # Verificar confianza
-            if max_val_ventas > 0.7:
+            if max_val_ventas > get_threshold('sap_ventas_menu_button', 0.7):
                 w_ventas = self.sap_ventas_menu_button_image.shape[1]
                 h_ventas = self.sap_ventas_menu_button_image.shape[0]
                 center_point_ventas = (max_loc_ventas[0] + w_ventas//2, max_loc_ventas[1] + h_ventas//2)
@@ -147,16 +196,13 @@ class Vision:
         """Busca el botón de órdenes de venta"""
         try:
             # Tomar screenshot actual
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+            screenshot_cv = grab_screen()
             
             # Buscar botón de órdenes
-            result_ordenes = cv2.matchTemplate(screenshot_cv, self.sap_ventas_order_button_image, cv2.TM_CCOEFF_NORMED)
-            min_val_ordenes, max_val_ordenes, min_loc_ordenes, max_loc_ordenes = cv2.minMaxLoc(result_ordenes)
+            max_val_ordenes, max_loc_ordenes = template_matcher.match_score(self.sap_ventas_order_button_image, screenshot_cv)
             
             # Verificar confianza
-            if max_val_ordenes > 0.7:
+            if max_val_ordenes > get_threshold('sap_ventas_order_button', 0.7):
                 w_ordenes = self.sap_ventas_order_button_image.shape[1]
                 h_ordenes = self.sap_ventas_order_button_image.shape[0]
                 center_point_ordenes = (max_loc_ordenes[0] + w_ordenes//2, max_loc_ordenes[1] + h_ordenes//2)
@@ -170,9 +216,8 @@ class Vision:
             return None
 
     def get_archivos_menu_coordinates(self):
-        result_archivo_menu = cv2.matchTemplate(self.sap_desktop_image, self.sap_archivo_menu_button_image ,cv2.TM_CCOEFF_NORMED)
-        min_val_archivo_menu, max_val_archivo_menu, min_loc_archivo_menu, max_loc_archivo_menu = cv2.minMaxLoc(result_archivo_menu)
-        if max_val_archivo_menu < 0.8:
+        max_val_archivo_menu, max_loc_archivo_menu = template_matcher.match_score(self.sap_archivo_menu_button_image, self.sap_desktop_image)
+        if max_val_archivo_menu <= get_threshold('sap_archivo_menu_button', get_confidence('default')):
             logger.error('Archivos menu not found.')
             return None
         w_archivo_menu = self.sap_archivo_menu_button_image.shape[1]
@@ -181,8 +226,7 @@ class Vision:
         return center_point_archivo_menu
 
     def get_finalizar_button_coordinates(self):
-        result_finalizar_button = cv2.matchTemplate(self.sap_archivos_menu_image, self.sap_finalizar_button_image ,cv2.TM_CCOEFF_NORMED)
-        min_val_finalizar_button, max_val_finalizar_button, min_loc_finalizar_button, max_loc_finalizar_button = cv2.minMaxLoc(result_finalizar_button)
+        max_val_finalizar_button, max_loc_finalizar_button = template_matcher.match_score(self.sap_finalizar_button_image, self.sap_archivos_menu_image)
         w_finalizar_button = self.sap_finalizar_button_image.shape[1]
         h_finalizar_button = self.sap_finalizar_button_image.shape[0]
         center_point_finalizar_button = (max_loc_finalizar_button[0] + w_finalizar_button//2, max_loc_finalizar_button[1] + h_finalizar_button//2)
@@ -198,20 +242,18 @@ class Vision:
             
             # Tomar captura de pantalla actual para template matching
             logger.info("ESTRATEGIA 3.2: Capturando pantalla para buscar sección de totales")
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+            screenshot_cv = grab_screen()
             logger.info("ESTRATEGIA 3.2 COMPLETADO: Captura de pantalla procesada")
             
             # Realizar template matching con la imagen de referencia de totales
             logger.info("ESTRATEGIA 3.3: Ejecutando template matching de sección de totales")
-            result_totales = cv2.matchTemplate(screenshot_cv, self.sap_totales_section_image, cv2.TM_CCOEFF_NORMED)
-            min_val_totales, max_val_totales, min_loc_totales, max_loc_totales = cv2.minMaxLoc(result_totales)
+            max_val_totales, max_loc_totales = template_matcher.match_score(self.sap_totales_section_image, screenshot_cv)
             
             logger.info(f"ESTRATEGIA 3.3 COMPLETADO: Template matching ejecutado - Confianza: {max_val_totales:.3f}")
             
             # Umbral de confianza más flexible para escritorio remoto
-            if max_val_totales > 0.5:  # Umbral más bajo para escritorio remoto
+            totales_threshold = get_threshold('sap_totales_section', 0.5)
+            if max_val_totales > totales_threshold:
                 w_totales = self.sap_totales_section_image.shape[1]
                 h_totales = self.sap_totales_section_image.shape[0]
                 
@@ -232,12 +274,13 @@ class Vision:
                     'confidence': max_val_totales
                 }
             else:
-                logger.warning(f'ESTRATEGIA 3 FALLIDA: Sección de totales no encontrada. Confianza: {max_val_totales:.3f} (umbral: 0.5)')
+                logger.warning(f'ESTRATEGIA 3 FALLIDA: Sección de totales no encontrada. Confianza: {max_val_totales:.3f} (umbral: {totales_threshold})')
                 
                 # ESTRATEGIA ALTERNATIVA: Buscar por texto usando OCR
                 logger.info("ESTRATEGIA 3.4: Intentando búsqueda por texto (OCR)")
                 if self.find_totales_by_text(screenshot_cv):
                     logger.info("ESTRATEGIA 3.4 EXITOSA: Sección de totales encontrada por texto")
+                    screen_height, screen_width = screenshot_cv.shape[:2]
                     return {
                         'center': (screen_width//2, screen_height-100),
                         'top_left': (0, screen_height-200),
@@ -298,9 +341,7 @@ class Vision:
             logger.info("PASO 8.2: Buscando 'Total antes del descuento' en parte inferior derecha")
             
             # Tomar screenshot
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+            screenshot_cv = grab_screen()
             
             # Obtener dimensiones de pantalla
             screen_height, screen_width = screenshot_cv.shape[:2]
@@ -334,9 +375,8 @@ class Vision:
             return False
 
     def get_ventas_menu_coordinates(self):
-        result_ventas_menu = cv2.matchTemplate(self.sap_modulos_menu_image, self.sap_ventas_menu_button_image ,cv2.TM_CCOEFF_NORMED)
-        min_val_ventas_menu, max_val_ventas_menu, min_loc_ventas_menu, max_loc_ventas_menu = cv2.minMaxLoc(result_ventas_menu)
-        if max_val_ventas_menu > 0.9:
+        max_val_ventas_menu, max_loc_ventas_menu = template_matcher.match_score(self.sap_ventas_menu_button_image, self.sap_modulos_menu_image)
+        if max_val_ventas_menu > get_threshold('sap_ventas_menu_button', get_confidence('high')):
             w_ventas_menu = self.sap_ventas_menu_button_image.shape[1]
             h_ventas_menu = self.sap_ventas_menu_button_image.shape[0]
             center_point_ventas_menu = (max_loc_ventas_menu[0] + w_ventas_menu//2, max_loc_ventas_menu[1] + h_ventas_menu//2)
@@ -346,9 +386,8 @@ class Vision:
             return None
     
     def get_orden_de_ventas_menu_coordinates(self):
-        result_orden_de_ventas_menu = cv2.matchTemplate(self.sap_ventas_order_menu_image, self.sap_ventas_order_button_image ,cv2.TM_CCOEFF_NORMED)
-        min_val_orden_de_ventas_menu, max_val_orden_de_ventas_menu, min_loc_orden_de_ventas_menu, max_loc_orden_de_ventas_menu = cv2.minMaxLoc(result_orden_de_ventas_menu)
-        if max_val_orden_de_ventas_menu > 0.9:
+        max_val_orden_de_ventas_menu, max_loc_orden_de_ventas_menu = template_matcher.match_score(self.sap_ventas_order_button_image, self.sap_ventas_order_menu_image)
+        if max_val_orden_de_ventas_menu > get_threshold('sap_ventas_order_button', get_confidence('high')):
             w_orden_de_ventas_menu = self.sap_ventas_order_button_image.shape[1]
             h_orden_de_ventas_menu = self.sap_ventas_order_button_image.shape[0]
             center_point_orden_de_ventas_menu = (max_loc_orden_de_ventas_menu[0] + w_orden_de_ventas_menu//2, max_loc_orden_de_ventas_menu[1] + h_orden_de_ventas_menu//2)
@@ -363,16 +402,13 @@ class Vision:
             logger.info("PASO 4.3: Buscando botón de Orden de Ventas")
             
             # Tomar captura de pantalla actual
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+            screenshot_cv = grab_screen()
             
             # Buscar el botón de orden de ventas en la pantalla actual
-            result = cv2.matchTemplate(screenshot_cv, self.sap_ventas_order_button_image, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            max_val, max_loc = template_matcher.match_score(self.sap_ventas_order_button_image, screenshot_cv)
             
             # Verificar confianza
-            if max_val > 0.7:  # Umbral de confianza
+            if max_val > get_threshold('sap_ventas_order_button', 0.7):
                 w_button = self.sap_ventas_order_button_image.shape[1]
                 h_button = self.sap_ventas_order_button_image.shape[0]
                 center_point = (max_loc[0] + w_button//2, max_loc[1] + h_button//2)
@@ -391,7 +427,7 @@ class Vision:
         """Busca el icono de SAP Business One usando template matching"""
         return template_matcher.find_template(
             self.sap_icon_image,
-            confidence=0.7  # Umbral específico para SAP
+            confidence=get_threshold('sap_icon', 0.7)
         )
 
     def get_sap_text_coordinates(self):
@@ -401,9 +437,7 @@ class Vision:
         """
         try:
             # Tomar captura de pantalla actual
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+            screenshot_cv = grab_screen()
             
             # Convertir a escala de grises para mejor OCR
             gray = cv2.cvtColor(screenshot_cv, cv2.COLOR_BGR2GRAY)
@@ -507,7 +541,7 @@ class Vision:
         logger.info("Buscando barra de desplazamiento")
         return template_matcher.find_template(
             self.scroll_to_bottom_image,
-            confidence=0.8
+            confidence=get_threshold('scroll_to_bottom', get_confidence('scrollbar'))
         )
 
     def image_show(self, image):
@@ -516,10 +550,16 @@ class Vision:
         cv2.destroyAllWindows()
 
     def save_template(self):
-        cv2.imwrite('./rpa/vision/reference_inmages/template.png', self.sap_orden_de_ventas_template_image)
+        """Guarda la captura del formulario en la carpeta de depuración"""
+        self._save_debug_image('template.png', self.get_form_frame())
     
     def save_click_points(self):
-        cv2.imwrite('./rpa/vision/reference_inmages/click points.png', self.sap_orden_de_ventas_template_image)
+        self._save_debug_image('click points.png', self.get_form_frame())
+    
+    def _save_debug_image(self, file_name, image):
+        debug_path = config.get('development.debug_screenshot_path', './debug_screenshots')
+        os.makedirs(debug_path, exist_ok=True)
+        cv2.imwrite(os.path.join(debug_path, file_name), image)
     
     def return_coordinates(self):
         return {
@@ -538,18 +578,15 @@ class Vision:
             logger.info("Verificando si ya está en la pantalla de SAP Business One")
             
             # Tomar captura de pantalla actual
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+            screenshot_cv = grab_screen()
             
             # Buscar la imagen de referencia de SAP desktop
-            result = cv2.matchTemplate(screenshot_cv, self.sap_desktop_image, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            max_val, max_loc = template_matcher.match_score(self.sap_desktop_image, screenshot_cv)
             
             # Umbral de confianza para considerar que está en SAP
-            confidence_threshold = 0.7
+            confidence_threshold = get_threshold('sap_desktop', 0.7)
             
-            if max_val >= confidence_threshold:
+            if max_val > confidence_threshold:
                 logger.info(f"SAP desktop detectado con confianza: {max_val:.3f}")
                 return True
             else:
@@ -569,32 +606,27 @@ class Vision:
             logger.info("Verificando si ya está en el formulario de órdenes de ventas")
             
             # Tomar captura de pantalla actual
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+            screenshot_cv = grab_screen()
             
             # Buscar múltiples elementos característicos del formulario
             elements_found = 0
             total_elements = 3
             
             # 1. Buscar campo de cliente en la pantalla actual
-            result_client = cv2.matchTemplate(screenshot_cv, self.client_field_image, cv2.TM_CCOEFF_NORMED)
-            min_val_client, max_val_client, min_loc_client, max_loc_client = cv2.minMaxLoc(result_client)
-            if max_val_client > 0.7:
+            max_val_client, max_loc_client = template_matcher.match_score(self.client_field_image, screenshot_cv)
+            if max_val_client > get_threshold('client_field', 0.7):
                 logger.info("Campo de cliente encontrado")
                 elements_found += 1
             
             # 2. Buscar campo de orden de compra en la pantalla actual
-            result_orden = cv2.matchTemplate(screenshot_cv, self.orden_compra_image, cv2.TM_CCOEFF_NORMED)
-            min_val_orden, max_val_orden, min_loc_orden, max_loc_orden = cv2.minMaxLoc(result_orden)
-            if max_val_orden > 0.7:
+            max_val_orden, max_loc_orden = template_matcher.match_score(self.orden_compra_image, screenshot_cv)
+            if max_val_orden > get_threshold('orden_compra', 0.7):
                 logger.info("Campo de orden de compra encontrado")
                 elements_found += 1
             
             # 3. Buscar campo de fecha de entrega en la pantalla actual
-            result_fecha = cv2.matchTemplate(screenshot_cv, self.fecha_entrega_image, cv2.TM_CCOEFF_NORMED)
-            min_val_fecha, max_val_fecha, min_loc_fecha, max_loc_fecha = cv2.minMaxLoc(result_fecha)
-            if max_val_fecha > 0.7:
+            max_val_fecha, max_loc_fecha = template_matcher.match_score(self.fecha_entrega_image, screenshot_cv)
+            if max_val_fecha > get_threshold('fecha_entrega', 0.7):
                 logger.info("Campo de fecha de entrega encontrado")
                 elements_found += 1
             
@@ -0,0 +1,303 @@
+"""
+Fuentes de captura de pantalla intercambiables
+Permite reemplazar la pantalla en vivo por una sesión grabada (replay)
+para probar y medir la visión fuera del escritorio remoto de producción
+"""
+
+import os
+import json
+import time
+import glob
+import threading
+import cv2
+import numpy as np
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, List, Dict, Any
+from rpa.config_manager import config
+from rpa.vision.frame_buffer import debug_frames
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.jsonl'
+LABELS_FILE = 'labels.json'
+
+
+class ScreenSource:
+    """Interfaz común: grab() retorna la pantalla como imagen BGR"""
+
+    name = 'base'
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None) -> Optional[np.ndarray]:
+        """
+        Captura la pantalla o una región de ella
+
+        Args:
+            region: Región opcional (x, y, width, height)
+
+        Returns:
+            Imagen BGR o None si no hay captura disponible
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Libera los recursos de la fuente"""
+        pass
+
+
+class LiveScreenSource(ScreenSource):
+    """Pantalla real mediante pyautogui (importado solo al capturar)"""
+
+    name = 'live'
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None) -> Optional[np.ndarray]:
+        import pyautogui
+        screenshot = pyautogui.screenshot(region=region) if region else pyautogui.screenshot()
+        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+
+
+class StaticScreenSource(ScreenSource):
+    """Sirve siempre la misma captura (benchmarks y pruebas unitarias)"""
+
+    name = 'static'
+
+    def __init__(self, frame: np.ndarray):
+        self.frame = frame
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None) -> Optional[np.ndarray]:
+        if region:
+            x, y, w, h = region
+            return self.frame[y:y+h, x:x+w]
+        return self.frame
+
+
+class ReplayScreenSource(ScreenSource):
+    """
+    Reproduce una secuencia grabada de capturas en lugar de la pantalla real
+
+    Acepta un directorio de PNG (ordenados por manifest.jsonl si existe, o por
+    nombre) o un contenedor .npz con un arreglo por captura. Cada captura se
+    sirve `hold` veces antes de avanzar; al final se repite la última o se
+    vuelve a empezar si `loop` es True.
+    """
+
+    name = 'replay'
+
+    def __init__(self, path: str, loop: bool = False, hold: int = 1):
+        self.path = path
+        self.loop = loop
+        self.hold = max(1, hold)
+        self.index = 0
+        self._served = 0
+        self._npz = None
+        self._cache: Tuple[int, Optional[np.ndarray]] = (-1, None)
+        self.entries: List[Dict[str, Any]] = self._load_entries(path)
+        self.labels: Dict[str, Any] = self._load_labels(path)
+        logger.info(f"Replay de {len(self.entries)} capturas desde {path}")
+
+    def _load_entries(self, path: str) -> List[Dict[str, Any]]:
+        """Lista las capturas de la sesión con sus metadatos"""
+        if path.endswith('.npz'):
+            self._npz = np.load(path)
+            return [{'file': key} for key in sorted(self._npz.files)]
+
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+
+        return [{'file': os.path.basename(p)} for p in sorted(glob.glob(os.path.join(path, '*.png')))]
+
+    def _load_labels(self, path: str) -> Dict[str, Any]:
+        """Carga las etiquetas de referencia (labels.json) si existen"""
+        base_dir = os.path.dirname(path) if path.endswith('.npz') else path
+        labels_path = os.path.join(base_dir, LABELS_FILE)
+        if not os.path.exists(labels_path):
+            return {}
+        with open(labels_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def current_name(self) -> Optional[str]:
+        """Nombre de la captura actual"""
+        if not self.entries:
+            return None
+        return self.entries[self.index]['file']
+
+    def seek(self, index: int):
+        """Posiciona la reproducción en la captura indicada"""
+        self.index = max(0, min(index, len(self.entries) - 1))
+        self._served = 0
+
+    def frame(self, index: int) -> Optional[np.ndarray]:
+        """Decodifica una captura por índice (se mantiene la última en memoria)"""
+        if self._cache[0] == index:
+            return self._cache[1]
+
+        name = self.entries[index]['file']
+        if self._npz is not None:
+            image = self._npz[name]
+        else:
+            image = cv2.imread(os.path.join(self.path, name), cv2.IMREAD_COLOR)
+            if image is None:
+                logger.error(f"No se pudo leer la captura grabada: {name}")
+
+        self._cache = (index, image)
+        return image
+
+    def frames(self):
+        """Itera (nombre, imagen) sobre toda la sesión sin alterar la posición"""
+        for index, entry in enumerate(self.entries):
+            yield entry['file'], self.frame(index)
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None) -> Optional[np.ndarray]:
+        if not self.entries:
+            return None
+
+        image = self.frame(self.index)
+        self._advance()
+
+        if image is not None and region:
+            x, y, w, h = region
+            image = image[y:y+h, x:x+w]
+        return image
+
+    def _advance(self):
+        """Avanza a la siguiente captura después de `hold` lecturas"""
+        self._served += 1
+        if self._served < self.hold:
+            return
+        self._served = 0
+        if self.index + 1 < len(self.entries):
+            self.index += 1
+        elif self.loop:
+            self.index = 0
+
+    def close(self):
+        if self._npz is not None:
+            self._npz.close()
+            self._npz = None
+
+
+class RecordingScreenSource(ScreenSource):
+    """
+    Envuelve otra fuente y guarda cada captura como PNG con su manifest.jsonl
+
+    La escritura se hace en un hilo aparte para no frenar el ciclo del RPA;
+    las capturas idénticas a la anterior se omiten si skip_unchanged es True.
+    """
+
+    name = 'record'
+
+    def __init__(self, inner: ScreenSource, output_dir: str, skip_unchanged: bool = True):
+        from rpa.vision.change_detector import change_detector
+        self.inner = inner
+        self.output_dir = output_dir
+        self.skip_unchanged = skip_unchanged
+        self._detector = change_detector
+        self._last_fp = None
+        self._count = len(glob.glob(os.path.join(output_dir, 'frame_*.png')))
+        self._annotations: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screen-recorder")
+        os.makedirs(output_dir, exist_ok=True)
+
+    def annotate(self, **info):
+        """Agrega metadatos (p. ej. estado del RPA) a las capturas siguientes"""
+        self._annotations.update(info)
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None) -> Optional[np.ndarray]:
+        # Se graba la pantalla completa para que el replay sirva cualquier región
+        image = self.inner.grab()
+        if image is None:
+            return None
+
+        fingerprint = self._detector.fingerprint(image)
+        if not (self.skip_unchanged and self._detector.is_same(self._last_fp, fingerprint)):
+            self._last_fp = fingerprint
+            self._record(image)
+
+        if region:
+            x, y, w, h = region
+            image = image[y:y+h, x:x+w]
+        return image
+
+    def _record(self, image: np.ndarray):
+        """Encola la escritura de la captura y su línea de manifest"""
+        with self._lock:
+            self._count += 1
+            entry = dict(self._annotations, file=f"frame_{self._count:06d}.png", timestamp=time.time())
+        self._writer.submit(self._write, image.copy(), entry)
+
+    def _write(self, image: np.ndarray, entry: Dict[str, Any]):
+        try:
+            cv2.imwrite(os.path.join(self.output_dir, entry['file']), image)
+            with open(os.path.join(self.output_dir, MANIFEST_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except Exception as e:
+            logger.error(f"Error guardando captura grabada {entry['file']}: {e}")
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self.inner.close()
+
+
+def create_screen_source(mode: str = None, path: str = None) -> ScreenSource:
+    """
+    Crea la fuente de captura indicada (por defecto según screen_source.* en config)
+
+    Args:
+        mode: 'live', 'replay' o 'record'
+        path: Sesión a reproducir o directorio donde grabar
+    """
+    mode = mode or config.get('screen_source.mode', 'live')
+    path = path or config.get('screen_source.path', './recordings')
+
+    if mode == 'replay':
+        return ReplayScreenSource(path, loop=config.get('screen_source.loop', False))
+    if mode == 'record':
+        return RecordingScreenSource(
+            LiveScreenSource(), path,
+            skip_unchanged=config.get('screen_source.skip_unchanged', True)
+        )
+    return LiveScreenSource()
+
+
+# Instancia global de la fuente de captura (se crea en el primer uso)
+_screen_source: Optional[ScreenSource] = None
+
+def get_screen_source() -> ScreenSource:
+    """Retorna la fuente de captura activa"""
+    global _screen_source
+    if _screen_source is None:
+        _screen_source = create_screen_source()
+    return _screen_source
+
+def set_screen_source(source: ScreenSource) -> ScreenSource:
+    """Reemplaza la fuente de captura activa (p. ej. por un replay en tests)"""
+    global _screen_source
+    previous = _screen_source
+    _screen_source = source
+    # Los resultados memorizados corresponden a la fuente anterior
+    from rpa.vision.change_detector import change_detector
+    change_detector.clear()
+    return previous
+
+def grab_screen(region: Optional[Tuple[int, int, int, int]] = None) -> Optional[np.ndarray]:
+    """Función de conveniencia: captura BGR desde la fuente activa"""
+    frame = get_screen_source().grab(region)
+    if region is None:
+        # Las capturas completas alimentan el buffer de depuración (sin tocar disco);
+        # los sondeos de una pantalla que no cambió no se vuelven a agregar
+        debug_frames.add_if_changed(frame)
+    return frame
+
+def annotate_screen_source(**info):
+    """Agrega metadatos a las capturas grabadas (sin efecto si no se está grabando)"""
+    source = get_screen_source()
+    if isinstance(source, RecordingScreenSource):
+        source.annotate(**info)
@@ -3,23 +3,76 @@ Módulo consolidado para template matching
 Elimina duplicación de código y centraliza la lógica de reconocimiento de imágenes
 """
 
+import os
+import time
+import weakref
 import cv2
 import numpy as np
-import pyautogui
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Optional, Tuple, Dict, Any
-from rpa.config_manager import get_confidence, get_delay
+from rpa.config_manager import config, get_confidence, get_delay
+from rpa.vision.change_detector import change_detector
+from rpa.vision.screen_source import grab_screen
+from rpa.vision.asset_bundle import asset_bundle
+from rpa.vision.thresholds import get_threshold
+from rpa.watchdog import watchdog_sleep
 
 # Configurar logger
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class MatchResult:
+    """Resultado de buscar un template dentro de una captura"""
+    name: str
+    confidence: float
+    coordinates: Optional[Tuple[int, int]] = None
+    top_left: Optional[Tuple[int, int]] = None
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def found(self) -> bool:
+        return self.coordinates is not None
+
+
+@dataclass
+class BatchMatchResult:
+    """Resultado de un lote de templates buscados sobre la misma captura"""
+    results: Dict[str, MatchResult] = field(default_factory=dict)
+    total_time: float = 0.0
+    workers: int = 1
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """Tiempo de matching por template en segundos"""
+        return {name: result.elapsed for name, result in self.results.items()}
+
+    def coordinates(self) -> Dict[str, Optional[Tuple[int, int]]]:
+        """Coordenadas por template (None si no superó el umbral)"""
+        return {name: result.coordinates for name, result in self.results.items()}
+
+    def confidences(self) -> Dict[str, float]:
+        """Confianza máxima obtenida por template"""
+        return {name: result.confidence for name, result in self.results.items()}
+
+
 class TemplateMatcher:
     """Clase centralizada para operaciones de template matching"""
     
     def __init__(self):
         self.screenshot_cache = {}
-        self.template_cache = {}
+        # Caché por ruta -> (mtime, imagen normalizada); algunas referencias se reescriben en ejecución
+        self.template_cache: Dict[str, Tuple[float, np.ndarray]] = {}
+        # Máscaras alfa por id de template -> (referencia débil, máscara)
+        self._template_masks: Dict[int, Tuple[weakref.ref, np.ndarray]] = {}
+        # Ruta de origen por id de template -> (referencia débil, ruta)
+        self._template_paths: Dict[int, Tuple[weakref.ref, str]] = {}
+        # cv2.matchTemplate libera el GIL: los lotes se reparten en hilos
+        self.batch_workers = config.get('template_matching.batch_workers', 0) or os.cpu_count() or 1
+        self._executors: Dict[int, ThreadPoolExecutor] = {}
     
     def find_template(self, 
                      template_image: np.ndarray, 
@@ -33,7 +86,7 @@ class TemplateMatcher:
         Args:
             template_image: Imagen template a buscar
             target_image: Imagen donde buscar (si es None, toma screenshot)
-            confidence: Umbral de confianza (si es None, usa el por defecto)
+            confidence: Umbral de confianza (si es None, usa el calibrado del template o el por defecto)
             offset: Offset para ajustar el punto central (x, y)
             search_region: Región de búsqueda (x, y, width, height)
         
@@ -52,9 +105,9 @@ class TemplateMatcher:
             logger.error("No se pudo obtener target image")
             return None
         
-        # Usar confianza por defecto si no se especifica
+        # Usar el umbral calibrado (o el por defecto) si no se especifica
         if confidence is None:
-            confidence = get_confidence('default')
+            confidence = self.default_threshold(template_image)
         
         # Aplicar región de búsqueda si se especifica
         if search_region:
@@ -66,13 +119,12 @@ class TemplateMatcher:
         
         try:
             # Realizar template matching
-            result = cv2.matchTemplate(target_image, template_image, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            max_val, max_loc = self.match_score(template_image, target_image)
             
             logger.debug(f"Template matching - Confianza: {max_val:.3f}, Umbral: {confidence}")
             
             # Verificar si se encontró match con suficiente confianza
-            if max_val >= confidence:
+            if max_val > confidence:
                 # Calcular coordenadas del centro
                 template_h, template_w = template_image.shape[:2]
                 center_x = max_loc[0] + template_w // 2 + offset[0] + region_offset[0]
@@ -81,46 +133,111 @@ class TemplateMatcher:
                 logger.info(f"Template encontrado en ({center_x}, {center_y}) con confianza {max_val:.3f}")
                 return (center_x, center_y)
             else:
-                logger.warning(f"Template no encontrado. Confianza: {max_val:.3f} < {confidence}")
+                logger.warning(f"Template no encontrado. Confianza: {max_val:.3f} <= {confidence}")
                 return None
                 
         except Exception as e:
             logger.error(f"Error en template matching: {str(e)}")
             return None
     
+    def match_score(self,
+                    template_image: np.ndarray,
+                    target_image: np.ndarray) -> Tuple[float, Tuple[int, int]]:
+        """
+        Ejecuta el template matching y retorna la confianza máxima y su posición
+        
+        Los templates con transparencia (ver load_template_image) se comparan con
+        TM_CCORR_NORMED y su máscara alfa, ignorando los píxeles transparentes.
+        
+        Args:
+            template_image: Imagen template a buscar
+            target_image: Imagen donde buscar
+        
+        Returns:
+            Tupla (confianza máxima, esquina superior izquierda del match)
+        """
+        mask = self.get_template_mask(template_image)
+        if mask is None:
+            result = cv2.matchTemplate(target_image, template_image, cv2.TM_CCOEFF_NORMED)
+        else:
+            result = cv2.matchTemplate(target_image, template_image, cv2.TM_CCORR_NORMED, mask=mask)
+            # Con máscara las zonas planas pueden producir inf/nan
+            result = np.nan_to_num(result, nan=0.0, posinf=0.0, neginf=0.0)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, max_loc
+    
     def find_template_with_timeout(self,
                                   template_image: np.ndarray,
                                   timeout: float = None,
                                   confidence: float = None,
-                                  check_interval: float = 0.1) -> Optional[Tuple[int, int]]:
+                                  check_interval: float = 0.1,
+                                  search_region: Optional[Tuple[int, int, int, int]] = None) -> Optional[Tuple[int, int]]:
         """
         Busca un template con timeout, útil para esperar que aparezcan elementos
         
+        Solo repite el template matching cuando la pantalla cambió respecto a la
+        captura anterior; si es idéntica reutiliza el resultado previo.
+        
         Args:
             template_image: Imagen template a buscar
             timeout: Tiempo máximo de espera en segundos
             confidence: Umbral de confianza
             check_interval: Intervalo entre verificaciones
+            search_region: Región de búsqueda (x, y, width, height)
         
         Returns:
             Coordenadas del match o None si timeout
         """
-        import time
-        
         if timeout is None:
             timeout = get_delay('template_timeout') or 10.0
         
         start_time = time.time()
+        # Solo los templates cargados desde archivo tienen una clave estable (ruta + mtime)
+        template_path = self.get_template_path(template_image)
+        cache_key = None
+        if template_path is not None:
+            cache_key = ('find_template', template_path, self.template_cache[template_path][0],
+                         confidence, search_region)
         
         while time.time() - start_time < timeout:
-            coordinates = self.find_template(template_image, confidence=confidence)
-            if coordinates:
-                return coordinates
-            time.sleep(check_interval)
+            screenshot = self._get_current_screenshot()
+            if screenshot is not None:
+                if cache_key is None:
+                    coordinates = self.find_template(template_image, screenshot, confidence,
+                                                     search_region=search_region)
+                else:
+                    coordinates = change_detector.cached_call(
+                        cache_key,
+                        screenshot,
+                        lambda: self.find_template(template_image, screenshot, confidence,
+                                                   search_region=search_region),
+                        region=search_region
+                    )
+                if coordinates:
+                    return coordinates
+            watchdog_sleep(check_interval)
         
         logger.warning(f"Template no encontrado después de {timeout} segundos")
         return None
     
+    def wait_for_change(self,
+                        region: Optional[Tuple[int, int, int, int]] = None,
+                        timeout: float = 10.0,
+                        check_interval: float = 0.05) -> bool:
+        """
+        Espera hasta que cambien los píxeles de una región de la pantalla
+        
+        Args:
+            region: Región a vigilar (x, y, width, height); None para toda la pantalla
+            timeout: Tiempo máximo de espera
+            check_interval: Intervalo entre capturas
+        
+        Returns:
+            True si hubo cambio, False si timeout
+        """
+        return change_detector.wait_for_change(region, timeout, check_interval,
+                                               grab=self._get_current_screenshot)
+    
     def find_multiple_templates(self, 
                               templates: Dict[str, np.ndarray],
                               confidence: float = None) -> Dict[str, Optional[Tuple[int, int]]]:
@@ -138,19 +255,110 @@ class TemplateMatcher:
         if target_image is None:
             return {name: None for name in templates.keys()}
         
-        results = {}
-        for name, template in templates.items():
-            results[name] = self.find_template(template, target_image, confidence)
+        return self.match_batch(templates, target_image, confidence=confidence).coordinates()
+    
+    def match_batch(self,
+                    templates: Dict[str, np.ndarray],
+                    target_image: Optional[np.ndarray] = None,
+                    regions: Optional[Dict[str, Tuple[int, int, int, int]]] = None,
+                    thresholds: Optional[Dict[str, float]] = None,
+                    confidence: float = None,
+                    max_workers: Optional[int] = None) -> BatchMatchResult:
+        """
+        Busca varios templates sobre una misma captura repartiendo el trabajo en hilos
         
-        return results
+        Args:
+            templates: Diccionario con nombre -> imagen template
+            target_image: Imagen donde buscar (si es None, toma screenshot)
+            regions: Región de búsqueda opcional por template (x, y, width, height)
+            thresholds: Umbral opcional por template
+            confidence: Umbral común para los templates sin umbral propio
+            max_workers: Hilos a usar (por defecto template_matching.batch_workers)
+        
+        Returns:
+            BatchMatchResult con el resultado y el tiempo de cada template
+        """
+        start_time = time.perf_counter()
+        regions = regions or {}
+        thresholds = thresholds or {}
+        if confidence is None:
+            confidence = get_confidence('default')
+        
+        if target_image is None:
+            target_image = self._get_current_screenshot()
+        
+        workers = max(1, min(max_workers or self.batch_workers, len(templates) or 1))
+        
+        if target_image is None:
+            logger.error("No se pudo obtener target image para el lote")
+            results = {name: MatchResult(name, 0.0, error="Sin captura") for name in templates}
+            return BatchMatchResult(results, time.perf_counter() - start_time, workers)
+        
+        jobs = [
+            (name, template, regions.get(name), thresholds.get(name, confidence))
+            for name, template in templates.items()
+        ]
+        
+        if workers == 1:
+            matches = [self._match_job(target_image, *job) for job in jobs]
+        else:
+            executor = self._get_executor(workers)
+            matches = list(executor.map(lambda job: self._match_job(target_image, *job), jobs))
+        
+        batch = BatchMatchResult(
+            {match.name: match for match in matches},
+            time.perf_counter() - start_time,
+            workers
+        )
+        logger.debug(f"Lote de {len(jobs)} templates en {batch.total_time * 1000:.1f} ms con {workers} hilos")
+        return batch
+    
+    def _match_job(self,
+                   target_image: np.ndarray,
+                   name: str,
+                   template_image: Optional[np.ndarray],
+                   search_region: Optional[Tuple[int, int, int, int]],
+                   confidence: float) -> MatchResult:
+        """Ejecuta un template del lote; los errores quedan en el resultado"""
+        job_start = time.perf_counter()
+        if template_image is None:
+            return MatchResult(name, 0.0, error="Template no cargado")
+        
+        try:
+            if search_region:
+                x, y, w, h = search_region
+                target = target_image[y:y+h, x:x+w]
+                region_offset = (x, y)
+            else:
+                target = target_image
+                region_offset = (0, 0)
+            
+            max_val, max_loc = self.match_score(template_image, target)
+            top_left = (max_loc[0] + region_offset[0], max_loc[1] + region_offset[1])
+            coordinates = None
+            if max_val > confidence:
+                template_h, template_w = template_image.shape[:2]
+                coordinates = (top_left[0] + template_w // 2, top_left[1] + template_h // 2)
+            
+            return MatchResult(name, max_val, coordinates, top_left, time.perf_counter() - job_start)
+        
+        except Exception as e:
+            logger.error(f"Error en template matching de '{name}': {str(e)}")
+            return MatchResult(name, 0.0, elapsed=time.perf_counter() - job_start, error=str(e))
+    
+    def _get_executor(self, workers: int) -> ThreadPoolExecutor:
+        """Obtiene (o crea) el pool de hilos para el número de workers indicado"""
+        if workers not in self._executors:
+            self._executors[workers] = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="template-match"
+            )
+        return self._executors[workers]
     
     def _get_current_screenshot(self) -> Optional[np.ndarray]:
-        """Obtiene screenshot actual y lo convierte a formato OpenCV"""
+        """Obtiene screenshot actual (fuente activa: en vivo o replay) en formato OpenCV"""
         try:
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-            return screenshot_cv
+            return grab_screen()
         except Exception as e:
             logger.error(f"Error tomando screenshot: {str(e)}")
             return None
@@ -159,31 +367,120 @@ class TemplateMatcher:
         """
         Carga una imagen template desde archivo con caché
         
+        La imagen se toma del paquete precalculado (asset_bundle) si está vigente;
+        si no, se lee con IMREAD_UNCHANGED y se normaliza una sola vez a BGR.
+        Si tiene canal alfa con transparencia se registra su máscara. La caché
+        se invalida cuando cambia la fecha de modificación del archivo.
+        
         Args:
             image_path: Ruta al archivo de imagen
         
         Returns:
-            Imagen cargada o None si error
+            Imagen BGR cargada o None si error
         """
-        if image_path in self.template_cache:
-            return self.template_cache[image_path]
+        try:
+            mtime = os.path.getmtime(image_path)
+        except OSError:
+            logger.error(f"No se pudo cargar la imagen: {image_path}")
+            return None
+        
+        cached = self.template_cache.get(image_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
         
         try:
-            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
-            if image is not None:
-                self.template_cache[image_path] = image
-                logger.debug(f"Template cargado y almacenado en caché: {image_path}")
+            # El paquete precalculado evita decodificar el PNG si está vigente
+            bundled = asset_bundle.lookup(image_path)
+            if bundled is not None:
+                image, mask = bundled
             else:
-                logger.error(f"No se pudo cargar la imagen: {image_path}")
+                raw_image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+                if raw_image is None:
+                    logger.error(f"No se pudo cargar la imagen: {image_path}")
+                    return None
+                image, mask = self.normalize_template(raw_image)
+            
+            self.register_mask(image, mask)
+            self._template_paths[id(image)] = (weakref.ref(image), image_path)
+            self.template_cache[image_path] = (mtime, image)
+            logger.debug(f"Template cargado y almacenado en caché: {image_path}"
+                         f"{' (con máscara alfa)' if mask is not None else ''}")
             return image
         except Exception as e:
             logger.error(f"Error cargando imagen {image_path}: {str(e)}")
             return None
     
+    def normalize_template(self, image: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Convierte un template a BGR de 3 canales y extrae su máscara alfa
+        
+        Args:
+            image: Imagen leída con IMREAD_UNCHANGED (gris, BGR o BGRA)
+        
+        Returns:
+            Tupla (imagen BGR, máscara uint8 0/255 o None si es opaca)
+        """
+        if image.ndim == 2:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR), None
+        
+        if image.shape[2] == 4:
+            bgr = np.ascontiguousarray(image[:, :, :3])
+            alpha = image[:, :, 3]
+            if alpha.min() == 255:
+                # Canal alfa totalmente opaco: no aporta nada al matching
+                return bgr, None
+            mask = np.where(alpha > 0, 255, 0).astype(np.uint8)
+            return bgr, mask
+        
+        return image, None
+    
+    def register_mask(self, template_image: np.ndarray, mask: Optional[np.ndarray]):
+        """Asocia una máscara alfa a un template ya normalizado"""
+        if mask is None:
+            self._template_masks.pop(id(template_image), None)
+            return
+        self._template_masks[id(template_image)] = (weakref.ref(template_image), mask)
+    
+    def get_template_mask(self, template_image: np.ndarray) -> Optional[np.ndarray]:
+        """Retorna la máscara alfa de un template, o None si es opaco"""
+        entry = self._template_masks.get(id(template_image))
+        if entry is None:
+            return None
+        # El id puede reutilizarse tras liberar el arreglo original
+        if entry[0]() is not template_image:
+            del self._template_masks[id(template_image)]
+            return None
+        return entry[1]
+    
+    def get_template_path(self, template_image: np.ndarray) -> Optional[str]:
+        """Ruta de la que se cargó un template vigente, o None si no viene de load_template_image"""
+        entry = self._template_paths.get(id(template_image))
+        if entry is None:
+            return None
+        # El id puede reutilizarse tras liberar el arreglo original
+        if entry[0]() is not template_image:
+            del self._template_paths[id(template_image)]
+            return None
+        cached = self.template_cache.get(entry[1])
+        if cached is None or cached[1] is not template_image:
+            # La referencia se recargó (cambió el archivo): esta imagen ya no es la vigente
+            return None
+        return entry[1]
+    
+    def default_threshold(self, template_image: np.ndarray) -> float:
+        """Umbral calibrado del template (por nombre de archivo) o el umbral por defecto"""
+        default = get_confidence('default')
+        template_path = self.get_template_path(template_image)
+        if template_path is None:
+            return default
+        return get_threshold(os.path.splitext(os.path.basename(template_path))[0], default)
+    
     def clear_cache(self):
         """Limpia el caché de templates e imágenes"""
         self.screenshot_cache.clear()
         self.template_cache.clear()
+        self._template_paths.clear()
+        change_detector.clear()
         logger.info("Caché de templates limpiado")
     
     def get_template_info(self, template_image: np.ndarray) -> Dict[str, Any]:
@@ -198,7 +495,8 @@ class TemplateMatcher:
             'width': width,
             'height': height,
             'channels': channels,
-            'dtype': str(template_image.dtype)
+            'dtype': str(template_image.dtype),
+            'masked': self.get_template_mask(template_image) is not None
         }
 
 
@@ -0,0 +1,134 @@
+"""
+Tabla de umbrales de confianza calibrados por template
+Los valores se generan con scripts/calibrate_thresholds.py a partir de capturas
+etiquetadas; si un template no está en la tabla se usa el umbral del código.
+Un match se acepta solo si su confianza es estrictamente mayor al umbral
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Dict, Any, List, Optional
+from rpa.config_manager import config
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLDS_FILE = './rpa/vision/thresholds.json'
+
+
+def calibrate_threshold(positives: List[float], negatives: List[float]) -> Dict[str, Any]:
+    """
+    Calcula el umbral que mejor separa las confianzas positivas de las negativas
+
+    Si las clases no se solapan, el umbral es el punto medio entre la menor
+    positiva y la mayor negativa (margen máximo hacia ambos lados). Si se
+    solapan, se elige el punto de corte con menos errores y, a igualdad de
+    errores, el de mayor margen.
+
+    Args:
+        positives: Confianzas en capturas donde el template está presente
+        negatives: Confianzas máximas en capturas donde no está
+
+    Returns:
+        Diccionario con threshold, margin, errores y estadísticas de ambas clases
+    """
+    if not positives:
+        raise ValueError("Se requiere al menos una captura positiva para calibrar")
+
+    positive_min = min(positives)
+    negative_max = max(negatives) if negatives else 0.0
+
+    if positive_min > negative_max:
+        threshold = (positive_min + negative_max) / 2
+        errors = 0
+    else:
+        # Candidatos: puntos medios entre confianzas consecutivas
+        scores = sorted(set(positives) | set(negatives))
+        candidates = [(a + b) / 2 for a, b in zip(scores, scores[1:])] or scores
+        best = None
+        for candidate in candidates:
+            # Un match se acepta con confianza > umbral (misma comparación que Vision)
+            candidate_errors = (sum(1 for p in positives if p <= candidate) +
+                                sum(1 for n in negatives if n > candidate))
+            nearest = min(abs(score - candidate) for score in scores)
+            key = (candidate_errors, -nearest)
+            if best is None or key < best[0]:
+                best = (key, candidate)
+        errors, threshold = best[0][0], best[1]
+
+    return {
+        'threshold': round(threshold, 4),
+        'margin': round(positive_min - negative_max, 4),
+        'errors': errors,
+        'positive_min': round(positive_min, 4),
+        'negative_max': round(negative_max, 4),
+        'positives': len(positives),
+        'negatives': len(negatives),
+    }
+
+
+class ThresholdTable:
+    """Carga la tabla de umbrales y la recarga si el archivo cambia"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.get('template_matching.thresholds_file', DEFAULT_THRESHOLDS_FILE)
+        self._mtime: Optional[float] = None
+        self._table: Dict[str, Any] = {}
+
+    def _refresh(self):
+        """Relee el archivo solo si cambió su fecha de modificación"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._table, self._mtime = {}, None
+            return
+
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._table = json.load(f)
+            self._mtime = mtime
+            logger.info(f"Tabla de umbrales cargada: {self.path}")
+        except Exception as e:
+            logger.error(f"Error cargando tabla de umbrales {self.path}: {e}")
+            self._table = {}
+
+    def get(self, name: str, default: float, section: str = 'templates') -> float:
+        """
+        Obtiene el umbral calibrado de un template (o de una pantalla)
+
+        Args:
+            name: Nombre del template (archivo sin extensión) o de la pantalla
+            default: Umbral a usar si no hay calibración
+            section: 'templates' o 'screen_states'
+        """
+        self._refresh()
+        entry = self._table.get(section, {}).get(name)
+        if entry is None:
+            return default
+        return entry['threshold']
+
+    def save(self, templates: Dict[str, Any], screen_states: Dict[str, Any], sources: List[str]):
+        """Escribe la tabla de umbrales (reemplazo atómico del archivo)"""
+        table = {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'sources': sources,
+            'templates': templates,
+            'screen_states': screen_states,
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(table, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self._mtime = None
+
+
+# Instancia global de la tabla de umbrales
+threshold_table = ThresholdTable()
+
+def get_threshold(name: str, default: float, section: str = 'templates') -> float:
+    """Función de conveniencia para obtener un umbral calibrado"""
+    return threshold_table.get(name, default, section)
@@ -0,0 +1,202 @@
+"""
+Watchdog de la máquina de estados
+Vigila un plazo máximo por estado, publica un archivo de heartbeat y permite
+interrumpir de forma cooperativa un manejador que se quedó colgado
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Optional, Dict, Any
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+
+
+class StateTimeoutError(BaseException):
+    """
+    El estado actual superó su plazo máximo
+
+    Hereda de BaseException (como KeyboardInterrupt) para que los
+    `except Exception` de las acciones no oculten la interrupción.
+    """
+
+    def __init__(self, state: str, timeout: float):
+        super().__init__(f"Timeout en estado {state} después de {timeout:.0f}s")
+        self.state = state
+        self.timeout = timeout
+
+
+class StateWatchdog:
+    """
+    Plazo por estado + heartbeat en un hilo aparte
+
+    El hilo no puede detener una llamada bloqueante; cuando vence el plazo
+    marca el estado como expirado y el manejador se interrumpe en el siguiente
+    punto de espera (watchdog_sleep / check), lanzando StateTimeoutError.
+    """
+
+    def __init__(self):
+        self.enabled = config.get('watchdog.enabled', True)
+        self.default_timeout = config.get('watchdog.default_timeout', 120)
+        self.state_timeouts: Dict[str, float] = config.get('watchdog.state_timeouts', {}) or {}
+        self.heartbeat_file = config.get('watchdog.heartbeat_file', './logs/heartbeat.json')
+        self.heartbeat_interval = config.get('watchdog.heartbeat_interval', 5)
+
+        self.state: Optional[str] = None
+        self.file: Optional[str] = None
+        self.timeout: Optional[float] = None
+        self.state_started: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.timeouts_count = 0
+
+        self._expired = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def get_timeout(self, state: str) -> float:
+        """Plazo configurado para un estado (o el plazo por defecto)"""
+        return float(self.state_timeouts.get(state, self.default_timeout))
+
+    def start(self):
+        """Inicia el hilo de vigilancia (idempotente)"""
+        if not self.enabled or self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="state-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de vigilancia"""
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def enter_state(self, state: str, file: Optional[str] = None, extra_time: float = 0.0):
+        """
+        Arma el plazo para un nuevo estado
+
+        Args:
+            state: Valor del RPAState que se va a ejecutar
+            file: Archivo en proceso (para el heartbeat)
+            extra_time: Segundos adicionales (p. ej. proporcional a los items)
+        """
+        with self._lock:
+            now = time.time()
+            self.state = state
+            self.file = file
+            self.timeout = self.get_timeout(state) + extra_time
+            self.state_started = now
+            self.deadline = now + self.timeout if self.timeout > 0 else None
+            self._expired.clear()
+        self._wakeup.set()
+
+    def clear(self):
+        """Desarma el plazo (el robot queda en espera)"""
+        with self._lock:
+            self.state = None
+            self.file = None
+            self.deadline = None
+            self._expired.clear()
+        self._wakeup.set()
+
+    @property
+    def expired(self) -> bool:
+        """True si el estado actual superó su plazo"""
+        if not self._expired.is_set() and self.deadline is not None and time.time() > self.deadline:
+            self._mark_expired()
+        return self._expired.is_set()
+
+    def check(self):
+        """Punto de interrupción: lanza StateTimeoutError si venció el plazo"""
+        if not self.enabled:
+            return
+        if self._expired.is_set() or (self.deadline is not None and time.time() > self.deadline):
+            self._mark_expired()
+            raise StateTimeoutError(self.state or "desconocido", self.timeout or 0)
+
+    def sleep(self, seconds: float):
+        """Espera interrumpible: termina antes y lanza StateTimeoutError si vence el plazo"""
+        if not self.enabled or self.deadline is None:
+            time.sleep(seconds)
+            return
+        self.check()
+        remaining = self.deadline - time.time()
+        if seconds <= remaining:
+            time.sleep(seconds)
+            return
+        # La espera cruza el plazo: esperar solo hasta el plazo
+        self._expired.wait(max(0.0, remaining))
+        self.check()
+
+    def heartbeat(self) -> Dict[str, Any]:
+        """Contenido del heartbeat actual"""
+        now = time.time()
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'timestamp': now,
+                'state': self.state,
+                'file': self.file,
+                'state_elapsed': round(now - self.state_started, 1) if self.state and self.state_started else None,
+                'deadline_in': round(self.deadline - now, 1) if self.deadline else None,
+                'expired': self._expired.is_set(),
+                'timeouts': self.timeouts_count,
+            }
+
+    def write_heartbeat(self):
+        """Escribe el heartbeat de forma atómica (archivo temporal + rename)"""
+        if not self.heartbeat_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.heartbeat_file)), exist_ok=True)
+            temp_file = self.heartbeat_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.heartbeat(), f)
+            os.replace(temp_file, self.heartbeat_file)
+        except Exception as e:
+            rpa_logger.warning(f"No se pudo escribir heartbeat: {e}")
+
+    def _mark_expired(self):
+        """Marca el plazo como vencido (una sola vez por estado)"""
+        with self._lock:
+            if self._expired.is_set():
+                return
+            self._expired.set()
+            self.timeouts_count += 1
+        rpa_logger.log_error(
+            f"WATCHDOG: estado {self.state} superó su plazo de {self.timeout:.0f}s",
+            f"Archivo: {self.file}"
+        )
+
+    def _run(self):
+        while self._running:
+            deadline = self.deadline
+            if deadline is not None and time.time() > deadline:
+                self._mark_expired()
+            self.write_heartbeat()
+
+            wait = self.heartbeat_interval
+            if deadline is not None and not self._expired.is_set():
+                wait = max(0.05, min(wait, deadline - time.time()))
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+
+# Instancia global del watchdog
+state_watchdog = StateWatchdog()
+
+
+# Funciones de conveniencia
+def watchdog_sleep(seconds: float):
+    """Reemplazo de time.sleep() que respeta el plazo del estado actual"""
+    state_watchdog.sleep(seconds)
+
+
+def watchdog_check():
+    """Punto de interrupción cooperativa para bucles largos"""
+    state_watchdog.check()
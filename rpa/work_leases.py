@@ -0,0 +1,297 @@
+"""
+Coordinación de varios robots sobre una misma cola de órdenes
+Cada orden se toma con un lease: un archivo <orden>.lease creado con
+O_CREAT | O_EXCL en un directorio compartido, así solo un robot puede tomarla.
+El dueño renueva el lease con un heartbeat mientras procesa; si el robot muere,
+el lease vence y otro robot lo reclama (la orden sigue en la cola hasta que se
+mueve a procesados, así que vencer el lease equivale a volver a encolarla)
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from rpa.config_manager import config
+from rpa.simple_logger import rpa_logger
+
+LEASE_SUFFIX = '.lease'
+LOCK_SUFFIX = '.lock'
+# Reintentos del candado al liberar (otro robot puede estar evaluando el lease en ese momento)
+RELEASE_ATTEMPTS = 50
+RELEASE_RETRY_SECONDS = 0.02
+# Lease de la etapa de entrada (planillas, validación previa y división): un solo robot a la vez
+INTAKE_LEASE = '__intake__'
+
+
+class LeaseLost(Exception):
+    """El lease venció y lo tomó otro robot"""
+    pass
+
+
+class LeaseManager:
+    """
+    Leases de órdenes en un directorio compartido
+
+    El reclamo de un lease vencido y la renovación se hacen bajo un candado
+    corto (<orden>.lease.lock, también O_EXCL) para que dos robots no lo
+    reclamen a la vez ni un dueño atrasado pise el lease de otro. El
+    contenido del lease se reemplaza con os.replace (atómico).
+
+    Args:
+        lease_dir: Directorio compartido de leases
+        worker_id: Identificador de este robot (aparece en los logs)
+        ttl: Segundos de validez de un lease sin heartbeat
+        heartbeat_interval: Segundos entre renovaciones
+        clock: Reloj de pared (time.time por defecto)
+    """
+
+    def __init__(self, lease_dir: str = None, worker_id: str = None, ttl: float = None,
+                 heartbeat_interval: float = None, clock=None):
+        self.lease_dir = lease_dir or config.get('workers.lease_dir', './data/outputs_json/.leases')
+        self.worker_id = worker_id or config.get('workers.worker_id') or rpa_logger.worker_id
+        self.ttl = ttl if ttl is not None else config.get('workers.lease_ttl', 120)
+        self.heartbeat_interval = (heartbeat_interval if heartbeat_interval is not None
+                                   else config.get('workers.heartbeat_interval', 30))
+        self.clock = clock or time.time
+
+    def _lease_path(self, name: str) -> str:
+        return os.path.join(self.lease_dir, name + LEASE_SUFFIX)
+
+    def read(self, name: str) -> Optional[Dict[str, Any]]:
+        """Contenido del lease de una orden, o None si no existe o está incompleto"""
+        try:
+            with open(self._lease_path(name), 'r', encoding='utf-8') as f:
+                lease = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return lease if isinstance(lease, dict) else None
+
+    def _new_lease(self, name: str, claimed_at: float = None) -> Dict[str, Any]:
+        now = self.clock()
+        return {'name': name, 'worker': self.worker_id, 'claimed_at': claimed_at or now,
+                'heartbeat_at': now, 'expires_at': now + self.ttl}
+
+    def _write(self, name: str, lease: Dict[str, Any]):
+        temp_file = f"{self._lease_path(name)}.{self.worker_id}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(lease, f)
+        os.replace(temp_file, self._lease_path(name))
+
+    def _expired(self, lease: Optional[Dict[str, Any]], path: str) -> bool:
+        if lease is None:
+            # Lease ilegible (robot muerto durante la escritura): vence por fecha de modificación
+            try:
+                return os.path.getmtime(path) + self.ttl < self.clock()
+            except OSError:
+                return True
+        return float(lease.get('expires_at', 0)) < self.clock()
+
+    def _acquire(self, lock_path: str) -> bool:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            pass
+        try:
+            abandoned = os.path.getmtime(lock_path) + self.ttl < self.clock()
+        except OSError:
+            abandoned = True
+        if not abandoned:
+            return False
+        try:
+            os.remove(lock_path)
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except OSError:
+            return False
+
+    @contextmanager
+    def _locked(self, name: str, attempts: int = 1):
+        """Candado corto por orden; un candado abandonado se rompe después de ttl"""
+        lock_path = self._lease_path(name) + LOCK_SUFFIX
+        acquired = self._acquire(lock_path)
+        retry = threading.Event()
+        for _ in range(attempts - 1):
+            if acquired:
+                break
+            # Event.wait: espera real aunque time.sleep esté reemplazado (simulador)
+            retry.wait(RELEASE_RETRY_SECONDS)
+            acquired = self._acquire(lock_path)
+        if not acquired:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def claim(self, name: str) -> bool:
+        """
+        Toma una orden para este robot
+
+        Args:
+            name: Nombre del archivo de la orden
+
+        Returns:
+            True si el lease quedó a nombre de este robot
+        """
+        os.makedirs(self.lease_dir, exist_ok=True)
+        if self._create(name):
+            return True
+        return self._claim_existing(name)
+
+    def _create(self, name: str) -> bool:
+        """Crea el lease si no existe (O_EXCL: solo un robot lo logra)"""
+        try:
+            fd = os.open(self._lease_path(name), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._new_lease(name), f)
+        return True
+
+    def _claim_existing(self, name: str) -> bool:
+        with self._locked(name) as locked:
+            if not locked:
+                return False
+            path = self._lease_path(name)
+            if not os.path.exists(path):
+                # Se liberó mientras tanto
+                return self._create(name)
+            current = self.read(name)
+            if current is not None and current.get('worker') == self.worker_id:
+                # Lease propio (p. ej. ciclo anterior de este mismo robot): se renueva
+                self._write(name, self._new_lease(name, current.get('claimed_at')))
+                return True
+            if not self._expired(current, path):
+                return False
+            self._write(name, self._new_lease(name))
+        previous = current.get('worker') if current else 'desconocido'
+        rpa_logger.log_action("Lease vencido reclamado, la orden vuelve a procesarse",
+                              f"Orden: {name}, Robot anterior: {previous}, Robot: {self.worker_id}")
+        return True
+
+    def heartbeat(self, name: str) -> bool:
+        """
+        Renueva el lease de una orden propia
+
+        Returns:
+            False si el lease ya no es de este robot
+        """
+        with self._locked(name) as locked:
+            current = self.read(name)
+            if current is None or current.get('worker') != self.worker_id:
+                return False
+            if not locked:
+                # Otro robot evalúa el lease en este momento; se reintenta en el próximo heartbeat
+                return not self._expired(current, self._lease_path(name))
+            self._write(name, self._new_lease(name, current.get('claimed_at')))
+            return True
+
+    def release(self, name: str) -> bool:
+        """Libera el lease de una orden propia (no toca leases de otros robots)"""
+        with self._locked(name, attempts=RELEASE_ATTEMPTS) as locked:
+            current = self.read(name)
+            if not locked or current is None or current.get('worker') != self.worker_id:
+                return False
+            try:
+                os.remove(self._lease_path(name))
+            except OSError:
+                return False
+            return True
+
+    def leases(self) -> List[Dict[str, Any]]:
+        """Leases existentes con su estado (para monitoreo)"""
+        result = []
+        try:
+            names = sorted(f for f in os.listdir(self.lease_dir) if f.endswith(LEASE_SUFFIX))
+        except OSError:
+            return result
+        for file_name in names:
+            name = file_name[:-len(LEASE_SUFFIX)]
+            lease = self.read(name)
+            expired = self._expired(lease, os.path.join(self.lease_dir, file_name))
+            lease = dict(lease or {'name': name, 'worker': None}, expired=expired)
+            result.append(lease)
+        return result
+
+    @contextmanager
+    def claimed(self, name: str):
+        """
+        Toma el lease de una orden solo mientras dura el bloque (etapa de entrada:
+        dividir o mandar a cuarentena un archivo que otro robot podría estar procesando)
+
+        Entrega False si la orden es de otro robot; en ese caso no se debe mover.
+        """
+        try:
+            owned = self.claim(name)
+        except OSError as e:
+            rpa_logger.log_error(f"No se pudo tomar el lease: {str(e)}", f"Orden: {name}")
+            owned = False
+        try:
+            yield owned
+        finally:
+            if owned:
+                self.release(name)
+
+    @contextmanager
+    def hold(self, name: str):
+        """
+        Mantiene el lease de una orden con un heartbeat en segundo plano
+
+        El lease se libera al salir. Si se pierde, el atributo 'lost' del objeto
+        entregado queda en True y el proceso debe evitar mover la orden.
+        """
+        keeper = LeaseKeeper(self, name)
+        keeper.start()
+        try:
+            yield keeper
+        finally:
+            keeper.stop()
+            self.release(name)
+
+
+class LeaseKeeper:
+    """Hilo de heartbeat de un lease"""
+
+    def __init__(self, manager: LeaseManager, name: str):
+        self.manager = manager
+        self.name = name
+        self.lost = False
+        # Event.wait usa tiempo real aunque time.sleep esté reemplazado (simulador)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.manager.heartbeat_interval):
+            try:
+                renewed = self.manager.heartbeat(self.name)
+            except OSError as e:
+                rpa_logger.warning(f"No se pudo renovar el lease: {e} ({self.name})")
+                continue
+            if not renewed:
+                self.lost = True
+                rpa_logger.log_error("Lease perdido: otro robot tomó la orden",
+                                     f"Orden: {self.name}, Robot: {self.manager.worker_id}")
+                return
+
+    def check(self):
+        """Lanza LeaseLost si el lease ya no es de este robot"""
+        if self.lost:
+            raise LeaseLost(self.name)
+
+
+# Instancia global de leases (solo se usa con workers.enabled)
+work_leases = LeaseManager()
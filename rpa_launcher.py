@@ -11,6 +11,8 @@ import queue
 import time
 from PIL import Image, ImageTk
 import webbrowser
+from rpa.processed_archive import processed_archive
+from rpa.supervisor import request_control, clear_controls, DRAIN, RELOAD
 
 class RPALauncher:
     def __init__(self):
@@ -35,6 +37,8 @@ class RPALauncher:
         self.rpa_process = None
         self.is_running = False
         self.log_queue = queue.Queue()
+        # Segundos que se espera a que el RPA termine la orden en curso antes de forzar la salida
+        self.drain_timeout = 900
         
         # Crear interfaz
         self.create_widgets()
@@ -123,6 +127,11 @@ class RPALauncher:
                                      command=self.toggle_rpa, style="Accent.TButton")
         self.main_button.pack(pady=10, ipadx=20, ipady=10)
         
+        # Recarga en caliente de config.yaml e imágenes de referencia (sin reiniciar SAP)
+        self.reload_button = ttk.Button(control_frame, text="♻️ Recargar configuración",
+                                       command=self.reload_rpa)
+        self.reload_button.pack(pady=(0, 10))
+        
         # Información de archivos JSON
         json_frame = ttk.LabelFrame(control_frame, text="Archivos JSON", padding=5)
         json_frame.pack(fill=tk.X, pady=20)
@@ -225,6 +234,9 @@ class RPALauncher:
             
             self.log_message("Iniciando sistema RPA...")
             
+            # Un pedido de detener o recargar pendiente de la ejecución anterior no aplica a esta
+            clear_controls()
+            
             # Iniciar proceso de Python
             self.rpa_process = subprocess.Popen(
                 [sys.executable, "main.py"],
@@ -250,28 +262,49 @@ class RPALauncher:
     
     def stop_rpa(self):
         try:
-            if self.rpa_process and self.rpa_process.poll() is None:
-                self.log_message("Deteniendo sistema RPA...")
-                self.rpa_process.terminate()
+            process = self.rpa_process
+            if process and process.poll() is None:
+                # Drenaje: el RPA termina la orden en curso, vacía logs y sale solo
+                self.log_message("Deteniendo sistema RPA (terminando la orden en curso)...")
+                request_control(DRAIN)
+                self.main_button.config(state=tk.DISABLED)
                 
-                # Esperar un poco para terminación limpia
-                try:
-                    self.rpa_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # Forzar terminación si no responde
-                    self.rpa_process.kill()
-                    self.log_message("Proceso RPA forzado a terminar", "WARNING")
-            
-            # Actualizar estado
-            self.is_running = False
-            self.status_label.config(text="Estado: Detenido", foreground="red")
-            self.main_button.config(text="🚀 INICIAR RPA")
+                def wait_for_drain():
+                    try:
+                        process.wait(timeout=self.drain_timeout)
+                    except subprocess.TimeoutExpired:
+                        # Forzar terminación si no termina la orden a tiempo
+                        process.terminate()
+                        try:
+                            process.wait(timeout=5)
+                        except subprocess.TimeoutExpired:
+                            process.kill()
+                        self.log_message("Proceso RPA forzado a terminar", "WARNING")
+                    self.root.after(0, self.on_rpa_stopped)
+                
+                threading.Thread(target=wait_for_drain, daemon=True).start()
+                return
             
-            self.log_message("Sistema RPA detenido", "SUCCESS")
+            self.on_rpa_stopped()
             
         except Exception as e:
             self.log_message(f"Error al detener RPA: {str(e)}", "ERROR")
     
+    def on_rpa_stopped(self):
+        # Actualizar estado
+        self.is_running = False
+        self.status_label.config(text="Estado: Detenido", foreground="red")
+        self.main_button.config(text="🚀 INICIAR RPA", state=tk.NORMAL)
+        
+        self.log_message("Sistema RPA detenido", "SUCCESS")
+    
+    def reload_rpa(self):
+        if self.rpa_process and self.rpa_process.poll() is None:
+            request_control(RELOAD)
+            self.log_message("Recarga de configuración solicitada (se aplica entre órdenes)")
+        else:
+            self.log_message("El sistema RPA no está en ejecución", "WARNING")
+    
     def start_output_monitor(self):
         def monitor_output():
             if self.rpa_process:
@@ -366,18 +399,8 @@ class RPALauncher:
             json_files = glob.glob("data/outputs_json/*.json")
             pending_count = len(json_files)
             
-            # Contar archivos procesados hoy
-            processed_dir = "data/outputs_json/Procesados"
-            processed_today = 0
-            
-            if os.path.exists(processed_dir):
-                today = datetime.now().date()
-                for file in os.listdir(processed_dir):
-                    if file.endswith('.json'):
-                        file_path = os.path.join(processed_dir, file)
-                        file_date = datetime.fromtimestamp(os.path.getmtime(file_path)).date()
-                        if file_date == today:
-                            processed_today += 1
+            # Contar archivos procesados hoy (contador diario del índice de procesados)
+            processed_today = processed_archive.processed_on()
             
             # Actualizar labels
             self.json_pending_label.config(text=f"Pendientes: {pending_count}")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark de template matching en lote (TemplateMatcher.match_batch)
+Compara el tiempo de un lote de templates con 1, 2, 4 y 8 hilos
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cv2
+import numpy as np
+
+from rpa.vision.template_matcher import template_matcher
+
+REFERENCE_DIR = './rpa/vision/reference_images'
+
+# Templates que ScreenDetector busca en cada detección
+DETECTION_TEMPLATES = [
+    'remote_desktop.png',
+    'sap_icon.png',
+    'sap_modulos_menu_button.png',
+    'sap_main_interface.png',
+    'client_field.png',
+    'orden_compra.png',
+    'fecha_entrega.png',
+    'agregar_y_button.png',
+    'sap_agregar_docum_button.png',
+]
+
+
+def build_synthetic_frame(templates, width, height, seed=7):
+    """Genera una captura sintética con los templates pegados en posiciones aleatorias"""
+    rng = np.random.default_rng(seed)
+    frame = np.full((height, width, 3), 236, dtype=np.uint8)
+    frame += rng.integers(0, 6, size=frame.shape, dtype=np.uint8)
+
+    for template in templates.values():
+        h, w = template.shape[:2]
+        if w >= width or h >= height:
+            continue
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - h))
+        frame[y:y+h, x:x+w] = template[:, :, :3]
+    return frame
+
+
+def load_templates(max_side):
+    """Carga los templates de detección descartando los más grandes que la pantalla"""
+    templates = {}
+    for file_name in DETECTION_TEMPLATES:
+        image = cv2.imread(os.path.join(REFERENCE_DIR, file_name), cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"⚠️  No se pudo cargar {file_name}, se omite")
+            continue
+        h, w = image.shape[:2]
+        if max(h, w) > max_side:
+            # Las capturas completas (remote_desktop, sap_main_interface) se reducen
+            scale = max_side / max(h, w)
+            image = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        templates[os.path.splitext(file_name)[0]] = image
+    return templates
+
+
+def run_benchmark(width, height, worker_counts, repeats):
+    """Ejecuta el lote con cada número de hilos y retorna la mediana por configuración"""
+    templates = load_templates(max_side=min(width, height) // 2)
+    frame = build_synthetic_frame(templates, width, height)
+
+    print(f"\nResolución {width}x{height} - {len(templates)} templates - {repeats} repeticiones")
+    print(f"{'Hilos':>6} {'Mediana (ms)':>14} {'Mín (ms)':>10} {'Speedup':>8}")
+
+    baseline = None
+    medians = {}
+    for workers in worker_counts:
+        # Calentamiento: crea el pool y carga cachés de OpenCV
+        template_matcher.match_batch(templates, frame, confidence=0.0, max_workers=workers)
+
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            template_matcher.match_batch(templates, frame, confidence=0.0, max_workers=workers)
+            samples.append(time.perf_counter() - start)
+
+        median = statistics.median(samples)
+        medians[workers] = median
+        if baseline is None:
+            baseline = median
+        print(f"{workers:>6} {median * 1000:>14.1f} {min(samples) * 1000:>10.1f} {baseline / median:>7.2f}x")
+
+    return medians
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de template matching en lote")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--resolution', default='1920x1080', help='Resolución ANCHOxALTO de la captura sintética')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+
+    print("=" * 60)
+    print("BENCHMARK: TemplateMatcher.match_batch")
+    print(f"CPU disponibles: {os.cpu_count()}, hilos OpenCV: {cv2.getNumThreads()}")
+    print("=" * 60)
+
+    run_benchmark(width, height, args.workers, args.repeats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark del modelo de órdenes
+Interpreta una cola sintética grande de órdenes y compara el acceso anterior
+(diccionarios del JSON, fechas re-parseadas en cada estado y cantidades
+convertidas en cada tecla) con Order/OrderItem construidos una sola vez;
+reporta también la memoria por item con __slots__ frente a diccionarios
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rpa.order_model import Order
+
+
+def build_backlog(orders, items_per_order, seed):
+    """JSON de órdenes sintéticas con el formato de data/outputs_json"""
+    rng = random.Random(seed)
+    backlog = []
+    for _ in range(orders):
+        day = rng.randint(1, 28)
+        backlog.append(json.dumps({
+            'comprador': {'nit': f'CN89090{rng.randint(1000, 9999)}'},
+            'orden_compra': str(rng.randint(4500000000, 4599999999)),
+            'fecha_entrega': f'{day:02d}/11/2026',
+            'fecha_documento': f'{day:02d}/10/2026',
+            'items': [{'codigo': f'PT{rng.randint(10000, 99999)}', 'cantidad': rng.randint(1, 5000),
+                       'fecha_entrega': f'{rng.randint(1, 28):02d}/11/2026'}
+                      for _ in range(items_per_order)],
+        }))
+    return backlog
+
+
+def dict_access(data):
+    """Acceso anterior: cada estado vuelve a recorrer y convertir el diccionario"""
+    def try_parse(value):
+        for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+            try:
+                return datetime.strptime(value, fmt)
+            except Exception:
+                pass
+        return None
+
+    nit = data['comprador']['nit']
+    orden = data['orden_compra']
+    candidates = [(data['fecha_entrega'], try_parse(data['fecha_entrega']))]
+    candidates += [(item['fecha_entrega'], try_parse(item['fecha_entrega'])) for item in data['items']]
+    fecha = max((c for c in candidates if c[1]), key=lambda c: c[1])[0]
+    keys = [(item['codigo'], str(item['cantidad'])) for item in data['items']]
+    return nit, orden, fecha, keys
+
+
+def model_build(data):
+    """Intake con el modelo: se interpreta una sola vez"""
+    return Order.from_dict(data)
+
+
+def model_access(order):
+    """Lectura de un estado (o de un reintento) con el modelo ya construido"""
+    keys = [(item.codigo, item.cantidad_text) for item in order.items]
+    return order.nit, order.orden_compra, order.fecha_entrega_sap, keys
+
+
+def measure(name, function, inputs):
+    start = time.perf_counter()
+    for value in inputs:
+        function(value)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<36} {elapsed * 1000:>10.1f} ms  {len(inputs) / elapsed:>10,.0f} órdenes/s")
+    return elapsed
+
+
+def memory_per_item(build, backlog):
+    tracemalloc.start()
+    kept = [build(json.loads(text)) for text in backlog]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    items = sum(len(json.loads(text)['items']) for text in backlog)
+    del kept
+    return current / items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del modelo Order/OrderItem')
+    parser.add_argument('--orders', type=int, default=5000, help='Órdenes en la cola sintética')
+    parser.add_argument('--items', type=int, default=20, help='Items por orden')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    backlog = build_backlog(args.orders, args.items, args.seed)
+    print(f"Cola sintética: {args.orders} órdenes x {args.items} items")
+
+    orders = [json.loads(text) for text in backlog]
+    dicts = measure('Diccionario (por intento)', dict_access, orders)
+    measure('Order.from_dict (una vez)', model_build, orders)
+    models = [Order.from_dict(data) for data in orders]
+    access = measure('Modelo construido (por intento)', model_access, models)
+    print(f"Aceleración por intento después del intake: {dicts / access:.1f}x")
+
+    dict_bytes = memory_per_item(lambda data: data['items'], backlog)
+    model_bytes = memory_per_item(lambda data: Order.from_dict(data).items, backlog)
+    print(f"Memoria por item: diccionario {dict_bytes:.0f} B, OrderItem {model_bytes:.0f} B")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de transiciones de la máquina de estados
+Simula decenas de miles de órdenes por el camino feliz y mide el costo por
+transición: búsqueda en la tabla compilada frente a la búsqueda anidada,
+y trigger_event completo con y sin checkpoints (logging desactivado)
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rpa.state_machine import StateMachine, RPAState, RPAEvent
+from rpa.simple_logger import rpa_logger
+import rpa.state_machine as state_machine_module
+from rpa.checkpoint_store import CheckpointStore
+
+# Eventos de una orden sin errores: de IDLE/COMPLETED hasta COMPLETED
+HAPPY_PATH = [
+    RPAEvent.START_PROCESSING,
+    RPAEvent.REMOTE_DESKTOP_CONNECTED,
+    RPAEvent.SAP_OPENED,
+    RPAEvent.SALES_ORDER_OPENED,
+    RPAEvent.NIT_LOADED,
+    RPAEvent.ORDER_LOADED,
+    RPAEvent.DATE_LOADED,
+    RPAEvent.ITEMS_LOADED,
+    RPAEvent.JSON_MOVED,
+    RPAEvent.MOUSE_POSITIONED,
+    RPAEvent.SCREENSHOT_TAKEN,
+    RPAEvent.GOOGLE_DRIVE_UPLOADED,
+]
+
+
+def nested_lookup(machine, orders):
+    """Resolución anterior: dos búsquedas anidadas más los diccionarios de callbacks"""
+    state = RPAState.IDLE
+    for _ in range(orders):
+        for event in HAPPY_PATH:
+            events = machine.transitions[state]
+            if event not in events:
+                raise RuntimeError(f"Transición inválida: {event.value}")
+            new_state = events[event]
+            machine.state_exit_callbacks.get(state)
+            machine.state_entry_callbacks.get(new_state)
+            state = new_state
+
+
+def compiled_lookup(machine, orders):
+    """Resolución con la tabla compilada (estado, evento)"""
+    table = machine._table
+    state = RPAState.IDLE
+    for _ in range(orders):
+        for event in HAPPY_PATH:
+            transition = table.get((state, event))
+            if transition is None:
+                raise RuntimeError(f"Transición inválida: {event.value}")
+            state = transition.target
+
+
+def full_trigger(machine, orders):
+    """trigger_event completo (callbacks y checkpoints incluidos)"""
+    machine.reset()
+    machine.context.current_file = 'benchmark.json'
+    for _ in range(orders):
+        for event in HAPPY_PATH:
+            if not machine.trigger_event(event):
+                raise RuntimeError(f"Transición rechazada: {event.value}")
+
+
+def measure(name, function, machine, orders):
+    start = time.perf_counter()
+    function(machine, orders)
+    elapsed = time.perf_counter() - start
+    transitions = orders * len(HAPPY_PATH)
+    print(f"{name:<28} {elapsed * 1000:>10.1f} ms  {elapsed / transitions * 1e6:>8.2f} µs/transición  "
+          f"{transitions / elapsed:>12,.0f} transiciones/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de transiciones de la máquina de estados')
+    parser.add_argument('--orders', type=int, default=20000, help='Órdenes simuladas (lookups)')
+    parser.add_argument('--trigger-orders', type=int, default=2000,
+                        help='Órdenes simuladas con trigger_event completo')
+    parser.add_argument('--dot', help='Exporta además el grafo de transiciones a este archivo')
+    args = parser.parse_args()
+
+    machine = StateMachine()
+    if args.dot:
+        machine.export_dot(args.dot)
+        print(f"Grafo exportado: {args.dot}")
+
+    # El logging a archivo domina cualquier medición de la máquina de estados
+    rpa_logger.logger.disabled = True
+    temp_dir = tempfile.mkdtemp()
+    original_store = state_machine_module.checkpoint_store
+    store = CheckpointStore(os.path.join(temp_dir, 'journal.jsonl'))
+    state_machine_module.checkpoint_store = store
+
+    try:
+        print(f"Órdenes: {args.orders} ({args.orders * len(HAPPY_PATH)} transiciones)")
+        nested = measure('Búsqueda anidada', nested_lookup, machine, args.orders)
+        compiled = measure('Tabla compilada', compiled_lookup, machine, args.orders)
+        print(f"Aceleración de la búsqueda: {nested / compiled:.2f}x")
+
+        print(f"\nÓrdenes con trigger_event: {args.trigger_orders}")
+        measure('trigger_event + checkpoints', full_trigger, machine, args.trigger_orders)
+        machine.save_checkpoint = lambda: True
+        machine.cleanup_checkpoint = lambda: True
+        measure('trigger_event sin checkpoints', full_trigger, machine, args.trigger_orders)
+    finally:
+        store.close()
+        state_machine_module.checkpoint_store = original_store
+        rpa_logger.logger.disabled = False
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
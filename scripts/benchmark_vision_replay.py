@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark de visión sobre una sesión grabada (replay)
+Reporta latencia y precisión por template y de ScreenDetector contra labels.json
+
+Formato de labels.json (junto a las capturas):
+    {
+        "frame_000001.png": {
+            "screen_state": "sap_desktop",
+            "templates": {"sap_icon": [512, 300], "client_field": null}
+        }
+    }
+Un template con coordenadas debe encontrarse a menos de --tolerance píxeles;
+uno con null no debe encontrarse.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rpa.vision.screen_source import ReplayScreenSource, set_screen_source
+from rpa.vision.template_matcher import template_matcher
+from rpa.vision.change_detector import change_detector
+
+REFERENCE_DIR = './rpa/vision/reference_images'
+
+
+def percentile(samples, pct):
+    """Percentil simple sobre una lista de muestras"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def is_hit(found, expected, tolerance):
+    """Indica si las coordenadas encontradas coinciden con las esperadas"""
+    return (abs(found[0] - expected[0]) <= tolerance and
+            abs(found[1] - expected[1]) <= tolerance)
+
+
+def benchmark_templates(replay, template_names, confidence, tolerance):
+    """Mide find_template por captura y template contra las etiquetas"""
+    templates = {name: template_matcher.load_template_image(os.path.join(REFERENCE_DIR, f"{name}.png"))
+                 for name in template_names}
+    stats = {name: {'times': [], 'correct': 0, 'labeled': 0} for name in template_names}
+
+    for frame_name, frame in replay.frames():
+        if frame is None:
+            continue
+        labels = replay.labels.get(frame_name, {}).get('templates', {})
+        for name, template in templates.items():
+            if template is None:
+                continue
+            start = time.perf_counter()
+            found = template_matcher.find_template(template, frame, confidence=confidence)
+            stats[name]['times'].append(time.perf_counter() - start)
+
+            if name in labels:
+                expected = labels[name]
+                stats[name]['labeled'] += 1
+                if expected is None:
+                    correct = found is None
+                else:
+                    correct = found is not None and is_hit(found, expected, tolerance)
+                stats[name]['correct'] += int(correct)
+
+    return stats
+
+
+def benchmark_screen_detector(replay):
+    """Mide ScreenDetector.detect_current_screen recorriendo la sesión"""
+    from rpa.screen_detector import screen_detector
+
+    times = []
+    correct = labeled = 0
+    replay.seek(0)
+    for _ in range(len(replay)):
+        frame_name = replay.current_name
+        start = time.perf_counter()
+        result = screen_detector.detect_current_screen()
+        times.append(time.perf_counter() - start)
+
+        expected = replay.labels.get(frame_name, {}).get('screen_state')
+        if expected:
+            labeled += 1
+            correct += int(result.state.value == expected)
+
+    return {'times': times, 'correct': correct, 'labeled': labeled}
+
+
+def format_row(name, times, correct, labeled):
+    accuracy = f"{correct}/{labeled}" if labeled else "-"
+    return (f"{name:<32} {statistics.median(times) * 1000:>10.1f} "
+            f"{percentile(times, 95) * 1000:>10.1f} {accuracy:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de visión sobre una sesión grabada")
+    parser.add_argument('session', help='Directorio de PNG grabados o archivo .npz')
+    parser.add_argument('--templates', nargs='+', default=[
+        'sap_icon', 'sap_modulos_menu_button', 'client_field', 'orden_compra',
+        'fecha_entrega', 'agregar_y_button', 'sap_agregar_docum_button'
+    ])
+    parser.add_argument('--confidence', type=float, default=0.8)
+    parser.add_argument('--tolerance', type=int, default=5, help='Píxeles de tolerancia para acierto')
+    parser.add_argument('--no-cache', action='store_true', help='Desactiva el detector de cambios')
+    args = parser.parse_args()
+
+    if args.no_cache:
+        change_detector.enabled = False
+
+    replay = ReplayScreenSource(args.session)
+    if not len(replay):
+        print(f"❌ No hay capturas en {args.session}")
+        return 1
+    set_screen_source(replay)
+
+    print("=" * 66)
+    print(f"BENCHMARK DE VISIÓN (replay): {args.session} - {len(replay)} capturas")
+    print(f"Etiquetas: {len(replay.labels)} capturas etiquetadas")
+    print("=" * 66)
+    print(f"{'Operación':<32} {'Mediana ms':>10} {'p95 ms':>10} {'Aciertos':>10}")
+
+    template_stats = benchmark_templates(replay, args.templates, args.confidence, args.tolerance)
+    for name, stats in template_stats.items():
+        if stats['times']:
+            print(format_row(name, stats['times'], stats['correct'], stats['labeled']))
+        else:
+            print(f"{name:<32} {'⚠️  template no disponible':>32}")
+
+    detector_stats = benchmark_screen_detector(replay)
+    print(format_row('detect_current_screen', detector_stats['times'],
+                     detector_stats['correct'], detector_stats['labeled']))
+    print(f"\nDetector de cambios: {change_detector.stats['hits']} reutilizaciones, "
+          f"{change_detector.stats['misses']} cálculos completos")
+
+    replay.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
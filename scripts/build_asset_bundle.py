@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Construye el paquete de imágenes de referencia (rpa/vision/bundle)
+Empaqueta los templates activos con sus variantes precalculadas (BGR, gris,
+máscara y pirámide) y los umbrales calibrados en thresholds.json
+"""
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rpa.vision.asset_bundle import build_bundle, RUNTIME_WRITTEN, DEFAULT_BUNDLE_PATH
+from rpa.vision.thresholds import threshold_table
+from rpa.config_manager import config
+
+REFERENCE_DIR = './rpa/vision/reference_images'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el paquete de templates de referencia")
+    parser.add_argument('--reference-dir', default=REFERENCE_DIR)
+    parser.add_argument('--output', default=config.get('template_matching.asset_bundle', DEFAULT_BUNDLE_PATH))
+    parser.add_argument('--metadata', help='JSON opcional con metadatos por template (offset, región esperada)')
+    parser.add_argument('--pyramid-levels', type=int, default=2)
+    args = parser.parse_args()
+
+    thresholds = {}
+    if os.path.exists(threshold_table.path):
+        with open(threshold_table.path, 'r', encoding='utf-8') as f:
+            thresholds = json.load(f).get('templates', {})
+
+    metadata = {}
+    if args.metadata:
+        with open(args.metadata, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+
+    print("📦 Construyendo paquete de templates")
+    manifest = build_bundle(args.reference_dir, args.output, thresholds, metadata, args.pyramid_levels)
+
+    print(f"{'Template':<32} {'Tamaño':>10} {'Variantes':<30} {'Umbral':>7}")
+    for name, entry in sorted(manifest['entries'].items()):
+        shape = entry['arrays']['bgr']['shape']
+        threshold = f"{entry['threshold']:.3f}" if entry['threshold'] is not None else '-'
+        print(f"{name:<32} {shape[1]:>4}x{shape[0]:<5} {', '.join(entry['arrays']):<30} {threshold:>7}")
+
+    print(f"\n⏭️  No empaquetados (se reescriben en ejecución): {', '.join(sorted(RUNTIME_WRITTEN))}")
+    print(f"✅ Paquete {manifest['version']}: {len(manifest['entries'])} templates, "
+          f"{manifest['size'] / 1024:.0f} KB en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
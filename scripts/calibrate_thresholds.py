@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Calibración de umbrales de confianza por template
+Ejecuta cada imagen de referencia sobre sesiones grabadas y etiquetadas
+(ver scripts/benchmark_vision_replay.py para el formato de labels.json),
+calcula el umbral de margen máximo y escribe rpa/vision/thresholds.json
+"""
+
+import os
+import sys
+import glob
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rpa.vision.screen_source import ReplayScreenSource
+from rpa.vision.template_matcher import template_matcher
+from rpa.vision.thresholds import calibrate_threshold, threshold_table
+
+REFERENCE_DIR = './rpa/vision/reference_images'
+# Imágenes obsoletas o que se reescriben en ejecución: no son templates estables
+EXCLUDED_PREFIXES = ('old_',)
+EXCLUDED_FILES = {'template.png'}
+
+
+def active_templates():
+    """Templates de referencia vigentes por nombre"""
+    templates = {}
+    for path in sorted(glob.glob(os.path.join(REFERENCE_DIR, '*.png'))):
+        file_name = os.path.basename(path)
+        if file_name.startswith(EXCLUDED_PREFIXES) or file_name in EXCLUDED_FILES:
+            continue
+        image = template_matcher.load_template_image(path)
+        if image is not None:
+            templates[os.path.splitext(file_name)[0]] = image
+    return templates
+
+
+def positive_score(template, frame, expected, tolerance):
+    """Confianza del template alrededor de la posición etiquetada (centro)"""
+    h, w = template.shape[:2]
+    x = max(0, int(expected[0] - w // 2 - tolerance))
+    y = max(0, int(expected[1] - h // 2 - tolerance))
+    window = frame[y:y + h + 2 * tolerance, x:x + w + 2 * tolerance]
+    if window.shape[0] < h or window.shape[1] < w:
+        return None
+    return template_matcher.match_score(template, window)[0]
+
+
+def collect_scores(sessions, templates, tolerance):
+    """Recorre las sesiones y agrupa confianzas positivas y negativas"""
+    from rpa.screen_detector import screen_detector
+
+    template_scores = {name: {'pos': [], 'neg': []} for name in templates}
+    state_scores = {}
+
+    for session in sessions:
+        replay = ReplayScreenSource(session)
+        for frame_name, frame in replay.frames():
+            labels = replay.labels.get(frame_name)
+            if frame is None or not labels:
+                continue
+
+            for name, expected in labels.get('templates', {}).items():
+                if name not in templates:
+                    continue
+                if expected is None:
+                    template_scores[name]['neg'].append(template_matcher.match_score(templates[name], frame)[0])
+                else:
+                    score = positive_score(templates[name], frame, expected, tolerance)
+                    if score is not None:
+                        template_scores[name]['pos'].append(score)
+
+            expected_state = labels.get('screen_state')
+            if expected_state:
+                for state, confidence in screen_detector._compute_confidences(frame).items():
+                    scores = state_scores.setdefault(state.value, {'pos': [], 'neg': []})
+                    scores['pos' if state.value == expected_state else 'neg'].append(confidence)
+        replay.close()
+
+    return template_scores, state_scores
+
+
+def calibrate_all(scores):
+    """Calibra cada entrada con al menos una captura positiva"""
+    table = {}
+    for name, values in scores.items():
+        if values['pos']:
+            table[name] = calibrate_threshold(values['pos'], values['neg'])
+    return table
+
+
+def print_table(title, table):
+    print(f"\n{title}")
+    print(f"{'Nombre':<32} {'Umbral':>7} {'Margen':>8} {'Errores':>8} {'Pos':>5} {'Neg':>5}")
+    for name, entry in sorted(table.items()):
+        flag = '⚠️ ' if entry['errors'] else ''
+        print(f"{name:<32} {entry['threshold']:>7.3f} {entry['margin']:>8.3f} "
+              f"{entry['errors']:>8} {entry['positives']:>5} {entry['negatives']:>5} {flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra umbrales de confianza por template")
+    parser.add_argument('sessions', nargs='+', help='Sesiones grabadas con labels.json')
+    parser.add_argument('--tolerance', type=int, default=5, help='Píxeles alrededor de la posición etiquetada')
+    parser.add_argument('--output', default=threshold_table.path)
+    parser.add_argument('--dry-run', action='store_true', help='Mostrar la tabla sin escribirla')
+    args = parser.parse_args()
+
+    templates = active_templates()
+    print(f"📐 Calibrando {len(templates)} templates con {len(args.sessions)} sesiones")
+
+    template_scores, state_scores = collect_scores(args.sessions, templates, args.tolerance)
+    template_table = calibrate_all(template_scores)
+    state_table = calibrate_all(state_scores)
+
+    print_table("TEMPLATES", template_table)
+    print_table("PANTALLAS (ScreenDetector)", state_table)
+
+    uncalibrated = sorted(set(templates) - set(template_table))
+    if uncalibrated:
+        print(f"\n⚠️  Sin capturas positivas (se mantiene el umbral del código): {', '.join(uncalibrated)}")
+
+    if args.dry_run:
+        return 0
+
+    threshold_table.path = args.output
+    threshold_table.save(template_table, state_table, [os.path.abspath(s) for s in args.sessions])
+    print(f"\n✅ Tabla de umbrales escrita en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
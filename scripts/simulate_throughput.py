@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Prueba de rendimiento de punta a punta contra el simulador de SAP
+Ejecuta la máquina de estados completa sobre órdenes sintéticas en un
+formulario simulado (sin escritorio remoto) y reporta órdenes por hora en
+tiempo virtual, tiempo por fase y teclas enviadas mientras SAP estaba ocupado.
+
+Uso:
+    python scripts/simulate_throughput.py --orders 20 --items 8
+    python scripts/simulate_throughput.py --latency nit_lookup=4 --latency item_lookup=2.5
+    python scripts/simulate_throughput.py --customers 3 --group   # agrupar por NIT
+    python scripts/simulate_throughput.py --orders 40 --workers 4 # varios robots con leases
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import multiprocessing
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rpa.config_manager import config
+from rpa.sap_simulator import VirtualClock, SimulatedSAP, install_simulator
+
+
+def build_orders(count, items_per_order, seed, customers):
+    """Órdenes sintéticas con el formato de data/outputs_json"""
+    rng = random.Random(seed)
+    nits = [f'CN8909006{10 + index:02d}' for index in range(customers)]
+    orders = []
+    for number in range(count):
+        items = [
+            {'codigo': f'PT{rng.randint(10000, 99999)}', 'cantidad': rng.randint(1, 500)}
+            for _ in range(items_per_order)
+        ]
+        day = rng.randint(1, 28)
+        orders.append((f'sim_{number + 1:04d}.json', {
+            'comprador': {'nit': rng.choice(nits)},
+            'orden_compra': f'{rng.randint(4500000000, 4599999999)}',
+            'fecha_entrega': f'{day:02d}/11/2026',
+            'fecha_documento': f'{day:02d}/10/2026',
+            'items': items,
+        }))
+    return orders
+
+
+def schedule_orders(orders, directory, group):
+    """Ordena las órdenes con OrderScheduler (EDF, agrupando por NIT si se pide)"""
+    from rpa.order_scheduler import OrderScheduler
+
+    os.makedirs(directory, exist_ok=True)
+    by_name = dict(orders)
+    paths = []
+    for file_name, data in orders:
+        path = os.path.join(directory, file_name)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        paths.append(path)
+
+    scheduler = OrderScheduler(aging_rate=0.0, state_file='', group_by_customer=group,
+                               max_group_size=len(orders))
+    scheduler.sync(paths)
+    return [(order.file_name, by_name[order.file_name]) for order in scheduler.ordered()]
+
+
+def order_matches(saved, data):
+    """Compara la orden grabada en el simulador con la orden de entrada"""
+    expected_items = [(item['codigo'], str(item['cantidad'])) for item in data['items']]
+    return (saved.nit == data['comprador']['nit'] and
+            saved.orden_compra == data['orden_compra'] and
+            saved.fecha_entrega == data['fecha_entrega'] and
+            saved.items == expected_items)
+
+
+def parse_latencies(values):
+    latencies = {}
+    for value in values or []:
+        name, _, seconds = value.partition('=')
+        latencies[name] = float(seconds)
+    return latencies
+
+
+def install_rpa(output, latencies):
+    """Simulador instalado y RPA con los estados de disco y red simulados"""
+    clock = VirtualClock()
+    sap = SimulatedSAP(clock, latencies=latencies, output_dir=output)
+    install_simulator(sap)
+
+    # Importar el RPA después de instalar el simulador para que use el driver simulado
+    from rpa.state_machine import RPAState, RPAEvent
+    from rpa.checkpoint_store import checkpoint_store
+    from rpa.rpa_with_state_machine import RPAWithStateMachine
+
+    checkpoint_store.path = os.path.join(output, 'journal.jsonl')
+    rpa = RPAWithStateMachine()
+    # Mover archivos y subir a Google Drive tocan disco y red: se simulan como exitosos
+    rpa.state_machine.register_state_handler(RPAState.MOVING_JSON, lambda context, **kwargs: RPAEvent.JSON_MOVED)
+    rpa.state_machine.register_state_handler(RPAState.UPLOADING_TO_GOOGLE_DRIVE,
+                                             lambda context, **kwargs: RPAEvent.GOOGLE_DRIVE_UPLOADED)
+    return clock, sap, rpa
+
+
+def run_worker(worker_index, queue_dir, output, latencies, results_file):
+    """
+    Robot simulado que drena la cola compartida con leases
+
+    Cada robot tiene su propio SAP simulado y reloj virtual; las órdenes se
+    mueven a <output>/procesados solo si el lease sigue siendo del robot.
+    """
+    worker_output = os.path.join(output, f'robot_{worker_index}')
+    clock, sap, rpa = install_rpa(worker_output, latencies)
+    from rpa.simple_logger import rpa_logger
+    from rpa.work_leases import LeaseManager
+
+    worker_id = f'sim-{worker_index}'
+    rpa_logger.set_worker_id(worker_id)
+    # Los leases usan el reloj real: el virtual de cada robot avanza a su propio ritmo
+    leases = LeaseManager(lease_dir=os.path.join(output, '.leases'), worker_id=worker_id,
+                          clock=clock._real_time)
+    done_dir = os.path.join(output, 'procesados')
+    processed = []
+    start = clock.time()
+    for file_name in sorted(os.listdir(queue_dir)):
+        if not file_name.endswith('.json') or not leases.claim(file_name):
+            continue
+        with leases.hold(file_name) as lease:
+            path = os.path.join(queue_dir, file_name)
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            saved_before = len(sap.saved_orders)
+            success = rpa.process_single_file(file_name, data)
+            clock.sleep(max(0.0, sap.busy_until - clock.time()))
+            sap.advance()
+            saved = sap.saved_orders[saved_before:]
+            if success and not lease.lost:
+                os.replace(path, os.path.join(done_dir, file_name))
+            processed.append({'file': file_name,
+                              'ok': bool(success and len(saved) == 1 and order_matches(saved[0], data))})
+    with open(results_file, 'w', encoding='utf-8') as f:
+        json.dump({'worker': worker_id, 'virtual_time': clock.time() - start, 'orders': processed}, f)
+
+
+def run_workers(args, orders):
+    """Reparte la cola sintética entre varios procesos y verifica que ninguna orden se repita"""
+    queue_dir = os.path.join(args.output, 'cola')
+    for directory in (queue_dir, os.path.join(args.output, 'procesados')):
+        os.makedirs(directory, exist_ok=True)
+    for file_name, data in orders:
+        with open(os.path.join(queue_dir, file_name), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    context = multiprocessing.get_context('spawn')
+    results = [os.path.join(args.output, f'robot_{index}.json') for index in range(args.workers)]
+    workers = [context.Process(target=run_worker,
+                               args=(index, queue_dir, args.output, parse_latencies(args.latency), results[index]))
+               for index in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    processed = []
+    slowest = 0.0
+    for path in results:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            result = json.load(f)
+        processed.extend(result['orders'])
+        slowest = max(slowest, result['virtual_time'])
+        print(f"  {result['worker']}: {len(result['orders'])} órdenes en {result['virtual_time']:.1f}s virtuales")
+
+    names = [entry['file'] for entry in processed]
+    duplicated = len(names) - len(set(names))
+    correct = sum(1 for entry in processed if entry['ok'])
+    print("\nResumen con varios robots")
+    print(f"  Órdenes correctas: {correct}/{len(orders)} (repetidas: {duplicated})")
+    print(f"  Pendientes en la cola: {len(os.listdir(queue_dir))}")
+    print(f"  Órdenes por hora (todos los robots): {correct * 3600 / slowest:.1f}" if slowest else
+          "  Órdenes por hora: N/A")
+    return 0 if correct == len(orders) and not duplicated else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento del RPA contra el simulador de SAP')
+    parser.add_argument('--orders', type=int, default=10, help='Cantidad de órdenes sintéticas')
+    parser.add_argument('--items', type=int, default=5, help='Items por orden')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--customers', type=int, default=3, help='NIT distintos entre las órdenes')
+    parser.add_argument('--group', action='store_true', help='Agrupar órdenes consecutivas por NIT')
+    parser.add_argument('--latency', action='append', metavar='NOMBRE=SEG',
+                        help='Sobrescribe una latencia del simulador (repetible)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Robots en procesos separados sobre la misma cola (leases)')
+    parser.add_argument('--output', default=config.get('simulator.output_dir', './simulation'))
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        orders = build_orders(args.orders, args.items, args.seed, args.customers)
+        return run_workers(args, orders)
+
+    clock, sap, rpa = install_rpa(args.output, parse_latencies(args.latency))
+
+    orders = build_orders(args.orders, args.items, args.seed, args.customers)
+    orders = schedule_orders(orders, os.path.join(args.output, 'orders'), args.group)
+    durations = []
+    phases = {}
+    correct = 0
+    cpu_start = time.process_time()
+
+    for file_name, data in orders:
+        saved_before = len(sap.saved_orders)
+        start = clock.time()
+        success = rpa.process_single_file(file_name, data)
+        # La grabación en SAP termina después del último clic
+        clock.sleep(max(0.0, sap.busy_until - clock.time()))
+        sap.advance()
+        durations.append(clock.time() - start)
+
+        saved = sap.saved_orders[saved_before:]
+        matches = success and len(saved) == 1 and order_matches(saved[0], data)
+        correct += int(matches)
+        stats = rpa.state_machine.get_context().processing_stats
+        if matches:
+            rpa.record_header_time(stats)
+        for name, value in stats.items():
+            if name.endswith('_time') and isinstance(value, (int, float)):
+                phases.setdefault(name, []).append(value)
+        print(f"{file_name}: {'OK' if matches else 'ERROR'} en {durations[-1]:.1f}s virtuales")
+
+    cpu_time = time.process_time() - cpu_start
+    total = sum(durations)
+    print("\nResumen")
+    print(f"  Órdenes correctas: {correct}/{len(orders)}")
+    print(f"  Tiempo virtual total: {total:.1f}s (mediana por orden {statistics.median(durations):.1f}s)")
+    # Solo cuentan las órdenes grabadas correctamente en SAP
+    print(f"  Órdenes por hora: {correct * 3600 / total:.1f}" if total else "  Órdenes por hora: N/A")
+    print(f"  Tiempo real de CPU: {cpu_time:.1f}s")
+    print(f"  Teclas con SAP ocupado: {sap.stats['keys_while_busy']} de {sap.stats['keystrokes']}")
+    print(f"  Encabezado ({'agrupado' if args.group else 'sin agrupar'}): {rpa.header_time_summary()}")
+    if phases:
+        print("  Tiempo por fase (promedio):")
+        for name, values in sorted(phases.items()):
+            print(f"    {name}: {statistics.mean(values):.1f}s")
+    return 0 if correct == len(orders) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Tests de regresión de rendimiento de visión
+Solo se ejecutan con RPA_BENCHMARKS=1 (son lentos y dependen del equipo)
+"""
+
+import unittest
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+RUN_BENCHMARKS = os.environ.get('RPA_BENCHMARKS') == '1'
+
+try:
+    from tests.benchmarks import vision_benchmarks
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+
+@unittest.skipUnless(HAS_CV2, "OpenCV/numpy no disponibles")
+class TestBenchmarkComparison(unittest.TestCase):
+    """Tests para la comparación contra el baseline"""
+
+    def test_regression_beyond_threshold_is_reported(self):
+        """Test: Una mediana por encima del umbral se reporta como regresión"""
+        baseline = {'cases': {'find_template@1920x1080': {'median_ms': 10.0}}}
+        results = {'find_template@1920x1080': {'median_ms': 13.0}}
+        regressions = vision_benchmarks.compare(results, baseline, max_regression_pct=20)
+        self.assertEqual(len(regressions), 1)
+        self.assertEqual(results['find_template@1920x1080']['change_pct'], 30.0)
+
+    def test_within_threshold_and_new_cases_pass(self):
+        """Test: Variaciones dentro del umbral y casos sin baseline no fallan"""
+        baseline = {'cases': {'find_template@1920x1080': {'median_ms': 10.0}}}
+        results = {
+            'find_template@1920x1080': {'median_ms': 11.0},
+            'detect_current_screen@1920x1080': {'median_ms': 50.0},
+            'ocr_find_totales_by_text@1920x1080': {'skipped': 'Tesseract no disponible'},
+        }
+        self.assertEqual(vision_benchmarks.compare(results, baseline, max_regression_pct=20), [])
+
+
+@unittest.skipUnless(RUN_BENCHMARKS and HAS_CV2, "Benchmarks desactivados (RPA_BENCHMARKS=1 para ejecutarlos)")
+class TestVisionBenchmarks(unittest.TestCase):
+    """Ejecuta la suite y falla si alguna mediana regresa más allá del umbral"""
+
+    def test_no_regressions_against_baseline(self):
+        """Test: Ningún caso supera el baseline en más del porcentaje configurado"""
+        from rpa.config_manager import config
+        results = vision_benchmarks.run_suite(
+            vision_benchmarks.default_resolutions(),
+            repeats=config.get('benchmarks.repeats', 15),
+            recorded=os.environ.get('RPA_BENCHMARK_RECORDED')
+        )
+        vision_benchmarks.print_report(results)
+        regressions = vision_benchmarks.compare(
+            results,
+            vision_benchmarks.load_baseline(),
+            config.get('benchmarks.max_regression_pct', 20.0)
+        )
+        self.assertEqual(regressions, [], "\n".join(regressions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Suite de micro-benchmarks de visión con umbrales de regresión
+
+Mide TemplateMatcher.find_template, ScreenDetector.detect_current_screen,
+Vision.get_totales_section_coordinates y las rutas OCR sobre capturas
+sintéticas (varias resoluciones) y, si se indica, sobre una sesión grabada.
+Las medianas se comparan contra baseline.json; un caso falla si su mediana
+supera la del baseline en más de benchmarks.max_regression_pct.
+
+Uso:
+    python tests/benchmarks/vision_benchmarks.py                     # comparar
+    python tests/benchmarks/vision_benchmarks.py --update-baseline   # registrar baseline
+    python tests/benchmarks/vision_benchmarks.py --output run.json --recorded ./recordings
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import statistics
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+import cv2
+import numpy as np
+
+from rpa.config_manager import config
+from rpa.vision.template_matcher import template_matcher
+from rpa.vision.change_detector import change_detector
+from rpa.vision.screen_source import StaticScreenSource, ReplayScreenSource, set_screen_source
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+REFERENCE_DIR = './rpa/vision/reference_images'
+
+# Templates pegados en la captura sintética: (archivo, posición relativa x, y)
+SYNTHETIC_LAYOUT = [
+    ('sap_icon.png', 0.05, 0.10),
+    ('sap_modulos_menu_button.png', 0.02, 0.02),
+    ('client_field.png', 0.10, 0.20),
+    ('orden_compra.png', 0.10, 0.26),
+    ('fecha_entrega.png', 0.60, 0.20),
+    ('sap_totales_section.png', 0.62, 0.72),
+    ('agregar_y_button.png', 0.02, 0.93),
+]
+
+
+class BenchmarkSkipped(Exception):
+    """El caso no puede ejecutarse en este entorno (dependencia o archivo faltante)"""
+
+
+def load_reference(file_name: str) -> np.ndarray:
+    """Carga una imagen de referencia o marca el caso como omitido"""
+    image = template_matcher.load_template_image(os.path.join(REFERENCE_DIR, file_name))
+    if image is None:
+        raise BenchmarkSkipped(f"Imagen de referencia no disponible: {file_name}")
+    return image
+
+
+def build_synthetic_frame(width: int, height: int, seed: int = 11) -> np.ndarray:
+    """Captura sintética estilo SAP con los templates de referencia en posiciones fijas"""
+    rng = np.random.default_rng(seed)
+    frame = np.full((height, width, 3), 238, dtype=np.uint8)
+    frame += rng.integers(0, 4, size=frame.shape, dtype=np.uint8)
+
+    for file_name, rel_x, rel_y in SYNTHETIC_LAYOUT:
+        try:
+            template = load_reference(file_name)
+        except BenchmarkSkipped:
+            continue
+        h, w = template.shape[:2]
+        x = min(int(width * rel_x), width - w)
+        y = min(int(height * rel_y), height - h)
+        if x < 0 or y < 0:
+            continue
+        frame[y:y+h, x:x+w] = template
+    return frame
+
+
+def _vision():
+    """Vision importa pytesseract/easyocr: si no están, los casos se omiten"""
+    try:
+        from rpa.vision.main import Vision
+    except ImportError as e:
+        raise BenchmarkSkipped(f"Vision no disponible: {e}")
+    return Vision()
+
+
+def _require_tesseract():
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        raise BenchmarkSkipped(f"Tesseract no disponible: {e}")
+
+
+# Cada fábrica recibe la captura y retorna la función a cronometrar
+def case_find_template(frame: np.ndarray) -> Callable[[], object]:
+    template = load_reference('client_field.png')
+    return lambda: template_matcher.find_template(template, frame, confidence=0.8)
+
+
+def case_detect_current_screen(frame: np.ndarray) -> Callable[[], object]:
+    from rpa.screen_detector import screen_detector
+    set_screen_source(StaticScreenSource(frame))
+    return screen_detector.detect_current_screen
+
+
+def case_get_totales_section(frame: np.ndarray) -> Callable[[], object]:
+    vision = _vision()
+    set_screen_source(StaticScreenSource(frame))
+    return vision.get_totales_section_coordinates
+
+
+def case_ocr_totales_by_text(frame: np.ndarray) -> Callable[[], object]:
+    _require_tesseract()
+    vision = _vision()
+    return lambda: vision.find_totales_by_text(frame)
+
+
+def case_ocr_total_antes_descuento(frame: np.ndarray) -> Callable[[], object]:
+    _require_tesseract()
+    vision = _vision()
+    set_screen_source(StaticScreenSource(frame))
+    return vision.find_total_antes_descuento
+
+
+CASES: Dict[str, Callable[[np.ndarray], Callable[[], object]]] = {
+    'find_template': case_find_template,
+    'detect_current_screen': case_detect_current_screen,
+    'get_totales_section_coordinates': case_get_totales_section,
+    'ocr_find_totales_by_text': case_ocr_totales_by_text,
+    'ocr_find_total_antes_descuento': case_ocr_total_antes_descuento,
+}
+
+# Las rutas OCR son lentas: se miden con menos repeticiones
+SLOW_CASES = {'ocr_find_totales_by_text', 'ocr_find_total_antes_descuento'}
+
+
+def time_call(func: Callable[[], object], repeats: int) -> Dict[str, float]:
+    """Ejecuta la función (con una corrida de calentamiento) y resume los tiempos en ms"""
+    func()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+        'min_ms': round(samples[0], 3),
+        'repeats': repeats,
+    }
+
+
+def collect_frames(resolutions: List[Tuple[int, int]], recorded: Optional[str]) -> Dict[str, np.ndarray]:
+    """Capturas a medir: sintéticas por resolución y las de una sesión grabada"""
+    frames = {f"{w}x{h}": build_synthetic_frame(w, h) for w, h in resolutions}
+    if recorded:
+        replay = ReplayScreenSource(recorded)
+        for name, frame in replay.frames():
+            if frame is not None:
+                frames[f"recorded:{os.path.splitext(name)[0]}"] = frame
+        replay.close()
+    return frames
+
+
+def run_suite(resolutions: List[Tuple[int, int]],
+              repeats: int,
+              recorded: Optional[str] = None,
+              only: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Ejecuta todos los casos sobre todas las capturas
+
+    Returns:
+        Diccionario "caso@captura" -> tiempos, o {'skipped': motivo}
+    """
+    # Se mide el trabajo completo, sin reutilizar resultados entre repeticiones
+    detector_enabled = change_detector.enabled
+    change_detector.enabled = False
+    results = {}
+    try:
+        for frame_name, frame in collect_frames(resolutions, recorded).items():
+            for case_name, factory in CASES.items():
+                if only and case_name not in only:
+                    continue
+                key = f"{case_name}@{frame_name}"
+                try:
+                    func = factory(frame)
+                    case_repeats = max(3, repeats // 5) if case_name in SLOW_CASES else repeats
+                    results[key] = time_call(func, case_repeats)
+                except BenchmarkSkipped as e:
+                    results[key] = {'skipped': str(e)}
+    finally:
+        change_detector.enabled = detector_enabled
+        set_screen_source(None)
+    return results
+
+
+def environment_info() -> Dict[str, object]:
+    """Metadatos para comparar corridas entre sí"""
+    return {
+        'host': socket.gethostname(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def load_baseline(path: str = BASELINE_FILE) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {'environment': {}, 'cases': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], max_regression_pct: float) -> List[str]:
+    """
+    Compara medianas contra el baseline
+
+    Returns:
+        Lista de regresiones ("caso: actual vs baseline (+x%)")
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get('cases', {}).get(key)
+        if 'skipped' in current or not base or 'median_ms' not in base:
+            continue
+        change_pct = (current['median_ms'] / base['median_ms'] - 1) * 100 if base['median_ms'] else 0.0
+        current['change_pct'] = round(change_pct, 1)
+        if change_pct > max_regression_pct:
+            regressions.append(
+                f"{key}: {current['median_ms']:.1f} ms vs {base['median_ms']:.1f} ms (+{change_pct:.1f}%)"
+            )
+    return regressions
+
+
+def print_report(results: Dict[str, dict]):
+    print(f"{'Caso':<58} {'Mediana ms':>10} {'p95 ms':>10} {'Δ baseline':>11}")
+    for key, current in results.items():
+        if 'skipped' in current:
+            print(f"{key:<58} ⏭️  {current['skipped']}")
+            continue
+        change = f"{current['change_pct']:+.1f}%" if 'change_pct' in current else '-'
+        print(f"{key:<58} {current['median_ms']:>10.1f} {current['p95_ms']:>10.1f} {change:>11}")
+
+
+def default_resolutions() -> List[Tuple[int, int]]:
+    return [tuple(r) for r in config.get('benchmarks.resolutions', [[1280, 720], [1920, 1080], [2560, 1440]])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de visión con umbral de regresión")
+    parser.add_argument('--repeats', type=int, default=config.get('benchmarks.repeats', 15))
+    parser.add_argument('--max-regression', type=float,
+                        default=config.get('benchmarks.max_regression_pct', 20.0),
+                        help='Porcentaje máximo de aumento de la mediana')
+    parser.add_argument('--recorded', help='Sesión grabada adicional (directorio de PNG o .npz)')
+    parser.add_argument('--only', nargs='+', choices=sorted(CASES), help='Ejecutar solo estos casos')
+    parser.add_argument('--output', help='Guardar los resultados de esta corrida en JSON')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true', help='Reemplazar el baseline con esta corrida')
+    args = parser.parse_args()
+
+    print("=" * 84)
+    print("BENCHMARKS DE VISIÓN")
+    print("=" * 84)
+
+    results = run_suite(default_resolutions(), args.repeats, args.recorded, args.only)
+    run = {'environment': environment_info(), 'cases': results}
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2, ensure_ascii=False)
+        print_report(results)
+        print(f"\n✅ Baseline actualizado: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline.get('environment', {}).get('host') not in (None, run['environment']['host']):
+        print(f"⚠️  Baseline registrado en otro equipo ({baseline['environment']['host']}): "
+              "las diferencias pueden no ser significativas")
+
+    regressions = compare(results, baseline, args.max_regression)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2, ensure_ascii=False)
+        print(f"\n📄 Resultados guardados en {args.output}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regresiones (> {args.max_regression}%):")
+        for regression in regressions:
+            print(f"   - {regression}")
+        return 1
+
+    print(f"\n✅ Sin regresiones mayores a {args.max_regression}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
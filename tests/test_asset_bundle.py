@@ -0,0 +1,92 @@
+"""
+Tests para el paquete de imágenes de referencia
+Verifica la construcción, la lectura mapeada en memoria y el respaldo a PNG
+"""
+
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import cv2
+    import numpy as np
+    from rpa.vision.asset_bundle import AssetBundle, build_bundle, is_bundled_asset
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+
+@unittest.skipUnless(HAS_CV2, "OpenCV/numpy no disponibles")
+class TestBundledAssets(unittest.TestCase):
+    """Tests para la selección de imágenes empaquetables"""
+
+    def test_obsolete_and_runtime_images_are_excluded(self):
+        """Test: Las imágenes old_* y las reescritas en ejecución no se empaquetan"""
+        self.assertTrue(is_bundled_asset('client_field.png'))
+        self.assertFalse(is_bundled_asset('old_sap_modulos_menu_button.png'))
+        self.assertFalse(is_bundled_asset('template.png'))
+        self.assertFalse(is_bundled_asset('sap_orden_de_ventas_template.png'))
+
+
+@unittest.skipUnless(HAS_CV2, "OpenCV/numpy no disponibles")
+class TestAssetBundle(unittest.TestCase):
+    """Tests para build_bundle y AssetBundle"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.reference_dir = os.path.join(self.temp_dir, 'reference_images')
+        os.makedirs(self.reference_dir)
+        rng = np.random.default_rng(5)
+        self.button = rng.integers(0, 255, size=(30, 50, 3), dtype=np.uint8)
+        cv2.imwrite(os.path.join(self.reference_dir, 'button.png'), self.button)
+        icon = np.zeros((20, 20, 4), dtype=np.uint8)
+        icon[:, :, :3] = 120
+        icon[5:15, 5:15, 3] = 255
+        cv2.imwrite(os.path.join(self.reference_dir, 'icon.png'), icon)
+        cv2.imwrite(os.path.join(self.reference_dir, 'old_button.png'), self.button)
+        self.manifest_path = os.path.join(self.temp_dir, 'bundle', 'assets.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_build_and_read_variants(self):
+        """Test: El paquete conserva BGR, gris, máscara y pirámide"""
+        manifest = build_bundle(self.reference_dir, self.manifest_path,
+                                thresholds={'button': {'threshold': 0.77}},
+                                metadata={'button': {'region': [0, 0, 100, 100]}})
+        self.assertEqual(set(manifest['entries']), {'button', 'icon'})
+
+        bundle = AssetBundle(self.manifest_path)
+        self.assertTrue(bundle.available)
+        np.testing.assert_array_equal(bundle.array('button', 'bgr'), self.button)
+        self.assertEqual(bundle.array('button', 'gray').shape, (30, 50))
+        self.assertEqual(bundle.array('button', 'pyr1').shape, (15, 25, 3))
+        self.assertIsNone(bundle.array('button', 'mask'))
+        self.assertEqual(int(bundle.array('icon', 'mask')[0, 0]), 0)
+        self.assertEqual(bundle.entry('button')['threshold'], 0.77)
+        self.assertEqual(bundle.entry('button')['region'], [0, 0, 100, 100])
+
+    def test_lookup_falls_back_when_png_changes(self):
+        """Test: Si el PNG cambió después de construir, se usa el PNG"""
+        build_bundle(self.reference_dir, self.manifest_path)
+        bundle = AssetBundle(self.manifest_path)
+        button_path = os.path.join(self.reference_dir, 'button.png')
+        self.assertIsNotNone(bundle.lookup(button_path))
+
+        future = time.time() + 5
+        os.utime(button_path, (future, future))
+        self.assertIsNone(bundle.lookup(button_path))
+
+    def test_missing_bundle_is_unavailable(self):
+        """Test: Sin paquete construido no se sirve nada"""
+        bundle = AssetBundle(os.path.join(self.temp_dir, 'missing.json'))
+        self.assertFalse(bundle.available)
+        self.assertIsNone(bundle.lookup(os.path.join(self.reference_dir, 'button.png')))
+
+
+if __name__ == '__main__':
+    unittest.main()
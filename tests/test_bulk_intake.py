@@ -0,0 +1,150 @@
+"""
+Tests para el ingreso masivo de órdenes desde planillas
+Verifica la agrupación por orden de compra, el rechazo de órdenes inválidas,
+la liberación por lotes desde el spool y la velocidad en filas por segundo
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.bulk_intake import BulkIntake, group_orders, cell_text
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+HEADER = 'nit;orden_compra;fecha_entrega;codigo;cantidad;descripcion'
+
+
+class TestGroupOrders(unittest.TestCase):
+    """Tests para group_orders"""
+
+    def test_consecutive_rows_form_one_order(self):
+        """Test: Las filas consecutivas con la misma orden de compra forman una orden"""
+        rows = [
+            {'nit': 'CN890900608', 'orden_compra': '4601', 'fecha_entrega': '22/12/2026', 'codigo': 'A1', 'cantidad': '10'},
+            {'nit': 'CN890900608', 'orden_compra': '4601', 'fecha_entrega': '22/12/2026', 'codigo': 'A2', 'cantidad': '2.5'},
+            {'nit': 'CN890924167', 'orden_compra': '4602', 'fecha_entrega': '23/12/2026', 'codigo': 'B1', 'cantidad': 'x'},
+        ]
+        orders = list(group_orders(iter(rows)))
+        self.assertEqual([order['orden_compra'] for order in orders], ['4601', '4602'])
+        self.assertEqual([item['cantidad'] for item in orders[0]['items']], [10, 2.5])
+        self.assertEqual(orders[1]['items'][0]['cantidad'], 'x')
+        self.assertEqual(orders[1]['comprador'], {'nit': 'CN890924167'})
+
+    def test_cell_text(self):
+        """Test: Celdas de XLSX (números y fechas) como texto del JSON"""
+        from datetime import datetime
+        self.assertEqual(cell_text(4004283.0), '4004283')
+        self.assertEqual(cell_text(datetime(2026, 12, 5)), '05/12/2026')
+        self.assertEqual(cell_text(None), '')
+
+
+class TestBulkIntake(unittest.TestCase):
+    """Tests para BulkIntake"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.queue_dir = os.path.join(self.temp_dir, 'outputs_json')
+        os.makedirs(self.queue_dir)
+        self.intake = BulkIntake(spool_dir=os.path.join(self.temp_dir, 'Lotes'),
+                                 archive_dir=os.path.join(self.temp_dir, 'Planillas'),
+                                 quarantine_dir=os.path.join(self.temp_dir, 'Cuarentena'),
+                                 release_batch=2, columns={})
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write_csv(self, name, lines):
+        path = os.path.join(self.queue_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join([HEADER] + lines) + '\n')
+        return path
+
+    def read_queue(self):
+        orders = {}
+        for name in sorted(os.listdir(self.queue_dir)):
+            if name.endswith('.json'):
+                with open(os.path.join(self.queue_dir, name), encoding='utf-8') as f:
+                    orders[name] = json.load(f)
+        return orders
+
+    def test_ingest_and_release_in_batches(self):
+        """Test: La planilla pasa al spool y la cola recibe a lo sumo release_batch órdenes"""
+        self.write_csv('exito.csv', [
+            'CN890900608;4601;22/12/2026;A1;10;ETQ 1',
+            'CN890900608;4601;22/12/2026;A2;20;ETQ 2',
+            'CN890900608;4602;23/12/2026;B1;5;ETQ 3',
+            'CN890900608;4603;24/12/2026;C1;7;ETQ 4',
+            # Filas no consecutivas de la orden 4601: se unen al liberarla
+            'CN890900608;4601;22/12/2026;A3;30;ETQ 5',
+        ])
+        reports = self.intake.scan(self.queue_dir)
+
+        self.assertEqual((reports[0].rows, reports[0].orders, reports[0].rejected), (5, 3, {}))
+        self.assertFalse(os.path.exists(os.path.join(self.queue_dir, 'exito.csv')))
+        self.assertEqual(self.read_queue(), {})
+
+        self.assertEqual(self.intake.release(self.queue_dir), ['exito_4601.json', 'exito_4602.json'])
+        queue = self.read_queue()
+        self.assertEqual([item['codigo'] for item in queue['exito_4601.json']['items']], ['A1', 'A2', 'A3'])
+        self.assertEqual(self.intake.pending(), 1)
+
+        # Con la cola llena no se libera nada más
+        self.assertEqual(self.intake.release(self.queue_dir, queued=2), [])
+        self.assertEqual(self.intake.release(self.queue_dir, queued=1), ['exito_4603.json'])
+        self.assertEqual(self.intake.pending(), 0)
+        self.assertEqual(os.listdir(self.intake.spool_dir), [])
+
+    def test_invalid_orders_are_rejected_with_reasons(self):
+        """Test: Una orden con un grupo de filas inválido se rechaza completa"""
+        self.write_csv('hermeco.csv', [
+            'CN890924167;4701;22/12/2026;A1;10;',
+            'CN890924167;4702;22/12/2026;B1;0;',
+            'CN890924167;4701;22/12/2026;A2;abc;',
+            'CN890924167;4703;fecha;C1;1;',
+        ])
+        report = self.intake.ingest(os.path.join(self.queue_dir, 'hermeco.csv'))
+
+        self.assertEqual(report.orders, 0)
+        self.assertEqual(sorted(report.rejected), ['4701', '4702', '4703'])
+        with open(os.path.join(self.intake.quarantine_dir, 'hermeco.reason.json'), encoding='utf-8') as f:
+            reasons = json.load(f)
+        self.assertIn('cantidad debe ser un número', reasons['orders']['4701'][0])
+
+    def test_rows_per_second_on_large_file(self):
+        """Test: Una planilla de 100.000 filas se ingresa con memoria acotada y reporta filas/s"""
+        lines = [f'CN890900608;{4500000000 + row // 20};22/12/2026;PT{row % 997:05d};{row % 50 + 1};ITEM'
+                 for row in range(100000)]
+        self.write_csv('masiva.csv', lines)
+        report = self.intake.ingest(os.path.join(self.queue_dir, 'masiva.csv'))
+
+        self.assertEqual((report.rows, report.orders, len(report.rejected)), (100000, 5000, 0))
+        self.assertGreater(report.rows_per_second, 0)
+
+    @unittest.skipUnless(OPENPYXL_AVAILABLE, "openpyxl no disponible")
+    def test_xlsx(self):
+        """Test: Una planilla XLSX se lee en modo streaming"""
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(HEADER.split(';'))
+        sheet.append(['CN890900608', 4601, '22/12/2026', 4004283, 7000.0, 'ETQ'])
+        path = os.path.join(self.queue_dir, 'exito.xlsx')
+        workbook.save(path)
+
+        report = self.intake.ingest(path)
+        self.assertEqual((report.rows, report.orders), (1, 1))
+        self.intake.release(self.queue_dir)
+        item = self.read_queue()['exito_4601.json']['items'][0]
+        self.assertEqual((item['codigo'], item['cantidad']), ('4004283', 7000))
+
+
+if __name__ == '__main__':
+    unittest.main()
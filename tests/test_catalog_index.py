@@ -0,0 +1,132 @@
+"""
+Tests para el índice local del catálogo de SAP
+Verifica la lectura de exportaciones, la búsqueda binaria y la recarga por tamaño y fecha de modificación
+"""
+
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+from unittest.mock import patch
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import rpa.catalog_index as catalog_module
+from rpa.catalog_index import CatalogIndex, SortedIndex, read_export_column
+
+
+class TestCatalogIndex(unittest.TestCase):
+    """Tests para CatalogIndex"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.items_file = os.path.join(self.temp_dir, 'items.csv')
+        self.customers_file = os.path.join(self.temp_dir, 'customers.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, path, lines, mtime=None):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def new_catalog(self):
+        return CatalogIndex(self.items_file, self.customers_file, 'codigo', 'nit')
+
+    def test_sorted_index_lookup(self):
+        """Test: Búsqueda binaria normalizando espacios y mayúsculas"""
+        index = SortedIndex(['4004283', 'PT100', '4004283', 'AB12'])
+        self.assertEqual(len(index), 3)
+        self.assertIn(' pt100 ', index)
+        self.assertIn(4004283, index)
+        self.assertNotIn('4004284', index)
+        self.assertNotIn('ZZZ', index)
+
+    def test_read_export_detects_delimiter_and_column(self):
+        """Test: Exportación con punto y coma y la columna en cualquier posición"""
+        self.write(self.items_file, ['Descripcion;Codigo;Unidad', 'ETQ AREPA;4004283;UN', 'ETQ PAN; pt100 ;UN'])
+        self.assertEqual(read_export_column(self.items_file, 'codigo'), ['4004283', 'PT100'])
+
+    def test_check_order(self):
+        """Test: Se reportan el NIT y los códigos que no están en el catálogo"""
+        self.write(self.items_file, ['codigo', '4004283', '4004284'])
+        self.write(self.customers_file, ['nit,nombre', 'CN890900608,EXITO'])
+        catalog = self.new_catalog()
+        catalog.refresh()
+
+        self.assertEqual(catalog.check_order('CN890900608', ['4004283', '4004284']), [])
+        self.assertEqual(catalog.check_order('CN000000001', ['4004283', '9999']), [
+            "NIT no existe en el catálogo de clientes: CN000000001",
+            "Item 2: código no existe en el catálogo: 9999",
+        ])
+
+    def test_missing_export_disables_check(self):
+        """Test: Sin exportación no se rechaza ninguna orden"""
+        catalog = self.new_catalog()
+        catalog.refresh()
+        self.assertFalse(catalog.available('items'))
+        self.assertEqual(catalog.check_order('CN890900608', ['cualquiera']), [])
+
+    def test_refresh_only_when_export_changes(self):
+        """Test: El índice se reconstruye solo si cambia la fecha de modificación"""
+        self.write(self.items_file, ['codigo', 'A1'], mtime=1000)
+        catalog = self.new_catalog()
+        self.assertTrue(catalog.refresh())
+        self.assertFalse(catalog.refresh())
+
+        self.write(self.items_file, ['codigo', 'A1', 'B2'], mtime=2000)
+        self.assertTrue(catalog.refresh())
+        self.assertIn('B2', catalog.items)
+
+    def test_export_changing_during_read_is_retried(self):
+        """Test: Si la exportación cambia mientras se lee se conserva el índice anterior"""
+        self.write(self.items_file, ['codigo', 'A1', 'B2'], mtime=1000)
+        catalog = self.new_catalog()
+        catalog.refresh()
+
+        self.write(self.items_file, ['codigo', 'A1', 'B2', 'C3'], mtime=2000)
+        read = read_export_column
+
+        def read_while_writing(path, column):
+            values = read(path, column)
+            self.write(self.items_file, ['codigo', 'A1', 'B2', 'C3', 'D4'], mtime=3000)
+            return values
+
+        with patch.object(catalog_module, 'read_export_column', side_effect=read_while_writing):
+            self.assertFalse(catalog.refresh())
+        self.assertNotIn('C3', catalog.items)
+
+        self.assertTrue(catalog.refresh())
+        self.assertIn('D4', catalog.items)
+
+    def test_sharply_smaller_export_is_rejected(self):
+        """Test: Una exportación con muchas menos claves no reemplaza el índice"""
+        self.write(self.items_file, ['codigo'] + [f'PT{i}' for i in range(100)], mtime=1000)
+        catalog = self.new_catalog()
+        catalog.refresh()
+
+        self.write(self.items_file, ['codigo'] + [f'PT{i}' for i in range(10)], mtime=2000)
+        self.assertFalse(catalog.refresh())
+        self.assertEqual(len(catalog.items), 100)
+
+        self.write(self.items_file, ['codigo'] + [f'PT{i}' for i in range(80)], mtime=3000)
+        self.assertTrue(catalog.refresh())
+        self.assertEqual(len(catalog.items), 80)
+
+    def test_build_from_large_export(self):
+        """Test: Una exportación de 100.000 filas se indexa en pocos segundos"""
+        self.write(self.items_file, ['codigo,descripcion'] + [f'PT{i:07d},ITEM {i}' for i in range(100000)])
+        catalog = self.new_catalog()
+
+        start_time = time.time()
+        catalog.refresh()
+        self.assertLess(time.time() - start_time, 5.0)
+        self.assertEqual(len(catalog.items), 100000)
+        self.assertIn('PT0099999', catalog.items)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Tests para el detector de cambios de pantalla
+Verifica la huella reducida, la reutilización de resultados y wait_for_change
+"""
+
+import unittest
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import cv2
+    import numpy as np
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+
+@unittest.skipUnless(HAS_CV2, "OpenCV/numpy no disponibles")
+class TestFrameChangeDetector(unittest.TestCase):
+    """Tests para FrameChangeDetector"""
+
+    def setUp(self):
+        from rpa.vision.change_detector import FrameChangeDetector
+        self.detector = FrameChangeDetector(grid=(64, 36), tolerance=2)
+        self.frame = np.full((720, 1280, 3), 200, dtype=np.uint8)
+
+    def test_identical_frames_are_same(self):
+        """Test: Dos capturas idénticas producen la misma huella"""
+        fp_a = self.detector.fingerprint(self.frame)
+        fp_b = self.detector.fingerprint(self.frame.copy())
+        self.assertTrue(self.detector.is_same(fp_a, fp_b))
+
+    def test_compression_noise_is_ignored(self):
+        """Test: Ruido leve (compresión RDP) no se considera cambio"""
+        noisy = self.frame.copy()
+        noisy[::7, ::5] += 1
+        self.assertTrue(self.detector.is_same(
+            self.detector.fingerprint(self.frame),
+            self.detector.fingerprint(noisy)
+        ))
+
+    def test_new_widget_is_detected(self):
+        """Test: Un elemento nuevo en pantalla se detecta como cambio"""
+        changed = self.frame.copy()
+        cv2.rectangle(changed, (600, 300), (700, 330), (0, 0, 0), -1)
+        self.assertFalse(self.detector.is_same(
+            self.detector.fingerprint(self.frame),
+            self.detector.fingerprint(changed)
+        ))
+
+    def test_cached_call_skips_unchanged_screen(self):
+        """Test: cached_call reutiliza el resultado si la pantalla no cambió"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return (10, 20)
+
+        self.assertEqual(self.detector.cached_call('k', self.frame, compute), (10, 20))
+        self.assertEqual(self.detector.cached_call('k', self.frame.copy(), compute), (10, 20))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.detector.stats['hits'], 1)
+
+        changed = self.frame.copy()
+        changed[:100, :100] = 0
+        self.detector.cached_call('k', changed, compute)
+        self.assertEqual(len(calls), 2)
+
+    def test_result_cache_is_bounded_lru(self):
+        """Test: La caché de resultados descarta la clave usada hace más tiempo"""
+        from rpa.vision.change_detector import FrameChangeDetector
+        detector = FrameChangeDetector(grid=(64, 36), tolerance=2, cache_size=2)
+        detector.cached_call('a', self.frame, lambda: 1)
+        detector.cached_call('b', self.frame, lambda: 2)
+        detector.cached_call('a', self.frame, lambda: 1)
+        detector.cached_call('c', self.frame, lambda: 3)
+        self.assertEqual(list(detector._result_cache), ['a', 'c'])
+
+    def test_wait_for_change_in_region(self):
+        """Test: wait_for_change retorna en cuanto cambia la región vigilada"""
+        frames = [self.frame, self.frame, self.frame.copy()]
+        frames[2][50:60, 50:60] = 0
+
+        def grab():
+            return frames.pop(0) if len(frames) > 1 else frames[0]
+
+        changed = self.detector.wait_for_change(
+            region=(40, 40, 40, 40), timeout=1.0, check_interval=0.0, grab=grab
+        )
+        self.assertTrue(changed)
+
+    def test_wait_for_change_timeout(self):
+        """Test: wait_for_change retorna False si la región no cambia"""
+        changed = self.detector.wait_for_change(
+            region=(0, 0, 100, 100), timeout=0.05, check_interval=0.01,
+            grab=lambda: self.frame
+        )
+        self.assertFalse(changed)
+
+    def test_wait_for_change_stops_at_state_deadline(self):
+        """Test: Un plazo de estado vencido interrumpe la espera aunque quede timeout"""
+        from rpa.watchdog import state_watchdog, StateTimeoutError
+        enabled, timeouts = state_watchdog.enabled, state_watchdog.state_timeouts
+        state_watchdog.enabled = True
+        state_watchdog.state_timeouts = {'loading_items': 0.1}
+        try:
+            state_watchdog.enter_state('loading_items')
+            with self.assertRaises(StateTimeoutError):
+                self.detector.wait_for_change(
+                    region=(0, 0, 100, 100), timeout=5.0, check_interval=0.01,
+                    grab=lambda: self.frame
+                )
+        finally:
+            state_watchdog.clear()
+            state_watchdog.enabled, state_watchdog.state_timeouts = enabled, timeouts
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Tests para el journal de checkpoints
+Verifica el índice, las lápidas, la compactación y la recuperación tras una caída
+"""
+
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.checkpoint_store import CheckpointStore
+
+
+class TestCheckpointStore(unittest.TestCase):
+    """Tests para CheckpointStore"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'journal.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def new_store(self, **kwargs):
+        options = {'fsync_every': 4, 'fsync_interval': 60, 'max_age': 3600, 'compact_min_records': 1000}
+        options.update(kwargs)
+        return CheckpointStore(self.path, **options)
+
+    def test_latest_checkpoint_per_file(self):
+        """Test: get retorna el último checkpoint de cada archivo"""
+        store = self.new_store()
+        store.put('a.json', {'current_state': 'loading_nit'})
+        store.put('b.json', {'current_state': 'loading_order'})
+        store.put('a.json', {'current_state': 'loading_items'})
+        self.assertEqual(store.get('a.json')['current_state'], 'loading_items')
+        self.assertEqual(store.get('b.json')['current_state'], 'loading_order')
+        self.assertIsNone(store.get('c.json'))
+
+    def test_reopen_rebuilds_index(self):
+        """Test: Otro proceso reconstruye el índice desde el journal"""
+        store = self.new_store()
+        store.put('a.json', {'current_state': 'loading_date'})
+        store.put('b.json', {'current_state': 'loading_nit'})
+        store.delete('b.json')
+        store.close()
+
+        reopened = self.new_store()
+        self.assertEqual(reopened.get('a.json')['current_state'], 'loading_date')
+        self.assertIsNone(reopened.get('b.json'))
+
+    def test_torn_tail_is_discarded(self):
+        """Test: Una línea a medio escribir o corrupta no invalida el resto"""
+        store = self.new_store()
+        store.put('a.json', {'current_state': 'loading_nit'})
+        store.put('a.json', {'current_state': 'loading_order'})
+        store.close()
+
+        with open(self.path, 'ab') as f:
+            f.write(b'0badc0de {"key":"a.json","ts":1,"da')
+
+        reopened = self.new_store()
+        self.assertEqual(reopened.get('a.json')['current_state'], 'loading_order')
+        reopened.put('a.json', {'current_state': 'loading_date'})
+        reopened.close()
+        self.assertEqual(self.new_store().get('a.json')['current_state'], 'loading_date')
+
+    def test_corrupted_line_fails_crc(self):
+        """Test: Una línea con CRC inválido se trata como fin del journal"""
+        store = self.new_store()
+        store.put('a.json', {'current_state': 'loading_nit'})
+        store.put('a.json', {'current_state': 'loading_order'})
+        store.close()
+
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        with open(self.path, 'wb') as f:
+            f.write(content.replace(b'loading_order', b'loading_ORDER'))
+
+        self.assertEqual(self.new_store().get('a.json')['current_state'], 'loading_nit')
+
+    def test_compaction_keeps_only_live_entries(self):
+        """Test: La compactación reduce el journal a las entradas vigentes"""
+        store = self.new_store(compact_min_records=20)
+        for i in range(25):
+            store.put('a.json', {'item': i})
+        store.put('b.json', {'item': 0})
+        store.delete('b.json')
+        store.close()
+
+        with open(self.path, 'rb') as f:
+            lines = f.read().splitlines()
+        self.assertLess(len(lines), 10)
+        self.assertEqual(self.new_store().get('a.json'), {'item': 24})
+
+    def test_expired_checkpoints_are_ignored(self):
+        """Test: Los checkpoints más viejos que max_age no se reanudan"""
+        store = self.new_store(max_age=0.05)
+        store.put('a.json', {'current_state': 'loading_nit'})
+        time.sleep(0.1)
+        self.assertIsNone(store.get('a.json'))
+        store.compact()
+        self.assertEqual(store.keys(), [])
+
+    def test_pending_writes_are_synced_by_timer(self):
+        """Test: Las escrituras pendientes se sincronizan tras fsync_interval aunque no haya más escrituras"""
+        store = self.new_store(fsync_every=100, fsync_interval=0.05)
+        store.put('a.json', {'current_state': 'loading_nit'})
+        self.assertEqual(store._pending, 1)
+        deadline = time.time() + 2
+        while store._pending and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(store._pending, 0)
+        store.close()
+
+    def test_each_worker_has_its_own_journal(self):
+        """Test: Cada robot escribe su journal y puede retomar el checkpoint de otro"""
+        robot_a = self.new_store(worker_id='robot-a')
+        robot_b = self.new_store(worker_id='robot-b')
+        self.assertEqual(robot_a.path, os.path.join(self.temp_dir, 'journal.robot-a.jsonl'))
+        robot_a.put('a.json', {'current_state': 'loading_items'})
+        robot_a.close()
+
+        self.assertEqual(robot_b.get('a.json'), {'current_state': 'loading_items'})
+        robot_b.put('a.json', {'current_state': 'finished'})
+        robot_b.delete('a.json')
+        robot_b.close()
+        self.assertFalse(os.path.exists(self.path))
+
+        # La lápida del robot que terminó la orden anula el checkpoint del otro journal
+        self.assertIsNone(self.new_store(worker_id='robot-c').get('a.json'))
+        self.assertIsNone(self.new_store(worker_id='robot-a').get('a.json'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests para el buffer circular de capturas de depuración
+Verifica la capacidad fija, el etiquetado por estado, la omisión de sondeos
+sin cambios y el volcado asíncrono
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import cv2
+    import numpy as np
+    from rpa.vision.frame_buffer import DebugFrameBuffer
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+
+@unittest.skipUnless(HAS_CV2, "OpenCV/numpy no disponibles")
+class TestDebugFrameBuffer(unittest.TestCase):
+    """Tests para DebugFrameBuffer"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.buffer = DebugFrameBuffer(capacity=3, scale=0.5, jpeg_quality=60, dump_path=self.temp_dir)
+        self.buffer.enabled = True
+        self.frame = np.full((200, 320, 3), 128, dtype=np.uint8)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_keeps_only_last_frames(self):
+        """Test: El buffer conserva solo las últimas N capturas"""
+        for i in range(5):
+            self.buffer.set_state(f"estado_{i}")
+            self.buffer.add(self.frame)
+        frames = self.buffer.snapshot()
+        self.assertEqual(len(frames), 3)
+        self.assertEqual([f.state for f in frames], ['estado_2', 'estado_3', 'estado_4'])
+
+    def test_frames_are_compressed(self):
+        """Test: Las capturas se guardan reducidas y comprimidas"""
+        self.buffer.add(self.frame)
+        stored = self.buffer.snapshot()[0]
+        self.assertLess(len(stored.data), self.frame.nbytes // 4)
+        decoded = cv2.imdecode(np.frombuffer(stored.data, np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape, (100, 160, 3))
+
+    def test_unchanged_polls_are_added_once(self):
+        """Test: Los sondeos de una pantalla sin cambios se agregan una sola vez por estado"""
+        self.buffer.set_state('opening_sap')
+        self.assertTrue(self.buffer.add_if_changed(self.frame))
+        self.assertFalse(self.buffer.add_if_changed(self.frame.copy()))
+
+        changed = self.frame.copy()
+        changed[50:150, 100:200] = 0
+        self.assertTrue(self.buffer.add_if_changed(changed))
+
+        self.buffer.set_state('loading_nit')
+        self.assertTrue(self.buffer.add_if_changed(changed))
+        self.assertEqual([f.state for f in self.buffer.snapshot()], ['opening_sap', 'opening_sap', 'loading_nit'])
+
+    def test_dump_writes_frames_and_index(self):
+        """Test: El volcado escribe las capturas y un índice con estado y hora"""
+        self.buffer.set_state('loading_items')
+        self.buffer.add(self.frame, label='find_template')
+        self.buffer.add(self.frame)
+        target = self.buffer.dump_async('orden 123.json', {'error': 'timeout'})
+        self.buffer.wait()
+
+        with open(os.path.join(target, 'index.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        self.assertEqual(index['details']['error'], 'timeout')
+        self.assertEqual(len(index['frames']), 2)
+        self.assertEqual(index['frames'][0]['state'], 'loading_items')
+        self.assertEqual(index['frames'][0]['label'], 'find_template')
+        self.assertEqual(index['frames'][0]['original_size'], [320, 200])
+        self.assertTrue(os.path.exists(os.path.join(target, index['frames'][1]['file'])))
+
+    def test_empty_buffer_does_not_dump(self):
+        """Test: Sin capturas no se crea directorio de volcado"""
+        self.assertIsNone(self.buffer.dump_async('error'))
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
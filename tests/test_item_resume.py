@@ -0,0 +1,196 @@
+"""
+Tests para la reanudación de la carga de items
+Usa un formulario simulado de SAP para verificar que una orden interrumpida
+continúa desde el siguiente item sin duplicar líneas
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.state_machine import StateMachine, RPAState, RPAEvent
+from rpa.rpa_state_handlers import RPAStateHandlers, resolve_resume_index
+from rpa.checkpoint_store import CheckpointStore
+
+
+class SimulatedSalesOrderForm:
+    """Formulario simulado: grilla de items con el cursor en una fila"""
+
+    def __init__(self, state_machine, fail_at=None, readable=True):
+        self.state_machine = state_machine
+        self.grid = []
+        self.cursor_row = 0
+        self.fail_at = fail_at
+        self.readable = readable
+        self.focus_calls = []
+
+    def type_in_focused_field(self, text):
+        # Sin hacer clic, el texto cae en la celda de la grilla que tiene el foco
+        if self.cursor_row < len(self.grid):
+            self.grid[self.cursor_row] = [text, '']
+        else:
+            self.grid.append([text, ''])
+
+    def load_nit(self, nit):
+        self.type_in_focused_field(nit)
+
+    def load_orden_compra(self, orden_compra):
+        self.type_in_focused_field(orden_compra)
+
+    def load_fecha_entrega(self, fecha_entrega, fecha_documento=None):
+        self.type_in_focused_field(fecha_entrega)
+
+    def load_items(self, items, start_index=0, on_item_loaded=None):
+        for index in range(start_index, len(items)):
+            if index == self.fail_at:
+                raise RuntimeError(f"SAP dejó de responder en el item {index + 1}")
+            row = [items[index].codigo, items[index].cantidad_text]
+            if self.cursor_row < len(self.grid):
+                self.grid[self.cursor_row] = row
+            else:
+                self.grid.append(row)
+            self.cursor_row += 1
+            if on_item_loaded:
+                on_item_loaded(index)
+
+    def read_items_grid(self, to_end=False):
+        return [row[0] for row in self.grid] if self.readable else None
+
+    def focus_item_row(self, index):
+        self.focus_calls.append(index)
+        self.cursor_row = index
+
+
+class TestResolveResumeIndex(unittest.TestCase):
+    """Tests para resolve_resume_index"""
+
+    def setUp(self):
+        self.items = [{'codigo': f'ART-{i}', 'cantidad': 1} for i in range(5)]
+
+    def test_grid_matches_checkpoint(self):
+        """Test: Con la grilla igual al checkpoint se continúa en el siguiente item"""
+        self.assertEqual(resolve_resume_index(self.items, 2, ['ART-0', 'ART-1', 'ART-2']), 3)
+
+    def test_grid_ahead_of_checkpoint(self):
+        """Test: Un item escrito pero no confirmado no se vuelve a cargar"""
+        self.assertEqual(resolve_resume_index(self.items, 1, ['art-0', 'ART-1', 'ART-2']), 3)
+
+    def test_new_empty_form(self):
+        """Test: Si se reabrió el formulario y la grilla está vacía se carga todo desde el inicio"""
+        self.assertEqual(resolve_resume_index(self.items, 3, [], form_reopened=True), 0)
+
+    def test_empty_read_without_reopen_trusts_checkpoint(self):
+        """Test: Una lectura vacía sin reabrir el formulario es un fallo de OCR, no una grilla vacía"""
+        self.assertEqual(resolve_resume_index(self.items, 3, []), 4)
+
+    def test_visible_window_never_goes_below_checkpoint(self):
+        """Test: Si toda la ventana visible coincide no se retrocede del checkpoint"""
+        self.assertEqual(resolve_resume_index(self.items, 3, ['ART-0', 'ART-1']), 4)
+        self.assertEqual(resolve_resume_index(self.items, 3, ['ART-0', 'ART-1'], form_reopened=True), 2)
+        # Una fila distinta dentro de la ventana sí indica dónde difiere la grilla
+        self.assertEqual(resolve_resume_index(self.items, 3, ['ART-0', 'OTRO']), 1)
+
+    def test_unreadable_grid_trusts_checkpoint(self):
+        """Test: Sin lectura de la grilla se usa el checkpoint"""
+        self.assertEqual(resolve_resume_index(self.items, 3, None), 4)
+        self.assertEqual(resolve_resume_index(self.items, 4, None), 5)
+
+    def test_scrolled_grid_window(self):
+        """Test: Con la grilla desplazada se ubica la ventana visible dentro de la orden"""
+        self.assertEqual(resolve_resume_index(self.items, 2, ['ART-2', 'ART-3']), 4)
+        self.assertEqual(resolve_resume_index(self.items, 2, ['OTRO', 'ART-3']), 0)
+
+
+class TestItemLevelResume(unittest.TestCase):
+    """Tests de reanudación con el formulario simulado"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = CheckpointStore(os.path.join(self.temp_dir, 'journal.jsonl'),
+                                     fsync_every=1, fsync_interval=0, max_age=3600)
+        self.patcher = patch('rpa.state_machine.checkpoint_store', self.store)
+        self.patcher.start()
+        self.items = [{'codigo': f'ART-{i:02d}', 'cantidad': i + 1} for i in range(40)]
+        self.data = {'items': self.items}
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.store.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def start_machine(self):
+        state_machine = StateMachine()
+        state_machine.start_processing('orden.json', self.data)
+        state_machine.current_state = RPAState.LOADING_ITEMS
+        return state_machine
+
+    @patch('rpa.rpa_state_handlers.watchdog_sleep')
+    def test_resume_after_crash_continues_from_next_item(self, _sleep):
+        """Test: Falla en el item 37 de 40 y la reanudación carga solo 37-40"""
+        state_machine = self.start_machine()
+        form = SimulatedSalesOrderForm(state_machine, fail_at=36)
+        handlers = RPAStateHandlers(form)
+
+        event = handlers.handle_loading_items(state_machine.get_context())
+        self.assertEqual(event, RPAEvent.ITEMS_FAILED)
+        self.assertEqual(len(form.grid), 36)
+
+        # Nuevo proceso: se restaura desde el journal
+        resumed = StateMachine()
+        self.assertTrue(resumed.try_resume_from_checkpoint('orden.json'))
+        self.assertEqual(resumed.get_context().last_confirmed_item, 35)
+        resumed.get_context().current_data = self.data
+        form.state_machine = resumed
+        form.fail_at = None
+
+        event = handlers.handle_loading_items(resumed.get_context())
+        self.assertEqual(event, RPAEvent.ITEMS_LOADED)
+        self.assertEqual(form.focus_calls, [36])
+        self.assertEqual([row[0] for row in form.grid], [item['codigo'] for item in self.items])
+        self.assertEqual(resumed.get_context().processing_stats['items_resumed_from'], 36)
+
+    @patch('rpa.rpa_state_handlers.watchdog_sleep')
+    def test_retry_on_fresh_form_starts_over(self, _sleep):
+        """Test: Si el reintento abrió un formulario nuevo se cargan todos los items"""
+        state_machine = self.start_machine()
+        state_machine.get_context().last_confirmed_item = 20
+        state_machine.get_context().form_reopened = True
+        form = SimulatedSalesOrderForm(state_machine)
+        handlers = RPAStateHandlers(form)
+
+        event = handlers.handle_loading_items(state_machine.get_context())
+        self.assertEqual(event, RPAEvent.ITEMS_LOADED)
+        self.assertEqual(form.focus_calls, [])
+        self.assertEqual(len(form.grid), 40)
+        self.assertEqual(state_machine.get_context().last_confirmed_item, 39)
+
+    @patch('rpa.rpa_state_handlers.watchdog_sleep')
+    def test_retry_with_form_open_skips_header(self, _sleep):
+        """Test: Un reintento con el formulario abierto no teclea el encabezado en la grilla"""
+        self.data.update({'comprador': {'nit': 'CN890900608'}, 'orden_compra': 'OC-123',
+                          'fecha_entrega': '15/10/2026'})
+        state_machine = self.start_machine()
+        form = SimulatedSalesOrderForm(state_machine, fail_at=20)
+        handlers = RPAStateHandlers(form)
+        context = state_machine.get_context()
+        self.assertEqual(handlers.handle_loading_items(context), RPAEvent.ITEMS_FAILED)
+        self.assertEqual(context.last_confirmed_item, 19)
+
+        # Reintento en el mismo proceso: la navegación encontró el formulario abierto
+        context.form_reopened = False
+        form.fail_at = None
+        self.assertEqual(handlers.handle_loading_nit(context), RPAEvent.NIT_LOADED)
+        self.assertEqual(handlers.handle_loading_order(context), RPAEvent.ORDER_LOADED)
+        self.assertEqual(handlers.handle_loading_date(context), RPAEvent.DATE_LOADED)
+        self.assertEqual(len(form.grid), 20)
+
+        self.assertEqual(handlers.handle_loading_items(context), RPAEvent.ITEMS_LOADED)
+        self.assertEqual([row[0] for row in form.grid], [item['codigo'] for item in self.items])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Tests para órdenes grandes
+Verifica la división en documentos vinculados, la verificación de la grilla
+desplazada y la velocidad de carga
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.large_orders import (
+    is_large_order, split_order, split_large_order_files, grid_window_matches, items_per_minute
+)
+from rpa.work_leases import LeaseManager
+
+
+def build_order(items_count):
+    return {
+        'comprador': {'nit': 'CN890900608'},
+        'orden_compra': '4601328501',
+        'fecha_entrega': '22/12/2026',
+        'items': [{'codigo': f'PT{i:04d}', 'cantidad': i + 1} for i in range(items_count)],
+    }
+
+
+class TestSplitOrder(unittest.TestCase):
+    """Tests para split_order"""
+
+    def test_small_order_is_not_split(self):
+        """Test: Una orden dentro del límite se procesa tal cual"""
+        order = build_order(10)
+        self.assertEqual(split_order(order, 10), [order])
+
+    def test_split_keeps_header_and_links_parts(self):
+        """Test: Las partes conservan el encabezado y referencian la orden original"""
+        order = build_order(205)
+        parts = split_order(order, 100, '{orden_compra}-{part}')
+
+        self.assertEqual([len(part['items']) for part in parts], [100, 100, 5])
+        self.assertEqual([part['orden_compra'] for part in parts],
+                         ['4601328501-1', '4601328501-2', '4601328501-3'])
+        self.assertEqual(parts[2]['items'][0]['codigo'], 'PT0200')
+        self.assertEqual(parts[1]['documento_vinculado'], {
+            'orden_compra_original': '4601328501', 'parte': 2, 'total_partes': 3, 'items_original': 205})
+        self.assertEqual(parts[0]['fecha_entrega'], order['fecha_entrega'])
+        self.assertEqual(len(order['items']), 205)
+
+    def test_large_order_threshold(self):
+        """Test: El modo de órdenes grandes se activa desde el umbral"""
+        self.assertFalse(is_large_order(39, 40))
+        self.assertTrue(is_large_order(40, 40))
+        self.assertFalse(is_large_order(500, 0))
+
+
+class TestSplitLargeOrderFiles(unittest.TestCase):
+    """Tests para split_large_order_files"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.archive_dir = os.path.join(self.temp_dir, 'Divididos')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, name, data):
+        with open(os.path.join(self.temp_dir, name), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def test_replaces_large_file_with_parts(self):
+        """Test: El archivo grande se reemplaza en la cola por sus partes y se archiva"""
+        self.write('chica.json', build_order(3))
+        self.write('grande.json', build_order(120))
+        files = split_large_order_files(self.temp_dir, ['chica.json', 'grande.json'], 50, self.archive_dir)
+
+        self.assertEqual(files, ['chica.json', 'grande.parte1de3.json',
+                                 'grande.parte2de3.json', 'grande.parte3de3.json'])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'grande.json')))
+        self.assertTrue(os.path.exists(os.path.join(self.archive_dir, 'grande.json')))
+        with open(os.path.join(self.temp_dir, 'grande.parte3de3.json'), encoding='utf-8') as f:
+            part = json.load(f)
+        self.assertEqual(len(part['items']), 20)
+        self.assertEqual(part['documento_vinculado']['archivo_original'], 'grande.json')
+
+    def test_order_held_by_other_robot_is_not_split(self):
+        """Test: Una orden grande que otro robot ya tomó no se divide ni se mueve"""
+        self.write('grande.json', build_order(120))
+        lease_dir = os.path.join(self.temp_dir, '.leases')
+        other = LeaseManager(lease_dir=lease_dir, worker_id='robot-b', ttl=60)
+        intake = LeaseManager(lease_dir=lease_dir, worker_id='robot-a', ttl=60)
+        other.claim('grande.json')
+
+        files = split_large_order_files(self.temp_dir, ['grande.json'], 50, self.archive_dir, leases=intake)
+        self.assertEqual(files, [])
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, 'grande.json')))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'grande.parte1de3.json')))
+
+        # Liberada la orden, la etapa de entrada la divide y no deja su lease tomado
+        other.release('grande.json')
+        files = split_large_order_files(self.temp_dir, ['grande.json'], 50, self.archive_dir, leases=intake)
+        self.assertEqual(len(files), 3)
+        self.assertIsNone(intake.read('grande.json'))
+
+    def test_disabled(self):
+        """Test: Con split_above en 0 no se divide nada"""
+        self.write('grande.json', build_order(120))
+        self.assertEqual(split_large_order_files(self.temp_dir, ['grande.json'], 0, self.archive_dir),
+                         ['grande.json'])
+
+
+class TestGridWindow(unittest.TestCase):
+    """Tests para grid_window_matches e items_per_minute"""
+
+    def setUp(self):
+        self.items = build_order(60)['items']
+
+    def test_scrolled_window_ends_at_last_loaded(self):
+        """Test: Las filas visibles deben ser los últimos items cargados"""
+        self.assertTrue(grid_window_matches(self.items, 50, ['PT0047', 'PT0048', 'pt0049']))
+        self.assertTrue(grid_window_matches(self.items, 3, ['PT0000', 'PT0001', 'PT0002']))
+
+    def test_mismatch(self):
+        """Test: Una fila perdida, una grilla sin desplazar o una lectura vacía no pasan"""
+        self.assertFalse(grid_window_matches(self.items, 50, ['PT0047', 'PT0049']))
+        self.assertFalse(grid_window_matches(self.items, 50, ['PT0000', 'PT0001']))
+        self.assertFalse(grid_window_matches(self.items, 50, []))
+
+    def test_items_per_minute(self):
+        """Test: Velocidad de carga en items por minuto"""
+        self.assertEqual(items_per_minute(30, 90.0), 20.0)
+        self.assertEqual(items_per_minute(30, 0), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -98,6 +98,16 @@ class TestSimpleRPALogger(unittest.TestCase):
                 self.assertIn(test_error, content)
                 self.assertIn('ERROR', content)
     
+    def test_worker_id_in_every_record(self):
+        """Test: Cada registro lleva el identificador del robot"""
+        self.logger.set_worker_id("robot-7")
+        self.logger.info("Mensaje con robot")
+        self.logger.error("Error con robot")
+        
+        for name in ('rpa.log', 'rpa_errors.log'):
+            with open(os.path.join(self.temp_dir, name), 'r', encoding='utf-8') as f:
+                self.assertIn("[robot-7]", f.read())
+    
     def test_log_with_context(self):
         """Test: Logging con contexto"""
         message = "Operation completed"
@@ -0,0 +1,72 @@
+"""
+Tests para el grafo de navegación ponderado
+Verifica la ruta de menor costo y el aprendizaje de costos por arista
+"""
+
+import unittest
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.navigation_graph import NavigationGraph
+
+
+class TestNavigationGraph(unittest.TestCase):
+    """Tests para NavigationGraph"""
+
+    def setUp(self):
+        self.graph = NavigationGraph(smoothing=0.5, failure_penalty=30.0)
+        self.graph.add_edge('unknown', 'remote', 'maximize', ['maximize_remote_desktop'], 3.0)
+        self.graph.add_edge('unknown', 'remote', 'connect', ['connect_remote_desktop'], 8.0)
+        self.graph.add_edge('remote', 'sap', 'open_sap', ['open_sap', 'wait_sap_load'], 30.0)
+        self.graph.add_edge('sap', 'form', 'sales_order', ['navigate_to_sales_order'], 8.0)
+
+    def test_shortest_path_picks_cheapest_alternative(self):
+        """Test: Entre aristas paralelas se elige la más barata"""
+        path = self.graph.shortest_path('unknown', 'form')
+        self.assertEqual([edge.name for edge in path], ['maximize', 'open_sap', 'sales_order'])
+        self.assertAlmostEqual(self.graph.path_cost(path), 41.0)
+
+    def test_same_state_and_unreachable(self):
+        """Test: Ruta vacía si ya se está en el objetivo y None si no hay ruta"""
+        self.assertEqual(self.graph.shortest_path('sap', 'sap'), [])
+        self.assertIsNone(self.graph.shortest_path('form', 'unknown'))
+        self.assertIsNone(self.graph.shortest_path('error', 'form'))
+
+    def test_cycles_do_not_loop(self):
+        """Test: Un ciclo en el grafo no impide terminar la búsqueda"""
+        self.graph.add_edge('sap', 'remote', 'back', ['close_sap'], 1.0)
+        path = self.graph.shortest_path('remote', 'form')
+        self.assertEqual([edge.name for edge in path], ['open_sap', 'sales_order'])
+
+    def test_failures_reroute_to_alternative(self):
+        """Test: Las fallas encarecen la arista y la ruta cambia a la alternativa"""
+        maximize = self.graph.shortest_path('unknown', 'remote')[0]
+        self.graph.record(maximize, 2.0, success=False)
+        self.assertAlmostEqual(maximize.cost, 0.5 * 32.0 + 0.5 * 3.0)
+        self.assertEqual(maximize.failures, 1)
+        self.assertEqual(self.graph.shortest_path('unknown', 'remote')[0].name, 'connect')
+
+    def test_successful_measurement_smooths_cost(self):
+        """Test: El costo converge a la duración medida"""
+        edge = self.graph.shortest_path('remote', 'sap')[0]
+        for _ in range(20):
+            self.graph.record(edge, 12.0, success=True)
+        self.assertAlmostEqual(edge.cost, 12.0, places=3)
+        self.assertEqual(edge.samples, 20)
+
+    def test_costs_roundtrip(self):
+        """Test: Los costos aprendidos se exportan y restauran por clave"""
+        edge = self.graph.shortest_path('sap', 'form')[0]
+        self.graph.record(edge, 4.0, success=True)
+        exported = self.graph.export_costs()
+
+        restored = NavigationGraph()
+        restored.add_edge('sap', 'form', 'sales_order', ['navigate_to_sales_order'], 8.0)
+        restored.load_costs(exported)
+        self.assertAlmostEqual(restored.edges_from('sap')[0].cost, 6.0)
+        self.assertEqual(restored.edges_from('sap')[0].samples, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests para el modelo tipado de órdenes
+Verifica la normalización de campos, la selección de fechas y el uso de __slots__
+"""
+
+import unittest
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.order_model import Order, OrderItem, parse_date, format_quantity, item_code
+
+
+class TestOrderModel(unittest.TestCase):
+    """Tests para Order y OrderItem"""
+
+    def order_data(self):
+        return {
+            "comprador": {"nit": " CN890900608 "},
+            "orden_compra": 4601328501,
+            "fecha_entrega": "22/12/2023",
+            "items": [
+                {"codigo": " 4004283 ", "cantidad": 7000.0, "fecha_entrega": "28/12/2023"},
+                {"codigo": "pt100", "cantidad": 12.5},
+            ],
+        }
+
+    def test_fields_are_normalized_once(self):
+        """Test: NIT, orden, códigos y cantidades quedan listos para teclear"""
+        order = Order.from_dict(self.order_data())
+        self.assertEqual(order.nit, "CN890900608")
+        self.assertEqual(order.orden_compra, "4601328501")
+        self.assertEqual([(item.codigo, item.cantidad_text) for item in order.items],
+                         [("4004283", "7000"), ("pt100", "12.5")])
+        self.assertEqual(item_code(order.items[1]), "PT100")
+        self.assertEqual(item_code({"codigo": " pt100 "}), "PT100")
+
+    def test_latest_delivery_date_in_sap_format(self):
+        """Test: Se carga la fecha más tardía entre encabezado e items"""
+        order = Order.from_dict(self.order_data())
+        self.assertEqual(order.fecha_entrega, datetime(2023, 12, 28))
+        self.assertEqual(order.fecha_entrega_sap, "28/12/2023")
+        # Sin fecha de documento se usa la de entrega
+        self.assertEqual(order.fecha_documento_sap, "28/12/2023")
+
+    def test_iso_dates_are_converted(self):
+        """Test: Una fecha YYYY-MM-DD se teclea en el formato de SAP"""
+        data = self.order_data()
+        data["fecha_entrega"] = "2024-01-15"
+        data["fecha_orden"] = "2023-12-01"
+        order = Order.from_dict(data)
+        self.assertEqual(order.fecha_entrega_sap, "15/01/2024")
+        self.assertEqual(order.fecha_documento_sap, "01/12/2023")
+
+    def test_missing_fields_stay_empty(self):
+        """Test: Los campos ausentes quedan en None para que cada estado los reporte"""
+        order = Order.from_dict({"items": [{"codigo": "A1", "cantidad": 1}]})
+        self.assertIsNone(order.nit)
+        self.assertIsNone(order.orden_compra)
+        self.assertIsNone(order.fecha_entrega_sap)
+        self.assertIsNone(Order.from_dict({}).items)
+        with self.assertRaises(ValueError):
+            Order.from_dict({"items": [{"codigo": "A1"}]})
+
+    def test_slots(self):
+        """Test: Los objetos no tienen __dict__ (menos memoria por item)"""
+        item = OrderItem("A1", 3)
+        self.assertFalse(hasattr(item, '__dict__'))
+        with self.assertRaises(AttributeError):
+            item.precio = 10
+
+    def test_helpers(self):
+        """Test: Parseo de fechas y formato de cantidades"""
+        self.assertEqual(parse_date("05/01/2024"), datetime(2024, 1, 5))
+        self.assertIsNone(parse_date("31/02/2024"))
+        self.assertIsNone(parse_date("pronto"))
+        self.assertEqual(format_quantity(10), "10")
+        self.assertEqual(format_quantity("7 "), "7")
+
+
+if __name__ == '__main__':
+    unittest.main()
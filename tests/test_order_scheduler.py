@@ -0,0 +1,140 @@
+"""
+Tests para el planificador de órdenes por fecha de entrega
+Verifica el orden EDF, la prioridad por cliente, el envejecimiento y la proyección
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.order_scheduler import OrderScheduler, parse_fecha
+
+DAY = 86400
+
+
+class TestOrderScheduler(unittest.TestCase):
+    """Tests para OrderScheduler"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.temp_dir, 'scheduler_state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def new_scheduler(self, **kwargs):
+        options = {'aging_rate': 0.0, 'customer_priority_days': {}, 'undated_days': 30,
+                   'state_file': self.state_file, 'group_by_customer': False}
+        options.update(kwargs)
+        return OrderScheduler(**options)
+
+    def write_order(self, name, fecha, nit='CN890900608', items=1):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'comprador': {'nit': nit}, 'orden_compra': '4500000001', 'fecha_entrega': fecha,
+                       'items': [{'codigo': f'A{i}', 'cantidad': 1} for i in range(items)]}, f)
+        return path
+
+    def drain(self, scheduler):
+        names = []
+        while True:
+            order = scheduler.pop()
+            if order is None:
+                return names
+            names.append(order.file_name)
+
+    def test_earliest_deadline_first(self):
+        """Test: La orden que vence primero sale primero, sin importar el orden de llegada"""
+        scheduler = self.new_scheduler()
+        scheduler.sync([self.write_order('mes.json', '30/11/2026'),
+                        self.write_order('manana.json', '20/10/2026'),
+                        self.write_order('semana.json', '27/10/2026')])
+        self.assertEqual(self.drain(scheduler), ['manana.json', 'semana.json', 'mes.json'])
+
+    def test_customer_priority(self):
+        """Test: La prioridad del cliente adelanta su fecha efectiva"""
+        scheduler = self.new_scheduler(customer_priority_days={'CN890924167': 10})
+        scheduler.sync([self.write_order('exito.json', '20/10/2026', nit='CN890900608'),
+                        self.write_order('hermeco.json', '25/10/2026', nit='CN890924167')])
+        self.assertEqual(self.drain(scheduler), ['hermeco.json', 'exito.json'])
+
+    def test_aging_prevents_starvation(self):
+        """Test: Una orden que espera mucho supera a las urgentes que llegan después"""
+        scheduler = self.new_scheduler(aging_rate=1.0)
+        scheduler.push(self.write_order('vieja.json', '30/11/2026'), enqueued_at=1000.0)
+        scheduler.push(self.write_order('nueva.json', '20/10/2026'), enqueued_at=1000.0 + 60 * DAY)
+        self.assertEqual(self.drain(scheduler), ['vieja.json', 'nueva.json'])
+
+    def test_sync_is_incremental(self):
+        """Test: sync solo lee archivos nuevos y descarta los que desaparecieron"""
+        scheduler = self.new_scheduler()
+        first = self.write_order('a.json', '20/10/2026')
+        second = self.write_order('b.json', '21/10/2026')
+        self.assertEqual(scheduler.sync([first, second]), 2)
+        self.assertEqual(scheduler.sync([second, self.write_order('c.json', '19/10/2026')]), 1)
+        self.assertEqual(len(scheduler), 2)
+        self.assertEqual(self.drain(scheduler), ['c.json', 'b.json'])
+
+    def test_invalid_date_goes_last(self):
+        """Test: Una orden sin fecha reconocible se atiende después de las fechadas"""
+        scheduler = self.new_scheduler(undated_days=3650)
+        scheduler.sync([self.write_order('sin_fecha.json', 'pronto'),
+                        self.write_order('fechada.json', '30/12/2026')])
+        self.assertEqual(self.drain(scheduler), ['fechada.json', 'sin_fecha.json'])
+
+    def build_mixed_customers(self):
+        return [self.write_order('exito_1.json', '20/10/2026', nit='CN890900608'),
+                self.write_order('hermeco_1.json', '21/10/2026', nit='CN890924167'),
+                self.write_order('exito_2.json', '22/10/2026', nit='CN890900608'),
+                self.write_order('hermeco_2.json', '23/10/2026', nit='CN890924167'),
+                self.write_order('exito_3.json', '24/10/2026', nit='CN890900608')]
+
+    def test_group_by_customer(self):
+        """Test: Con agrupación las órdenes del mismo NIT se procesan seguidas"""
+        scheduler = self.new_scheduler(group_by_customer=True, max_group_size=10)
+        scheduler.sync(self.build_mixed_customers())
+        now = parse_fecha('01/10/2026')
+        names = [order.file_name for order in scheduler.ordered(now=now)]
+        self.assertEqual(names, ['exito_1.json', 'exito_2.json', 'exito_3.json',
+                                 'hermeco_1.json', 'hermeco_2.json'])
+        self.assertEqual([scheduler.pop(now=now).file_name for _ in range(5)], names)
+
+    def test_group_size_limit(self):
+        """Test: Un grupo se corta en max_group_size para no postergar a otros clientes"""
+        scheduler = self.new_scheduler(group_by_customer=True, max_group_size=2)
+        scheduler.sync(self.build_mixed_customers())
+        names = [order.file_name for order in scheduler.ordered(now=parse_fecha('01/10/2026'))]
+        self.assertEqual(names[:3], ['exito_1.json', 'exito_2.json', 'hermeco_1.json'])
+
+    def test_group_does_not_make_urgent_order_late(self):
+        """Test: No se agrupa si la orden más urgente quedaría atrasada"""
+        scheduler = self.new_scheduler(group_by_customer=True, max_group_size=10)
+        scheduler.sync(self.build_mixed_customers())
+        # A punto de vencer hermeco_1: después de exito_1 se atiende hermeco_1
+        now = parse_fecha('22/10/2026') - 60
+        names = [order.file_name for order in scheduler.ordered(now=now)]
+        self.assertEqual(names[:2], ['exito_1.json', 'hermeco_1.json'])
+
+    def test_projection_uses_measured_rate(self):
+        """Test: La proyección acumula la duración estimada con la velocidad medida"""
+        scheduler = self.new_scheduler()
+        scheduler.record_completion({'items_count': 10, 'items_load_time': 100.0, 'total_processing_time': 160.0})
+        self.assertEqual((scheduler.seconds_per_item, scheduler.order_overhead), (10.0, 60.0))
+
+        scheduler.sync([self.write_order('a.json', '20/10/2026', items=4),
+                        self.write_order('b.json', '21/10/2026', items=2)])
+        now = parse_fecha('19/10/2026')
+        projections = scheduler.projections(now=now)
+        self.assertEqual([p['projected_finish'] - now for p in projections], [100.0, 180.0])
+        self.assertFalse(projections[0]['late'])
+
+        # La velocidad medida persiste para el siguiente ciclo
+        self.assertEqual(self.new_scheduler().seconds_per_item, 10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Tests para la validación previa de órdenes
+Verifica las reglas compiladas, la cuarentena con archivo de motivos y el pool de procesos
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.order_validation import compile_schema, validate_order, OrderPrevalidator
+from rpa.catalog_index import CatalogIndex
+from rpa.work_leases import LeaseManager
+
+
+def valid_order():
+    return {
+        "comprador": {"nit": "CN890900608"},
+        "orden_compra": "4601328501",
+        "fecha_entrega": "22/12/2023",
+        "items": [{"codigo": "4004283", "cantidad": 7000}],
+    }
+
+
+class TestValidateOrder(unittest.TestCase):
+    """Tests para validate_order"""
+
+    def setUp(self):
+        self.schema = compile_schema()
+
+    def test_valid_order(self):
+        """Test: Una orden real de Éxito no tiene errores"""
+        self.assertEqual(validate_order(valid_order(), self.schema), [])
+
+    def test_missing_nit(self):
+        """Test: Orden sin comprador.nit"""
+        order = valid_order()
+        order['comprador'] = {}
+        self.assertEqual(validate_order(order, self.schema), ["NIT faltante en comprador"])
+
+    def test_invalid_nit_format(self):
+        """Test: NIT con separadores o muy corto"""
+        for nit in ("900-123-456", "CN1234567", "900 123 456"):
+            order = valid_order()
+            order['comprador']['nit'] = nit
+            self.assertIn("NIT con formato inválido", validate_order(order, self.schema)[0])
+
+    def test_empty_items(self):
+        """Test: Orden sin items"""
+        order = valid_order()
+        order['items'] = []
+        self.assertEqual(validate_order(order, self.schema), ["La orden no tiene items"])
+
+    def test_bad_fecha_entrega(self):
+        """Test: Fechas con formato o calendario inválido"""
+        for fecha in ("2023-12-22", "31/02/2024", "22/12/1999", ""):
+            order = valid_order()
+            order['fecha_entrega'] = fecha
+            self.assertEqual(len(validate_order(order, self.schema)), 1, fecha)
+
+    def test_reports_all_errors(self):
+        """Test: Se reportan todos los errores de la orden, no solo el primero"""
+        order = valid_order()
+        order['comprador']['nit'] = "ABC"
+        order['items'] = [{"codigo": "4004283", "cantidad": "x"}, {"codigo": "1"}]
+        self.assertEqual(len(validate_order(order, self.schema)), 3)
+
+
+class TestOrderPrevalidator(unittest.TestCase):
+    """Tests para OrderPrevalidator"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.quarantine_dir = os.path.join(self.temp_dir, 'Cuarentena')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content if isinstance(content, str) else json.dumps(content))
+        return path
+
+    def build_batch(self, count):
+        paths = []
+        for i in range(count):
+            order = valid_order()
+            if i % 5 == 0:
+                order['items'] = []
+            paths.append(self.write(f'orden_{i:03d}.json', order))
+        return paths
+
+    def test_quarantine_with_reason_file(self):
+        """Test: Los archivos inválidos se mueven a cuarentena con sus motivos"""
+        paths = [self.write('ok.json', valid_order()), self.write('roto.json', '{"comprador": ')]
+        report = OrderPrevalidator(self.quarantine_dir, workers=1).validate(paths)
+
+        self.assertEqual(report.valid_files, [paths[0]])
+        self.assertFalse(os.path.exists(paths[1]))
+        with open(os.path.join(self.quarantine_dir, 'roto.json.reason.json'), encoding='utf-8') as f:
+            reason = json.load(f)
+        self.assertIn("JSON ilegible", reason['errors'][0])
+        self.assertGreater(report.files_per_second, 0)
+
+    def test_process_pool_matches_serial(self):
+        """Test: El pool de procesos da el mismo resultado y orden que la validación en serie"""
+        paths = self.build_batch(20)
+        report = OrderPrevalidator(self.quarantine_dir, workers=2, min_parallel_files=0).validate(paths)
+
+        self.assertEqual(report.workers, 2)
+        self.assertEqual(report.valid_files, [p for i, p in enumerate(paths) if i % 5 != 0])
+        self.assertEqual(sorted(report.quarantined), ['orden_000.json', 'orden_005.json',
+                                                      'orden_010.json', 'orden_015.json'])
+
+    def test_order_held_by_other_robot_is_not_quarantined(self):
+        """Test: Un archivo inválido que otro robot tomó no se mueve a cuarentena"""
+        paths = [self.write('roto.json', '{"comprador": ')]
+        lease_dir = os.path.join(self.temp_dir, '.leases')
+        LeaseManager(lease_dir=lease_dir, worker_id='robot-b', ttl=60).claim('roto.json')
+        intake = LeaseManager(lease_dir=lease_dir, worker_id='robot-a', ttl=60)
+
+        report = OrderPrevalidator(self.quarantine_dir, workers=1).validate(paths, leases=intake)
+        self.assertEqual(report.valid_files, [])
+        self.assertEqual(report.quarantined, {})
+        self.assertTrue(os.path.exists(paths[0]))
+
+    def test_unknown_catalog_code_is_quarantined(self):
+        """Test: Un código que no existe en el catálogo se detecta antes de llegar a SAP"""
+        items_file = self.write('items.csv', 'codigo\n4004283\n')
+        catalog = CatalogIndex(items_file, '', 'codigo', 'nit')
+        unknown = valid_order()
+        unknown['items'].append({"codigo": "9999999", "cantidad": 1})
+        paths = [self.write('ok.json', valid_order()), self.write('desconocido.json', unknown)]
+
+        report = OrderPrevalidator(self.quarantine_dir, workers=1, catalog=catalog).validate(paths)
+        self.assertEqual(report.valid_files, [paths[0]])
+        self.assertEqual(report.quarantined['desconocido.json'],
+                         ["Item 2: código no existe en el catálogo: 9999999"])
+
+
+if __name__ == '__main__':
+    unittest.main()
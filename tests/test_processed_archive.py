@@ -0,0 +1,113 @@
+"""
+Tests para el archivo de procesados particionado por fecha
+Verifica las carpetas por día, la búsqueda de artefactos (incluida la carpeta
+plana anterior) y los contadores diarios del índice
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.processed_archive import ProcessedArchive
+
+
+def touch(path, content='{}'):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+class TestProcessedArchive(unittest.TestCase):
+    """Tests para ProcessedArchive"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.archive = ProcessedArchive(root=self.root, lookup_days=3)
+        self.today = datetime.now().date()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_path_for_uses_date_shard(self):
+        """Test: Los artefactos se guardan en Procesados/YYYY/MM/DD"""
+        path = self.archive.path_for('4500225658.PDF.json', day=date(2026, 3, 7))
+        self.assertEqual(path, os.path.join(self.root, '2026', '03', '07', '4500225658.PDF.json'))
+        self.assertTrue(os.path.isdir(os.path.dirname(path)))
+
+    def test_locate_finds_recent_shard_and_legacy_flat_file(self):
+        """Test: locate() encuentra archivos de días recientes y de la carpeta plana anterior"""
+        yesterday = self.archive.path_for('ayer.png', day=self.today - timedelta(days=1))
+        touch(yesterday)
+        legacy = os.path.join(self.root, 'antiguo.json')
+        touch(legacy)
+
+        self.assertEqual(self.archive.locate('ayer.png'), yesterday)
+        self.assertEqual(self.archive.locate('antiguo.json'), legacy)
+        self.assertIsNone(self.archive.locate('no_existe.json'))
+
+    def test_locate_prefers_today(self):
+        """Test: Si el archivo existe en varios días se usa el más reciente"""
+        old = self.archive.path_for('orden.json', day=self.today - timedelta(days=2))
+        touch(old)
+        today = self.archive.path_for('orden.json')
+        touch(today)
+        self.assertEqual(self.archive.locate('orden.json'), today)
+
+    def test_locate_falls_back_to_older_shards(self):
+        """Test: Un archivo fuera de la ventana de días recientes se encuentra recorriendo las carpetas"""
+        old = self.archive.path_for('viejo.json', day=self.today - timedelta(days=30))
+        touch(old)
+        older = self.archive.path_for('viejo.json', day=self.today - timedelta(days=400))
+        touch(older)
+        self.assertEqual(self.archive.locate('viejo.json'), old)
+        self.assertIsNone(self.archive.locate('no_existe.json'))
+
+    def test_all_shards_newest_first(self):
+        """Test: all_shards() lista solo carpetas de días, de la más reciente a la más antigua"""
+        self.archive.path_for('a.json', day=date(2025, 12, 31))
+        self.archive.path_for('b.json', day=date(2026, 1, 2))
+        os.makedirs(os.path.join(self.root, 'otra_carpeta'))
+        expected = [self.archive.shard_dir(date(2026, 1, 2)), self.archive.shard_dir(date(2025, 12, 31))]
+        self.assertEqual(self.archive.all_shards(), expected)
+
+    def test_record_completion_counts_per_day(self):
+        """Test: El índice lleva un contador por día"""
+        for name in ('a.json', 'b.json'):
+            touch(self.archive.path_for(name))
+            self.archive.record_completion(name)
+        other_day = date(2026, 1, 2)
+        self.archive.record_completion('c.json', day=other_day)
+
+        self.assertEqual(self.archive.processed_on(), 2)
+        self.assertEqual(self.archive.processed_on(other_day), 1)
+        with open(os.path.join(self.root, 'index.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['dias'][self.today.isoformat()], 2)
+
+    def test_processed_on_without_index_counts_only_that_day(self):
+        """Test: Sin índice se cuentan solo los JSON de la carpeta del día"""
+        touch(self.archive.path_for('hoy.json'))
+        touch(self.archive.path_for('hoy.png'))
+        touch(self.archive.path_for('ayer.json', day=self.today - timedelta(days=1)))
+        touch(os.path.join(self.root, 'antiguo.json'))
+        self.assertEqual(self.archive.processed_on(), 1)
+
+    def test_record_completion_rebuilds_missing_counter(self):
+        """Test: Si el índice se perdió, el contador parte de los JSON ya archivados hoy"""
+        for name in ('a.json', 'b.json', 'c.json'):
+            touch(self.archive.path_for(name))
+        self.assertEqual(self.archive.record_completion('c.json'), 3)
+        self.assertEqual(self.archive.processed_on(), 3)
+
+    def test_corrupt_index_is_ignored(self):
+        """Test: Un índice ilegible no impide registrar órdenes"""
+        touch(os.path.join(self.root, 'index.json'), 'no es json')
+        touch(self.archive.path_for('a.json'))
+        self.assertEqual(self.archive.record_completion('a.json'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
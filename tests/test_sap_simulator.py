@@ -0,0 +1,155 @@
+"""
+Tests para el simulador del formulario de órdenes de venta
+Verifica el orden de tabulación, las latencias en tiempo virtual, el grabado
+de la orden con la secuencia de teclas que usa el RPA y la corrida de punta a
+punta de scripts/simulate_throughput.py
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import importlib.util
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from rpa.sap_simulator import VirtualClock, SimulatedSAP, SimulatedScreenSource, SimulatedInputDriver
+    SIMULATOR_AVAILABLE = True
+except ImportError:
+    SIMULATOR_AVAILABLE = False
+
+# El RPA completo importa además los módulos de OCR de rpa.vision.main
+RPA_AVAILABLE = SIMULATOR_AVAILABLE and all(
+    importlib.util.find_spec(name) is not None for name in ('pytesseract', 'easyocr', 'PIL')
+)
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+@unittest.skipUnless(SIMULATOR_AVAILABLE, "El simulador requiere opencv y numpy")
+class TestSimulatedSAP(unittest.TestCase):
+    """Tests para SimulatedSAP y el driver de entrada simulado"""
+
+    def setUp(self):
+        self.clock = VirtualClock(start=1000.0)
+        self.sap = SimulatedSAP(self.clock, start_screen='sales_order_form')
+        self.driver = SimulatedInputDriver(self.sap, SimulatedScreenSource(self.sap))
+        self.driver.PAUSE = 0.0
+
+    def tab(self, count):
+        for _ in range(count):
+            self.driver.hotkey('tab')
+
+    def test_virtual_clock_does_not_block(self):
+        """Test: sleep avanza el reloj virtual sin esperar"""
+        self.clock.sleep(3600)
+        self.assertEqual(self.clock.time(), 4600.0)
+
+    def test_header_fields_follow_tab_order(self):
+        """Test: NIT, orden y fechas quedan en los campos de la configuración de tabs"""
+        self.driver.hotkey('ctrl', 'a')
+        self.driver.typewrite('CN890900608')
+        self.driver.hotkey('enter')
+        self.tab(3)
+        self.driver.typewrite('4500012345')
+        self.tab(4)
+        self.driver.typewrite('15/11/2026')
+        self.tab(1)
+        self.driver.typewrite('15/10/2026')
+        self.assertEqual(self.sap.values['nit'], 'CN890900608')
+        self.assertEqual(self.sap.values['orden_compra'], '4500012345')
+        self.assertEqual(self.sap.values['fecha_entrega'], '15/11/2026')
+        self.assertEqual(self.sap.values['fecha_documento'], '15/10/2026')
+
+    def test_keys_while_busy_are_counted(self):
+        """Test: Escribir antes de que termine la búsqueda del NIT cuenta como riesgo"""
+        self.driver.typewrite('CN890900608')
+        self.driver.hotkey('enter')
+        self.driver.hotkey('tab')
+        self.assertEqual(self.sap.stats['keys_while_busy'], 1)
+
+        self.clock.sleep(self.sap.latencies['nit_lookup'])
+        self.driver.hotkey('tab')
+        self.assertEqual(self.sap.stats['keys_while_busy'], 1)
+
+    def test_items_and_save(self):
+        """Test: Los items cargados con la secuencia del RPA se graban con "Agregar y cerrar" """
+        self.sap.focus = self.sap.grid_start
+        for code, quantity in (('PT10001', '5'), ('PT10002', '7')):
+            self.driver.typewrite(code)
+            self.tab(2)
+            self.driver.typewrite(quantity)
+            self.tab(3)
+        self.assertEqual(self.sap.total, 12.0)
+
+        x, y, w, h = self.sap.regions['sales_order_form']['agregar_y_button']
+        self.driver.click(x + w // 2, y + h // 2)
+        self.clock.sleep(self.sap.latencies['popup'])
+        popup_x, popup_y, popup_w, popup_h = self.sap.regions['popup']['sap_popup_agregar_y_cerrar']
+        self.driver.click(popup_x + popup_w // 2, popup_y + popup_h // 2)
+        self.driver.click(x + w // 2, y + h // 2)
+        self.clock.sleep(self.sap.latencies['save'])
+        self.sap.advance()
+
+        self.assertEqual(len(self.sap.saved_orders), 1)
+        self.assertEqual(self.sap.saved_orders[0].items, [('PT10001', '5'), ('PT10002', '7')])
+        self.assertEqual(self.sap.screen, 'sap_desktop')
+
+    def test_screenshot_never_writes_reference_images(self):
+        """Test: Las capturas con ruta se redirigen al directorio del simulador"""
+        shot = self.driver.screenshot()
+        self.assertTrue(shot)
+        self.assertEqual(shot.output_dir, self.sap.output_dir)
+
+    def test_remote_desktop_is_not_taken_for_sap(self):
+        """Test: El escritorio remoto simulado no supera el umbral de sap_desktop y muestra el icono"""
+        from rpa.vision.template_matcher import template_matcher, load_template
+        from rpa.vision.thresholds import get_threshold
+        sap = SimulatedSAP(self.clock)
+        frame = sap.render()
+
+        sap_desktop = load_template('./rpa/vision/reference_images/sap_desktop.png')
+        score, _ = template_matcher.match_score(sap_desktop, frame)
+        self.assertLessEqual(score, get_threshold('sap_desktop', 0.7))
+
+        sap_icon = load_template('./rpa/vision/reference_images/sap_icon.png')
+        score, location = template_matcher.match_score(sap_icon, frame)
+        self.assertGreater(score, get_threshold('sap_icon', 0.7))
+        self.assertEqual(sap.widget_at(location[0] + 5, location[1] + 5), 'sap_icon')
+
+
+@unittest.skipUnless(RPA_AVAILABLE, "El RPA completo requiere opencv, numpy y los módulos de OCR")
+class TestSimulatedThroughput(unittest.TestCase):
+    """Corre process_single_file de punta a punta contra el simulador (en otro proceso)"""
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output, ignore_errors=True)
+
+    def run_script(self, *args):
+        # Proceso aparte: el simulador reemplaza pyautogui y el reloj de forma global
+        return subprocess.run(
+            [sys.executable, os.path.join('scripts', 'simulate_throughput.py'),
+             '--orders', '2', '--items', '3', '--output', self.output, *args],
+            cwd=REPO_ROOT, env=dict(os.environ, PYTHONIOENCODING='utf-8'),
+            capture_output=True, text=True, encoding='utf-8', timeout=600
+        )
+
+    def test_orders_are_saved_from_remote_desktop(self):
+        """Test: Desde el escritorio remoto se abre SAP y las dos órdenes quedan grabadas"""
+        result = self.run_script()
+        self.assertIn("Órdenes correctas: 2/2", result.stdout, result.stdout + result.stderr)
+        self.assertEqual(result.returncode, 0)
+
+    def test_orders_are_saved_with_workers(self):
+        """Test: Con dos robots cada orden se graba una sola vez"""
+        result = self.run_script('--workers', '2')
+        self.assertIn("Órdenes correctas: 2/2 (repetidas: 0)", result.stdout, result.stdout + result.stderr)
+        self.assertEqual(result.returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Tests para las fuentes de captura de pantalla
+Verifica el replay de sesiones grabadas y el grabador de capturas
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import cv2
+    import numpy as np
+    from rpa.vision.screen_source import (
+        ScreenSource, ReplayScreenSource, RecordingScreenSource,
+        set_screen_source, grab_screen
+    )
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+
+def _frame(value):
+    """Captura uniforme de 120x160 con el valor indicado"""
+    return np.full((120, 160, 3), value, dtype=np.uint8)
+
+
+class _FakeSource(ScreenSource if HAS_CV2 else object):
+    """Fuente que entrega una lista fija de capturas"""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def grab(self, region=None):
+        return self.frames.pop(0) if len(self.frames) > 1 else self.frames[0]
+
+
+@unittest.skipUnless(HAS_CV2, "OpenCV/numpy no disponibles")
+class TestReplayScreenSource(unittest.TestCase):
+    """Tests para ReplayScreenSource"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for i, value in enumerate([10, 20, 30]):
+            cv2.imwrite(os.path.join(self.temp_dir, f"frame_{i + 1:06d}.png"), _frame(value))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_replays_png_directory_in_order(self):
+        """Test: Las capturas se sirven en orden y la última se repite"""
+        replay = ReplayScreenSource(self.temp_dir)
+        values = [int(replay.grab()[0, 0, 0]) for _ in range(4)]
+        self.assertEqual(values, [10, 20, 30, 30])
+
+    def test_hold_and_loop(self):
+        """Test: hold repite cada captura y loop vuelve al inicio"""
+        replay = ReplayScreenSource(self.temp_dir, loop=True, hold=2)
+        values = [int(replay.grab()[0, 0, 0]) for _ in range(7)]
+        self.assertEqual(values, [10, 10, 20, 20, 30, 30, 10])
+
+    def test_region_is_cropped(self):
+        """Test: grab con región retorna el recorte"""
+        replay = ReplayScreenSource(self.temp_dir)
+        self.assertEqual(replay.grab(region=(10, 20, 30, 40)).shape, (40, 30, 3))
+
+    def test_npz_container_and_labels(self):
+        """Test: Se reproduce un .npz y se cargan las etiquetas"""
+        npz_path = os.path.join(self.temp_dir, 'session.npz')
+        np.savez(npz_path, frame_a=_frame(1), frame_b=_frame(2))
+        with open(os.path.join(self.temp_dir, 'labels.json'), 'w') as f:
+            json.dump({'frame_b': {'screen_state': 'sap_desktop'}}, f)
+
+        replay = ReplayScreenSource(npz_path)
+        self.assertEqual(len(replay), 2)
+        self.assertEqual(int(replay.grab()[0, 0, 0]), 1)
+        self.assertEqual(replay.current_name, 'frame_b')
+        self.assertEqual(replay.labels['frame_b']['screen_state'], 'sap_desktop')
+        replay.close()
+
+    def test_global_source_is_used_by_matcher(self):
+        """Test: El template matcher captura desde la fuente activa"""
+        from rpa.vision.template_matcher import template_matcher
+        previous = set_screen_source(ReplayScreenSource(self.temp_dir))
+        try:
+            self.assertEqual(int(template_matcher._get_current_screenshot()[0, 0, 0]), 10)
+            self.assertEqual(int(grab_screen()[0, 0, 0]), 20)
+        finally:
+            set_screen_source(previous)
+
+
+@unittest.skipUnless(HAS_CV2, "OpenCV/numpy no disponibles")
+class TestRecordingScreenSource(unittest.TestCase):
+    """Tests para RecordingScreenSource"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_records_changed_frames_with_manifest(self):
+        """Test: Se graban solo las capturas distintas, con sus metadatos"""
+        recorder = RecordingScreenSource(
+            _FakeSource([_frame(10), _frame(10), _frame(90)]), self.temp_dir
+        )
+        recorder.annotate(rpa_state='loading_nit')
+        for _ in range(3):
+            recorder.grab()
+        recorder.close()
+
+        replay = ReplayScreenSource(self.temp_dir)
+        self.assertEqual(len(replay), 2)
+        self.assertEqual(replay.entries[0]['rpa_state'], 'loading_nit')
+        self.assertEqual(int(replay.grab()[0, 0, 0]), 10)
+        self.assertEqual(int(replay.grab()[0, 0, 0]), 90)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -233,7 +233,11 @@ class TestRPAStateHandlers(unittest.TestCase):
         result = self.state_handlers.handle_loading_items(self.context)
         
         self.assertEqual(result, RPAEvent.ITEMS_LOADED)
-        self.mock_rpa.load_items.assert_called_once_with([{"codigo": "ITEM1", "cantidad": 10}])
+        self.mock_rpa.load_items.assert_called_once()
+        args, kwargs = self.mock_rpa.load_items.call_args
+        # Los items llegan como OrderItem con la cantidad ya formateada
+        self.assertEqual([(item.codigo, item.cantidad_text) for item in args[0]], [("ITEM1", "10")])
+        self.assertEqual(kwargs, {'start_index': 0, 'on_item_loaded': self.mock_rpa.state_machine.confirm_item})
     
     def test_handle_scrolling_success(self):
         """Verifica el manejo exitoso de scroll"""
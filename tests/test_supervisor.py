@@ -0,0 +1,161 @@
+"""
+Tests para el supervisor del ciclo del robot
+Verifica el drenaje ordenado (señales y archivo de control), la recarga en
+caliente entre órdenes y el vaciado de trabajo pendiente al salir
+"""
+
+import unittest
+import os
+import sys
+import signal
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.supervisor import Supervisor, request_control, DRAIN, RELOAD
+
+
+class TestSupervisor(unittest.TestCase):
+    """Tests para Supervisor"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.stop_file = os.path.join(self.temp_dir, 'control', 'detener')
+        self.reload_file = os.path.join(self.temp_dir, 'control', 'recargar')
+        self.cycles = []
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def new_supervisor(self, task=None):
+        return Supervisor(task or self.cycles.append, interval=0, poll=0.01, error_wait=0,
+                          stop_file=self.stop_file, reload_file=self.reload_file)
+
+    def test_between_orders_stops_after_drain(self):
+        """Test: Después de pedir drenaje no se toman más órdenes"""
+        supervisor = self.new_supervisor()
+        self.assertTrue(supervisor.between_orders())
+        supervisor.request_drain("prueba")
+        self.assertFalse(supervisor.between_orders())
+
+    def test_reload_runs_hooks_between_orders(self):
+        """Test: La recarga pendiente se aplica en el siguiente punto seguro"""
+        supervisor = self.new_supervisor()
+        reloaded = []
+        supervisor.add_reload_hook(lambda: reloaded.append(True))
+        supervisor.request_reload("prueba")
+        self.assertEqual(reloaded, [])
+        self.assertTrue(supervisor.between_orders())
+        self.assertEqual(reloaded, [True])
+        self.assertEqual(supervisor.reloads, 1)
+        supervisor.between_orders()
+        self.assertEqual(reloaded, [True])
+
+    def test_failed_reload_keeps_running(self):
+        """Test: Un error al recargar no detiene el robot"""
+        supervisor = self.new_supervisor()
+
+        def broken_hook():
+            raise RuntimeError("template corrupto")
+
+        supervisor.add_reload_hook(broken_hook)
+        supervisor.request_reload()
+        self.assertTrue(supervisor.between_orders())
+        self.assertEqual(supervisor.reloads, 0)
+
+    def test_control_files_are_consumed(self):
+        """Test: Los archivos de control piden recarga y drenaje y se eliminan"""
+        supervisor = self.new_supervisor()
+        reloaded = []
+        supervisor.add_reload_hook(lambda: reloaded.append(True))
+        request_control(RELOAD, self.reload_file)
+        self.assertTrue(supervisor.between_orders())
+        self.assertEqual(reloaded, [True])
+        self.assertFalse(os.path.exists(self.reload_file))
+
+        request_control(DRAIN, self.stop_file)
+        self.assertFalse(supervisor.between_orders())
+        self.assertFalse(os.path.exists(self.stop_file))
+
+    def test_stale_control_file_is_discarded(self):
+        """Test: Un archivo de control de una ejecución anterior no drena el robot recién iniciado"""
+        request_control(DRAIN, self.stop_file)
+        old = time.time() - 3600
+        os.utime(self.stop_file, (old, old))
+
+        supervisor = self.new_supervisor()
+        self.assertTrue(supervisor.between_orders())
+        self.assertFalse(os.path.exists(self.stop_file))
+
+    def test_run_forever_finishes_cycle_then_flushes(self):
+        """Test: Un drenaje pedido durante el ciclo deja terminarlo y luego vacía el trabajo pendiente"""
+        events = []
+
+        def task(supervisor):
+            events.append('inicio')
+            supervisor.request_drain("prueba")
+            events.append('fin')
+
+        supervisor = self.new_supervisor(task)
+        supervisor.add_shutdown_hook(lambda: events.append('vaciado'))
+        supervisor.run_forever(max_cycles=5)
+        self.assertEqual(events, ['inicio', 'fin', 'vaciado'])
+
+    def test_run_forever_repeats_cycles(self):
+        """Test: Sin pedidos el ciclo se repite cada intervalo"""
+        supervisor = self.new_supervisor()
+        supervisor.run_forever(max_cycles=3)
+        self.assertEqual(len(self.cycles), 3)
+
+    def test_task_error_does_not_stop_supervisor(self):
+        """Test: Un error en el ciclo se registra y el supervisor continúa"""
+        calls = []
+
+        def task(supervisor):
+            calls.append(True)
+            raise RuntimeError("SAP no responde")
+
+        supervisor = self.new_supervisor(task)
+        supervisor.run_forever(max_cycles=2)
+        self.assertEqual(len(calls), 2)
+
+    def test_error_waits_only_error_wait(self):
+        """Test: Después de un ciclo con error se espera error_wait y no además el intervalo"""
+        def task(supervisor):
+            raise RuntimeError("SAP no responde")
+
+        supervisor = Supervisor(task, interval=600, poll=0.01, error_wait=5,
+                                stop_file=self.stop_file, reload_file=self.reload_file)
+        with patch.object(supervisor, '_wait') as wait:
+            supervisor.run_forever(max_cycles=2)
+        self.assertEqual([call.args for call in wait.call_args_list], [(5,)])
+
+    @unittest.skipUnless(hasattr(signal, 'SIGHUP'), "Señales POSIX no disponibles")
+    def test_signals_request_drain_and_reload(self):
+        """Test: SIGTERM pide drenaje y SIGHUP pide recarga"""
+        previous = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)}
+        try:
+            supervisor = self.new_supervisor()
+            reloaded = []
+            supervisor.add_reload_hook(lambda: reloaded.append(True))
+            supervisor.install_signal_handlers()
+
+            os.kill(os.getpid(), signal.SIGHUP)
+            self.assertTrue(supervisor.between_orders())
+            self.assertEqual(reloaded, [True])
+
+            os.kill(os.getpid(), signal.SIGTERM)
+            self.assertFalse(supervisor.between_orders())
+
+            # Segundo Ctrl+C durante el drenaje: detención inmediata
+            with self.assertRaises(KeyboardInterrupt):
+                os.kill(os.getpid(), signal.SIGINT)
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+
+if __name__ == '__main__':
+    unittest.main()
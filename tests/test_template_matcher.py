@@ -0,0 +1,166 @@
+"""
+Tests para TemplateMatcher
+Verifica el matching en lote con regiones y umbrales por template
+y la carga de templates con canal alfa
+"""
+
+import unittest
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import cv2
+    import numpy as np
+    from rpa.vision.template_matcher import TemplateMatcher
+    HAS_VISION = True
+except Exception:
+    HAS_VISION = False
+
+
+def _make_pattern(seed, size=(24, 40)):
+    """Genera un template con textura para que el matching sea inequívoco"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, size=(size[0], size[1], 3), dtype=np.uint8)
+
+
+@unittest.skipUnless(HAS_VISION, "OpenCV/numpy no disponibles")
+class TestMatchBatch(unittest.TestCase):
+    """Tests para TemplateMatcher.match_batch"""
+
+    def setUp(self):
+        self.matcher = TemplateMatcher()
+        self.frame = np.full((400, 600, 3), 240, dtype=np.uint8)
+        self.template_a = _make_pattern(1)
+        self.template_b = _make_pattern(2)
+        self.frame[100:124, 50:90] = self.template_a
+        self.frame[300:324, 400:440] = self.template_b
+
+    def test_batch_finds_all_templates(self):
+        """Test: El lote encuentra cada template en su posición"""
+        batch = self.matcher.match_batch(
+            {'a': self.template_a, 'b': self.template_b},
+            self.frame, confidence=0.9, max_workers=2
+        )
+        self.assertEqual(batch.coordinates(), {'a': (70, 112), 'b': (420, 312)})
+        self.assertEqual(set(batch.timings), {'a', 'b'})
+        self.assertEqual(batch.workers, 2)
+
+    def test_sequential_and_parallel_agree(self):
+        """Test: 1 hilo y varios hilos producen el mismo resultado"""
+        templates = {'a': self.template_a, 'b': self.template_b}
+        sequential = self.matcher.match_batch(templates, self.frame, confidence=0.9, max_workers=1)
+        parallel = self.matcher.match_batch(templates, self.frame, confidence=0.9, max_workers=4)
+        self.assertEqual(sequential.coordinates(), parallel.coordinates())
+
+    def test_per_template_region_and_threshold(self):
+        """Test: Región y umbral por template"""
+        batch = self.matcher.match_batch(
+            {'a': self.template_a, 'b': self.template_b},
+            self.frame,
+            regions={'b': (0, 0, 300, 200)},
+            thresholds={'a': 0.9, 'b': 0.9}
+        )
+        self.assertEqual(batch.results['a'].coordinates, (70, 112))
+        # 'b' está fuera de su región de búsqueda
+        self.assertIsNone(batch.results['b'].coordinates)
+
+    def test_region_offsets_coordinates(self):
+        """Test: Las coordenadas con región se expresan en la pantalla completa"""
+        batch = self.matcher.match_batch(
+            {'b': self.template_b}, self.frame,
+            regions={'b': (350, 250, 200, 100)}, thresholds={'b': 0.9}
+        )
+        self.assertEqual(batch.results['b'].coordinates, (420, 312))
+
+    def test_missing_template_reports_error(self):
+        """Test: Un template no cargado no interrumpe el lote"""
+        batch = self.matcher.match_batch({'a': self.template_a, 'none': None}, self.frame, confidence=0.9)
+        self.assertTrue(batch.results['a'].found)
+        self.assertFalse(batch.results['none'].found)
+        self.assertIsNotNone(batch.results['none'].error)
+
+
+@unittest.skipUnless(HAS_VISION, "OpenCV/numpy no disponibles")
+class TestAlphaTemplates(unittest.TestCase):
+    """Tests para templates con transparencia"""
+
+    def setUp(self):
+        self.matcher = TemplateMatcher()
+        self.temp_dir = tempfile.mkdtemp()
+        # Botón con textura y un marco transparente de 6 px
+        self.bgra = np.zeros((36, 52, 4), dtype=np.uint8)
+        self.bgra[:, :, :3] = _make_pattern(3, size=(36, 52))
+        self.bgra[6:30, 6:46, 3] = 255
+        self.path = os.path.join(self.temp_dir, 'button.png')
+        cv2.imwrite(self.path, self.bgra)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_load_normalizes_to_bgr_with_mask(self):
+        """Test: Un PNG BGRA se carga como BGR con máscara registrada"""
+        template = self.matcher.load_template_image(self.path)
+        self.assertEqual(template.shape, (36, 52, 3))
+        mask = self.matcher.get_template_mask(template)
+        self.assertIsNotNone(mask)
+        self.assertEqual(int(mask[0, 0]), 0)
+        self.assertEqual(int(mask[10, 10]), 255)
+        self.assertTrue(self.matcher.get_template_info(template)['masked'])
+
+    def test_opaque_alpha_has_no_mask(self):
+        """Test: Un canal alfa totalmente opaco no genera máscara"""
+        self.bgra[:, :, 3] = 255
+        cv2.imwrite(self.path, self.bgra)
+        template = self.matcher.load_template_image(self.path)
+        self.assertIsNone(self.matcher.get_template_mask(template))
+
+    def test_grayscale_template_is_converted(self):
+        """Test: Un template en escala de grises se convierte a BGR"""
+        gray_path = os.path.join(self.temp_dir, 'gray.png')
+        cv2.imwrite(gray_path, _make_pattern(4)[:, :, 0])
+        template = self.matcher.load_template_image(gray_path)
+        self.assertEqual(template.shape, (24, 40, 3))
+
+    def test_masked_match_ignores_transparent_border(self):
+        """Test: El borde transparente no afecta el matching sobre otro fondo"""
+        template = self.matcher.load_template_image(self.path)
+        frame = np.full((300, 400, 3), 30, dtype=np.uint8)
+        # Solo la zona opaca coincide; el borde queda sobre un fondo distinto
+        frame[106:130, 206:246] = self.bgra[6:30, 6:46, :3]
+        coordinates = self.matcher.find_template(template, frame, confidence=0.95)
+        self.assertEqual(coordinates, (226, 118))
+
+    def test_cache_invalidated_when_file_changes(self):
+        """Test: La caché se recarga si el archivo se reescribe"""
+        first = self.matcher.load_template_image(self.path)
+        self.assertIs(self.matcher.load_template_image(self.path), first)
+
+        self.bgra[:, :, 3] = 255
+        cv2.imwrite(self.path, self.bgra)
+        future = time.time() + 5
+        os.utime(self.path, (future, future))
+
+        second = self.matcher.load_template_image(self.path)
+        self.assertIsNot(second, first)
+        self.assertIsNone(self.matcher.get_template_mask(second))
+
+    def test_template_path_identifies_current_image(self):
+        """Test: La ruta de origen identifica al template vigente (clave de la caché de resultados)"""
+        first = self.matcher.load_template_image(self.path)
+        self.assertEqual(self.matcher.get_template_path(first), self.path)
+        self.assertIsNone(self.matcher.get_template_path(first.copy()))
+
+        cv2.imwrite(self.path, self.bgra)
+        future = time.time() + 5
+        os.utime(self.path, (future, future))
+        second = self.matcher.load_template_image(self.path)
+        self.assertEqual(self.matcher.get_template_path(second), self.path)
+        self.assertIsNone(self.matcher.get_template_path(first))
+
+
+if __name__ == '__main__':
+    unittest.main()
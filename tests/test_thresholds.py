@@ -0,0 +1,93 @@
+"""
+Tests para la tabla de umbrales calibrados
+Verifica el cálculo del umbral de margen máximo y la carga de la tabla
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.vision.thresholds import calibrate_threshold, ThresholdTable
+
+
+class TestCalibrateThreshold(unittest.TestCase):
+    """Tests para calibrate_threshold"""
+
+    def test_separable_scores_use_midpoint(self):
+        """Test: Sin solapamiento el umbral queda en el punto medio"""
+        result = calibrate_threshold([0.92, 0.95, 0.97], [0.40, 0.61, 0.55])
+        self.assertAlmostEqual(result['threshold'], 0.765)
+        self.assertAlmostEqual(result['margin'], 0.31)
+        self.assertEqual(result['errors'], 0)
+
+    def test_overlapping_scores_minimize_errors(self):
+        """Test: Con solapamiento se minimizan los errores"""
+        result = calibrate_threshold([0.70, 0.90, 0.95], [0.50, 0.75, 0.60])
+        self.assertEqual(result['errors'], 1)
+        self.assertLess(result['margin'], 0)
+        # El corte queda entre 0.75 y 0.90: solo se pierde el positivo de 0.70
+        self.assertGreater(result['threshold'], 0.75)
+        self.assertLess(result['threshold'], 0.90)
+
+    def test_without_negatives(self):
+        """Test: Sin negativos el umbral es la mitad de la menor positiva"""
+        result = calibrate_threshold([0.8, 0.9], [])
+        self.assertAlmostEqual(result['threshold'], 0.4)
+        self.assertEqual(result['negatives'], 0)
+
+    def test_score_equal_to_threshold_is_rejected(self):
+        """Test: Una confianza igual al umbral no se acepta (misma comparación que Vision)"""
+        result = calibrate_threshold([0.8], [0.8])
+        self.assertAlmostEqual(result['threshold'], 0.8)
+        self.assertEqual(result['errors'], 1)
+
+    def test_requires_positives(self):
+        """Test: Sin positivos no se puede calibrar"""
+        with self.assertRaises(ValueError):
+            calibrate_threshold([], [0.3])
+
+
+class TestThresholdTable(unittest.TestCase):
+    """Tests para ThresholdTable"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'thresholds.json')
+        self.table = ThresholdTable(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_missing_file_uses_default(self):
+        """Test: Sin archivo se usa el umbral por defecto"""
+        self.assertEqual(self.table.get('sap_icon', 0.7), 0.7)
+
+    def test_save_and_get(self):
+        """Test: Los umbrales guardados se leen por template y por pantalla"""
+        self.table.save(
+            {'sap_icon': calibrate_threshold([0.95], [0.55])},
+            {'sap_desktop': calibrate_threshold([0.88], [0.3])},
+            ['./recordings']
+        )
+        self.assertAlmostEqual(self.table.get('sap_icon', 0.7), 0.75)
+        self.assertAlmostEqual(self.table.get('sap_desktop', 0.8, 'screen_states'), 0.59)
+        self.assertEqual(self.table.get('client_field', 0.75), 0.75)
+
+    def test_reloads_when_file_changes(self):
+        """Test: La tabla se recarga si el archivo cambia"""
+        with open(self.path, 'w') as f:
+            json.dump({'templates': {'sap_icon': {'threshold': 0.6}}}, f)
+        self.assertEqual(self.table.get('sap_icon', 0.7), 0.6)
+
+        with open(self.path, 'w') as f:
+            json.dump({'templates': {'sap_icon': {'threshold': 0.65}}}, f)
+        os.utime(self.path, (os.path.getmtime(self.path) + 5,) * 2)
+        self.assertEqual(self.table.get('sap_icon', 0.7), 0.65)
+
+
+if __name__ == '__main__':
+    unittest.main()
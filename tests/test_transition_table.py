@@ -0,0 +1,73 @@
+"""
+Tests para la tabla de transiciones compilada de la máquina de estados
+Verifica la validación al iniciar, los callbacks pre-enlazados y la exportación del grafo
+"""
+
+import unittest
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.state_machine import StateMachine, RPAState, RPAEvent, TransitionTableError
+
+
+class TestTransitionTable(unittest.TestCase):
+    """Tests para la compilación y validación de transiciones"""
+
+    def setUp(self):
+        self.state_machine = StateMachine()
+
+    def test_default_table_is_valid(self):
+        """Test: La tabla por defecto pasa la validación y cubre cada transición"""
+        self.state_machine.validate_transitions()
+        expected = sum(len(events) for events in self.state_machine.transitions.values())
+        self.assertEqual(len(self.state_machine._table), expected)
+
+    def test_unreachable_state_fails_validation(self):
+        """Test: Un estado al que no llega ninguna transición se detecta al validar"""
+        del self.state_machine.transitions[RPAState.POSITIONING_MOUSE][RPAEvent.MOUSE_POSITIONED]
+        with self.assertRaises(TransitionTableError) as error:
+            self.state_machine.validate_transitions()
+        self.assertIn('taking_screenshot', str(error.exception))
+
+    def test_missing_state_fails_validation(self):
+        """Test: Un estado sin transiciones definidas se detecta al validar"""
+        del self.state_machine.transitions[RPAState.RETRYING]
+        with self.assertRaises(TransitionTableError) as error:
+            self.state_machine.validate_transitions()
+        self.assertIn('Sin transiciones definidas: retrying', str(error.exception))
+
+    def test_missing_handlers_fail_validation(self):
+        """Test: Con require_handlers se exige un manejador por estado"""
+        with self.assertRaises(TransitionTableError):
+            self.state_machine.validate_transitions(require_handlers=True)
+
+    @patch('rpa.state_machine.checkpoint_store')
+    def test_callbacks_registered_after_compile_are_used(self, _store):
+        """Test: Registrar un callback recompila la tabla"""
+        calls = []
+        self.state_machine.register_exit_callback(RPAState.IDLE, lambda context, **kwargs: calls.append('exit'))
+        self.state_machine.register_entry_callback(RPAState.CONNECTING_REMOTE_DESKTOP,
+                                                   lambda context, **kwargs: calls.append('enter'))
+        self.assertTrue(self.state_machine.trigger_event(RPAEvent.START_PROCESSING))
+        self.assertEqual(calls, ['exit', 'enter'])
+        self.assertEqual(self.state_machine.context.last_completed_state, RPAState.CONNECTING_REMOTE_DESKTOP)
+
+    def test_invalid_event_is_rejected(self):
+        """Test: Un evento sin transición desde el estado actual no cambia el estado"""
+        self.assertFalse(self.state_machine.trigger_event(RPAEvent.NIT_LOADED))
+        self.assertEqual(self.state_machine.get_current_state(), RPAState.IDLE)
+        self.assertFalse(self.state_machine.can_transition_to(RPAEvent.NIT_LOADED))
+        self.assertEqual(self.state_machine.get_available_events(), [RPAEvent.START_PROCESSING])
+
+    def test_export_dot(self):
+        """Test: El grafo exportado contiene cada transición"""
+        dot = self.state_machine.export_dot()
+        self.assertTrue(dot.startswith('digraph rpa_state_machine {'))
+        self.assertIn('"loading_nit" -> "loading_order" [label="nit_loaded"];', dot)
+        self.assertIn('"loading_items" -> "error" [label="state_timeout" color=red];', dot)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Tests para la captura en memoria del formulario de órdenes de venta
+Verifica que las búsquedas de coordenadas usen el frame actual sin escribir a disco
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import numpy as np
+    from rpa.vision.main import Vision
+    HAS_VISION = True
+except ImportError:
+    HAS_VISION = False
+
+
+@unittest.skipUnless(HAS_VISION, "OpenCV/OCR no disponibles")
+class TestFormFrame(unittest.TestCase):
+    """Tests para Vision.set_form_frame"""
+
+    def setUp(self):
+        self.vision = Vision()
+        self.frame = np.full((600, 800, 3), 235, dtype=np.uint8)
+        h, w = self.vision.client_field_image.shape[:2]
+        self.frame[200:200 + h, 100:100 + w] = self.vision.client_field_image
+
+    def test_lookups_use_form_frame(self):
+        """Test: get_client_coordinates busca en el frame en memoria"""
+        self.vision.set_form_frame(self.frame)
+        self.assertIs(self.vision.get_template_image(), self.frame)
+        coordinates = self.vision.get_client_coordinates()
+        self.assertIsNotNone(coordinates)
+        h = self.vision.client_field_image.shape[0]
+        self.assertEqual(coordinates[1], 200 + h // 2)
+
+    def test_set_form_frame_does_not_write_files(self):
+        """Test: Guardar el frame no toca la carpeta de referencias"""
+        reference_dir = './rpa/vision/reference_images'
+        before = {name: os.path.getmtime(os.path.join(reference_dir, name)) for name in os.listdir(reference_dir)}
+        with patch('rpa.vision.main.grab_screen', return_value=self.frame):
+            self.vision.set_form_frame()
+        after = {name: os.path.getmtime(os.path.join(reference_dir, name)) for name in os.listdir(reference_dir)}
+        self.assertEqual(before, after)
+
+    def test_save_template_writes_to_debug_path(self):
+        """Test: save_template escribe en la carpeta de depuración"""
+        debug_dir = tempfile.mkdtemp()
+        try:
+            self.vision.set_form_frame(self.frame)
+            with patch('rpa.vision.main.config.get', return_value=debug_dir):
+                self.vision.save_template()
+            self.assertTrue(os.path.exists(os.path.join(debug_dir, 'template.png')))
+        finally:
+            shutil.rmtree(debug_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Tests para el watchdog de la máquina de estados
+Verifica plazos por estado, interrupción cooperativa y heartbeat
+"""
+
+import unittest
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.watchdog import StateWatchdog, StateTimeoutError
+from rpa.state_machine import StateMachine, RPAState, RPAEvent
+
+
+class TestStateWatchdog(unittest.TestCase):
+    """Tests para StateWatchdog"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.watchdog = StateWatchdog()
+        self.watchdog.enabled = True
+        self.watchdog.heartbeat_file = os.path.join(self.temp_dir, 'heartbeat.json')
+        self.watchdog.heartbeat_interval = 0.05
+        self.watchdog.state_timeouts = {'loading_nit': 0.2}
+
+    def tearDown(self):
+        self.watchdog.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_timeout_per_state(self):
+        """Test: Cada estado usa su plazo o el plazo por defecto"""
+        self.watchdog.default_timeout = 50
+        self.assertEqual(self.watchdog.get_timeout('loading_nit'), 0.2)
+        self.assertEqual(self.watchdog.get_timeout('opening_sap'), 50)
+
+    def test_sleep_is_interrupted_at_deadline(self):
+        """Test: Una espera larga se corta al vencer el plazo"""
+        self.watchdog.enter_state('loading_nit', 'orden.json')
+        start = time.time()
+        with self.assertRaises(StateTimeoutError):
+            self.watchdog.sleep(5)
+        self.assertLess(time.time() - start, 1.0)
+        self.assertTrue(self.watchdog.expired)
+        self.assertEqual(self.watchdog.timeouts_count, 1)
+
+    def test_timeout_is_not_swallowed_by_except_exception(self):
+        """Test: Un `except Exception` de una acción no oculta el timeout"""
+        self.watchdog.enter_state('loading_nit')
+
+        def action():
+            try:
+                self.watchdog.sleep(5)
+            except Exception:
+                return False
+
+        with self.assertRaises(StateTimeoutError):
+            action()
+
+    def test_new_state_rearms_deadline(self):
+        """Test: Entrar a un estado nuevo limpia el vencimiento anterior"""
+        self.watchdog.enter_state('loading_nit')
+        time.sleep(0.25)
+        self.assertTrue(self.watchdog.expired)
+        self.watchdog.enter_state('loading_order')
+        self.assertFalse(self.watchdog.expired)
+        self.watchdog.sleep(0.01)
+
+    def test_heartbeat_file(self):
+        """Test: El hilo publica el heartbeat con el estado actual"""
+        self.watchdog.enter_state('loading_order', 'orden.json')
+        self.watchdog.start()
+        time.sleep(0.2)
+        with open(self.watchdog.heartbeat_file, 'r', encoding='utf-8') as f:
+            heartbeat = json.load(f)
+        self.assertEqual(heartbeat['state'], 'loading_order')
+        self.assertEqual(heartbeat['file'], 'orden.json')
+        self.assertFalse(heartbeat['expired'])
+
+
+class TestStateMachineTimeout(unittest.TestCase):
+    """Tests para el evento STATE_TIMEOUT en la máquina de estados"""
+
+    def test_handler_timeout_leads_to_error(self):
+        """Test: Un manejador interrumpido genera STATE_TIMEOUT y pasa a ERROR"""
+        state_machine = StateMachine()
+        state_machine.current_state = RPAState.LOADING_NIT
+
+        def hung_handler(context, **kwargs):
+            raise StateTimeoutError('loading_nit', 60)
+
+        state_machine.register_state_handler(RPAState.LOADING_NIT, hung_handler)
+        event = state_machine.execute_current_state()
+        self.assertEqual(event, RPAEvent.STATE_TIMEOUT)
+        self.assertEqual(state_machine.context.processing_stats['timeouts'][0]['state'], 'loading_nit')
+
+        self.assertTrue(state_machine.trigger_event(event))
+        self.assertEqual(state_machine.get_current_state(), RPAState.ERROR)
+
+    def test_timeout_transition_only_for_working_states(self):
+        """Test: Los estados de control no tienen transición por timeout"""
+        state_machine = StateMachine()
+        self.assertIn(RPAEvent.STATE_TIMEOUT, state_machine.transitions[RPAState.LOADING_ITEMS])
+        self.assertNotIn(RPAEvent.STATE_TIMEOUT, state_machine.transitions[RPAState.IDLE])
+        self.assertNotIn(RPAEvent.STATE_TIMEOUT, state_machine.transitions[RPAState.ERROR])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+"""
+Tests para la coordinación de varios robots con leases
+Verifica el reclamo exclusivo, el heartbeat, el vencimiento y reclamo por otro
+robot, y que varios procesos drenen una misma cola sin repetir órdenes
+"""
+
+import unittest
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import multiprocessing
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rpa.work_leases import LeaseManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def drain_queue(queue_dir, done_dir, lease_dir, worker_id, results_file):
+    """Robot de prueba: toma órdenes con lease y las mueve a procesados"""
+    leases = LeaseManager(lease_dir=lease_dir, worker_id=worker_id, ttl=30, heartbeat_interval=0.05)
+    processed = []
+    for name in sorted(os.listdir(queue_dir)):
+        if not leases.claim(name):
+            continue
+        with leases.hold(name) as lease:
+            source = os.path.join(queue_dir, name)
+            if not os.path.exists(source):
+                continue
+            time.sleep(0.01)
+            lease.check()
+            os.rename(source, os.path.join(done_dir, name))
+            processed.append(name)
+    with open(results_file, 'w', encoding='utf-8') as f:
+        json.dump(processed, f)
+
+
+class TestLeaseManager(unittest.TestCase):
+    """Tests para LeaseManager en un solo proceso"""
+
+    def setUp(self):
+        self.lease_dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.robot_a = LeaseManager(lease_dir=self.lease_dir, worker_id='robot-a', ttl=60, clock=self.clock)
+        self.robot_b = LeaseManager(lease_dir=self.lease_dir, worker_id='robot-b', ttl=60, clock=self.clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.lease_dir, ignore_errors=True)
+
+    def test_claim_is_exclusive(self):
+        """Test: Solo un robot toma una orden con lease vigente"""
+        self.assertTrue(self.robot_a.claim('orden.json'))
+        self.assertFalse(self.robot_b.claim('orden.json'))
+        self.assertEqual(self.robot_a.read('orden.json')['worker'], 'robot-a')
+
+    def test_own_lease_is_reclaimed(self):
+        """Test: El mismo robot vuelve a tomar su lease (ciclo siguiente)"""
+        self.assertTrue(self.robot_a.claim('orden.json'))
+        self.assertTrue(self.robot_a.claim('orden.json'))
+
+    def test_expired_lease_is_stolen(self):
+        """Test: Un lease sin heartbeat vence y otro robot reclama la orden"""
+        self.robot_a.claim('orden.json')
+        self.clock.now += 61
+        self.assertTrue(self.robot_b.claim('orden.json'))
+        self.assertEqual(self.robot_b.read('orden.json')['worker'], 'robot-b')
+        # El robot original ya no puede renovar ni liberar
+        self.assertFalse(self.robot_a.heartbeat('orden.json'))
+        self.assertFalse(self.robot_a.release('orden.json'))
+        self.assertTrue(os.path.exists(os.path.join(self.lease_dir, 'orden.json.lease')))
+
+    def test_heartbeat_extends_lease(self):
+        """Test: El heartbeat evita que el lease venza"""
+        self.robot_a.claim('orden.json')
+        self.clock.now += 50
+        self.assertTrue(self.robot_a.heartbeat('orden.json'))
+        self.clock.now += 50
+        self.assertFalse(self.robot_b.claim('orden.json'))
+
+    def test_release_frees_order(self):
+        """Test: Al liberar el lease otro robot puede tomar la orden"""
+        self.robot_a.claim('orden.json')
+        self.assertTrue(self.robot_a.release('orden.json'))
+        self.assertTrue(self.robot_b.claim('orden.json'))
+
+    def test_unreadable_lease_expires_by_mtime(self):
+        """Test: Un lease incompleto (robot muerto al escribirlo) vence por fecha de modificación"""
+        path = os.path.join(self.lease_dir, 'orden.json.lease')
+        with open(path, 'w') as f:
+            f.write('{"worker": ')
+        self.clock.now = time.time()
+        self.assertFalse(self.robot_b.claim('orden.json'))
+        self.clock.now = time.time() + 61
+        self.assertTrue(self.robot_b.claim('orden.json'))
+
+    def test_abandoned_lock_is_broken(self):
+        """Test: Un candado de reclamo abandonado no bloquea la orden para siempre"""
+        self.robot_a.claim('orden.json')
+        lock_path = os.path.join(self.lease_dir, 'orden.json.lease.lock')
+        open(lock_path, 'w').close()
+        self.clock.now = time.time() + 61
+        self.assertTrue(self.robot_b.claim('orden.json'))
+        self.assertFalse(os.path.exists(lock_path))
+
+    def test_leases_reports_expired(self):
+        """Test: leases() lista los leases con su estado"""
+        self.robot_a.claim('a.json')
+        self.robot_b.claim('b.json')
+        self.clock.now += 61
+        self.robot_b.heartbeat('b.json')
+        status = {lease['name']: lease['expired'] for lease in self.robot_a.leases()}
+        self.assertEqual(status, {'a.json': True, 'b.json': False})
+
+    def test_claimed_only_while_block_runs(self):
+        """Test: claimed() toma el lease durante el bloque y no pisa el de otro robot"""
+        with self.robot_a.claimed('orden.json') as owned:
+            self.assertTrue(owned)
+            self.assertFalse(self.robot_b.claim('orden.json'))
+        self.assertIsNone(self.robot_a.read('orden.json'))
+
+        self.robot_b.claim('orden.json')
+        with self.robot_a.claimed('orden.json') as owned:
+            self.assertFalse(owned)
+        self.assertEqual(self.robot_a.read('orden.json')['worker'], 'robot-b')
+
+    def test_hold_renews_and_releases(self):
+        """Test: hold() renueva en segundo plano y libera al terminar"""
+        robot = LeaseManager(lease_dir=self.lease_dir, worker_id='robot-c', ttl=60, heartbeat_interval=0.01)
+        robot.claim('orden.json')
+        first = robot.read('orden.json')['heartbeat_at']
+        with robot.hold('orden.json') as lease:
+            time.sleep(0.1)
+            self.assertGreater(robot.read('orden.json')['heartbeat_at'], first)
+            self.assertFalse(lease.lost)
+        self.assertIsNone(robot.read('orden.json'))
+
+
+class TestMultipleWorkers(unittest.TestCase):
+    """Varios procesos drenan la misma cola"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.queue_dir = os.path.join(self.root, 'cola')
+        self.done_dir = os.path.join(self.root, 'procesados')
+        self.lease_dir = os.path.join(self.root, '.leases')
+        for directory in (self.queue_dir, self.done_dir, self.lease_dir):
+            os.makedirs(directory)
+        self.orders = [f'orden_{i:03d}.json' for i in range(60)]
+        for name in self.orders:
+            with open(os.path.join(self.queue_dir, name), 'w') as f:
+                f.write('{}')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_workers_process_each_order_once(self):
+        """Test: Cada orden la procesa exactamente un robot, incluida la de un robot muerto"""
+        # Lease vencido de un robot que murió a mitad de una orden
+        dead = LeaseManager(lease_dir=self.lease_dir, worker_id='robot-muerto', ttl=30,
+                            clock=lambda: time.time() - 3600)
+        dead.claim(self.orders[0])
+
+        context = multiprocessing.get_context('spawn')
+        results = [os.path.join(self.root, f'robot_{i}.json') for i in range(4)]
+        workers = [context.Process(target=drain_queue,
+                                   args=(self.queue_dir, self.done_dir, self.lease_dir, f'robot-{i}', results[i]))
+                   for i in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            self.assertEqual(worker.exitcode, 0)
+
+        processed = []
+        for path in results:
+            with open(path, encoding='utf-8') as f:
+                processed.extend(json.load(f))
+        self.assertEqual(sorted(processed), self.orders)
+        self.assertEqual(sorted(os.listdir(self.done_dir)), self.orders)
+        self.assertEqual(os.listdir(self.queue_dir), [])
+        self.assertEqual(os.listdir(self.lease_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()